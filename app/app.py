@@ -1,7 +1,8 @@
 import logging
 
 from app.config import init_app
-from app.devices.device_service import DeviceService
+from app.config.settings import PREPARE_DEVICES
+from app.devices.federation import create_live_device_service
 
 logger = logging.getLogger(__name__)
 
@@ -13,8 +14,8 @@ def main():
 
     logger.info("Starting EXA-MYIM3 application")
 
-    # Create device service
-    device_service = DeviceService()
+    # Create device service (federated when several ADB servers are configured)
+    device_service = create_live_device_service()
 
     # Get and display connected devices
     devices = device_service.get_devices()
@@ -34,25 +35,44 @@ def main():
         else:
             logger.warning(f"No properties available for device {device.serial}")
 
+    if PREPARE_DEVICES:
+        ready = device_service.prepare_devices([device.serial for device in devices])
+        for serial, ok in ready.items():
+            if not ok:
+                logger.warning(f"Device {serial} could not be fully prepared")
+
+    # Battery, CPU and thermal state sampled in the background for the whole run
+    telemetry = device_service.start_telemetry([device.serial for device in devices])
+
     package_name = "com.pure.indosat.care"
 
     for device in devices:
         serial = device.serial
 
-        # Press HOME key first
-        logger.info(f"Pressing HOME key on device {serial}")
-        success = device_service.press_key(serial, 3)  # KEYCODE_HOME = 3
-        logger.info(f"Press HOME result: {'Success' if success else 'Failed'}")
-
-        # Then open the app
+        # Open the app unless it is already in front
         logger.info(f"Opening {package_name} on device {serial}")
-        app_success = device_service.open_app(serial, package_name)
-        logger.info(f"Open app result: {'Success' if app_success else 'Failed'}")
+        launch = device_service.launch_app(serial, package_name)
+        if launch.skipped:
+            logger.info("Open app result: already in front")
+        else:
+            logger.info(
+                f"Open app result: {'Success' if launch.ok else 'Failed'} "
+                f"({launch.launch_state}, TotalTime={launch.total_time}ms)"
+            )
+
+        # Get battery info (latest telemetry sample when telemetry is on)
+        latest = telemetry.latest(serial) if telemetry else {}
+        if latest:
+            logger.info(
+                "Telemetry: "
+                + ", ".join(f"{name}={value:g}" for name, value in latest.items())
+            )
+        else:
+            battery = device_service.get_battery_info(serial)
+            if "level" in battery:
+                logger.info(f"Battery level: {battery['level']}%")
 
-        # Get battery info
-        battery = device_service.get_battery_info(serial)
-        if "level" in battery:
-            logger.info(f"Battery level: {battery['level']}%")
+    device_service.close()  # restores prepared device settings
 
     logger.info("Application completed")
 
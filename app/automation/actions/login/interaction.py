@@ -1,9 +1,13 @@
-import time
-import uiautomator2 as u2
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 
 from app.logging import get_device_logger, log_action
 from app.automation.ui.input_utils import is_element_enabled
 
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+
 
 @log_action
 def click_continue(ui_device: u2.Device, resource_id: str, serial: str) -> bool:
@@ -20,11 +24,10 @@ def click_continue(ui_device: u2.Device, resource_id: str, serial: str) -> bool:
     """
     logger = get_device_logger(serial)
 
-    continue_button = ui_device(resourceId=resource_id)
-    if not continue_button.exists or not is_element_enabled(ui_device, resource_id):
+    if not is_element_enabled(ui_device, resource_id):
         logger.error("Button Continue tidak ditemukan atau tidak enabled")
         return False
 
-    continue_button.click()
+    ui_device(resourceId=resource_id).click()
     logger.info("Klik button Continue")
     return True
@@ -1,7 +1,13 @@
-import uiautomator2 as u2
+from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
+from app.automation.timing import timing_profiles
 from app.logging import get_device_logger, log_action
 
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+
 
 @log_action
 def navigate_to_account(
@@ -14,7 +20,8 @@ def navigate_to_account(
         ui_device: Objek UI Automator device
         resource_ids: Dictionary resource IDs
         serial: Serial number device
-        timeout: Timeout untuk menunggu container login (detik)
+        timeout: Timeout untuk menunggu container login (detik), sampai
+            profil waktu model device ini cukup terekam
 
     Returns:
         bool: True jika berhasil, False jika gagal
@@ -30,9 +37,13 @@ def navigate_to_account(
     logger.info("Klik tab Account")
 
     # Tunggu elemen container login muncul
-    if not ui_device(resourceId=resource_ids["login_container"]).wait(timeout=timeout):
+    wait = timing_profiles.for_serial(serial).wait("login_container", timeout)
+    login_container = ui_device(resourceId=resource_ids["login_container"])
+    if not login_container.wait(timeout=wait.timeout):
+        wait.timed_out()
         logger.error("Login container tidak muncul")
         return False
+    wait.done()
 
     logger.info("Berhasil navigasi ke halaman login")
     return True
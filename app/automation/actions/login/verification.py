@@ -1,9 +1,14 @@
-import time
+from __future__ import annotations
 
-import uiautomator2 as u2
+from typing import TYPE_CHECKING
 
+from app.automation.timing import timing_profiles
+from app.devices.logcat import wait_for_ui_event
 from app.logging import get_device_logger, log_action
 
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+
 
 @log_action
 def verify_app_opened(ui_device: u2.Device, resource_id: str, serial: str) -> bool:
@@ -39,25 +44,28 @@ def verify_login_success(
         ui_device: Objek UI Automator device
         resource_ids: Dictionary resource IDs
         serial: Serial number device
-        timeout: Waktu maksimum menunggu (detik)
+        timeout: Waktu maksimum menunggu (detik) sampai profil waktu model
+            device ini cukup terekam
 
     Returns:
         bool: True jika login berhasil, False jika gagal
     """
     logger = get_device_logger(serial)
-    start_time = time.time()
+    wait = timing_profiles.for_serial(serial).wait("login_result", timeout, poll=1)
 
-    while time.time() - start_time < timeout:
+    while not wait.expired():
         # Cek apakah sudah di halaman OTP (yang paling diharapkan)
-        otp_title = ui_device(resourceId="com.pure.indosat.care:id/tvLoginVerification")
-        otp_input = ui_device(resourceId="com.pure.indosat.care:id/etOtpView")
+        otp_title = ui_device(resourceId=resource_ids["otp_title"])
+        otp_input = ui_device(resourceId=resource_ids["otp_input"])
 
         if otp_title.exists or otp_input.exists:
+            wait.done()
             logger.info("Login berhasil - halaman OTP terdeteksi")
             return True
 
         # Cek apakah sudah di halaman home (alternatif)
         if ui_device(resourceId=resource_ids["home_indicator"]).exists:
+            wait.done()
             logger.info("Login berhasil - indikator home terdeteksi")
             return True
 
@@ -78,10 +86,12 @@ def verify_login_success(
                 )
                 return False
 
-        # Tunggu sebentar dan coba lagi
-        time.sleep(1)
+        # Tunggu sebentar (atau sampai layar berganti) dan coba lagi
+        wait_for_ui_event(serial, wait.poll)
 
+    wait.timed_out()
     logger.error(
-        f"Login timeout setelah {timeout} detik - tidak ada indikator sukses terdeteksi"
+        f"Login timeout setelah {wait.timeout:.1f} detik - "
+        "tidak ada indikator sukses terdeteksi"
     )
     return False
@@ -3,5 +3,9 @@ from app.automation.actions.otp.interaction import (
     input_otp_code,
     try_resend_otp,
 )
-from app.automation.actions.otp.utils import check_otp_message, get_countdown_time
+from app.automation.actions.otp.utils import (
+    check_otp_message,
+    get_countdown_time,
+    parse_countdown_seconds,
+)
 from app.automation.actions.otp.verification import verify_home_page, verify_otp_page
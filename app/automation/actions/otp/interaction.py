@@ -1,15 +1,21 @@
-import re
-import time
+from __future__ import annotations
 
-import uiautomator2 as u2
+from typing import TYPE_CHECKING
 
 from app.automation.actions.otp.utils import (
     check_otp_message,
     get_countdown_time,
+    parse_countdown_seconds,
     parse_timer_seconds,
 )
+from app.automation.deadline import bounded_timeout, interruptible_sleep
+from app.automation.timing import timing_profiles
+from app.automation.ui.stability import settle
 from app.logging import get_device_logger, log_action
 
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+
 
 @log_action
 def input_otp_code(
@@ -37,19 +43,20 @@ def input_otp_code(
 
     # Klik pada field untuk fokus
     otp_field.click()
-    time.sleep(0.5)
+    interruptible_sleep(0.5)
 
     # Clear field dulu untuk jaga-jaga
     otp_field.clear_text()
-    time.sleep(0.5)
-
-    # Input OTP
-    otp_field.send_keys(otp_code)
+    interruptible_sleep(0.5)
+
+    # Input OTP, lalu tunggu validasi aplikasi (default maks. 1 detik)
+    timing = timing_profiles.for_serial(serial)
+    ceiling = timing.timeout("settle_input_otp", 1)
+    with settle(ui_device, ceiling, "input OTP", logger, serial) as screen:
+        otp_field.send_keys(otp_code)
+    timing.record("settle_input_otp", screen.seconds)
     logger.info(f"Input OTP: {otp_code}")
 
-    # Tunggu validasi aplikasi
-    time.sleep(1)
-
     return True
 
 
@@ -60,7 +67,8 @@ def click_verify(ui_device: u2.Device, resource_ids: dict, serial: str) -> bool:
 
     Args:
         ui_device: Objek UI Automator device
-        resource_ids: Dictionary resource IDs
+        resource_ids: SelectorSet dari selector_registry (memakai fallback
+            tombol verifikasi)
         serial: Serial number device
 
     Returns:
@@ -68,34 +76,30 @@ def click_verify(ui_device: u2.Device, resource_ids: dict, serial: str) -> bool:
     """
     logger = get_device_logger(serial)
 
-    # Cari tombol verifikasi dengan resource ID yang benar
-    verify_button = ui_device(resourceId=resource_ids["verify_button"])
-
-    # Jika tombol tidak ditemukan dengan resource ID, coba dengan teks
-    if not verify_button.exists:
-        # Coba cari dengan teks (dalam bahasa Inggris atau Indonesia)
-        verify_button = ui_device(text="Verify")
-        if not verify_button.exists:
-            verify_button = ui_device(text="Verifikasi")
-
-        if not verify_button.exists:
-            logger.error("Tombol verifikasi tidak ditemukan")
-            return False
+    # Cari tombol verifikasi dengan resource ID, lalu fallback teks (EN/ID)
+    verify_button = resource_ids["verify_button"].find(ui_device)
+    if verify_button is None:
+        logger.error("Tombol verifikasi tidak ditemukan")
+        return False
 
     # Cek apakah tombol enabled
     if not verify_button.info.get("enabled"):
         logger.error("Tombol verifikasi tidak enabled, mungkin OTP belum valid")
         return False
 
-    # Klik tombol
-    verify_button.click()
+    # Klik tombol, lalu tunggu respons sampai layar tidak berubah (default
+    # maks. 2 detik)
+    timing = timing_profiles.for_serial(serial)
+    ceiling = timing.timeout("settle_verify", 2)
+    with settle(ui_device, ceiling, "klik verifikasi", logger, serial) as screen:
+        verify_button.click()
+    timing.record("settle_verify", screen.seconds)
     logger.info("Klik tombol verifikasi OTP")
 
-    # Tunggu sebentar untuk respons
-    time.sleep(2)
-
-    # Periksa pesan yang muncul
-    is_success, message_type = check_otp_message(ui_device, resource_ids, serial)
+    # Periksa pesan yang muncul, dari hierarchy terakhir settle jika ada
+    is_success, message_type = check_otp_message(
+        ui_device, resource_ids, serial, hierarchy=screen.hierarchy
+    )
 
     if not is_success:
         logger.error(f"Verifikasi gagal dengan pesan tipe: {message_type}")
@@ -110,13 +114,13 @@ def click_verify(ui_device: u2.Device, resource_ids: dict, serial: str) -> bool:
             try:
                 timer_text = timer.get_text().strip()
                 seconds = parse_timer_seconds(timer_text)
-                # Tambah 2 detik untuk jaga-jaga
+                # Tambah 2 detik untuk jaga-jaga; selesai begitu timer hilang
                 wait_time = seconds + 2
-                logger.info(f"Menunggu {wait_time} detik untuk redirect...")
-                time.sleep(wait_time)
+                logger.info(f"Menunggu redirect (maks. {wait_time} detik)...")
+                timer.wait_gone(timeout=bounded_timeout(wait_time))
             except Exception as e:
                 logger.warning(f"Gagal parse timer, menunggu 5 detik default: {e}")
-                time.sleep(5)
+                interruptible_sleep(5)
 
     return True
 
@@ -143,38 +147,33 @@ def try_resend_otp(ui_device: u2.Device, resource_ids: dict, serial: str) -> boo
     if not resend_button or not _is_button_enabled(resend_button, logger):
         return False
 
-    resend_button.click()
+    timing = timing_profiles.for_serial(serial)
+    ceiling = timing.timeout("settle_resend", 2)
+    with settle(ui_device, ceiling, "klik resend", logger, serial) as screen:
+        resend_button.click()
+    timing.record("settle_resend", screen.seconds)
     logger.info("Klik tombol resend OTP")
-    time.sleep(2)
 
     return _verify_resend_success(ui_device, resource_ids, serial, logger)
 
 
 def _is_countdown_finished(ui_device, resource_ids, serial, logger) -> bool:
     countdown_text = get_countdown_time(ui_device, resource_ids["countdown"], serial)
-    if countdown_text == "N/A":
+    seconds = parse_countdown_seconds(countdown_text)
+    if seconds is None:
         logger.warning("Tidak dapat menentukan status countdown")
         return False
-    if countdown_text != "00:00":
-        match = re.search(r"(\d+):(\d+)", countdown_text)
-        if match and (int(match.group(1)) > 0 or int(match.group(2)) > 0):
-            logger.info(
-                f"Masih ada waktu countdown ({countdown_text}), belum bisa resend"
-            )
-            return False
+    if seconds > 0:
+        logger.info(f"Masih ada waktu countdown ({countdown_text}), belum bisa resend")
+        return False
     return True
 
 
 def _find_resend_button(ui_device, resource_ids, logger):
-    resend_button = ui_device(resourceId=resource_ids["resend_button"])
-    if not resend_button.exists:
-        for text in ["Resend OTP", "Kirim Ulang OTP", "Resend", "Kirim Ulang"]:
-            resend_button = ui_device(text=text)
-            if resend_button.exists:
-                break
-    if not resend_button.exists:
+    # Resource ID lalu fallback teks (EN/ID) dari selector registry
+    resend_button = resource_ids["resend_button"].find(ui_device)
+    if resend_button is None:
         logger.error("Tombol resend OTP tidak ditemukan")
-        return None
     return resend_button
 
 
@@ -1,17 +1,118 @@
-import re
-from typing import Tuple
+from __future__ import annotations
 
-import uiautomator2 as u2
+import re
+from itertools import chain
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple
 
+from app.automation.ui.bounds import Element, element_at, unescape
+from app.devices.artifacts import note_hierarchy
 from app.logging import get_device_logger, log_action
 
-# Constant messages untuk deteksi state
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+
+# Pesan setelah verifikasi OTP per tipe. Urutan tipe adalah prioritas saat
+# beberapa pesan terlihat sekaligus: pesan error menang atas pesan sukses
 OTP_MESSAGES = {
     "invalid": ["Invalid OTP code", "Kode OTP tidak valid"],
-    "expired": ["OTP has expired", "Kode OTP telah kadaluarsa", "Invalid OTP code"],
+    "expired": ["OTP has expired", "Kode OTP telah kadaluarsa"],
     "sent": ["OTP successfully sent", "OTP berhasil dikirim"],
     "success": ["Verification Complete", "Verifikasi Selesai"],
 }
+_PRECEDENCE = {message_type: rank for rank, message_type in enumerate(OTP_MESSAGES)}
+# Nilai atribut teks yang terlihat pengguna di dump hierarchy. Satu regex
+# per atribut: awalan literal membuat regex mencari dengan cepat, sedangkan
+# alternasi (text|content-desc) memaksa regex mencoba di setiap posisi
+_TEXT_VALUES = tuple(
+    re.compile(f' {name}="([^"]+)"') for name in ("text", "content-desc")
+)
+# Karakter yang ditulis sebagai entity di nilai atribut dump XML
+_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+
+
+def _compile_messages(escape_text=lambda text: text) -> re.Pattern:
+    # Satu regex untuk semua pesan, satu grup bernama per tipe
+    return re.compile(
+        "|".join(
+            f"(?P<{message_type}>"
+            + "|".join(re.escape(escape_text(text)) for text in texts)
+            + ")"
+            for message_type, texts in OTP_MESSAGES.items()
+        ),
+        re.IGNORECASE,
+    )
+
+
+_MESSAGE = _compile_messages()
+# Untuk nilai atribut mentah: teks pesan di-escape seperti di dump XML
+_MESSAGE_IN_XML = _compile_messages(lambda text: text.translate(_ESCAPES))
+
+
+class OtpMessage(NamedTuple):
+    """Pesan OTP yang ditemukan di layar dan elemen yang menampilkannya."""
+
+    type: str
+    text: str  # teks lengkap elemen
+    element: Element
+
+
+def _best_type(pattern: re.Pattern, text: str) -> Optional[str]:
+    best = None
+    for match in pattern.finditer(text):
+        if best is None or _PRECEDENCE[match.lastgroup] < _PRECEDENCE[best]:
+            best = match.lastgroup
+    return best
+
+
+def classify_message(text: str) -> Optional[str]:
+    """
+    Tipe pesan OTP dalam sebuah teks, mengikuti prioritas OTP_MESSAGES.
+
+    Returns:
+        str: "invalid", "expired", "sent", "success", atau None
+    """
+    return _best_type(_MESSAGE, text)
+
+
+def find_otp_message(hierarchy: str) -> Optional[OtpMessage]:
+    """
+    Cari pesan OTP di semua elemen teks sebuah dump hierarchy.
+
+    Nilai `text` dan `content-desc` diambil langsung dari XML mentah dan
+    dicocokkan dengan regex gabungan; hanya elemen pemenang yang di-parse.
+    Pesan di dialog, toast, atau elemen selain tvMessage juga terdeteksi.
+
+    Args:
+        hierarchy: XML dari `dump_hierarchy`
+
+    Returns:
+        OtpMessage dengan prioritas tertinggi, atau None
+    """
+    best = None  # (prioritas, tipe, match nilai atribut)
+    values = chain.from_iterable(
+        pattern.finditer(hierarchy) for pattern in _TEXT_VALUES
+    )
+    for value in values:
+        message_type = _best_type(_MESSAGE_IN_XML, value.group(1))
+        if message_type is None:
+            continue
+        rank = _PRECEDENCE[message_type]
+        if best is None or rank < best[0]:
+            best = (rank, message_type, value)
+            if rank == 0:
+                break
+    if best is None:
+        return None
+    _, message_type, value = best
+    element = element_at(hierarchy, value.start())
+    if element is None:
+        return None
+    return OtpMessage(message_type, unescape(value.group(1)), element)
+
+
+def has_element(hierarchy: str, resource_id: str) -> bool:
+    """Apakah elemen dengan resource ID ini ada di dump hierarchy."""
+    return f'resource-id="{resource_id}"' in hierarchy
 
 
 @log_action
@@ -44,17 +145,43 @@ def get_countdown_time(ui_device: u2.Device, resource_id: str, serial: str) -> s
         return "N/A"
 
 
+def parse_countdown_seconds(countdown_text: str) -> Optional[int]:
+    """
+    Parse teks countdown OTP ("MM:SS") menjadi jumlah detik.
+
+    Args:
+        countdown_text: Teks dari get_countdown_time
+
+    Returns:
+        int: Sisa detik (0 jika teks tidak berformat MM:SS, sama seperti
+            saat resend sudah boleh), None jika countdown tidak terbaca
+    """
+    if countdown_text == "N/A":
+        return None
+    match = re.search(r"(\d+):(\d+)", countdown_text)
+    if not match:
+        return 0
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
 @log_action
 def check_otp_message(
-    ui_device: u2.Device, resource_ids: dict, serial: str
+    ui_device: u2.Device,
+    resource_ids: dict,
+    serial: str,
+    hierarchy: Optional[str] = None,
 ) -> Tuple[bool, str]:
     """
     Memeriksa pesan yang muncul setelah verifikasi OTP.
 
+    Semua elemen teks di layar diperiksa dari satu dump hierarchy.
+
     Args:
         ui_device: Objek UI Automator device
         resource_ids: Dictionary resource IDs
         serial: Serial number device
+        hierarchy: Dump hierarchy yang baru dibaca (opsional, mis. dari
+            settle); tanpa itu layar di-dump sekali
 
     Returns:
         tuple: (is_success, message_type)
@@ -62,49 +189,31 @@ def check_otp_message(
             message_type (str): Tipe pesan yang terdeteksi
     """
     logger = get_device_logger(serial)
-
-    message_text = _get_message_text(ui_device, resource_ids, logger)
-    if message_text:
-        return _check_message_type(message_text, logger)
-
-    if _is_verification_complete(ui_device, resource_ids, logger):
+    if hierarchy is None:
+        hierarchy = ui_device.dump_hierarchy()
+    note_hierarchy(serial, hierarchy)
+
+    message = find_otp_message(hierarchy)
+    if message is not None:
+        attributes = message.element.attributes
+        source = attributes.get("resource-id") or attributes.get("class", "")
+        logger.info(f"Pesan terdeteksi: {message.text} ({source})")
+        if message.type in ("invalid", "expired"):
+            logger.error(f"OTP {message.type}: {message.text}")
+            return False, message.type
+        if message.type == "sent":
+            logger.info("OTP berhasil dikirim ulang")
+        else:
+            logger.info("Verifikasi OTP berhasil")
+        return True, message.type
+
+    if has_element(hierarchy, resource_ids["verification_complete_text"]):
+        logger.info("Verifikasi OTP berhasil terdeteksi")
         return True, "success"
 
     return True, "none"
 
 
-def _get_message_text(ui_device: u2.Device, resource_ids: dict, logger) -> str:
-    message_element = ui_device(resourceId=resource_ids["message_text"])
-    if message_element.exists:
-        message_text = message_element.get_text()
-        logger.info(f"Pesan terdeteksi: {message_text}")
-        return message_text
-    return ""
-
-
-def _check_message_type(message_text: str, logger) -> Tuple[bool, str]:
-    for msg_type, patterns in OTP_MESSAGES.items():
-        for pattern in patterns:
-            if pattern.lower() in message_text.lower():
-                if msg_type in ["invalid", "expired"]:
-                    logger.error(f"OTP {msg_type}: {message_text}")
-                    return False, msg_type
-                elif msg_type == "sent":
-                    logger.info("OTP berhasil dikirim ulang")
-                    return True, msg_type
-                elif msg_type == "success":
-                    logger.info("Verifikasi OTP berhasil")
-                    return True, msg_type
-    return True, "none"
-
-
-def _is_verification_complete(ui_device: u2.Device, resource_ids: dict, logger) -> bool:
-    if ui_device(resourceId=resource_ids["verification_complete_text"]).exists:
-        logger.info("Verifikasi OTP berhasil terdeteksi")
-        return True
-    return False
-
-
 @log_action
 def parse_timer_seconds(timer_text: str) -> int:
     """
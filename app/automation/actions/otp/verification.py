@@ -1,10 +1,15 @@
-import time
+from __future__ import annotations
 
-import uiautomator2 as u2
+from typing import TYPE_CHECKING
 
-from app.automation.actions.otp.utils import check_otp_message
+from app.automation.actions.otp.utils import check_otp_message, has_element
+from app.automation.timing import timing_profiles
+from app.devices.logcat import wait_for_ui_event
 from app.logging import get_device_logger, log_action
 
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+
 
 @log_action
 def verify_otp_page(ui_device: u2.Device, resource_ids: dict, serial: str) -> bool:
@@ -51,42 +56,50 @@ def verify_home_page(
         ui_device: Objek UI Automator device
         resource_ids: Dictionary resource IDs
         serial: Serial number device
-        timeout: Waktu maksimum menunggu (detik)
+        timeout: Waktu maksimum menunggu (detik) sampai profil waktu model
+            device ini cukup terekam
 
     Returns:
         bool: True jika sukses, False jika gagal
     """
     logger = get_device_logger(serial)
-    start_time = time.time()
+    wait = timing_profiles.for_serial(serial).wait("home_page", timeout, poll=1)
+
+    while not wait.expired():
+        # Satu dump untuk semua pengecekan di bawah
+        hierarchy = ui_device.dump_hierarchy()
 
-    while time.time() - start_time < timeout:
         # Cek pesan error atau sukses
-        is_success, message_type = check_otp_message(ui_device, resource_ids, serial)
+        is_success, message_type = check_otp_message(
+            ui_device, resource_ids, serial, hierarchy=hierarchy
+        )
         if not is_success:
             logger.error(f"Terdeteksi pesan error: {message_type}")
             return False
 
         # Jika masih dalam proses verifikasi (sukses), tunggu
-        if (
-            message_type == "success"
-            and ui_device(resourceId=resource_ids["verification_timer"]).exists
+        if message_type == "success" and has_element(
+            hierarchy, resource_ids["verification_timer"]
         ):
             logger.info("Masih dalam proses verifikasi, menunggu...")
-            time.sleep(1)
+            wait_for_ui_event(serial, wait.poll)
             continue
 
         # Cek indikator home
-        if ui_device(resourceId=resource_ids["home_indicator"]).exists:
+        if has_element(hierarchy, resource_ids["home_indicator"]):
+            wait.done()
             logger.info("Verifikasi OTP berhasil - indikator home terdeteksi")
             return True
 
         # Cek dashboard view
-        if ui_device(resourceId=resource_ids["dashboard_view"]).exists:
+        if has_element(hierarchy, resource_ids["dashboard_view"]):
+            wait.done()
             logger.info("Verifikasi OTP berhasil - dashboard terdeteksi")
             return True
 
-        # Tunggu sebentar sebelum check lagi
-        time.sleep(1)
+        # Tunggu sebentar (atau sampai layar berganti) sebelum check lagi
+        wait_for_ui_event(serial, wait.poll)
 
-    logger.error(f"Timeout ({timeout}s) menunggu halaman home")
+    wait.timed_out()
+    logger.error(f"Timeout ({wait.timeout:.1f}s) menunggu halaman home")
     return False
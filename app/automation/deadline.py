@@ -0,0 +1,207 @@
+# Module for time budgets and cancellation shared by flows, actions and waits
+import contextvars
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Longest uninterrupted sleep; bounds how late a cancellation is noticed
+CHECK_INTERVAL = 0.25
+
+
+class Cancelled(BaseException):
+    """
+    Raised inside a flow when its deadline passed or its job was cancelled.
+
+    Derives from BaseException (like asyncio.CancelledError) so the broad
+    `except Exception` blocks in the actions cannot swallow it.
+    """
+
+    def __init__(self, message: str, deadline: "Deadline"):
+        super().__init__(message)
+        self.deadline = deadline
+
+
+class DeadlineExceeded(Cancelled):
+    """The time budget of a scope ran out."""
+
+
+class JobCancelled(Cancelled):
+    """The scope was cancelled explicitly."""
+
+
+class Aborted(Cancelled):
+    """The scope was stopped because its work can no longer succeed."""
+
+
+class Deadline:
+    """A time budget and cancellation flag, nested inside its parent scope."""
+
+    def __init__(
+        self,
+        budget: Optional[float] = None,
+        name: str = "",
+        parent: Optional["Deadline"] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ):
+        """Initialize the deadline.
+
+        Args:
+            budget: Seconds from now, or None for no own time limit
+            name: Label used in error messages
+            parent: Enclosing deadline; its limits apply as well
+            cancel_event: Event that cancels this scope when set
+        """
+        self.name = name
+        self.parent = parent
+        self.expires_at = None if budget is None else time.monotonic() + budget
+        self.cancel_event = cancel_event or threading.Event()
+        self.abort_reason: Optional[str] = None
+
+    def _chain(self):
+        deadline = self
+        while deadline is not None:
+            yield deadline
+            deadline = deadline.parent
+
+    def cancel(self):
+        """Cancel this scope and every scope nested in it."""
+        self.cancel_event.set()
+
+    def abort(self, reason: str):
+        """Stop this scope because it cannot succeed (e.g. the app crashed)."""
+        self.abort_reason = reason
+
+    def remaining(self) -> float:
+        """Seconds left before the nearest deadline (inf if unbounded)."""
+        now = time.monotonic()
+        ends = [d.expires_at for d in self._chain() if d.expires_at is not None]
+        return min(ends) - now if ends else math.inf
+
+    def error(self) -> Optional[Cancelled]:
+        """The exception to raise if this scope must stop, else None."""
+        now = time.monotonic()
+        for deadline in self._chain():
+            if deadline.abort_reason is not None:
+                return Aborted(
+                    f"{deadline.name or 'scope'} aborted: {deadline.abort_reason}",
+                    deadline,
+                )
+            if deadline.cancel_event.is_set():
+                return JobCancelled(f"{deadline.name or 'scope'} cancelled", deadline)
+            if deadline.expires_at is not None and now >= deadline.expires_at:
+                return DeadlineExceeded(
+                    f"{deadline.name or 'scope'} exceeded its time budget", deadline
+                )
+        return None
+
+    def check(self):
+        """Raise Cancelled if the scope was cancelled or ran out of time."""
+        error = self.error()
+        if error is not None:
+            raise error
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The innermost active deadline of this thread, if any."""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(
+    budget: Optional[float] = None,
+    name: str = "",
+    cancel_event: Optional[threading.Event] = None,
+):
+    """
+    Run the enclosed block under a time budget nested in the current one.
+
+    Args:
+        budget: Seconds allowed for the block (None: only the outer limits)
+        name: Label used in error messages
+        cancel_event: Event that cancels the block when set
+    """
+    deadline = Deadline(budget, name, _current.get(), cancel_event)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def check_deadline():
+    """Raise Cancelled if the current scope must stop; no-op without one."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def bounded_timeout(timeout: float) -> float:
+    """Clamp a wait timeout to the time left in the current scope."""
+    deadline = _current.get()
+    if deadline is None:
+        return timeout
+    deadline.check()
+    return max(0.0, min(timeout, deadline.remaining()))
+
+
+def interruptible_sleep(seconds: float):
+    """
+    Sleep like time.sleep, but stop early when the current scope ends.
+
+    Raises Cancelled when the scope is cancelled or its budget runs out
+    before `seconds` have passed.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        time.sleep(seconds)
+        return
+
+    end = time.monotonic() + seconds
+    while True:
+        deadline.check()
+        left = min(end - time.monotonic(), deadline.remaining())
+        if left <= 0:
+            break
+        time.sleep(min(left, CHECK_INTERVAL))
+    if time.monotonic() < end:
+        deadline.check()
+
+
+def flow_budget(seconds: float):
+    """
+    Decorator bounding a whole flow by `seconds`.
+
+    When the flow's own budget runs out, or the flow's scope is aborted,
+    it logs why and returns False like any other failed flow; cancellation
+    and outer deadlines propagate to the caller.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with deadline_scope(seconds, func.__name__) as scope:
+                try:
+                    return func(*args, **kwargs)
+                except (DeadlineExceeded, Aborted) as e:
+                    if e.deadline is not scope:
+                        raise
+                    if isinstance(e, Aborted):
+                        logger.error(f"{func.__name__} dihentikan: {e}")
+                    else:
+                        logger.error(f"{func.__name__} dihentikan setelah {seconds}s")
+                    return False
+
+        return wrapper
+
+    return decorator
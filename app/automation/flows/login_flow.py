@@ -4,22 +4,25 @@ from app.automation.actions.login import (
     verify_app_opened,
     verify_login_success,
 )
+from app.automation.deadline import flow_budget
 from app.automation.popup.pop_utils import handle_popup
+from app.automation.timing import timing_profiles
 from app.automation.ui.input_utils import input_text
+from app.automation.ui.selectors import selector_registry
+from app.config.settings import LOGIN_FLOW_BUDGET
+from app.devices.app_perf import capture_steps
+from app.devices.artifacts import keep_artifacts
+from app.devices.logcat import abort_on_crash
 from app.logging import get_device_logger, log_action
-
-# Element ResourceIDs
-RESOURCE_IDS = {
-    "action_bar_root": "com.pure.indosat.care:id/action_bar_root",
-    "account_tab": "com.pure.indosat.care:id/navigation_account",
-    "login_container": "com.pure.indosat.care:id/clLogin",
-    "mobile_field": "com.pure.indosat.care:id/tilMobileNumber",
-    "continue_button": "com.pure.indosat.care:id/btnContinue",
-    "home_indicator": "com.pure.indosat.care:id/home",
-}
+from app.profiling import profile_flow
 
 
+@profile_flow
+@flow_budget(LOGIN_FLOW_BUDGET)
+@abort_on_crash
+@keep_artifacts
 @log_action
+@capture_steps
 def login_flow(device_service, serial: str, phone_number: str) -> bool:
     """
     Flow untuk login ke aplikasi MYIM3.
@@ -34,35 +37,39 @@ def login_flow(device_service, serial: str, phone_number: str) -> bool:
     """
     logger = get_device_logger(serial)
     ui_device = device_service.get_ui_device(serial)
+    # Resource ID sesuai versi aplikasi di device (app/config/selectors)
+    selectors = selector_registry.for_device(device_service, serial)
+    # Timeout dan polling per model device; action membacanya lewat serial
+    timing_profiles.for_device(device_service, serial)
 
     # 1. Verifikasi aplikasi terbuka
-    if not verify_app_opened(ui_device, RESOURCE_IDS["action_bar_root"], serial):
+    if not verify_app_opened(ui_device, selectors["action_bar_root"], serial):
         return False
 
     # 2. Tangani popup jika ada
-    if not handle_popup(ui_device, serial):
+    if not handle_popup(ui_device, serial, device_service=device_service):
         logger.warning("Ada masalah saat menangani popup, melanjutkan flow")
 
     # 3. Navigasi ke tab Account
-    if not navigate_to_account(ui_device, RESOURCE_IDS, serial):
+    if not navigate_to_account(ui_device, selectors, serial):
         return False
 
     # 4. Input nomor telepon
     if not input_text(
         ui_device,
-        RESOURCE_IDS["mobile_field"],
+        selectors["mobile_field"],
         phone_number,
         serial,
-        RESOURCE_IDS["continue_button"],
+        selectors["continue_button"],
     ):
         return False
 
     # 5. Klik button Continue
-    if not click_continue(ui_device, RESOURCE_IDS["continue_button"], serial):
+    if not click_continue(ui_device, selectors["continue_button"], serial):
         return False
 
     # 6. Verifikasi login berhasil (bisa ke OTP atau home)
-    if not verify_login_success(ui_device, RESOURCE_IDS, serial):
+    if not verify_login_success(ui_device, selectors, serial):
         return False
 
     logger.info(f"Login berhasil untuk nomor {phone_number}")
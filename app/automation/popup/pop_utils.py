@@ -1,25 +1,58 @@
-import time
-from typing import Dict, Optional
+from __future__ import annotations
 
-import uiautomator2 as u2
+from typing import TYPE_CHECKING, Dict, Optional
 
+from app.automation.deadline import interruptible_sleep
+from app.automation.ui import visual
+from app.automation.ui.bounds import bounds_cache
+from app.automation.ui.selectors import selector_registry
 from app.logging import get_device_logger, log_action
 
-# Resource IDs untuk popup yang umum muncul
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+
+# Popup yang umum muncul; "selectors" memetakan kunci *_id ke nama selector
+# di app/config/selectors, diisi resource ID versi aplikasi oleh popup_configs
 POPUP_CONFIGS = {
     "promo": {
-        "container_id": "com.pure.indosat.care:id/inapp_html_full_relative_layout",
-        "close_button_id": "button-2",
+        "selectors": {
+            "container_id": "promo_container",
+            "close_button_id": "promo_close",
+        },
+        # Webview tanpa resource ID: cari tombol close di screenshot
+        "close_template": "promo_close",
+        "close_region": (0.5, 0.0, 1.0, 0.3),
         "priority": 1,
     },
     "tutorial": {
-        "container_id": "com.pure.indosat.care:id/skip_layout",  # ID yang benar
-        "close_button_id": "com.pure.indosat.care:id/tvSkip",  # Tombol SKIP
-        "alt_button_id": "com.pure.indosat.care:id/tvNext",  # Tombol Next (alternatif)
+        "selectors": {
+            "container_id": "tutorial_container",
+            "close_button_id": "tutorial_skip",  # Tombol SKIP
+            "alt_button_id": "tutorial_next",  # Tombol Next (alternatif)
+        },
         "priority": 2,
     },
 }
 
+# Konfigurasi popup yang sudah diisi resource ID, per versi selector
+_RESOLVED_CONFIGS: Dict[str, Dict[str, Dict]] = {}
+
+
+def popup_configs(serial: str) -> Dict[str, Dict]:
+    """POPUP_CONFIGS dengan resource ID untuk versi aplikasi di device."""
+    selectors = selector_registry.for_serial(serial)
+    configs = _RESOLVED_CONFIGS.get(selectors.version)
+    if configs is None:
+        configs = {
+            popup_type: {
+                **config,
+                **{key: selectors[name] for key, name in config["selectors"].items()},
+            }
+            for popup_type, config in POPUP_CONFIGS.items()
+        }
+        _RESOLVED_CONFIGS[selectors.version] = configs
+    return configs
+
 
 @log_action
 def handle_popup(
@@ -27,6 +60,7 @@ def handle_popup(
     serial: str,
     popup_type: Optional[str] = None,
     timeout: int = 3,
+    device_service=None,
 ) -> bool:
     """
     Menangani popup yang mungkin muncul dalam aplikasi.
@@ -36,26 +70,33 @@ def handle_popup(
         serial: Serial number device
         popup_type: Jenis popup yang akan ditangani (opsional, default: semua)
         timeout: Timeout dalam detik
+        device_service: Service device; jika ada, tombol close juga dicari
+            lewat screenshot saat hierarchy tidak cukup (opsional)
 
     Returns:
         bool: True jika berhasil menangani popup, False jika gagal
     """
     logger = get_device_logger(serial)
+    configs = popup_configs(serial)
 
     # Jika popup_type ditentukan, hanya cek jenis tersebut
-    if popup_type and popup_type in POPUP_CONFIGS:
-        config = POPUP_CONFIGS[popup_type]
-        return _handle_specific_popup(ui_device, serial, popup_type, config, logger)
+    if popup_type and popup_type in configs:
+        config = configs[popup_type]
+        return _handle_specific_popup(
+            ui_device, serial, popup_type, config, logger, device_service
+        )
 
     # Jika tidak, cek semua popup berdasarkan prioritas
-    popup_types = sorted(POPUP_CONFIGS.items(), key=lambda x: x[1].get("priority", 999))
+    popup_types = sorted(configs.items(), key=lambda x: x[1].get("priority", 999))
 
     for p_type, config in popup_types:
         # Cek apakah popup ini terlihat
         container = ui_device(resourceId=config["container_id"])
         if container.exists:
             logger.info(f"Popup terdeteksi: {p_type}")
-            if _handle_specific_popup(ui_device, serial, p_type, config, logger):
+            if _handle_specific_popup(
+                ui_device, serial, p_type, config, logger, device_service
+            ):
                 return True
             # Jika gagal menangani, coba popup berikutnya
 
@@ -64,7 +105,12 @@ def handle_popup(
 
 
 def _handle_specific_popup(
-    ui_device: u2.Device, serial: str, popup_type: str, config: Dict, logger
+    ui_device: u2.Device,
+    serial: str,
+    popup_type: str,
+    config: Dict,
+    logger,
+    device_service=None,
 ) -> bool:
     """Menangani jenis popup tertentu."""
     container = ui_device(resourceId=config["container_id"])
@@ -77,11 +123,25 @@ def _handle_specific_popup(
     if popup_type == "tutorial":
         return tutorial_handling(ui_device, container, config, logger)
 
+    # Template tombol close dipelajari selagi resource ID-nya masih terlihat
+    use_template = device_service is not None and "close_template" in config
+    if use_template:
+        learn_close_button(device_service, serial, ui_device, config, logger)
+
     # Jika tidak ada strategi khusus, gunakan strategi default
     if close_popup_by_button(ui_device, container, config["close_button_id"], logger):
         return True
     if close_popup_by_coordinates(
-        ui_device, container, config["close_button_id"], logger
+        ui_device,
+        container,
+        config["close_button_id"],
+        logger,
+        serial=serial,
+        screen=f"popup:{popup_type}",
+    ):
+        return True
+    if use_template and close_popup_by_template(
+        device_service, serial, ui_device, container, config, logger
     ):
         return True
     return close_popup_by_default_position(ui_device, container, logger)
@@ -93,7 +153,7 @@ def close_popup_by_button(ui_device, popup, close_button_id, logger) -> bool:
     if close_button.exists:
         close_button.click()
         logger.info(f"Klik tombol close (id: {close_button_id})")
-        time.sleep(0.5)
+        interruptible_sleep(0.5)
         if not popup.exists:
             logger.info("Popup berhasil ditutup")
             return True
@@ -101,34 +161,95 @@ def close_popup_by_button(ui_device, popup, close_button_id, logger) -> bool:
     return False
 
 
-def close_popup_by_coordinates(ui_device, popup, close_button_id, logger) -> bool:
-    """Menutup popup dengan mengklik koordinat tombol."""
-    close_button = ui_device(resourceId=close_button_id)
+def close_popup_by_coordinates(
+    ui_device, popup, close_button_id, logger, serial=None, screen="popup"
+) -> bool:
+    """
+    Menutup popup dengan mengklik koordinat tombol.
+
+    Dengan `serial`, koordinat diambil dari cache bounds per resolusi dan
+    versi aplikasi (tanpa RPC saat cache hit); tanpa itu dibaca dari info
+    tombol.
+    """
     try:
-        bounds = close_button.info.get("bounds")
-        if bounds:
-            center_x = (bounds["left"] + bounds["right"]) // 2
-            center_y = (bounds["top"] + bounds["bottom"]) // 2
+        if serial is not None:
+            cached = bounds_cache.bounds(
+                ui_device, serial, screen, {"resourceId": close_button_id}
+            )
+            center = cached.center if cached else None
+        else:
+            bounds = ui_device(resourceId=close_button_id).info.get("bounds")
+            center = None
+            if bounds:
+                center = (
+                    (bounds["left"] + bounds["right"]) // 2,
+                    (bounds["top"] + bounds["bottom"]) // 2,
+                )
+        if center:
+            center_x, center_y = center
             ui_device.click(center_x, center_y)
             logger.info(
                 f"Mencoba klik koordinat tombol close: ({center_x}, {center_y})"
             )
-            time.sleep(0.5)
+            interruptible_sleep(0.5)
             if not popup.exists:
                 logger.info("Popup berhasil ditutup dengan klik koordinat")
                 return True
+            if serial is not None:
+                # Koordinat lama meleset: baca ulang layout popup berikutnya
+                bounds_cache.invalidate(ui_device, serial, screen)
     except Exception as e:
         logger.warning(f"Error saat mencoba klik koordinat: {e}")
     return False
 
 
+def learn_close_button(device_service, serial, ui_device, config, logger):
+    """Simpan template tombol close dari screenshot, sekali per resolusi layar."""
+    name = config["close_template"]
+    if not visual.numpy_available() or not visual.templates.needs(name, serial):
+        return
+    close_button = ui_device(resourceId=config["close_button_id"])
+    try:
+        if not close_button.exists:
+            return
+        bounds = close_button.info.get("bounds")
+        if bounds:
+            visual.learn(device_service, serial, name, bounds)
+    except Exception as e:
+        logger.warning(f"Gagal menyimpan template tombol close: {e}")
+
+
+def close_popup_by_template(
+    device_service, serial, ui_device, popup, config, logger
+) -> bool:
+    """Menutup popup dengan mencari tombol close di screenshot."""
+    try:
+        point = visual.locate(
+            device_service,
+            serial,
+            config["close_template"],
+            config.get("close_region", visual.FULL_SCREEN),
+        )
+        if point is None:
+            return False
+        ui_device.click(*point)
+        logger.info(f"Klik tombol close hasil pencocokan template: {point}")
+        interruptible_sleep(0.5)
+        if not popup.exists:
+            logger.info("Popup berhasil ditutup dengan pencocokan template")
+            return True
+    except Exception as e:
+        logger.warning(f"Error saat mencari tombol close di screenshot: {e}")
+    return False
+
+
 def close_popup_by_default_position(ui_device, popup, logger) -> bool:
     """Menutup popup dengan mengklik posisi default."""
     try:
         screen_width = ui_device.window_size()[0]
         ui_device.click(screen_width - 50, 100)  # Asumsi posisi tombol close
         logger.info("Mencoba klik posisi default tombol close")
-        time.sleep(0.5)
+        interruptible_sleep(0.5)
         if not popup.exists:
             logger.info("Popup berhasil ditutup dengan klik posisi default")
             return True
@@ -162,7 +283,7 @@ def handle_skip_button(ui_device, popup, config, logger) -> bool:
     if skip_button.exists and skip_button.info.get("clickable", False):
         skip_button.click()
         logger.info("Klik tombol 'SKIP' untuk melewati tutorial")
-        time.sleep(0.5)
+        interruptible_sleep(0.5)
         if not popup.exists:
             return True
     return False
@@ -176,7 +297,7 @@ def handle_next_button(ui_device, popup, config, logger) -> bool:
             for i in range(5):  # Asumsi maksimal 5 langkah
                 next_button.click()
                 logger.info(f"Klik tombol 'Next' ({i + 1}) untuk langkah tutorial")
-                time.sleep(0.5)
+                interruptible_sleep(0.5)
                 if not popup.exists:
                     logger.info(f"Tutorial berhasil dilewati setelah {i + 1} klik Next")
                     return True
@@ -191,7 +312,7 @@ def handle_skip_all(ui_device, popup, logger) -> bool:
     if skip_all.exists:
         skip_all.click()
         logger.info("Klik 'Skip All' untuk melewati tutorial")
-        time.sleep(0.5)
+        interruptible_sleep(0.5)
         if not popup.exists:
             return True
     return False
@@ -212,12 +333,13 @@ def is_popup_visible(
     Returns:
         bool: True jika popup terlihat, False jika tidak
     """
-    if popup_type and popup_type in POPUP_CONFIGS:
-        container_id = POPUP_CONFIGS[popup_type]["container_id"]
+    configs = popup_configs(serial)
+    if popup_type and popup_type in configs:
+        container_id = configs[popup_type]["container_id"]
         return bool(ui_device(resourceId=container_id).exists)
 
     # Cek semua jenis popup
-    for config in POPUP_CONFIGS.values():
+    for config in configs.values():
         if ui_device(resourceId=config["container_id"]).exists:
             return True
 
@@ -0,0 +1,348 @@
+# Module for per-device-model timeouts and poll intervals learned from latencies
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from app.automation.deadline import bounded_timeout
+from app.config.settings import ADAPTIVE_TIMING, TIMING_PROFILES_PATH
+from app.profiling import add_flow_observer
+
+logger = logging.getLogger(__name__)
+
+# Durations kept per (model, step); older ones drop out so a profile follows
+# app updates and aging devices
+HISTORY = 200
+# Samples a step needs before its learned values replace the defaults
+MIN_SAMPLES = 10
+# Timeout: this percentile of the recorded durations, times the margin
+TIMEOUT_PERCENTILE = 95
+TIMEOUT_MARGIN = 1.5
+# Poll interval: this fraction of the median duration, so a wait is checked
+# a few times before it usually ends
+POLL_PERCENTILE = 50
+POLL_FRACTION = 0.25
+# Guard rails, as factors of the default the caller passes: a learned value
+# never leaves [default * MIN, default * MAX]
+TIMEOUT_MIN_FACTOR = 0.5
+TIMEOUT_MAX_FACTOR = 3.0
+POLL_MIN_FACTOR = 0.25
+POLL_MAX_FACTOR = 2.0
+# Shortest time between two writes of the profiles file after a flow
+SAVE_INTERVAL = 30.0
+
+
+def percentile(ordered: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+class TimingProfile:
+    """Recorded step durations of one device model."""
+
+    def __init__(self, model: str, profiles: Optional["TimingProfiles"] = None):
+        self.model = model
+        # None for a device whose model is unknown: defaults, nothing recorded
+        self.profiles = profiles
+        self.steps: Dict[str, Deque[float]] = {}
+        self._sorted: Dict[str, List[float]] = {}  # per step, until a new sample
+
+    def _ordered(self, step: str) -> Optional[List[float]]:
+        ordered = self._sorted.get(step)
+        if ordered is None:
+            samples = self.steps.get(step)
+            if samples is None or len(samples) < MIN_SAMPLES:
+                return None
+            ordered = self._sorted[step] = sorted(samples)
+        return ordered
+
+    def timeout(self, step: str, default: float) -> float:
+        """
+        Timeout for a wait: the default until the step has enough samples,
+        then TIMEOUT_PERCENTILE of its durations times TIMEOUT_MARGIN,
+        kept within the guard rails around the default.
+        """
+        if self.profiles is None or not self.profiles.enabled:
+            return default
+        ordered = self._ordered(step)
+        if ordered is None:
+            return default
+        return _clamp(
+            percentile(ordered, TIMEOUT_PERCENTILE) * TIMEOUT_MARGIN,
+            default * TIMEOUT_MIN_FACTOR,
+            default * TIMEOUT_MAX_FACTOR,
+        )
+
+    def poll_interval(self, step: str, default: float) -> float:
+        """Pause between checks of a wait, learned like `timeout`."""
+        if self.profiles is None or not self.profiles.enabled:
+            return default
+        ordered = self._ordered(step)
+        if ordered is None:
+            return default
+        return _clamp(
+            percentile(ordered, POLL_PERCENTILE) * POLL_FRACTION,
+            default * POLL_MIN_FACTOR,
+            default * POLL_MAX_FACTOR,
+        )
+
+    def record(self, step: str, seconds: Optional[float]):
+        """
+        Add one measured duration of a step (None is ignored).
+
+        A wait that timed out is recorded at its full length: the true
+        duration is at least that, and it pulls the learned timeout up
+        instead of letting a too tight one hide the slow runs.
+        """
+        if self.profiles is None or seconds is None:
+            return
+        self.profiles.add(self, step, seconds)
+
+    def wait(self, step: str, timeout: float, poll: float = 1.0) -> "StepWait":
+        """Start a polling wait with the learned timeout and interval."""
+        return StepWait(self, step, timeout, poll)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per step: sample count and the median and TIMEOUT_PERCENTILE."""
+        rows = {}
+        for step, samples in self.steps.items():
+            ordered = sorted(samples)
+            rows[step] = {
+                "samples": len(ordered),
+                "p50": percentile(ordered, POLL_PERCENTILE),
+                f"p{TIMEOUT_PERCENTILE}": percentile(ordered, TIMEOUT_PERCENTILE),
+            }
+        return rows
+
+
+class StepWait:
+    """
+    One polling wait of a step, timed from its creation.
+
+    Usage:
+        wait = timing.wait("login_result", timeout=15, poll=1)
+        while not wait.expired():
+            if done():
+                wait.done()
+                return True
+            wait_for_ui_event(serial, wait.poll)
+        wait.timed_out()
+    """
+
+    def __init__(self, profile: TimingProfile, step: str, timeout: float, poll: float):
+        self.profile = profile
+        self.step = step
+        self.limit = profile.timeout(step, timeout)
+        self.timeout = bounded_timeout(self.limit)  # also within the flow budget
+        self.poll = profile.poll_interval(step, poll)
+        self.start = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self) -> float:
+        return max(0.0, self.timeout - self.elapsed())
+
+    def expired(self) -> bool:
+        return self.elapsed() >= self.timeout
+
+    def done(self):
+        """The awaited state was reached: record how long it took."""
+        self.profile.record(self.step, self.elapsed())
+
+    def timed_out(self):
+        """
+        Record a wait that ran out; not when the flow budget cut it short,
+        since that says nothing about the device.
+        """
+        if self.timeout >= self.limit:
+            self.profile.record(self.step, self.elapsed())
+
+
+class TimingProfiles:
+    """
+    Timing profiles per device model (ro.product.model), shared by every
+    device of that model and kept in a JSON file across runs.
+
+    Flows resolve a device's model once (`for_device`); actions then look
+    up timeouts and poll intervals by serial and record how long their
+    waits took. The file is merged, not overwritten, when saved, so
+    several processes can learn into the same one. With ADAPTIVE_TIMING
+    off, durations are still recorded but the defaults are used.
+    """
+
+    def __init__(
+        self, path: str = TIMING_PROFILES_PATH, enabled: bool = ADAPTIVE_TIMING
+    ):
+        """Initialize the profiles; the file is read on first use.
+
+        Args:
+            path: JSON file of the profiles ("" keeps them in memory)
+            enabled: Use the learned values instead of the defaults
+        """
+        self.path = path
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._save_lock = threading.Lock()  # one save() at a time, off self.lock
+        self._profiles: Optional[Dict[str, TimingProfile]] = None  # model -> ...
+        self._devices: Dict[str, TimingProfile] = {}  # serial -> profile
+        self._pending: Dict[tuple, List[float]] = {}  # (model, step) -> unsaved
+        self._saved_at = time.monotonic()
+        self._unknown = TimingProfile("")
+        add_flow_observer(self)
+
+    def _read(self) -> Dict[str, Dict[str, List[float]]]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f).get("models", {})
+        except (OSError, ValueError) as e:
+            logger.error(f"Gagal membaca profil waktu {self.path}: {e}")
+            return {}
+
+    def _fill(self, models: Dict[str, Dict[str, List[float]]]):
+        # Caller holds self.lock
+        for model, steps in models.items():
+            profile = self._profiles.get(model)
+            if profile is None:
+                profile = self._profiles[model] = TimingProfile(model, self)
+            for step, samples in steps.items():
+                profile.steps[step] = deque(samples, maxlen=HISTORY)
+            profile._sorted.clear()
+
+    def profiles(self) -> Dict[str, TimingProfile]:
+        """All profiles by model, loaded from the file on first use."""
+        if self._profiles is None:
+            models = self._read()
+            with self.lock:
+                if self._profiles is None:
+                    self._profiles = {}
+                    self._fill(models)
+        return self._profiles
+
+    def profile(self, model: str) -> TimingProfile:
+        """Profile of a device model, created empty if it has none yet."""
+        profiles = self.profiles()
+        with self.lock:
+            profile = profiles.get(model)
+            if profile is None:
+                profile = profiles[model] = TimingProfile(model, self)
+        return profile
+
+    def for_device(self, device_service, serial: str) -> TimingProfile:
+        """
+        Profile of a device's model, read once per serial (getprop) and
+        remembered until `forget`.
+        """
+        with self.lock:
+            known = self._devices.get(serial)
+        if known is not None:
+            return known
+        device = device_service.get_device(serial)
+        model = ""
+        try:
+            if device is not None:
+                model = device.shell("getprop ro.product.model").strip()
+        except Exception as e:
+            logger.debug(f"Model device {serial} tidak terbaca: {e}")
+        if not model:
+            # Not remembered: the next flow tries to read it again
+            logger.warning(f"Model {serial} tidak terbaca, memakai waktu default")
+            return self._unknown
+        profile = self.profile(model)
+        with self.lock:
+            self._devices[serial] = profile
+        return profile
+
+    def for_serial(self, serial: str) -> TimingProfile:
+        """Profile already resolved for a device, else the defaults."""
+        with self.lock:
+            return self._devices.get(serial, self._unknown)
+
+    def add(self, profile: TimingProfile, step: str, seconds: float):
+        """Record one duration; called through TimingProfile.record."""
+        seconds = round(seconds, 3)
+        with self.lock:
+            samples = profile.steps.get(step)
+            if samples is None:
+                samples = profile.steps[step] = deque(maxlen=HISTORY)
+            samples.append(seconds)
+            profile._sorted.pop(step, None)
+            if self.path:
+                self._pending.setdefault((profile.model, step), []).append(seconds)
+
+    def save(self):
+        """
+        Merge the durations recorded since the last save into the file.
+
+        The file is read and written outside self.lock, so waits looking up
+        their timeouts meanwhile do not block on the disk.
+        """
+        if not self.path:
+            return
+        with self._save_lock:
+            with self.lock:
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, {}
+                self._saved_at = time.monotonic()
+            models = self._read()
+            for (model, step), samples in pending.items():
+                merged = models.setdefault(model, {}).get(step, []) + samples
+                models[model][step] = merged[-HISTORY:]
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, "w") as f:
+                    json.dump({"models": models}, f)
+                os.replace(temporary, self.path)
+            except OSError as e:
+                logger.error(f"Gagal menyimpan profil waktu {self.path}: {e}")
+                with self.lock:
+                    for key, samples in pending.items():
+                        self._pending[key] = samples + self._pending.get(key, [])
+                return
+            with self.lock:
+                if self._profiles is None:
+                    return
+                # Also picks up what other processes learned meanwhile
+                self._fill(models)
+                # Durations recorded while the file was written are not in it
+                for (model, step), samples in self._pending.items():
+                    profile = self._profiles.get(model)
+                    if profile is not None:
+                        steps = profile.steps.setdefault(step, deque(maxlen=HISTORY))
+                        steps.extend(samples)
+                        profile._sorted.pop(step, None)
+
+    def record_flow(self, serial: str, flow: str, seconds: float, ok: bool):
+        """Flow observer: save now and then, so a crash loses little."""
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def forget(self, serial: str):
+        """Read the model again next time."""
+        with self.lock:
+            self._devices.pop(serial, None)
+
+    def clear(self):
+        """Forget every device and duration (the file is not read again)."""
+        with self.lock:
+            self._profiles = {}
+            self._devices.clear()
+            self._pending.clear()
+
+
+# Shared by every flow in the process
+timing_profiles = TimingProfiles()
@@ -0,0 +1,317 @@
+# Module for caching element bounds so taps can skip the lookup RPC
+import logging
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.automation.ui.selectors import selector_registry
+from app.config.settings import DEFAULT_PACKAGE
+from app.devices.artifacts import note_hierarchy
+
+logger = logging.getLogger(__name__)
+
+_NODE = re.compile(r"<node\b([^>]*)>")
+_ATTRIBUTE = re.compile(r'([\w-]+)="([^"]*)"')
+_BOUNDS = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+# Entities uiautomator writes in attribute values; decoded in one pass so a
+# literal "&amp;quot;" stays "&quot;" (xml.sax.saxutils would import urllib)
+_ENTITIES = {"&amp;": "&", "&lt;": "<", "&gt;": ">", "&quot;": '"', "&apos;": "'"}
+_ENTITY = re.compile("|".join(_ENTITIES))
+
+# Selector attributes as named in uiautomator2 -> in the hierarchy dump
+_SELECTOR_ATTRIBUTES = {
+    "resourceId": "resource-id",
+    "text": "text",
+    "className": "class",
+    "description": "content-desc",
+}
+
+# (width, height) of the screen and versionName of the app
+Context = Tuple[Tuple[int, int], str]
+
+# Seconds an element missing from a screen's dump is taken as still missing;
+# a tap that misses on cached coordinates re-dumps the screen before that
+MISSING_TTL = 10.0
+
+
+class Bounds(NamedTuple):
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return (self.left + self.right) // 2, (self.top + self.bottom) // 2
+
+
+class Element(NamedTuple):
+    attributes: Dict[str, str]
+    bounds: Bounds
+    clickable: bool
+
+
+def unescape(text: str) -> str:
+    """Attribute value of a hierarchy dump with its XML entities decoded."""
+    if "&" not in text:
+        return text
+    return _ENTITY.sub(lambda entity: _ENTITIES[entity.group()], text)
+
+
+def parse_element(attributes_text: str) -> Optional[Element]:
+    """Element from the attributes of one `<node ...>` tag of a dump."""
+    attributes = {
+        name: unescape(value) for name, value in _ATTRIBUTE.findall(attributes_text)
+    }
+    coordinates = _BOUNDS.match(attributes.get("bounds", ""))
+    if coordinates is None:
+        return None
+    bounds = Bounds(*(int(value) for value in coordinates.groups()))
+    return Element(attributes, bounds, attributes.get("clickable") == "true")
+
+
+def element_at(xml: str, position: int) -> Optional[Element]:
+    """The element whose `<node ...>` tag contains `position` of a dump."""
+    start = xml.rfind("<node", 0, position)
+    end = xml.find(">", position)
+    if start < 0 or end < 0:
+        return None
+    return parse_element(xml[start + len("<node") : end])
+
+
+class Snapshot:
+    """Elements of one hierarchy dump, with a digest of its layout."""
+
+    def __init__(self, xml: str):
+        self.elements: List[Element] = []
+        layout = []
+        for match in _NODE.finditer(xml):
+            element = parse_element(match.group(1))
+            if element is None:
+                continue
+            self.elements.append(element)
+            # Text and state change while a screen is in use; the layout not
+            attributes = element.attributes
+            layout.append(
+                f"{attributes.get('resource-id', '')}|"
+                f"{attributes.get('class', '')}|{element.bounds}"
+            )
+        self.digest = zlib.crc32("\n".join(layout).encode("utf-8"))
+
+    def size(self) -> Optional[Tuple[int, int]]:
+        """Width and height of the screen, from the root element's bounds."""
+        if not self.elements:
+            return None
+        left, top, right, bottom = self.elements[0].bounds
+        if left or top or right <= 0 or bottom <= 0:
+            return None
+        return right, bottom
+
+    def find(self, selector: Dict[str, str]) -> Optional[Bounds]:
+        """Bounds of the first element matching a uiautomator2-style selector."""
+        wanted = [(_SELECTOR_ATTRIBUTES[key], value) for key, value in selector.items()]
+        for element in self.elements:
+            if all(element.attributes.get(name) == value for name, value in wanted):
+                return element.bounds
+        return None
+
+    def neutral_point(self) -> Optional[Tuple[int, int]]:
+        """
+        A point on the screen's vertical centre line that no clickable
+        element covers: the middle of the tallest such gap.
+        """
+        if not self.elements:
+            return None
+        screen = self.elements[0].bounds
+        x = (screen.left + screen.right) // 2
+        covered = sorted(
+            (element.bounds.top, element.bounds.bottom)
+            for element in self.elements
+            if element.clickable and element.bounds.left <= x < element.bounds.right
+        )
+        best, gap_top = None, screen.top
+        for top, bottom in covered + [(screen.bottom, screen.bottom)]:
+            if top > gap_top and (best is None or top - gap_top > best[1] - best[0]):
+                best = (gap_top, top)
+            gap_top = max(gap_top, bottom)
+        if best is None:
+            return None
+        return x, (best[0] + best[1]) // 2
+
+
+class _Screen:
+    """Cached bounds of one screen state, learned from a single snapshot."""
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot: Optional[Snapshot] = snapshot  # None once invalidated
+        self.digest = snapshot.digest
+        self.bounds: Dict[tuple, object] = {}  # found bounds or point only
+        self.missing: Dict[tuple, float] = {}  # not found -> monotonic time
+
+    def cached(self, name: tuple, now: float) -> bool:
+        if name in self.bounds:
+            return True
+        looked_up = self.missing.get(name)
+        return looked_up is not None and now - looked_up < MISSING_TTL
+
+
+def selector_key(selector: Dict[str, str]) -> tuple:
+    return tuple(sorted(selector.items()))
+
+
+class BoundsCache:
+    """
+    Element bounds keyed by (resolution, app version, screen state, selector).
+
+    Entries come from one hierarchy dump per screen state and are shared
+    by every device with the same resolution and app version, so a tap
+    after the first one needs no lookup RPC. An element missing from the
+    dump is cached as missing for MISSING_TTL seconds. When a tap on cached
+    coordinates misses, the caller invalidates the screen; the next lookup
+    dumps the hierarchy again, and if its layout digest changed, every
+    cached entry of that screen is replaced, not only the one that missed.
+    """
+
+    def __init__(self, package: str = DEFAULT_PACKAGE):
+        self.package = package
+        self.lock = threading.Lock()
+        self._contexts: Dict[str, Context] = {}  # serial -> context
+        self._screens: Dict[Tuple[Context, str], _Screen] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def context(
+        self, ui_device, serial: str, snapshot: Optional[Snapshot] = None
+    ) -> Context:
+        """
+        Resolution and app version of a device, read once per serial.
+
+        The resolution is taken from `snapshot` when given, instead of
+        asking the device for its window size.
+        """
+        with self.lock:
+            context = self._contexts.get(serial)
+        if context is None:
+            size = snapshot.size() if snapshot is not None else None
+            width, height = size or ui_device.window_size()
+            # Usually read already by the flow, for its selectors
+            version = selector_registry.app_version(serial)
+            try:
+                if version is None:
+                    info = ui_device.app_info(self.package)
+                    version = info.get("versionName") or ""
+            except Exception as e:
+                logger.debug(f"Versi aplikasi di {serial} tidak terbaca: {e}")
+                version = ""
+            context = ((int(width), int(height)), version)
+            with self.lock:
+                self._contexts[serial] = context
+        return context
+
+    def _dump(self, ui_device, serial: str) -> Snapshot:
+        hierarchy = ui_device.dump_hierarchy()
+        note_hierarchy(serial, hierarchy)
+        return Snapshot(hierarchy)
+
+    def _learn(self, key: Tuple[Context, str], snapshot: Snapshot) -> _Screen:
+        with self.lock:
+            previous = self._screens.get(key)
+            if previous is not None and previous.digest != snapshot.digest:
+                logger.info(f"Layout layar {key[1]} berubah, cache bounds diganti")
+            screen = _Screen(snapshot)
+            self._screens[key] = screen
+        return screen
+
+    def _lookup(self, ui_device, serial: str, screen_name: str, name: tuple, find):
+        snapshot = None
+        with self.lock:
+            context = self._contexts.get(serial)
+        if context is None:
+            # First lookup on this device: the dump it needs (or that checks
+            # what other devices cached) also gives the resolution
+            snapshot = self._dump(ui_device, serial)
+            context = self.context(ui_device, serial, snapshot)
+        key = (context, screen_name)
+        now = time.monotonic()
+        with self.lock:
+            screen = self._screens.get(key)
+            if snapshot is None and screen is not None and screen.cached(name, now):
+                self.hits += 1
+                return screen.bounds.get(name)
+            self.misses += 1
+        if snapshot is not None:
+            screen = self._learn(key, snapshot)
+        elif screen is None or screen.snapshot is None or name in screen.missing:
+            # Never dumped, invalidated by a missed tap, or missing for too long
+            screen = self._learn(key, self._dump(ui_device, serial))
+        result = find(screen.snapshot)
+        with self.lock:
+            if result is not None:
+                screen.bounds[name] = result
+            else:
+                screen.missing[name] = now
+        return result
+
+    def bounds(
+        self, ui_device, serial: str, screen: str, selector: Dict[str, str]
+    ) -> Optional[Bounds]:
+        """
+        Cached bounds of the element matching `selector` on `screen`.
+
+        Args:
+            ui_device: uiautomator2 device
+            serial: Device serial number
+            screen: Name of the screen state the element is on
+            selector: uiautomator2-style selector (resourceId, text, ...)
+
+        Returns:
+            Bounds, or None if the element is not on that screen
+        """
+        return self._lookup(
+            ui_device,
+            serial,
+            screen,
+            selector_key(selector),
+            lambda snapshot: snapshot.find(selector),
+        )
+
+    def neutral_point(
+        self, ui_device, serial: str, screen: str
+    ) -> Optional[Tuple[int, int]]:
+        """Cached point on `screen` that a tap reaches without hitting a control."""
+        return self._lookup(
+            ui_device,
+            serial,
+            screen,
+            ("neutral",),
+            lambda snapshot: snapshot.neutral_point(),
+        )
+
+    def invalidate(self, ui_device, serial: str, screen: str):
+        """Drop a screen after a tap on its cached coordinates missed."""
+        key = (self.context(ui_device, serial), screen)
+        with self.lock:
+            cached = self._screens.get(key)
+            if cached is not None:
+                # Keep the digest so the next snapshot can tell if it changed
+                cached.bounds.clear()
+                cached.missing.clear()
+                cached.snapshot = None
+
+    def forget(self, serial: str):
+        """Read the resolution and app version of a device again next time."""
+        with self.lock:
+            self._contexts.pop(serial, None)
+
+    def clear(self):
+        """Forget every device and screen (e.g. between benchmark runs)."""
+        with self.lock:
+            self._contexts.clear()
+            self._screens.clear()
+            self.hits = self.misses = 0
+
+
+# Shared by every flow in the process
+bounds_cache = BoundsCache()
@@ -1,13 +1,13 @@
-import time
-from typing import Optional
+from __future__ import annotations
 
-import uiautomator2 as u2
+from typing import TYPE_CHECKING, Optional
 
+from app.automation.deadline import interruptible_sleep
+from app.automation.ui.bounds import bounds_cache
 from app.logging import get_device_logger, log_action
 
-# Screen dimensions default (bisa dikonfigurasi)
-DEFAULT_SCREEN_CENTER_X = 540
-DEFAULT_SCREEN_CENTER_Y = 800
+if TYPE_CHECKING:
+    import uiautomator2 as u2
 
 
 @log_action
@@ -34,15 +34,11 @@ def input_text(
     logger = get_device_logger(serial)
     logger.info(f"Mencoba input teks: {text}")
 
-    # Temukan field input
-    input_field = ui_device(resourceId=input_field_id)
-    if not input_field.exists:
+    # Klik pada field untuk fokus (sekaligus cek keberadaannya)
+    if not ui_device(resourceId=input_field_id).click_exists(timeout=0):
         logger.error(f"Field input dengan ID {input_field_id} tidak ditemukan")
         return False
-
-    # Klik pada field untuk fokus
-    input_field.click()
-    time.sleep(0.5)
+    interruptible_sleep(0.5)
 
     # Cari EditText di dalam container
     edit_text = ui_device(className="android.widget.EditText")
@@ -51,7 +47,9 @@ def input_text(
         return False
 
     # Mencoba tiga strategi input:
-    if try_direct_input(ui_device, edit_text, text, serial, verify_enabled_id):
+    if try_direct_input(
+        ui_device, edit_text, text, serial, verify_enabled_id, screen=input_field_id
+    ):
         return True
 
     if try_edit_last_digit(ui_device, edit_text, text, serial, verify_enabled_id):
@@ -71,6 +69,7 @@ def try_direct_input(
     text: str,
     serial: str,
     verify_enabled_id: Optional[str] = None,
+    screen: str = "input",
 ) -> bool:
     """
     Strategi 1: Input langsung kemudian trigger validasi.
@@ -81,6 +80,7 @@ def try_direct_input(
         text: Teks yang akan diinput
         serial: Serial number device
         verify_enabled_id: ID elemen yang akan dicek enabled nya (opsional)
+        screen: Nama layar tempat field berada, kunci cache titik klik
 
     Returns:
         bool: True jika berhasil, False jika gagal
@@ -88,11 +88,15 @@ def try_direct_input(
     logger = get_device_logger(serial)
 
     edit_text.set_text(text)
-    time.sleep(0.5)
+    interruptible_sleep(0.5)
 
-    # Klik di luar untuk trigger validasi
-    ui_device.click(DEFAULT_SCREEN_CENTER_X, DEFAULT_SCREEN_CENTER_Y)
-    time.sleep(0.5)
+    # Klik di luar untuk trigger validasi, di titik tanpa kontrol pada layar ini
+    point = bounds_cache.neutral_point(ui_device, serial, screen)
+    if point is None:
+        (width, height), _ = bounds_cache.context(ui_device, serial)
+        point = (width // 2, height // 3)
+    ui_device.click(*point)
+    interruptible_sleep(0.5)
 
     # Cek apakah validasi berhasil
     if verify_enabled_id and not is_element_enabled(ui_device, verify_enabled_id):
@@ -132,10 +136,10 @@ def try_edit_last_digit(
 
     # Hapus digit terakhir
     edit_text.set_text(current_text[:-1])
-    time.sleep(0.3)
+    interruptible_sleep(0.3)
     # Input kembali digit terakhir
     edit_text.set_text(current_text)
-    time.sleep(0.5)
+    interruptible_sleep(0.5)
 
     # Cek apakah validasi berhasil
     if verify_enabled_id and not is_element_enabled(ui_device, verify_enabled_id):
@@ -171,13 +175,13 @@ def try_digit_by_digit(
 
     logger.info("Mencoba input digit per digit")
     edit_text.clear_text()
-    time.sleep(0.5)
+    interruptible_sleep(0.5)
 
     for digit in text:
         edit_text.set_text(edit_text.get_text() + digit)
-        time.sleep(0.2)  # Jeda kecil antar digit
+        interruptible_sleep(0.2)  # Jeda kecil antar digit
 
-    time.sleep(0.5)
+    interruptible_sleep(0.5)
 
     # Cek apakah validasi berhasil
     if verify_enabled_id and not is_element_enabled(ui_device, verify_enabled_id):
@@ -200,8 +204,8 @@ def is_element_enabled(ui_device: u2.Device, resource_id: str) -> bool:
     Returns:
         bool: True jika elemen enabled, False jika tidak
     """
-    element = ui_device(resourceId=resource_id)
-    if not element.exists:
+    # info gagal untuk elemen yang tidak ada: satu RPC, bukan exists + info
+    try:
+        return ui_device(resourceId=resource_id).info.get("enabled") == True
+    except Exception:
         return False
-
-    return element.info.get("enabled") == True
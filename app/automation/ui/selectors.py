@@ -0,0 +1,319 @@
+# Module for the versioned registry of UI selectors, loaded from data files
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config.paths import SELECTORS_DIR
+from app.config.settings import DEFAULT_PACKAGE
+
+logger = logging.getLogger(__name__)
+
+# Selector keys allowed in the data files ("id" is a resource ID without the
+# "<package>:id/" prefix); the same keys the hierarchy snapshots understand
+_KEYS = ("resourceId", "text", "className", "description")
+_ENTRY_OPTIONS = ("fallbacks", "optional")
+
+# Worst status first; a selector reports the worst status it had in any dump
+OK = "ok"
+FALLBACK = "fallback"  # found only through a fallback: update the primary
+MISSING = "missing"  # its screen was seen but no candidate matched
+UNSEEN = "unseen"  # its screen was not in any dump
+_SEVERITY = (UNSEEN, OK, FALLBACK, MISSING)
+
+
+def version_key(version: str) -> Tuple[int, ...]:
+    """Sortable form of a versionName: "120.3.1" -> (120, 3, 1)."""
+    return tuple(int(part) for part in re.findall(r"\d+", version or ""))
+
+
+class Selector(str):
+    """
+    A resource ID with its ordered fallbacks, compiled once at load time.
+
+    The string value is the primary resource ID, so a Selector goes
+    wherever a resource ID does (`ui_device(resourceId=selector)`).
+    `candidates` holds the uiautomator2 selector of the primary followed
+    by its fallbacks, ready to be passed as keyword arguments.
+    """
+
+    def __new__(
+        cls,
+        resource_id: str,
+        name: str = "",
+        screen: str = "",
+        fallbacks: Iterable[Dict[str, str]] = (),
+        optional: bool = False,
+    ):
+        self = super().__new__(cls, resource_id)
+        self.name = name
+        self.screen = screen
+        self.optional = optional  # not always on its screen (e.g. messages)
+        self.candidates = ({"resourceId": resource_id}, *fallbacks)
+        return self
+
+    def find(self, ui_device):
+        """
+        First candidate present on the screen, trying fallbacks in order.
+
+        Returns:
+            The uiautomator2 UI object, or None if no candidate exists
+        """
+        for index, candidate in enumerate(self.candidates):
+            element = ui_device(**candidate)
+            if element.exists:
+                if index:
+                    logger.debug(f"Selector {self.name} ditemukan lewat {candidate}")
+                return element
+        return None
+
+
+class SelectorSet(dict):
+    """Selectors of one app version: name -> Selector."""
+
+    def __init__(self, version: str, selectors: Dict[str, Selector]):
+        super().__init__(selectors)
+        self.version = version
+
+    def screens(self) -> Dict[str, List[Selector]]:
+        screens: Dict[str, List[Selector]] = {}
+        for selector in self.values():
+            screens.setdefault(selector.screen, []).append(selector)
+        return screens
+
+    def check(self, hierarchies: Iterable[str]) -> Dict[str, str]:
+        """
+        Validate the selectors against recorded hierarchy dumps.
+
+        A dump shows a screen when any required selector of that screen
+        matches in it; every required selector of the screen must then
+        match as well, by its primary or a fallback.
+
+        Args:
+            hierarchies: XML dumps as returned by `dump_hierarchy`
+
+        Returns:
+            dict: name -> OK, FALLBACK, MISSING or UNSEEN
+        """
+        from app.automation.ui.bounds import Snapshot
+
+        status = {name: UNSEEN for name in self}
+        screens = self.screens()
+        for xml in hierarchies:
+            snapshot = Snapshot(xml)
+            for selectors in screens.values():
+                matched = {}
+                for selector in selectors:
+                    matched[selector.name] = next(
+                        (
+                            index
+                            for index, candidate in enumerate(selector.candidates)
+                            if snapshot.find(candidate) is not None
+                        ),
+                        None,
+                    )
+                shown = any(
+                    matched[selector.name] is not None
+                    for selector in selectors
+                    if not selector.optional
+                )
+                if not shown:
+                    continue
+                for selector in selectors:
+                    index = matched[selector.name]
+                    if index is None:
+                        result = UNSEEN if selector.optional else MISSING
+                    else:
+                        result = FALLBACK if index else OK
+                    if _SEVERITY.index(result) > _SEVERITY.index(status[selector.name]):
+                        status[selector.name] = result
+        return status
+
+
+def _compile_candidate(value, prefix: str, where: str) -> Dict[str, str]:
+    if isinstance(value, str):
+        return {"resourceId": prefix + value}
+    if not isinstance(value, dict) or not value:
+        raise ValueError(f"{where}: selector harus string atau object")
+    candidate = {}
+    for key, item in value.items():
+        if key == "id":
+            key, item = "resourceId", prefix + item
+        if key not in _KEYS:
+            raise ValueError(f"{where}: atribut selector tidak dikenal: {key}")
+        if not isinstance(item, str):
+            raise ValueError(f"{where}: nilai {key} harus string")
+        candidate[key] = item
+    return candidate
+
+
+def _compile_entry(name: str, screen: str, entry, prefix: str, where: str):
+    options = entry if isinstance(entry, dict) else {}
+    primary = _compile_candidate(
+        {k: v for k, v in options.items() if k not in _ENTRY_OPTIONS} or entry,
+        prefix,
+        where,
+    )
+    if set(primary) != {"resourceId"}:
+        raise ValueError(f"{where}: selector utama harus berupa resource ID saja")
+    fallbacks = [
+        _compile_candidate(fallback, prefix, where)
+        for fallback in options.get("fallbacks", [])
+    ]
+    return Selector(
+        primary["resourceId"],
+        name,
+        screen,
+        fallbacks,
+        bool(options.get("optional", False)),
+    )
+
+
+def _read_file(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data.get("version"), str) or not isinstance(
+        data.get("screens"), dict
+    ):
+        raise ValueError(f"{path}: butuh 'version' dan 'screens'")
+    return data
+
+
+class SelectorRegistry:
+    """
+    Selector sets per app versionName, compiled from the JSON files in
+    `directory` (one per version, `"extends"` inherits and overrides an
+    older one).
+
+    A device's versionName is read once through the package manager; a
+    version without its own file uses the newest older set (or the oldest
+    set when the device is older than all of them), with a warning, so an
+    app update shows up in the log instead of as slow fallbacks.
+    """
+
+    def __init__(self, directory: str = SELECTORS_DIR, package: str = DEFAULT_PACKAGE):
+        self.directory = directory
+        self.package = package
+        self.lock = threading.Lock()
+        self._sets: Optional[Dict[str, SelectorSet]] = None  # loaded lazily
+        self._ordered: List[SelectorSet] = []  # oldest first
+        self._resolved: Dict[str, SelectorSet] = {}  # versionName -> set
+        self._devices: Dict[str, Tuple[str, SelectorSet]] = {}  # serial -> ...
+
+    def _load(self) -> Dict[str, SelectorSet]:
+        raw = {}
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".json"):
+                data = _read_file(os.path.join(self.directory, filename))
+                raw[data["version"]] = (filename, data)
+
+        entries: Dict[str, Dict[str, Tuple[str, object, str]]] = {}
+
+        def resolve(version: str, chain: Tuple[str, ...] = ()):
+            if version in entries:
+                return entries[version]
+            if version not in raw:
+                raise ValueError(f"Selector versi {version} tidak ditemukan")
+            if version in chain:
+                raise ValueError(f"Selector versi {version} saling extends")
+            filename, data = raw[version]
+            package = data.get("package", self.package)
+            merged = {}
+            if "extends" in data:
+                merged = dict(resolve(data["extends"], chain + (version,)))
+            for screen, selectors in data["screens"].items():
+                for name, entry in selectors.items():
+                    merged[name] = (screen, entry, f"{package}:id/")
+            entries[version] = merged
+            return merged
+
+        sets = {}
+        for version, (filename, _) in raw.items():
+            selectors = {}
+            for name, (screen, entry, prefix) in resolve(version).items():
+                where = f"{filename}: {name}"
+                selectors[name] = _compile_entry(name, screen, entry, prefix, where)
+            sets[version] = SelectorSet(version, selectors)
+        if not sets:
+            raise ValueError(f"Tidak ada file selector di {self.directory}")
+        return sets
+
+    def sets(self) -> Dict[str, SelectorSet]:
+        """All selector sets by version, loaded on first use."""
+        if self._sets is None:
+            with self.lock:
+                if self._sets is None:
+                    sets = self._load()
+                    self._ordered = sorted(
+                        sets.values(), key=lambda s: version_key(s.version)
+                    )
+                    self._sets = sets
+        return self._sets
+
+    def get(self, version: Optional[str]) -> SelectorSet:
+        """Selector set for an app versionName ("" or None: the newest)."""
+        version = version or ""
+        selectors = self._resolved.get(version)
+        if selectors is not None:
+            return selectors
+        sets = self.sets()
+        selectors = sets.get(version)
+        if selectors is None:
+            key = version_key(version)
+            older = [s for s in self._ordered if version_key(s.version) <= key]
+            if not key:
+                selectors = self._ordered[-1]
+            else:
+                selectors = older[-1] if older else self._ordered[0]
+                logger.warning(
+                    f"Tidak ada selector untuk versi aplikasi {version}, "
+                    f"memakai selector versi {selectors.version}"
+                )
+        with self.lock:
+            self._resolved[version] = selectors
+        return selectors
+
+    def for_device(self, device_service, serial: str) -> SelectorSet:
+        """
+        Selector set for the app version installed on a device.
+
+        The versionName is read once per serial (dumpsys package) and
+        remembered until `forget`.
+        """
+        with self.lock:
+            known = self._devices.get(serial)
+        if known is not None:
+            return known[1]
+        info = device_service.dumpsys(serial, "package", package_name=self.package)
+        version = info.version_name if info is not None else None
+        if version is None:
+            # Not remembered: the next flow tries to read it again
+            logger.warning(f"Versi aplikasi di {serial} tidak terbaca")
+            return self.get(None)
+        selectors = self.get(version)
+        with self.lock:
+            self._devices[serial] = (version, selectors)
+        return selectors
+
+    def for_serial(self, serial: str) -> SelectorSet:
+        """Selector set already resolved for a device, else the newest."""
+        with self.lock:
+            known = self._devices.get(serial)
+        return known[1] if known is not None else self.get(None)
+
+    def app_version(self, serial: str) -> Optional[str]:
+        """versionName read from a device, if it was read already."""
+        with self.lock:
+            known = self._devices.get(serial)
+        return known[0] if known is not None else None
+
+    def forget(self, serial: str):
+        """Read the version again next time (e.g. after the app was updated)."""
+        with self.lock:
+            self._devices.pop(serial, None)
+
+
+# Shared by every flow in the process
+selector_registry = SelectorRegistry()
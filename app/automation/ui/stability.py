@@ -0,0 +1,120 @@
+# Module for waiting until the UI stops changing instead of sleeping a constant
+import logging
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Hashable, Optional
+
+from app.automation.deadline import interruptible_sleep
+from app.config.settings import SETTLE_INTERVAL, SETTLE_SAMPLES, UI_SETTLE
+from app.devices.artifacts import note_hierarchy
+
+logger = logging.getLogger(__name__)
+
+
+def hierarchy_digest(ui_device) -> int:
+    """CRC32 of the UI hierarchy dump; equal digests mean an unchanged screen."""
+    return zlib.crc32(ui_device.dump_hierarchy().encode("utf-8"))
+
+
+class SettledScreen:
+    """What `settle` saw: the hierarchy of the screen it settled on."""
+
+    def __init__(self):
+        # Last dump once the UI held still; None if it never did (or
+        # EXA_UI_SETTLE=0), so callers read the screen themselves
+        self.hierarchy: Optional[str] = None
+        # Seconds from the action until the UI held still; None likewise
+        self.seconds: Optional[float] = None
+
+
+def wait_until_stable(
+    sample: Callable[[], Hashable],
+    ceiling: float,
+    samples: int = SETTLE_SAMPLES,
+    interval: float = SETTLE_INTERVAL,
+    baseline: Optional[Hashable] = None,
+) -> bool:
+    """
+    Poll `sample` until it returns the same value `samples` times in a row.
+
+    With a `baseline` (the value before an action), a run of equal samples
+    only counts once it differs from the baseline, so a screen the app has
+    not reacted to yet is not mistaken for a settled one.
+
+    Args:
+        sample: Returns a digest of the current screen
+        ceiling: Longest wait in seconds
+        samples: Consecutive equal samples that mean "stable"
+        interval: Pause between samples (on top of the sampling itself)
+        baseline: Digest of the screen before the action (optional)
+
+    Returns:
+        bool: True once stable, False when `ceiling` passed first
+    """
+    end = time.monotonic() + ceiling
+    last, run = None, 0
+    while True:
+        digest = sample()
+        if digest == last:
+            run += 1
+        else:
+            last, run = digest, 1
+        if run >= samples and digest != baseline:
+            return True
+        left = end - time.monotonic()
+        if left <= 0:
+            return False
+        interruptible_sleep(min(interval, left))
+
+
+@contextmanager
+def settle(
+    ui_device,
+    ceiling: float,
+    what: str = "aksi",
+    log=None,
+    serial: Optional[str] = None,
+):
+    """
+    Wait after the enclosed action until the UI stops changing.
+
+    Replaces a fixed post-click sleep of `ceiling` seconds: the hierarchy
+    is read once before the action, then sampled after it until it changed
+    and held still for SETTLE_SAMPLES reads, or `ceiling` passed. With
+    EXA_UI_SETTLE=0 it sleeps the full `ceiling` instead. `log` is the
+    device logger the settle time is reported to. The yielded
+    SettledScreen holds the settled hierarchy afterwards, so the caller
+    can inspect the screen without dumping it again. With a `serial`, the
+    last dump also goes to the failure artifacts of that device.
+
+    Usage:
+        with settle(ui_device, 2, "klik verifikasi", logger, serial) as screen:
+            verify_button.click()
+        check(screen.hierarchy)
+    """
+    screen = SettledScreen()
+    if not UI_SETTLE:
+        yield screen
+        interruptible_sleep(ceiling)
+        return
+    baseline = hierarchy_digest(ui_device)
+    yield screen
+    start = time.monotonic()
+    last = [""]  # most recent dump
+
+    def sample() -> int:
+        last[0] = ui_device.dump_hierarchy()
+        return zlib.crc32(last[0].encode("utf-8"))
+
+    stable = wait_until_stable(sample, ceiling, baseline=baseline)
+    elapsed = time.monotonic() - start
+    if serial is not None and last[0]:
+        note_hierarchy(serial, last[0])
+    log = log or logger
+    if stable:
+        screen.hierarchy = last[0]
+        screen.seconds = elapsed
+        log.debug(f"UI stabil {elapsed:.2f}s setelah {what}")
+    else:
+        log.debug(f"UI belum stabil setelah {what}, batas {ceiling:.1f}s tercapai")
@@ -0,0 +1,296 @@
+# Module for finding UI elements in raw screen frames by template matching
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from app.config.paths import TEMPLATES_DIR
+from app.config.settings import VISUAL_MATCH_THRESHOLD
+from app.devices.screencap import to_gray
+
+logger = logging.getLogger(__name__)
+
+# Frames and templates are compared at 1/MATCH_STEP of the screen resolution
+MATCH_STEP = 4
+# Smallest template side (match-scale pixels) worth learning
+MIN_TEMPLATE_SIZE = 4
+
+# Part of the screen to search: left, top, right, bottom as fractions
+Region = Tuple[float, float, float, float]
+FULL_SCREEN: Region = (0.0, 0.0, 1.0, 1.0)
+Resolution = Tuple[int, int]
+
+
+@lru_cache(maxsize=1)
+def numpy_available() -> bool:
+    """Whether NumPy is installed; without it visual matching is skipped."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def match_template(image, template) -> Optional[Tuple[int, int, float]]:
+    """
+    Best position of `template` in `image` by normalized cross-correlation.
+
+    The correlation of every position is computed at once with FFTs and the
+    per-window mean/variance from integral images, so the cost does not
+    grow with the template size.
+
+    Args:
+        image: 2-D grayscale array
+        template: 2-D grayscale array, not larger than `image`
+
+    Returns:
+        (x, y, score) of the template's top-left corner, score in [-1, 1];
+        None if the template does not fit or is flat
+    """
+    import numpy as np
+
+    image_h, image_w = image.shape
+    height, width = template.shape
+    if height > image_h or width > image_w:
+        return None
+    image = image.astype(np.float64)
+    template = template.astype(np.float64)
+    template = template - template.mean()
+    template_norm = np.sqrt((template * template).sum())
+    if template_norm == 0:
+        return None
+
+    # Circular correlation is exact for every position where the template fits
+    spectrum = np.fft.rfft2(image) * np.conj(np.fft.rfft2(template, image.shape))
+    correlation = np.fft.irfft2(spectrum, image.shape)
+    correlation = correlation[: image_h - height + 1, : image_w - width + 1]
+
+    def window_sums(values):
+        integral = np.zeros((image_h + 1, image_w + 1))
+        integral[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+        return (
+            integral[height:, width:]
+            - integral[:-height, width:]
+            - integral[height:, :-width]
+            + integral[:-height, :-width]
+        )
+
+    sums = window_sums(image)
+    variance = window_sums(image * image) - sums * sums / (height * width)
+    spread = np.sqrt(np.maximum(variance, 0)) * template_norm
+    scores = np.divide(
+        correlation, spread, out=np.zeros_like(correlation), where=spread > 1e-6
+    )
+    y, x = np.unravel_index(np.argmax(scores), scores.shape)
+    return int(x), int(y), float(scores[y, x])
+
+
+def _read_pgm(path: str):
+    import numpy as np
+
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, width, height = data.split(maxsplit=3)[:3]
+    if magic != b"P5":
+        raise ValueError(f"{path} bukan file PGM biner")
+    width, height = int(width), int(height)
+    # Pixels are the last width*height bytes, after a single whitespace
+    pixels = np.frombuffer(data[-width * height :], dtype=np.uint8)
+    return pixels.reshape(height, width).astype(np.float32)
+
+
+def _write_pgm(path: str, template):
+    import numpy as np
+
+    pixels = np.clip(np.rint(template), 0, 255).astype(np.uint8)
+    height, width = pixels.shape
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(f"P5\n{width} {height}\n255\n".encode())
+        f.write(pixels.tobytes())
+    os.replace(tmp_path, path)
+
+
+def _resize(template, height: int, width: int):
+    """Nearest-neighbour resize (templates are small; no filtering needed)."""
+    import numpy as np
+
+    rows = np.arange(height) * template.shape[0] // height
+    cols = np.arange(width) * template.shape[1] // width
+    return template[np.ix_(rows, cols)]
+
+
+class TemplateCache:
+    """
+    Element templates per (name, screen resolution), at match scale.
+
+    Templates are kept in memory and stored in `directory` as
+    `<name>@<width>x<height>.pgm`. A template missing for a resolution is
+    derived from one stored for another resolution, scaled by the width
+    ratio (layouts are in dp, so elements scale with the screen width);
+    derived templates are replaced as soon as one is learned on a screen of
+    that resolution. Lookups that found nothing are remembered as well, so
+    only the first one per resolution touches the disk.
+    """
+
+    def __init__(self, directory: str = TEMPLATES_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        # (name, width, height) -> (template or None, learned at this size)
+        self._templates: Dict[Tuple[str, int, int], Tuple[object, bool]] = {}
+        self._resolutions: Dict[str, Resolution] = {}  # serial -> last seen
+
+    def _path(self, name: str, resolution: Resolution) -> str:
+        width, height = resolution
+        return os.path.join(self.directory, f"{name}@{width}x{height}.pgm")
+
+    def _stored(self, name: str) -> Dict[Resolution, str]:
+        if not os.path.isdir(self.directory):
+            return {}
+        stored = {}
+        for filename in os.listdir(self.directory):
+            base, _, ext = filename.rpartition(".")
+            stem, _, size = base.rpartition("@")
+            if ext != "pgm" or stem != name:
+                continue
+            try:
+                width, height = (int(value) for value in size.split("x"))
+            except ValueError:
+                continue
+            stored[(width, height)] = os.path.join(self.directory, filename)
+        return stored
+
+    def _load(self, name: str, resolution: Resolution) -> Tuple[object, bool]:
+        stored = self._stored(name)
+        try:
+            if resolution in stored:
+                return _read_pgm(stored[resolution]), True
+            if not stored:
+                return None, False
+            # Closest width first: the smallest scaling error
+            source = min(stored, key=lambda size: abs(size[0] - resolution[0]))
+            template = _read_pgm(stored[source])
+        except (OSError, ValueError) as e:
+            logger.warning(f"Gagal membaca template {name}: {e}")
+            return None, False
+        ratio = resolution[0] / source[0]
+        height = max(1, round(template.shape[0] * ratio))
+        width = max(1, round(template.shape[1] * ratio))
+        return _resize(template, height, width), False
+
+    def get(self, name: str, resolution: Resolution):
+        """Template of `name` for a screen resolution, or None."""
+        key = (name, *resolution)
+        with self.lock:
+            entry = self._templates.get(key)
+        if entry is None:
+            entry = self._load(name, resolution)
+            with self.lock:
+                entry = self._templates.setdefault(key, entry)
+        return entry[0]
+
+    def put(self, name: str, resolution: Resolution, template):
+        """Store a template learned on a screen of this resolution."""
+        with self.lock:
+            self._templates[(name, *resolution)] = (template, True)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_pgm(self._path(name, resolution), template)
+        except OSError as e:
+            logger.warning(f"Gagal menyimpan template {name}: {e}")
+
+    def needs(self, name: str, serial: str) -> bool:
+        """Whether a device's screen could still teach a template for `name`."""
+        with self.lock:
+            resolution = self._resolutions.get(serial)
+        if resolution is None:
+            return True
+        self.get(name, resolution)
+        with self.lock:
+            return not self._templates[(name, *resolution)][1]
+
+    def seen(self, serial: str, resolution: Resolution):
+        with self.lock:
+            self._resolutions[serial] = resolution
+
+
+# Shared by every flow in the process
+templates = TemplateCache()
+
+
+def locate(
+    device_service,
+    serial: str,
+    name: str,
+    region: Region = FULL_SCREEN,
+    threshold: float = VISUAL_MATCH_THRESHOLD,
+) -> Optional[Tuple[int, int]]:
+    """
+    Find the element `name` on the device screen by its template.
+
+    Reads one raw frame (no PNG encoding), downscales it by striding and
+    searches only `region`.
+
+    Returns:
+        (x, y) centre of the match in screen pixels, or None if NumPy is
+        missing, no template is known or nothing scores `threshold`
+    """
+    if not numpy_available():
+        return None
+    frame = device_service.screencap(serial)
+    if frame is None:
+        return None
+    templates.seen(serial, frame.resolution)
+    template = templates.get(name, frame.resolution)
+    if template is None:
+        return None
+    image = to_gray(frame, MATCH_STEP)
+    image_h, image_w = image.shape
+    left, top = int(region[0] * image_w), int(region[1] * image_h)
+    right, bottom = int(region[2] * image_w), int(region[3] * image_h)
+    match = match_template(image[top:bottom, left:right], template)
+    if match is None:
+        return None
+    x, y, score = match
+    if score < threshold:
+        logger.debug(f"Template {name} di {serial} tidak cocok (skor {score:.2f})")
+        return None
+    height, width = template.shape
+    center_x = (left + x + width / 2) * MATCH_STEP
+    center_y = (top + y + height / 2) * MATCH_STEP
+    logger.debug(f"Template {name} di {serial} cocok (skor {score:.2f})")
+    return int(center_x), int(center_y)
+
+
+def learn(device_service, serial: str, name: str, bounds: Dict[str, int]) -> bool:
+    """
+    Cut the template of `name` out of the current screen.
+
+    Call it while the element is visible and its bounds are known from the
+    hierarchy, so `locate` can find it later where the hierarchy cannot.
+
+    Args:
+        bounds: Element bounds as in uiautomator2's info["bounds"]
+
+    Returns:
+        bool: True if a template was stored
+    """
+    if not numpy_available():
+        return False
+    frame = device_service.screencap(serial)
+    if frame is None:
+        return False
+    templates.seen(serial, frame.resolution)
+    if not templates.needs(name, serial):
+        return True  # already learned on this resolution (e.g. another device)
+    image = to_gray(frame, MATCH_STEP)
+    template = image[
+        bounds["top"] // MATCH_STEP : bounds["bottom"] // MATCH_STEP,
+        bounds["left"] // MATCH_STEP : bounds["right"] // MATCH_STEP,
+    ]
+    if min(template.shape) < MIN_TEMPLATE_SIZE or template.std() < 1:
+        return False
+    templates.put(name, frame.resolution, template.copy())
+    logger.info(f"Template {name} disimpan untuk layar {frame.width}x{frame.height}")
+    return True
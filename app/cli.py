@@ -0,0 +1,278 @@
+import argparse
+import json
+import logging
+import sys
+
+from app.config.settings import (
+    DAEMON_HOST,
+    DAEMON_PORT,
+    TELEMETRY_DB,
+    TIMING_PROFILES_PATH,
+)
+from app.logging import initialize_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _device_service():
+    # Only the ADB layer is loaded here; uiautomator2 stays unimported
+    from app.devices.federation import create_live_device_service
+
+    return create_live_device_service()
+
+
+def cmd_devices(args) -> int:
+    """List connected devices with their basic properties."""
+    devices = _device_service().get_devices()
+    if not devices:
+        print("Tidak ada device terdeteksi")
+        return 1
+
+    for device in devices:
+        print(
+            f"{device.serial}\t{device.status}\t{device.manufacturer or '-'} "
+            f"{device.model or '-'}\tAndroid {device.android_version or '-'}"
+        )
+    return 0
+
+
+def cmd_battery(args) -> int:
+    """Print battery information for one device."""
+    battery = _device_service().get_battery_info(args.serial)
+    if "error" in battery:
+        print(f"Gagal membaca baterai {args.serial}: {battery['error']}")
+        return 1
+
+    for key, value in battery.items():
+        print(f"{key}: {value}")
+    return 0
+
+
+def cmd_health(args) -> int:
+    """Check the ADB server and report a one-line health summary per device."""
+    device_service = _device_service()
+    if not device_service.ensure_adb_running():
+        print("ADB server: TIDAK BERJALAN")
+        return 1
+    servers = getattr(device_service, "server_status", None)
+    if servers is None:
+        print(f"ADB server: OK (versi {device_service.adb_client.version()})")
+    else:
+        for address, status in servers().items():
+            state = "OK" if status["available"] else "TERPUTUS"
+            print(f"ADB server {address}: {state}\t{status['devices']} device")
+
+    devices = device_service.get_devices()
+    if not devices:
+        print("Tidak ada device terdeteksi")
+        return 1
+
+    healthy = True
+    for device in devices:
+        battery = device_service.get_battery_info(device.serial)
+        level = battery.get("level", "?")
+        temperature = battery.get("temperature")
+        temp_text = f"{int(temperature) / 10:.1f}C" if temperature else "?"
+        status = "OK" if not device.error and "error" not in battery else "ERROR"
+        healthy = healthy and status == "OK"
+        print(f"{device.serial}\t{status}\tbaterai {level}%\tsuhu {temp_text}")
+    return 0 if healthy else 1
+
+
+def cmd_telemetry(args) -> int:
+    """Relate stored flow durations to the device telemetry they ran under."""
+    from app.devices.telemetry import TelemetryStore, correlate
+
+    flows = TelemetryStore(args.db).flows()
+    if args.serial:
+        flows = [flow for flow in flows if flow["serial"] == args.serial]
+    if not flows:
+        print(f"Tidak ada flow tercatat di {args.db}")
+        return 1
+
+    for flow, series in correlate(flows).items():
+        print(flow)
+        for name, row in series.items():
+            if row["r"] is None:
+                print(f"  {name:<16} n={row['samples']:<5} -")
+            else:
+                print(
+                    f"  {name:<16} n={row['samples']:<5} r={row['r']:+.2f}  "
+                    f"{row['slope']:+.4f}s per unit"
+                )
+    return 0
+
+
+def cmd_timings(args) -> int:
+    """Show the step durations learned per device model."""
+    from app.automation.timing import TimingProfiles
+
+    profiles = TimingProfiles(args.path).profiles()
+    if args.model:
+        profiles = {m: p for m, p in profiles.items() if m == args.model}
+    if not profiles:
+        print(f"Tidak ada profil waktu tercatat di {args.path}")
+        return 1
+
+    for model, profile in sorted(profiles.items()):
+        print(model)
+        for step, row in sorted(profile.summary().items()):
+            percentiles = "  ".join(
+                f"{name}={value:.2f}s"
+                for name, value in row.items()
+                if name != "samples"
+            )
+            print(f"  {step:<18} n={row['samples']:<5} {percentiles}")
+    return 0
+
+
+def cmd_run(args) -> int:
+    """Run the full application (open the app on every device)."""
+    from app.app import main as run_app
+
+    run_app()
+    return 0
+
+
+def cmd_daemon(args) -> int:
+    """Run the daemon keeping device connections warm for login/OTP jobs."""
+    from app.config import init_app
+    from app.fleet.daemon import Daemon
+
+    init_app()
+    if args.simulate:
+        from app.devices.simulator import SimulatedDeviceService, SimulatedFarm
+
+        device_service = SimulatedDeviceService(SimulatedFarm(args.simulate))
+    else:
+        device_service = _device_service()
+
+    Daemon(device_service, args.host, args.port).serve_forever()
+    return 0
+
+
+def cmd_job(args) -> int:
+    """Submit a login/OTP job to a running daemon and stream its progress."""
+    import urllib.error
+    import urllib.request
+
+    params = {}
+    if args.kind in ("login", "otp"):
+        if not args.value:
+            print("Nomor telepon / kode OTP wajib diisi")
+            return 2
+        params["phone_number" if args.kind == "login" else "otp_code"] = args.value
+    base_url = f"http://{args.host}:{args.port}"
+    request = urllib.request.Request(
+        f"{base_url}/jobs",
+        data=json.dumps(
+            {
+                "kind": args.kind,
+                "serial": args.serial,
+                "params": params,
+                "budget": args.budget,
+            }
+        ).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            job = json.load(response)
+        with urllib.request.urlopen(f"{base_url}/jobs/{job['id']}/events") as stream:
+            for line in stream:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if "job" in event:
+                    job = event["job"]
+                else:
+                    print(f"[{event['level']}] {event['message']}")
+    except urllib.error.HTTPError as e:
+        print(f"Job ditolak: {json.load(e).get('error', e.reason)}")
+        return 1
+    except urllib.error.URLError as e:
+        print(f"Daemon tidak dapat dihubungi di {base_url}: {e.reason}")
+        return 1
+
+    print(f"Job {job['id']}: {job['status']}")
+    return 0 if job["status"] == "succeeded" else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="exa-myim3", description="EXA-MYIM3")
+    subparsers = parser.add_subparsers(dest="command")
+
+    devices = subparsers.add_parser("devices", help="Daftar device yang terhubung")
+    devices.set_defaults(handler=cmd_devices)
+
+    battery = subparsers.add_parser("battery", help="Info baterai satu device")
+    battery.add_argument("serial", help="Serial number device")
+    battery.set_defaults(handler=cmd_battery)
+
+    health = subparsers.add_parser("health", help="Cek ADB server dan device")
+    health.set_defaults(handler=cmd_health)
+
+    daemon = subparsers.add_parser("daemon", help="Jalankan daemon dengan API job")
+    daemon.add_argument("--host", default=DAEMON_HOST, help="Alamat listen")
+    daemon.add_argument("--port", type=int, default=DAEMON_PORT, help="Port listen")
+    daemon.add_argument(
+        "--simulate",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Gunakan N device simulasi alih-alih device asli",
+    )
+    daemon.set_defaults(handler=cmd_daemon)
+
+    job = subparsers.add_parser("job", help="Kirim job login/OTP ke daemon")
+    job.add_argument("kind", choices=["login", "otp", "open_app"], help="Jenis job")
+    job.add_argument(
+        "value", nargs="?", help="Nomor telepon (login) atau kode OTP (otp)"
+    )
+    job.add_argument(
+        "--serial",
+        help="Serial number device (wajib untuk otp; login dirutekan ke device "
+        "pemilik SIM nomor tersebut)",
+    )
+    job.add_argument(
+        "--budget", type=float, help="Batas waktu job dalam detik (default daemon)"
+    )
+    job.add_argument("--host", default=DAEMON_HOST, help="Alamat daemon")
+    job.add_argument("--port", type=int, default=DAEMON_PORT, help="Port daemon")
+    job.set_defaults(handler=cmd_job)
+
+    telemetry = subparsers.add_parser(
+        "telemetry", help="Korelasi durasi flow dengan telemetry device"
+    )
+    telemetry.add_argument("--db", default=TELEMETRY_DB, help="File SQLite telemetry")
+    telemetry.add_argument("--serial", help="Hanya flow dari device ini")
+    telemetry.set_defaults(handler=cmd_telemetry)
+
+    timings = subparsers.add_parser(
+        "timings", help="Durasi langkah yang dipelajari per model device"
+    )
+    timings.add_argument(
+        "--path", default=TIMING_PROFILES_PATH, help="File JSON profil waktu"
+    )
+    timings.add_argument("--model", help="Hanya model device ini")
+    timings.set_defaults(handler=cmd_timings)
+
+    run = subparsers.add_parser("run", help="Jalankan aplikasi lengkap (default)")
+    run.set_defaults(handler=cmd_run)
+    return parser
+
+
+def main(argv=None) -> int:
+    """Command line entry point."""
+    args = build_parser().parse_args(argv)
+    handler = getattr(args, "handler", cmd_run)
+
+    if handler not in (cmd_run, cmd_daemon):
+        # Lightweight commands: no log file, only warnings on the console
+        initialize_logging(log_to_file=False, log_level=logging.WARNING)
+
+    return handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
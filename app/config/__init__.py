@@ -1,6 +1,12 @@
 from app.config.constants import APP_NAME, KEY_CODES
-from app.config.paths import APP_DIR, LOGS_DIR, ROOT_DIR
-from app.config.settings import ADB_HOST, ADB_PORT, ANDROID_SDK_PATH
+from app.config.paths import APP_DIR, LOGS_DIR, PROFILES_DIR, ROOT_DIR
+from app.config.settings import (
+    ADB_HOST,
+    ADB_PORT,
+    ANDROID_SDK_PATH,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL,
+)
 from app.logging import initialize_logging
 
 
@@ -1,9 +1,14 @@
 import os
 
-# Define application paths
+# Define application paths (directories are created when first used)
 APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ROOT_DIR = os.path.dirname(APP_DIR)
 LOGS_DIR = os.path.join(ROOT_DIR, "logs")
-
-# Ensure required directories exist
-os.makedirs(LOGS_DIR, exist_ok=True)
+# Output profiling (dibuat saat profiling aktif)
+PROFILES_DIR = os.path.join(ROOT_DIR, "profiles")
+# Screenshot dan hierarchy saat flow gagal (dibuat saat ada kegagalan)
+ARTIFACTS_DIR = os.path.join(ROOT_DIR, "artifacts")
+# Template elemen UI untuk pencocokan visual, per resolusi layar
+TEMPLATES_DIR = os.path.join(ROOT_DIR, "templates")
+# Selector UI per versi aplikasi (file JSON, ikut repo)
+SELECTORS_DIR = os.path.join(APP_DIR, "config", "selectors")
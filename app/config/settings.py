@@ -1,11 +1,99 @@
 import os
 
+from app.config.paths import LOGS_DIR
+
 # ADB config
 ADB_HOST = "127.0.0.1"
 ADB_PORT = 5037
+# Beberapa ADB server sekaligus (mis. satu per host USB), "host:port" dipisah
+# koma; device dari semua server digabung dalam satu DeviceService. Kosong:
+# hanya ADB_HOST:ADB_PORT
+ADB_SERVERS = os.environ.get("EXA_ADB_SERVERS", "")
+# Jeda (detik) sebelum menyambung ulang ke ADB server yang terputus, lalu
+# berlipat sampai batas maksimum
+ADB_RECONNECT_BACKOFF = float(os.environ.get("EXA_ADB_BACKOFF", "2"))
+ADB_RECONNECT_BACKOFF_MAX = float(os.environ.get("EXA_ADB_BACKOFF_MAX", "60"))
 
 # Path ke Android SDK (jika ada, atau kosong jika menggunakan yang di PATH)
 ANDROID_SDK_PATH = os.environ.get("ANDROID_SDK_PATH", "")
 
 # Package aplikasi default
 DEFAULT_PACKAGE = "com.pure.indosat.care"
+
+# Batas waktu (detik) untuk satu flow, termasuk semua wait dan sleep di dalamnya
+LOGIN_FLOW_BUDGET = float(os.environ.get("EXA_LOGIN_BUDGET", "90"))
+OTP_FLOW_BUDGET = float(os.environ.get("EXA_OTP_BUDGET", "180"))
+
+# File JSON {serial: [nomor, ...]} untuk SIM yang tidak menyimpan nomornya sendiri
+SIM_MAP_PATH = os.environ.get("EXA_SIM_MAP", "")
+
+# Circuit breaker per device: gagal berturut-turut sebelum dikarantina
+HEALTH_FAILURE_THRESHOLD = int(os.environ.get("EXA_HEALTH_FAILURES", "3"))
+# Median latency RPC (detik) yang dianggap device bermasalah
+HEALTH_LATENCY_THRESHOLD = float(os.environ.get("EXA_HEALTH_LATENCY", "5"))
+# Jeda (detik) sebelum recovery pertama, lalu berlipat sampai batas maksimum
+HEALTH_RECOVERY_BACKOFF = float(os.environ.get("EXA_HEALTH_BACKOFF", "30"))
+HEALTH_RECOVERY_BACKOFF_MAX = float(os.environ.get("EXA_HEALTH_BACKOFF_MAX", "600"))
+
+# Siapkan device sebelum flow (animasi mati, layar tetap menyala, buka kunci);
+# settings asli dikembalikan saat selesai. "0" untuk mematikan
+PREPARE_DEVICES = os.environ.get("EXA_PREPARE_DEVICES", "1") != "0"
+
+# Baca logcat per device selama flow: bangun segera saat layar berganti dan
+# gagalkan flow saat aplikasi crash/ANR. "0" untuk mematikan
+LOGCAT_EVENTS = os.environ.get("EXA_LOGCAT_EVENTS", "1") != "0"
+
+# Rekam dumpsys gfxinfo (frame janky, persentil waktu frame) dan meminfo aplikasi
+# sebelum dan sesudah setiap langkah flow, untuk memisahkan lambatnya aplikasi
+# dari lambatnya otomasi. Menambah satu perintah shell sebelum dan sesudah
+# setiap langkah. "1" untuk menyalakan
+APP_PERF_CAPTURE = os.environ.get("EXA_APP_PERF", "0") == "1"
+
+# Simpan hierarchy dan screenshot terakhir per device selama flow berjalan, lalu
+# tulis ke ARTIFACTS_DIR di background saat flow gagal. "0" untuk mematikan
+ARTIFACTS_ENABLED = os.environ.get("EXA_ARTIFACTS", "1") != "0"
+# Jumlah snapshot terakhir yang disimpan per jenis
+ARTIFACT_RING_SIZE = int(os.environ.get("EXA_ARTIFACT_RING", "10"))
+
+# Setelah klik, tunggu sampai hierarchy UI tidak berubah (SETTLE_SAMPLES kali
+# berturut-turut, dibaca tiap SETTLE_INTERVAL detik) alih-alih jeda tetap; jeda
+# lama menjadi batas atas. "0" untuk kembali ke jeda tetap
+UI_SETTLE = os.environ.get("EXA_UI_SETTLE", "1") != "0"
+SETTLE_SAMPLES = int(os.environ.get("EXA_SETTLE_SAMPLES", "2"))
+SETTLE_INTERVAL = float(os.environ.get("EXA_SETTLE_INTERVAL", "0.05"))
+
+# Timeout dan interval polling per model device, dipelajari dari durasi langkah
+# yang terekam (persentil, dibatasi sekitar nilai default). "0" memakai nilai
+# default; durasi tetap direkam
+ADAPTIVE_TIMING = os.environ.get("EXA_ADAPTIVE_TIMING", "1") != "0"
+# File JSON profil waktu per model device; "" hanya disimpan di memori
+TIMING_PROFILES_PATH = os.environ.get(
+    "EXA_TIMING_PROFILES", os.path.join(LOGS_DIR, "timings.json")
+)
+
+# Skor minimal (normalized cross-correlation, 0-1) agar template dianggap cocok
+# saat mencari elemen di screenshot (butuh NumPy)
+VISUAL_MATCH_THRESHOLD = float(os.environ.get("EXA_MATCH_THRESHOLD", "0.8"))
+
+# Telemetry per device (baterai, frekuensi CPU, suhu, PSS aplikasi) di background:
+# interval sampling (detik), "0" untuk mematikan
+TELEMETRY_INTERVAL = float(os.environ.get("EXA_TELEMETRY_INTERVAL", "5"))
+# File SQLite untuk telemetry yang sudah diringkas; "" hanya disimpan di memori
+TELEMETRY_DB = os.environ.get(
+    "EXA_TELEMETRY_DB", os.path.join(LOGS_DIR, "telemetry.db")
+)
+
+# Profiling per device dan per flow: "" (mati), "cprofile" atau "sample"
+PROFILE_MODE = os.environ.get("EXA_PROFILE", "").lower()
+# Interval sampling (detik) untuk mode "sample"
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("EXA_PROFILE_INTERVAL", "0.005"))
+
+# Daemon: API lokal untuk job login/OTP dengan koneksi device yang tetap hangat
+DAEMON_HOST = os.environ.get("EXA_DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.environ.get("EXA_DAEMON_PORT", "8765"))
+# Interval (detik) pengecekan device yang tersambung/terputus
+DAEMON_REFRESH_INTERVAL = float(os.environ.get("EXA_DAEMON_REFRESH", "10"))
+# Batas waktu default (detik) satu job daemon, dari mulai berjalan sampai selesai
+DAEMON_JOB_BUDGET = float(os.environ.get("EXA_DAEMON_JOB_BUDGET", "300"))
+# Jumlah job selesai yang tetap disimpan untuk dilihat lewat API
+DAEMON_JOB_HISTORY = int(os.environ.get("EXA_DAEMON_JOB_HISTORY", "500"))
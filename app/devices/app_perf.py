@@ -0,0 +1,252 @@
+# Module for capturing the app's rendering and memory cost around flow steps
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from app.config.settings import DEFAULT_PACKAGE
+from app.logging import get_device_logger
+
+if TYPE_CHECKING:
+    from app.devices.dumpsys import GfxInfo
+
+logger = logging.getLogger(__name__)
+
+_SEPARATOR = "---"
+
+
+@dataclass
+class AppSnapshot:
+    """Frame counters and PSS of the app at one moment."""
+
+    gfx: "GfxInfo"
+    pss: Optional[int]  # KB, None when the app is not running
+
+
+@dataclass
+class StepRecord:
+    """
+    One flow step: host-side duration next to what the app did meanwhile.
+
+    `seconds` is the wall time of the step itself; the two snapshots are
+    taken outside it and their cost is reported as `capture_seconds`.
+    """
+
+    serial: str
+    flow: str
+    step: str
+    seconds: float
+    error: Optional[str] = None  # exception type if the step raised
+    frames: int = 0
+    janky_frames: int = 0
+    percentiles: Dict[int, int] = field(default_factory=dict)  # frame ms
+    slow_ui_thread: int = 0
+    pss_before: Optional[int] = None
+    pss_after: Optional[int] = None
+    capture_seconds: float = 0.0
+
+    @property
+    def janky_percent(self) -> Optional[float]:
+        if not self.frames:
+            return None
+        return 100 * self.janky_frames / self.frames
+
+    @property
+    def pss_delta(self) -> Optional[int]:
+        if self.pss_before is None or self.pss_after is None:
+            return None
+        return self.pss_after - self.pss_before
+
+    def to_dict(self) -> Dict:
+        return {
+            "flow": self.flow,
+            "step": self.step,
+            "seconds": self.seconds,
+            "error": self.error,
+            "frames": self.frames,
+            "janky_frames": self.janky_frames,
+            "percentiles": self.percentiles,
+            "slow_ui_thread": self.slow_ui_thread,
+            "pss_before": self.pss_before,
+            "pss_after": self.pss_after,
+            "pss_delta": self.pss_delta,
+            "capture_seconds": self.capture_seconds,
+        }
+
+    def summary(self) -> str:
+        text = f"{self.step}: {self.seconds:.2f}s, app: {self.frames} frame"
+        if self.frames:
+            text += (
+                f", {self.janky_frames} janky ({self.janky_percent:.0f}%), "
+                f"p90 {self.percentiles.get(90, '?')}ms"
+            )
+        if self.pss_delta is not None:
+            text += f", PSS {self.pss_delta / 1024:+.1f}MB"
+        return text
+
+
+class _Scope:
+    """Capture state of one running flow."""
+
+    def __init__(self, device_service, serial: str, flow: str, package: str):
+        self.device_service = device_service
+        self.serial = serial
+        self.flow = flow
+        self.package = package
+        self.in_step = False  # only the flow's outermost steps are captured
+
+
+_scope: contextvars.ContextVar[Optional[_Scope]] = contextvars.ContextVar(
+    "app_perf_scope", default=None
+)
+_collector: contextvars.ContextVar[Optional[List[StepRecord]]] = contextvars.ContextVar(
+    "app_perf_collector", default=None
+)
+
+
+def take_snapshot(
+    device_service, serial: str, package: str = DEFAULT_PACKAGE
+) -> Optional[AppSnapshot]:
+    """
+    Read gfxinfo and meminfo of the app in one shell call.
+
+    Returns:
+        AppSnapshot: The snapshot, or None if the device is not connected
+    """
+    # Imported here: flows import this module for its decorator only
+    from app.devices.dumpsys import GFXINFO, MEMINFO, SECTION_COMMANDS, parse_section
+
+    device = device_service.get_device(serial)
+    if device is None:
+        return None
+    # gfxinfo and meminfo of the app in one shell round trip
+    command = "; ".join(
+        [SECTION_COMMANDS[GFXINFO], f"echo {_SEPARATOR}", SECTION_COMMANDS[MEMINFO]]
+    )
+    output = device.shell(command.format(arg=package))
+    gfx_output, _, mem_output = output.partition(f"{_SEPARATOR}\n")
+    return AppSnapshot(
+        gfx=parse_section(GFXINFO, gfx_output, package),
+        pss=parse_section(MEMINFO, mem_output, package).total_pss,
+    )
+
+
+def _snapshot(scope: _Scope) -> Optional[AppSnapshot]:
+    try:
+        return take_snapshot(scope.device_service, scope.serial, scope.package)
+    except Exception as e:
+        logger.debug(f"Snapshot performa aplikasi {scope.serial} gagal: {e}")
+        return None
+
+
+def _finish(
+    scope: _Scope,
+    step: str,
+    error: Optional[str],
+    before: Optional[AppSnapshot],
+    start: float,
+    step_start: float,
+):
+    seconds = time.perf_counter() - step_start
+    after = _snapshot(scope)
+    capture_seconds = time.perf_counter() - start - seconds
+    record = StepRecord(
+        scope.serial, scope.flow, step, seconds, error, capture_seconds=capture_seconds
+    )
+    if before is not None:
+        record.pss_before = before.pss
+    if after is not None:
+        record.pss_after = after.pss
+        gfx = after.gfx.since(before.gfx) if before is not None else after.gfx
+        record.frames = gfx.total_frames
+        record.janky_frames = gfx.janky_frames
+        record.percentiles = gfx.percentiles
+        record.slow_ui_thread = gfx.counters.get("Slow UI thread", 0)
+    get_device_logger(record.serial).info(record.summary())
+    records = _collector.get()
+    if records is not None:
+        records.append(record)
+
+
+@contextmanager
+def capture_step(name: str):
+    """
+    Snapshot the app before and after one step of a capturing flow.
+
+    No-op outside capture_scope (or a flow decorated with @capture_steps)
+    and for steps nested inside another captured step. Steps cancelled by
+    their deadline are not recorded, so a flow that must stop is not held
+    up by dumpsys.
+    """
+    scope = _scope.get()
+    if scope is None or scope.in_step:
+        yield
+        return
+    scope.in_step = True
+    try:
+        start = time.perf_counter()
+        before = _snapshot(scope)
+        step_start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            _finish(scope, name, type(e).__name__, before, start, step_start)
+            raise
+        _finish(scope, name, None, before, start, step_start)
+    finally:
+        scope.in_step = False
+
+
+@contextmanager
+def capture_scope(device_service, serial: str, flow: str):
+    """
+    Capture the @log_action steps called inside this block as steps of `flow`.
+
+    No-op unless `device_service.app_perf_enabled` is set.
+    """
+    if not getattr(device_service, "app_perf_enabled", False):
+        yield
+        return
+    token = _scope.set(_Scope(device_service, serial, flow, DEFAULT_PACKAGE))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def capture_steps(func):
+    """
+    Decorator for flows called as `func(device_service, serial, ...)`.
+
+    Place it directly above the flow function (under @log_action): every
+    @log_action step the flow calls gets an app snapshot before and after
+    it when `device_service.app_perf_enabled` is set.
+    """
+
+    @wraps(func)
+    def wrapper(device_service, serial, *args, **kwargs):
+        with capture_scope(device_service, serial, func.__name__):
+            return func(device_service, serial, *args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def collect_steps():
+    """
+    Collect the StepRecords of flows run inside this block.
+
+    Usage:
+        with collect_steps() as steps:
+            login_flow(device_service, serial, phone_number)
+        job.steps = steps
+    """
+    records: List[StepRecord] = []
+    token = _collector.set(records)
+    try:
+        yield records
+    finally:
+        _collector.reset(token)
@@ -0,0 +1,406 @@
+# Module for keeping recent screens per device and writing them out on failure
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config.paths import ARTIFACTS_DIR
+from app.config.settings import ARTIFACT_RING_SIZE
+
+logger = logging.getLogger(__name__)
+
+HIERARCHY = "hierarchy"
+SCREENSHOT = "screenshot"
+# Longest side of the screenshots kept in the ring (pixels)
+SCREENSHOT_SIZE = 480
+SCREENSHOT_QUALITY = 50
+# Failures waiting for the writer; more are dropped rather than queued
+MAX_PENDING = 32
+# Seconds in which further dumps of a device count as the same failure
+DUMP_INTERVAL = 2.0
+_IMAGE_TYPES = ((b"\xff\xd8", ".jpg"), (b"\x89PNG", ".png"), (b"P6", ".ppm"))
+
+
+@dataclass
+class Snapshot:
+    """One captured screen state; `data` is stored as written to disk."""
+
+    kind: str
+    digest: str  # sha1 of the uncompressed content
+    data: bytes
+    time: float
+    last_seen: float  # an unchanged screen only moves this forward
+
+
+def shrink_screenshot(raw: bytes) -> bytes:
+    """
+    Downscale a screenshot to SCREENSHOT_SIZE as JPEG.
+
+    Pillow comes with uiautomator2; without it the image is kept as is.
+    """
+    try:
+        from io import BytesIO
+
+        from PIL import Image
+    except ImportError:
+        return raw
+    try:
+        image = Image.open(BytesIO(raw))
+        image.thumbnail((SCREENSHOT_SIZE, SCREENSHOT_SIZE))
+        output = BytesIO()
+        image.convert("RGB").save(output, "JPEG", quality=SCREENSHOT_QUALITY)
+        return output.getvalue()
+    except Exception as e:
+        logger.debug(f"Gagal memperkecil screenshot: {e}")
+        return raw
+
+
+class _DeviceRing:
+    """Recent snapshots of one device."""
+
+    def __init__(self, size: int):
+        self.rings: Dict[str, Deque[Snapshot]] = {
+            HIERARCHY: deque(maxlen=size),
+            SCREENSHOT: deque(maxlen=size),
+        }
+        self.users = 0  # flows currently recording
+        self.last_error: Optional[Tuple[float, str]] = None
+        self.dumped_at = 0.0  # time.monotonic() of the last dump()
+
+
+_active: Dict[str, "ArtifactRecorder"] = {}
+_active_lock = threading.Lock()
+
+
+def note_hierarchy(serial: str, hierarchy: str):
+    """
+    Hand a hierarchy the flow just dumped to the recorder of its device.
+
+    No-op unless a flow on that device is recording.
+    """
+    with _active_lock:
+        recorder = _active.get(serial)
+    if recorder is not None:
+        recorder.add(serial, HIERARCHY, hierarchy.encode("utf-8"))
+
+
+class _ErrorTracker(logging.Handler):
+    """Remembers the last ERROR logged for each device, as the failure reason."""
+
+    def __init__(self, recorder: "ArtifactRecorder"):
+        super().__init__(level=logging.ERROR)
+        self.recorder = recorder
+
+    def emit(self, record):
+        serial = getattr(record, "device_id", None)
+        if serial is not None:
+            self.recorder.note_error(serial, record.getMessage())
+
+
+class ArtifactRecorder:
+    """
+    Failure artifacts of one DeviceService.
+
+    While a flow records (recording() / @keep_artifacts), the hierarchies
+    it dumps anyway (settle, bounds lookups, message scans) are handed over
+    through note_hierarchy() into a ring of the last `size` snapshots per
+    kind; an unchanged screen only refreshes the newest entry. Recording
+    adds no device calls of its own. When the flow fails, dump() copies
+    the ring and hands it to a writer thread, so the failing flow never
+    waits for a capture or for disk. The writer takes one downscaled
+    screenshot, then writes a manifest plus content-addressed objects
+    (hierarchies zlib-compressed, one file per distinct content) under
+    `directory`.
+    """
+
+    def __init__(
+        self,
+        device_service,
+        size: int = ARTIFACT_RING_SIZE,
+        directory: str = ARTIFACTS_DIR,
+    ):
+        """Initialize the recorder.
+
+        Args:
+            device_service: DeviceService used to reach the devices
+            size: Snapshots kept per kind and device
+            directory: Root directory for written artifacts
+        """
+        self.device_service = device_service
+        self.size = size
+        self.directory = directory
+        self.devices: Dict[str, _DeviceRing] = {}
+        self.lock = threading.Lock()
+        self.pending: "queue.Queue[Optional[tuple]]" = queue.Queue(MAX_PENDING)
+        self.written: List[str] = []  # manifest paths, newest last
+        self._writer: Optional[threading.Thread] = None
+        self._errors: Optional[_ErrorTracker] = None  # added on first start()
+
+    # Capture
+
+    def _ring(self, serial: str) -> _DeviceRing:
+        # Caller holds self.lock
+        ring = self.devices.get(serial)
+        if ring is None:
+            ring = self.devices[serial] = _DeviceRing(self.size)
+        return ring
+
+    def add(self, serial: str, kind: str, content: bytes):
+        """
+        Add a captured hierarchy (UTF-8 XML) or screenshot to a device's ring.
+
+        Flows feed their own dumps through note_hierarchy().
+        """
+        import hashlib  # loaded once a flow records, not at startup
+
+        now = time.time()
+        digest = hashlib.sha1(content).hexdigest()
+        with self.lock:
+            ring = self._ring(serial).rings[kind]
+            if ring and ring[-1].digest == digest:
+                ring[-1].last_seen = now
+                return
+        data = zlib.compress(content) if kind == HIERARCHY else content
+        with self.lock:
+            self._ring(serial).rings[kind].append(
+                Snapshot(kind, digest, data, now, now)
+            )
+
+    def capture_screenshot(self, serial: str):
+        """Take a downscaled screenshot of a device into its ring."""
+        raw = self.device_service.get_ui_device(serial).screenshot(format="raw")
+        if raw:
+            self.add(serial, SCREENSHOT, shrink_screenshot(raw))
+
+    def _unregister(self, serials):
+        with _active_lock:
+            for serial in serials:
+                if _active.get(serial) is self:
+                    del _active[serial]
+
+    def start(self, serial: str):
+        """Start recording a device (counted; pair with stop())."""
+        with self.lock:
+            if self._errors is None:
+                self._errors = _ErrorTracker(self)
+                logging.getLogger("device").addHandler(self._errors)
+            ring = self._ring(serial)
+            ring.users += 1
+            if ring.users > 1:
+                return
+            ring.last_error = None
+        with _active_lock:
+            _active[serial] = self
+
+    def stop(self, serial: str):
+        with self.lock:
+            ring = self.devices.get(serial)
+            if ring is None or not ring.users:
+                return
+            ring.users -= 1
+            if ring.users:
+                return
+        self._unregister([serial])
+
+    def note_error(self, serial: str, message: str):
+        with self.lock:
+            ring = self.devices.get(serial)
+            if ring is not None and ring.users:
+                ring.last_error = (time.time(), message)
+
+    # Failure
+
+    def dump(self, serial: str, flow: str, reason: Optional[str] = None) -> bool:
+        """
+        Queue the recent screens of a device for writing; never blocks.
+
+        Args:
+            serial: Device serial number
+            flow: Flow or step that failed
+            reason: Failure description (default: last ERROR logged for it)
+
+        Returns:
+            bool: False if nothing was recorded, the same failure was already
+                dumped (within DUMP_INTERVAL) or the writer is backed up
+        """
+        now = time.monotonic()
+        with self.lock:
+            ring = self.devices.get(serial)
+            if ring is None or now - ring.dumped_at < DUMP_INTERVAL:
+                return False
+            ring.dumped_at = now
+            snapshots = [s for kind in ring.rings.values() for s in kind]
+            if reason is None and ring.last_error is not None:
+                reason = ring.last_error[1]
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="artifacts-writer", daemon=True
+                )
+                self._writer.start()
+        try:
+            self.pending.put_nowait((serial, flow, reason, time.time(), snapshots))
+        except queue.Full:
+            logger.warning(f"Antrian artefak penuh, artefak {serial} dilewati")
+            return False
+        return True
+
+    def _write_loop(self):
+        while True:
+            job = self.pending.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            except Exception as e:
+                logger.error(f"Gagal menulis artefak: {e}")
+            finally:
+                self.pending.task_done()
+
+    def _object_path(self, snapshot: Snapshot) -> str:
+        extension = ".xml.z"
+        if snapshot.kind == SCREENSHOT:
+            extension = next(
+                (ext for magic, ext in _IMAGE_TYPES if snapshot.data.startswith(magic)),
+                ".img",
+            )
+        name = snapshot.digest + extension
+        return os.path.join("objects", snapshot.digest[:2], name)
+
+    def _write(
+        self,
+        serial: str,
+        flow: str,
+        reason: Optional[str],
+        failed_at: float,
+        snapshots: List[Snapshot],
+    ):
+        # The screen right after the failure, taken here instead of in the flow
+        if self.device_service.health.is_available(serial):
+            try:
+                self.capture_screenshot(serial)
+                with self.lock:
+                    ring = self.devices.get(serial)
+                    screenshots = ring.rings[SCREENSHOT] if ring is not None else ()
+                    latest = screenshots[-1] if screenshots else None
+                if latest is not None and all(s is not latest for s in snapshots):
+                    snapshots.append(latest)
+            except Exception as e:
+                logger.debug(f"Screenshot artefak {serial} gagal: {e}")
+
+        entries = []
+        for snapshot in sorted(snapshots, key=lambda s: s.time):
+            relative = self._object_path(snapshot)
+            path = os.path.join(self.directory, relative)
+            if not os.path.exists(path):  # identical content is written once
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temporary = f"{path}.{threading.get_ident()}.tmp"
+                with open(temporary, "wb") as f:
+                    f.write(snapshot.data)
+                os.replace(temporary, path)
+            entries.append(
+                {
+                    "kind": snapshot.kind,
+                    "time": snapshot.time,
+                    "last_seen": snapshot.last_seen,
+                    "object": relative,
+                }
+            )
+
+        import json
+
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(failed_at))
+        folder = os.path.join(self.directory, serial, f"{stamp}-{flow}")
+        os.makedirs(folder, exist_ok=True)
+        manifest = os.path.join(folder, "manifest.json")
+        with open(manifest, "w") as f:
+            json.dump(
+                {
+                    "serial": serial,
+                    "flow": flow,
+                    "reason": reason,
+                    "failed_at": failed_at,
+                    "snapshots": entries,
+                },
+                f,
+                indent=2,
+            )
+        with self.lock:
+            self.written.append(manifest)
+        logger.info(f"Artefak kegagalan {serial} ditulis ke {folder}")
+
+    def flush(self, timeout: Optional[float] = None):
+        """Wait until every queued failure is written."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            time.sleep(0.05)
+
+    @contextmanager
+    def capturing(self, serial: str):
+        """Record while the block runs."""
+        self.start(serial)
+        try:
+            yield self
+        finally:
+            self.stop(serial)
+
+    @contextmanager
+    def recording(self, serial: str, flow: str):
+        """Record while the block runs; dump if it raises (or is cancelled)."""
+        with self.capturing(serial):
+            try:
+                yield self
+            except BaseException as e:
+                self.dump(serial, flow, f"{type(e).__name__}: {e}")
+                raise
+
+    def forget(self, serial: str):
+        """Drop the ring of a disconnected device."""
+        with self.lock:
+            self.devices.pop(serial, None)
+        self._unregister([serial])
+
+    def close(self, timeout: float = 10.0):
+        """Stop recording and finish writing queued failures."""
+        with self.lock:
+            for ring in self.devices.values():
+                ring.users = 0
+            serials = list(self.devices)
+            writer = self._writer
+            errors, self._errors = self._errors, None
+        self._unregister(serials)
+        if writer is not None:
+            self.flush(timeout)
+        if errors is not None:
+            logging.getLogger("device").removeHandler(errors)
+
+
+def keep_artifacts(func):
+    """
+    Decorator for flows called as `func(device_service, serial, ...)`.
+
+    Records recent screens while the flow runs and writes them out in the
+    background when it returns False or raises (including its deadline).
+    No-op when `device_service.artifacts` is None.
+    """
+
+    @wraps(func)
+    def wrapper(device_service, serial, *args, **kwargs):
+        recorder = getattr(device_service, "artifacts", None)
+        if recorder is None:
+            return func(device_service, serial, *args, **kwargs)
+        with recorder.recording(serial, func.__name__):
+            result = func(device_service, serial, *args, **kwargs)
+            if not result:
+                recorder.dump(serial, func.__name__)
+            return result
+
+    return wrapper
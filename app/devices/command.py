@@ -1,6 +1,8 @@
 # Module for functions that use shell commands to interact with devices
 import logging
-from typing import Dict
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -50,18 +52,11 @@ def get_battery_info(device) -> Dict[str, str]:
     Returns:
         dict: Battery information (level, status, etc.)
     """
+    from app.devices.dumpsys import BATTERY, parse_section
+
     try:
         result = device.shell("dumpsys battery")
-
-        # Parse the battery info
-        battery_info = {}
-        for line in result.splitlines():
-            line = line.strip()
-            if ":" in line:
-                key, value = line.split(":", 1)
-                battery_info[key.strip()] = value.strip()
-
-        return battery_info
+        return parse_section(BATTERY, result).values
     except Exception as e:
         logger.exception(
             f"Error getting battery info for device {device.serial}: {str(e)}"
@@ -119,3 +114,321 @@ def get_device_properties(device) -> Dict[str, str]:
             f"Error getting properties for device {device.serial}: {str(e)}"
         )
         return {"error": str(e)}
+
+
+# Transaction codes of IPhoneSubInfo.getLine1NumberForSubscriber, newest first.
+# The AIDL order changes between Android releases, so several are tried and
+# only results that look like an MSISDN are kept.
+LINE1_TRANSACTION_CODES = {
+    30: (15, 13, 12),  # Android 11+
+    29: (12, 11, 15),  # Android 10
+    0: (11, 12, 13),  # older releases
+}
+
+
+def parse_parcel_string(output: str) -> str:
+    """
+    Extract the string from `service call` Parcel output.
+
+    Args:
+        output: Raw output such as "Result: Parcel(0x00000000: ... '..+.6.2.')"
+
+    Returns:
+        str: Decoded text (empty if the Parcel holds no string)
+    """
+    chunks = re.findall(r"'(.*?)'", output)
+    return "".join(chunks).replace(".", "").strip()
+
+
+def normalize_msisdn(number: str) -> str:
+    """
+    Normalize a phone number to the local 08xx format.
+
+    Args:
+        number: Number such as "+62 856-1234", "62856..." or "0856..."
+
+    Returns:
+        str: Normalized number, or "" if it does not look like an MSISDN
+    """
+    digits = re.sub(r"\D", "", number)
+    if digits.startswith("62"):
+        digits = "0" + digits[2:]
+    if not digits.startswith("0") or not 9 <= len(digits) <= 14:
+        return ""
+    return digits
+
+
+def get_sim_numbers(device, sdk_version: int = 0, subscriptions: int = 2) -> List[str]:
+    """
+    Discover the MSISDN(s) of the SIM(s) in a device.
+
+    Queries the telephony `iphonesubinfo` service for each subscription
+    and falls back to `dumpsys iphonesubinfo` on old releases. Many SIMs
+    do not store their own number, so an empty list is a normal result.
+
+    Args:
+        device: ppadb device object
+        sdk_version: Android SDK level, used to pick transaction codes
+        subscriptions: Number of subscription IDs to try (dual SIM)
+
+    Returns:
+        list: Normalized numbers, without duplicates
+    """
+    codes = next(
+        codes
+        for level, codes in sorted(LINE1_TRANSACTION_CODES.items(), reverse=True)
+        if sdk_version >= level
+    )
+    numbers: List[str] = []
+    try:
+        for code in codes:
+            for sub_id in range(1, subscriptions + 1):
+                output = device.shell(
+                    f"service call iphonesubinfo {code} i32 {sub_id} "
+                    "s16 com.android.shell"
+                )
+                number = normalize_msisdn(parse_parcel_string(output))
+                if number and number not in numbers:
+                    numbers.append(number)
+            if numbers:
+                return numbers
+
+        output = device.shell("dumpsys iphonesubinfo")
+        for match in re.finditer(r"Line1Number\s*[=:]\s*(\S+)", output):
+            number = normalize_msisdn(match.group(1))
+            if number and number not in numbers:
+                numbers.append(number)
+    except Exception as e:
+        logger.exception(f"Error reading SIM numbers of {device.serial}: {str(e)}")
+    return numbers
+
+
+# Global settings scaling window, transition and animator animations
+ANIMATION_SETTINGS = (
+    "window_animation_scale",
+    "transition_animation_scale",
+    "animator_duration_scale",
+)
+# Keep the screen on while plugged in (AC | USB | wireless)
+STAY_ON_SETTING = "stay_on_while_plugged_in"
+STAY_ON_ALL = "7"
+
+
+def get_global_settings(device, names) -> Dict[str, str]:
+    """
+    Read several `settings global` values in one shell round trip.
+
+    Args:
+        device: ppadb device object
+        names: Setting names
+
+    Returns:
+        dict: Name -> value ("null" when the setting is unset)
+    """
+    names = list(names)
+    output = device.shell("; ".join(f"settings get global {name}" for name in names))
+    values = output.splitlines()
+    if len(values) != len(names):
+        raise ValueError(f"Unexpected settings output: {output!r}")
+    return {name: value.strip() for name, value in zip(names, values)}
+
+
+def put_global_settings(device, values: Dict[str, str]) -> bool:
+    """
+    Write several `settings global` values in one shell round trip.
+
+    A value of "null" deletes the setting, restoring the system default.
+
+    Args:
+        device: ppadb device object
+        values: Name -> value
+
+    Returns:
+        bool: True if the shell reported no error
+    """
+    commands = [
+        f"settings delete global {name}"
+        if value == "null"
+        else f"settings put global {name} {value}"
+        for name, value in values.items()
+    ]
+    try:
+        result = device.shell("; ".join(commands))
+        return "error" not in result.lower() and "exception" not in result.lower()
+    except Exception as e:
+        logger.exception(f"Error writing settings on {device.serial}: {str(e)}")
+        return False
+
+
+def wake_and_unlock(device) -> bool:
+    """
+    Turn the screen on and dismiss a swipe (insecure) keyguard.
+
+    Args:
+        device: ppadb device object
+
+    Returns:
+        bool: True if the device reports it is awake
+    """
+    try:
+        output = device.shell(
+            "input keyevent KEYCODE_WAKEUP; wm dismiss-keyguard; "
+            "dumpsys power | grep -m1 mWakefulness="
+        )
+        return "mWakefulness=Awake" in output
+    except Exception as e:
+        logger.exception(f"Error waking device {device.serial}: {str(e)}")
+        return False
+
+
+def trim_background_apps(device) -> bool:
+    """
+    Kill cached background processes to free memory for the app.
+
+    Args:
+        device: ppadb device object
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        result = device.shell("am kill-all")
+        return "error" not in result.lower()
+    except Exception as e:
+        logger.exception(f"Error trimming apps on {device.serial}: {str(e)}")
+        return False
+
+
+# Launch modes of start_activity
+COLD, WARM, HOT = "cold", "warm", "hot"
+LAUNCH_MODES = (COLD, WARM, HOT)
+
+# Intent flags NEW_TASK | CLEAR_TASK: recreate the activity, keep the process
+_CLEAR_TASK_FLAGS = "0x10008000"
+
+
+@dataclass
+class LaunchResult:
+    """Outcome of one app launch."""
+
+    ok: bool
+    mode: str
+    activity: Optional[str] = None
+    launch_state: Optional[str] = None  # COLD/WARM/HOT as reported by Android
+    total_time: Optional[int] = None  # ms until the first frame
+    wait_time: Optional[int] = None  # ms including am overhead
+    skipped: bool = False  # app was already in front
+    error: Optional[str] = None
+
+
+def resolve_launcher_activity(device, package_name: str) -> Optional[str]:
+    """
+    Resolve the launcher activity of a package.
+
+    Args:
+        device: ppadb device object
+        package_name (str): Package name of the app
+
+    Returns:
+        str: Component such as "com.pkg/.MainActivity", or None if not found
+    """
+    try:
+        output = device.shell(
+            "cmd package resolve-activity --brief "
+            f"-c android.intent.category.LAUNCHER {package_name}"
+        )
+    except Exception as e:
+        logger.exception(f"Error resolving launcher of {package_name}: {str(e)}")
+        return None
+    for line in reversed(output.splitlines()):
+        line = line.strip()
+        if line.startswith(f"{package_name}/"):
+            return line
+    return None
+
+
+def get_foreground_package(device) -> Optional[str]:
+    """
+    Get the package of the focused window with one cheap dumpsys query.
+
+    Args:
+        device: ppadb device object
+
+    Returns:
+        str: Package name, or None if it cannot be determined
+    """
+    from app.devices.dumpsys import WINDOW, parse_section
+
+    try:
+        output = device.shell("dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'")
+    except Exception as e:
+        logger.exception(f"Error reading focus of {device.serial}: {str(e)}")
+        return None
+    return parse_section(WINDOW, output).package
+
+
+def parse_am_start(output: str) -> Dict[str, str]:
+    """
+    Parse the key/value report printed by `am start -W`.
+
+    Args:
+        output: Raw output ("Status: ok", "TotalTime: 412", ...)
+
+    Returns:
+        dict: Keys such as Status, LaunchState, Activity, TotalTime, WaitTime,
+            plus Error when the launch was rejected
+    """
+    report = {}
+    for line in output.splitlines():
+        key, sep, value = line.strip().partition(":")
+        if sep and key and " " not in key:
+            report.setdefault(key, value.strip())
+    return report
+
+
+def start_activity(device, component: str, mode: str = HOT) -> LaunchResult:
+    """
+    Start an activity with `am start -W` and report the real launch result.
+
+    Args:
+        device: ppadb device object
+        component (str): Component from resolve_launcher_activity
+        mode (str): COLD (force-stop first), WARM (recreate the activity in
+            the running process) or HOT (bring the existing task to front)
+
+    Returns:
+        LaunchResult: ok is True only if Android reports Status: ok
+    """
+    if mode not in LAUNCH_MODES:
+        raise ValueError(f"Unknown launch mode: {mode}")
+    options = {COLD: "-S ", WARM: f"-f {_CLEAR_TASK_FLAGS} ", HOT: ""}[mode]
+    try:
+        output = device.shell(f"am start -W {options}-n {component}")
+    except Exception as e:
+        logger.exception(f"Error starting {component} on {device.serial}: {str(e)}")
+        return LaunchResult(False, mode, component, error=str(e))
+
+    report = parse_am_start(output)
+    ok = report.get("Status") == "ok" and "Error" not in report
+
+    def millis(key):
+        value = report.get(key, "")
+        return int(value) if value.isdigit() else None
+
+    result = LaunchResult(
+        ok,
+        mode,
+        report.get("Activity", component),
+        report.get("LaunchState"),
+        millis("TotalTime"),
+        millis("WaitTime"),
+        error=None if ok else report.get("Error") or output.strip(),
+    )
+    if ok:
+        logger.info(
+            f"Started {component} on {device.serial} ({mode}, "
+            f"TotalTime={result.total_time}ms, WaitTime={result.wait_time}ms)"
+        )
+    else:
+        logger.error(f"Failed to start {component} on {device.serial}: {result.error}")
+    return result
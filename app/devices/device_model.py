@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 
 @dataclass
@@ -18,6 +18,9 @@ class Device:
     # Optional additional properties
     properties: Optional[Dict[str, str]] = None
 
+    # MSISDN(s) of the SIM(s), normalized to 08xx (empty if unknown)
+    sim_numbers: Optional[List[str]] = None
+
     # Runtime information
     is_connected: bool = True
     error: Optional[str] = None
@@ -26,3 +29,5 @@ class Device:
         """Initialize additional fields after construction."""
         if self.properties is None:
             self.properties = {}
+        if self.sim_numbers is None:
+            self.sim_numbers = []
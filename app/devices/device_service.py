@@ -1,20 +1,43 @@
+import json
 import logging
 import os
 import threading
-from typing import Dict, List
-
-import uiautomator2 as u2
-from ppadb.client import Client
+from contextlib import nullcontext
+from dataclasses import replace
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 
 from app.config import ADB_HOST, ADB_PORT, ANDROID_SDK_PATH
+from app.config.settings import (
+    APP_PERF_CAPTURE,
+    ARTIFACTS_ENABLED,
+    LOGCAT_EVENTS,
+    SIM_MAP_PATH,
+    TELEMETRY_DB,
+    TELEMETRY_INTERVAL,
+)
 from app.devices.command import (
-    get_battery_info,
+    HOT,
+    LaunchResult,
     get_device_properties,
+    get_foreground_package,
+    get_sim_numbers,
+    normalize_msisdn,
     open_apk,
     press_key,
+    resolve_launcher_activity,
+    start_activity,
 )
 from app.devices.device_model import Device
 
+if TYPE_CHECKING:
+    from app.devices.artifacts import ArtifactRecorder
+    from app.devices.dumpsys import DumpsysCache
+    from app.devices.health import HealthTracker
+    from app.devices.logcat import LogcatStream
+    from app.devices.preparation import DevicePreparation
+    from app.devices.screencap import RawFrame
+    from app.devices.telemetry import TelemetrySampler
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,9 +51,351 @@ class DeviceService:
             host: ADB server host
             port: ADB server port
         """
-        self.adb_client = Client(host=host, port=port)
+        self.adb_client = self._create_adb_client(host, port)
         self.device_cache = {}  # Cache for uiautomator2 device objects
         self.lock = threading.Lock()  # Thread safety for device cache
+        self._health: Optional["HealthTracker"] = None  # see health
+        self._preparation: Optional["DevicePreparation"] = None  # see preparation
+        self.sim_cache: Dict[str, List[str]] = {}  # MSISDNs per serial
+        self.device_info: Dict[str, Device] = {}  # listed devices, see get_devices
+        self.launcher_cache: Dict[tuple, str] = {}  # (serial, package) -> component
+        self._dumpsys_cache: Optional["DumpsysCache"] = None  # see dumpsys_cache
+        self.logcat_enabled = LOGCAT_EVENTS
+        self.event_streams: Dict[str, "LogcatStream"] = {}  # started by event_stream()
+        self.telemetry: Optional["TelemetrySampler"] = None  # start_telemetry()
+        self.app_perf_enabled = APP_PERF_CAPTURE  # gfxinfo/meminfo around steps
+        self._artifacts: Optional["ArtifactRecorder"] = None  # see artifacts
+        self._artifacts_enabled = ARTIFACTS_ENABLED
+        self._sim_map: Optional[Dict[str, List[str]]] = None
+        self._device_listeners: List[Callable[[], None]] = []
+
+    @property
+    def health(self) -> "HealthTracker":
+        """Circuit breaker per device, created on first use.
+
+        The job manager asks for it before the first job runs, so no
+        failure goes uncounted. One-off commands never create it: their
+        RPCs are timed through timed(), which skips a missing tracker.
+        """
+        if self._health is None:
+            from app.devices.health import HealthTracker
+
+            with self.lock:
+                if self._health is None:
+                    self._health = HealthTracker(self)
+        return self._health
+
+    def timed(self, serial: str):
+        """Time the enclosed RPC as device latency, once health exists."""
+        if self._health is None:
+            return nullcontext()
+        return self._health.timed(serial)
+
+    @property
+    def preparation(self) -> "DevicePreparation":
+        """Animations off and screen on per device, created on first use.
+
+        Flow durations are compared per prepared/unprepared device from
+        then on, which is when prepare_devices() is first called.
+        """
+        if self._preparation is None:
+            from app.devices.preparation import DevicePreparation
+
+            with self.lock:
+                if self._preparation is None:
+                    self._preparation = DevicePreparation(self)
+        return self._preparation
+
+    @property
+    def dumpsys_cache(self) -> "DumpsysCache":
+        """Parsed dumpsys sections with TTLs, created on first read."""
+        if self._dumpsys_cache is None:
+            from app.devices.dumpsys import DumpsysCache
+
+            with self.lock:
+                if self._dumpsys_cache is None:
+                    self._dumpsys_cache = DumpsysCache(self)
+        return self._dumpsys_cache
+
+    @property
+    def artifacts(self) -> Optional["ArtifactRecorder"]:
+        """Recent screens per device, written out when a flow fails.
+
+        Created on first use; None when artifacts are off (EXA_ARTIFACTS=0
+        or set to None by a subclass).
+        """
+        if self._artifacts is None and self._artifacts_enabled:
+            from app.devices.artifacts import ArtifactRecorder
+
+            with self.lock:
+                if self._artifacts is None:
+                    self._artifacts = ArtifactRecorder(self)
+        return self._artifacts
+
+    @artifacts.setter
+    def artifacts(self, recorder: Optional["ArtifactRecorder"]):
+        self._artifacts = recorder
+        self._artifacts_enabled = recorder is not None
+
+    def _create_adb_client(self, host: str, port: int):
+        """Create the ADB client used for shell-level commands.
+
+        Subclasses override this to swap the transport (e.g. record/replay).
+        """
+        from ppadb.client import Client
+
+        return Client(host=host, port=port)
+
+    def _connect_ui(self, serial: str):
+        """Create a new uiautomator2 connection for a device.
+
+        Subclasses override this to swap the transport (e.g. record/replay).
+        uiautomator2 is imported here so ADB-only commands never load it.
+        """
+        import uiautomator2 as u2
+
+        return u2.connect(serial)
+
+    def _open_shell_stream(self, serial: str, command: str):
+        """Start a long-running shell command and return its output stream.
+
+        The stream has readline() (returning "" at the end) and close().
+        Subclasses override this to swap the transport (e.g. simulation);
+        record/replay refuse streams, which have no fixed order to replay.
+        """
+        device = self.get_device(serial)
+        if device is None:
+            raise ConnectionError(f"Device {serial} not found")
+        from app.devices.logcat import SocketLineStream
+
+        connection = device.create_connection(timeout=None)
+        connection.send(f"shell:{command}")
+        return SocketLineStream(connection)
+
+    def _exec_out(self, serial: str, command: str) -> bytes:
+        """Run a command through the exec service and return its raw output.
+
+        Unlike shell:, exec: never rewrites line endings, so binary output
+        such as a raw screencap arrives intact.
+        Subclasses override this to swap the transport (e.g. record/replay).
+        """
+        device = self.get_device(serial)
+        if device is None:
+            raise ConnectionError(f"Device {serial} not found")
+        connection = device.create_connection()
+        try:
+            connection.send(f"exec:{command}")
+            return bytes(connection.read_all())
+        finally:
+            connection.close()
+
+    def close(self):
+        """Restore prepared devices, release connections and stop recoveries."""
+        if self._preparation is not None:
+            self._preparation.restore_all()
+        if self._health is not None:
+            self._health.close()
+        with self.lock:
+            self.device_cache.clear()
+            streams = list(self.event_streams.values())
+            self.event_streams.clear()
+        for stream in streams:
+            stream.stop()
+        if self.telemetry is not None:
+            self.telemetry.close()
+            self.telemetry.log_report()
+        if self._artifacts is not None:
+            self._artifacts.close()
+        from app.automation.timing import timing_profiles
+
+        # Flows that ended since the last periodic save
+        timing_profiles.save()
+
+    def start_telemetry(
+        self,
+        serials: List[str],
+        interval: float = TELEMETRY_INTERVAL,
+        db_path: str = TELEMETRY_DB,
+    ) -> Optional["TelemetrySampler"]:
+        """Sample battery, CPU, thermal and memory of devices in the background.
+
+        Args:
+            serials: Devices to sample (already sampled ones are skipped)
+            interval: Seconds between samples; 0 disables telemetry
+            db_path: SQLite file for downsampled series ("" keeps them in memory)
+
+        Returns:
+            TelemetrySampler: The sampler, or None if telemetry is disabled
+        """
+        if interval <= 0:
+            return None
+        from app.devices.telemetry import TelemetrySampler
+
+        with self.lock:
+            if self.telemetry is None:
+                self.telemetry = TelemetrySampler(self, interval, db_path or None)
+        for serial in serials:
+            self.telemetry.start(serial)
+        return self.telemetry
+
+    def event_stream(self, serial: str) -> Optional["LogcatStream"]:
+        """Logcat event stream of a device, started on first use.
+
+        Args:
+            serial: Device serial number
+
+        Returns:
+            LogcatStream: The running stream, or None if LOGCAT_EVENTS is off
+        """
+        if not self.logcat_enabled:
+            return None
+        from app.devices.logcat import LogcatStream
+
+        with self.lock:
+            stream = self.event_streams.get(serial)
+            if stream is None:
+                stream = self.event_streams[serial] = LogcatStream(self, serial)
+                stream.start()
+        return stream
+
+    def release(self, serial: str):
+        """Drop the cached uiautomator2 connection of one device.
+
+        Args:
+            serial: Device serial number
+        """
+        with self.lock:
+            if self.device_cache.pop(serial, None) is not None:
+                logger.info(f"Released uiautomator2 connection for {serial}")
+
+    def reconnected(self, serial: str):
+        """Read a device's properties and SIM numbers again on its next listing.
+
+        Called when a server reports a device as connected (again): it may
+        have been reflashed or had its SIM swapped while it was away.
+
+        Args:
+            serial: Device serial number
+        """
+        with self.lock:
+            self.sim_cache.pop(serial, None)
+            self.device_info.pop(serial, None)
+
+    def forget(self, serial: str):
+        """Drop everything cached for a device that disconnected.
+
+        Args:
+            serial: Device serial number
+        """
+        self.release(serial)
+        if self._health is not None:
+            self._health.forget(serial)
+        if self._preparation is not None:
+            self._preparation.forget(serial)
+        if self._dumpsys_cache is not None:
+            self._dumpsys_cache.forget(serial)
+        if self.telemetry is not None:
+            self.telemetry.forget(serial)
+        if self._artifacts is not None:
+            self._artifacts.forget(serial)
+        from app.automation.timing import timing_profiles
+        from app.automation.ui.bounds import bounds_cache
+        from app.automation.ui.selectors import selector_registry
+
+        selector_registry.forget(serial)
+        bounds_cache.forget(serial)
+        timing_profiles.forget(serial)
+        with self.lock:
+            stream = self.event_streams.pop(serial, None)
+            self.sim_cache.pop(serial, None)
+            self.device_info.pop(serial, None)
+            for key in [key for key in self.launcher_cache if key[0] == serial]:
+                del self.launcher_cache[key]
+        if stream is not None:
+            stream.stop()
+
+    def on_devices_changed(self, callback: Callable[[], None]):
+        """Register a callback run when devices appear or disappear.
+
+        A single ADB server is only polled through get_devices(), so only
+        services that track their servers call it.
+        """
+        self._device_listeners.append(callback)
+
+    def _devices_changed(self):
+        for callback in self._device_listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.exception(f"Device change callback failed: {e}")
+
+    def _load_sim_map(self) -> Dict[str, List[str]]:
+        if self._sim_map is None:
+            self._sim_map = {}
+            if SIM_MAP_PATH:
+                try:
+                    with open(SIM_MAP_PATH) as f:
+                        self._sim_map = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Gagal membaca SIM map {SIM_MAP_PATH}: {e}")
+        return self._sim_map
+
+    def get_sim_numbers(self, serial: str, refresh: bool = False) -> List[str]:
+        """Get the SIM MSISDN(s) of a device, discovered once and cached.
+
+        Numbers from the SIM map file (EXA_SIM_MAP) come first, followed by
+        the ones read from the telephony service.
+
+        Args:
+            serial: Device serial number
+            refresh: Query the device again instead of using the cache
+
+        Returns:
+            List of normalized numbers (08xx), possibly empty
+        """
+        with self.lock:
+            if not refresh and serial in self.sim_cache:
+                return self.sim_cache[serial]
+
+        numbers = [
+            normalize_msisdn(number) for number in self._load_sim_map().get(serial, [])
+        ]
+        device = self.get_device(serial)
+        if device is not None:
+            sdk = device.shell("getprop ro.build.version.sdk").strip()
+            discovered = get_sim_numbers(device, int(sdk) if sdk.isdigit() else 0)
+            numbers += [number for number in discovered if number not in numbers]
+        numbers = [number for number in numbers if number]
+        if not numbers:
+            logger.warning(f"Nomor SIM device {serial} tidak diketahui")
+
+        with self.lock:
+            self.sim_cache[serial] = numbers
+        return numbers
+
+    def prepare_devices(self, serials: Optional[List[str]] = None) -> Dict[str, bool]:
+        """Prepare devices for automation concurrently.
+
+        Turns animations off, keeps the screen on, wakes and unlocks the
+        screen and trims background apps. close() restores the settings.
+
+        Args:
+            serials: Devices to prepare (default: all connected devices)
+
+        Returns:
+            Serial -> True if the device is ready
+        """
+        if serials is None:
+            serials = [device.serial for device in self.get_devices()]
+        return self.preparation.prepare_all(serials)
+
+    def restore_devices(self) -> Dict[str, bool]:
+        """Restore the settings of every prepared device.
+
+        Returns:
+            Serial -> True if restored
+        """
+        return self.preparation.restore_all()
 
     def ensure_adb_running(self) -> bool:
         """
@@ -46,42 +411,52 @@ class DeviceService:
             return True
         except Exception as e:
             logger.warning(f"ADB server tidak berjalan: {e}")
+            return self._start_adb_server()
 
-            # Coba jalankan adb start-server
-            try:
-                import subprocess
-
-                # Coba beberapa kemungkinan path adb
-                adb_paths = [
-                    os.path.join(ANDROID_SDK_PATH, "platform-tools", "adb.exe"),
-                    os.path.join(ANDROID_SDK_PATH, "platform-tools", "adb"),
-                    "adb.exe",  # Coba di PATH
-                    "adb",  # Coba di PATH
-                ]
-
-                for adb_path in adb_paths:
-                    try:
-                        logger.info(f"Mencoba menjalankan: {adb_path} start-server")
-                        result = subprocess.run(
-                            [adb_path, "start-server"],
-                            capture_output=True,
-                            text=True,
-                            check=False,
-                        )
-
-                        if result.returncode == 0:
-                            logger.info("ADB server berhasil dijalankan")
-                            return True
-                    except FileNotFoundError:
-                        continue
-
-                logger.error(
-                    "Gagal menjalankan ADB server - adb executable tidak ditemukan"
-                )
-                return False
-            except Exception as e:
-                logger.error(f"Gagal menjalankan ADB server: {e}")
-                return False
+    def _start_adb_server(self, port: int = ADB_PORT) -> bool:
+        """
+        Menjalankan `adb start-server` lokal untuk port tertentu.
+
+        Args:
+            port: Port ADB server
+
+        Returns:
+            bool: True jika berhasil, False jika gagal
+        """
+        try:
+            import subprocess
+
+            # Coba beberapa kemungkinan path adb
+            adb_paths = [
+                os.path.join(ANDROID_SDK_PATH, "platform-tools", "adb.exe"),
+                os.path.join(ANDROID_SDK_PATH, "platform-tools", "adb"),
+                "adb.exe",  # Coba di PATH
+                "adb",  # Coba di PATH
+            ]
+
+            for adb_path in adb_paths:
+                try:
+                    logger.info(f"Mencoba menjalankan: {adb_path} start-server")
+                    result = subprocess.run(
+                        [adb_path, "-P", str(port), "start-server"],
+                        capture_output=True,
+                        text=True,
+                        check=False,
+                    )
+
+                    if result.returncode == 0:
+                        logger.info("ADB server berhasil dijalankan")
+                        return True
+                except FileNotFoundError:
+                    continue
+
+            logger.error(
+                "Gagal menjalankan ADB server - adb executable tidak ditemukan"
+            )
+            return False
+        except Exception as e:
+            logger.error(f"Gagal menjalankan ADB server: {e}")
+            return False
 
     def get_device(self, serial: str):
         """Get an ADB device by serial number.
@@ -102,6 +477,9 @@ class DeviceService:
     def get_devices(self) -> List[Device]:
         """Get list of connected Android devices.
 
+        Properties and SIM numbers are read once per serial, until forget()
+        or reconnected().
+
         Returns:
             List of Device objects
         """
@@ -115,6 +493,12 @@ class DeviceService:
             adb_devices = self.adb_client.devices()
 
             for device in adb_devices:
+                with self.lock:
+                    known = self.device_info.get(device.serial)
+                if known is not None:
+                    devices.append(replace(known))
+                    continue
+
                 # Create basic device model
                 device_model = Device(
                     serial=device.serial,
@@ -129,6 +513,10 @@ class DeviceService:
                         device_model.model = properties.get("model")
                         device_model.android_version = properties.get("android_version")
                         device_model.properties = properties
+                    device_model.sim_numbers = self.get_sim_numbers(device.serial)
+                    if "error" not in properties:
+                        with self.lock:
+                            self.device_info[device.serial] = replace(device_model)
                 except Exception as e:
                     device_model.error = str(e)
                     logger.exception(
@@ -154,7 +542,7 @@ class DeviceService:
         with self.lock:  # Thread-safe access to device cache
             if serial not in self.device_cache:
                 try:
-                    self.device_cache[serial] = u2.connect(serial)
+                    self.device_cache[serial] = self._connect_ui(serial)
                     logger.info(f"Connected to device {serial} with uiautomator2")
                 except Exception as e:
                     logger.exception(
@@ -164,21 +552,161 @@ class DeviceService:
             return self.device_cache[serial]
 
     def open_app(self, serial: str, package_name: str) -> bool:
-        """Open an app on a specific device.
+        """Open an app on a specific device (see launch_app).
 
         Args:
             serial: Device serial number
             package_name: Package name of the app
 
         Returns:
-            True if successful, False otherwise
+            True if the app is in front, False otherwise
+        """
+        return self.launch_app(serial, package_name).ok
+
+    def get_launcher_activity(self, serial: str, package_name: str) -> Optional[str]:
+        """Resolve the launcher activity of a package once per device.
+
+        Args:
+            serial: Device serial number
+            package_name: Package name of the app
+
+        Returns:
+            Component name, or None if it cannot be resolved
+        """
+        key = (serial, package_name)
+        with self.lock:
+            if key in self.launcher_cache:
+                return self.launcher_cache[key]
+        device = self.get_device(serial)
+        component = resolve_launcher_activity(device, package_name) if device else None
+        if component:
+            with self.lock:
+                self.launcher_cache[key] = component
+        return component
+
+    def is_app_in_front(self, serial: str, package_name: str) -> bool:
+        """Check the focused window with one dumpsys query.
+
+        Args:
+            serial: Device serial number
+            package_name: Package name of the app
+
+        Returns:
+            True if the app's window has focus
+        """
+        device = self.get_device(serial)
+        return device is not None and get_foreground_package(device) == package_name
+
+    def launch_app(
+        self, serial: str, package_name: str, mode: Optional[str] = None
+    ) -> LaunchResult:
+        """Launch an app and wait until its first frame is drawn.
+
+        Uses `am start -W` on the cached launcher activity, so no sleep is
+        needed afterwards. Without a mode the launch is skipped when the app
+        is already in front. Falls back to monkey when the launcher activity
+        cannot be resolved.
+
+        Args:
+            serial: Device serial number
+            package_name: Package name of the app
+            mode: None (skip if in front), "cold", "warm" or "hot"
+
+        Returns:
+            LaunchResult with TotalTime/WaitTime reported by Android
         """
         device = self.get_device(serial)
         if not device:
             logger.error(f"Device {serial} not found")
-            return False
+            return LaunchResult(False, mode or "auto", error="Device not found")
+
+        if mode is None:
+            # Only the cheap query counts as RPC latency; launches take seconds
+            with self.timed(serial):
+                in_front = get_foreground_package(device) == package_name
+            if in_front:
+                logger.info(f"{package_name} already in front on {serial}")
+                return LaunchResult(True, "auto", skipped=True)
+
+        component = self.get_launcher_activity(serial, package_name)
+        if component is None:
+            logger.warning(f"Launcher activity of {package_name} not resolved")
+            ok = open_apk(device, package_name)
+            self._launched(serial, package_name)
+            return LaunchResult(ok, "monkey", error=None if ok else "monkey failed")
+        result = start_activity(device, component, mode or HOT)
+        self._launched(serial, package_name)
+        return result
+
+    def _launched(self, serial: str, package_name: str):
+        from app.automation.ui.selectors import selector_registry
+
+        # Cached sections an app launch makes stale; none before the first read
+        if self._dumpsys_cache is not None:
+            from app.devices.dumpsys import (
+                ACTIVITY_TOP,
+                GFXINFO,
+                MEMINFO,
+                PACKAGE,
+                WINDOW,
+            )
+
+            self._dumpsys_cache.invalidate(
+                serial, WINDOW, ACTIVITY_TOP, MEMINFO, GFXINFO, PACKAGE
+            )
+        # The app may have been updated since its version was read
+        if package_name == selector_registry.package:
+            selector_registry.forget(serial)
+
+    def dumpsys(
+        self,
+        serial: str,
+        section: str,
+        package_name: Optional[str] = None,
+        max_age: Optional[float] = None,
+    ):
+        """Read one parsed dumpsys section, cached per section TTL.
 
-        return open_apk(device, package_name)
+        Args:
+            serial: Device serial number
+            section: "battery", "window", "activity_top", "package", "meminfo"
+                or "gfxinfo"
+            package_name: Package for "package", "meminfo" and "gfxinfo"
+                (default app)
+            max_age: Accept a cached result at most this old (0: always read)
+
+        Returns:
+            Typed result (BatteryInfo, WindowFocus, ...), or None on error
+        """
+        try:
+            result = self.dumpsys_cache.get(serial, section, package_name, max_age)
+        except Exception as e:
+            logger.exception(f"Error reading dumpsys {section} of {serial}: {e}")
+            return None
+        if result is None:
+            logger.error(f"Device {serial} not found")
+        return result
+
+    def screencap(self, serial: str) -> Optional["RawFrame"]:
+        """Grab the screen as raw pixels, skipping PNG encoding on the device.
+
+        Args:
+            serial: Device serial number
+
+        Returns:
+            RawFrame, or None on error
+        """
+        if not self.get_device(serial):
+            logger.error(f"Device {serial} not found")
+            return None
+        from app.devices.screencap import parse_screencap
+
+        try:
+            with self.timed(serial):
+                return parse_screencap(self._exec_out(serial, "screencap"))
+        except Exception as e:
+            logger.warning(f"Error reading screencap of {serial}: {e}")
+            return None
 
     def get_battery_info(self, serial: str) -> Dict[str, str]:
         """Get battery information for a device.
@@ -189,12 +717,16 @@ class DeviceService:
         Returns:
             Battery information
         """
-        device = self.get_device(serial)
-        if not device:
+        if not self.get_device(serial):
             logger.error(f"Device {serial} not found")
             return {"error": "Device not found"}
+        from app.devices.dumpsys import BATTERY
 
-        return get_battery_info(device)
+        try:
+            return self.dumpsys_cache.get(serial, BATTERY).values
+        except Exception as e:
+            logger.exception(f"Error getting battery info for device {serial}: {e}")
+            return {"error": str(e)}
 
     def press_key(self, serial: str, keycode: int) -> bool:
         """Press a key on a device.
@@ -211,7 +743,8 @@ class DeviceService:
             logger.error(f"Device {serial} not found")
             return False
 
-        return press_key(device, keycode)
+        with self.timed(serial):
+            return press_key(device, keycode)
 
     def execute_action(self, serial: str, action: str, *args, **kwargs):
         """Execute an action on a specific device.
@@ -238,11 +771,11 @@ class DeviceService:
         elif action == "uninstall":
             return device.uninstall(*args, **kwargs)
         elif action == "open_app":
-            return open_apk(device, args[0])
+            return self.open_app(serial, args[0])
         elif action == "press_key":
             return press_key(device, args[0])
         elif action == "get_battery_info":
-            return get_battery_info(device)
+            return self.get_battery_info(serial)
 
         # UI Automator actions
         ui_device = self.get_ui_device(serial)
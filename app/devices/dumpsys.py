@@ -0,0 +1,454 @@
+# Module for typed dumpsys parsers that stop early and a per-device result cache
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from app.config.settings import DEFAULT_PACKAGE
+
+# Sections
+BATTERY = "battery"
+WINDOW = "window"
+ACTIVITY_TOP = "activity_top"
+PACKAGE = "package"
+MEMINFO = "meminfo"
+GFXINFO = "gfxinfo"
+
+# Shell command per section; package and meminfo take a package name
+SECTION_COMMANDS = {
+    BATTERY: "dumpsys battery",
+    WINDOW: "dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'",
+    ACTIVITY_TOP: "dumpsys activity top | grep -E '^ *(TASK|ACTIVITY) '",
+    PACKAGE: "dumpsys package {arg}",
+    MEMINFO: "dumpsys meminfo {arg}",
+    GFXINFO: "dumpsys gfxinfo {arg}",
+}
+# Seconds a parsed section stays valid: focus changes with every screen,
+# battery drifts slowly and the installed version only changes on install
+SECTION_TTLS = {
+    BATTERY: 30.0,
+    WINDOW: 0.5,
+    ACTIVITY_TOP: 0.5,
+    PACKAGE: 300.0,
+    MEMINFO: 5.0,
+    GFXINFO: 1.0,
+}
+_PACKAGE_SECTIONS = (PACKAGE, MEMINFO, GFXINFO)
+
+# "mCurrentFocus=Window{1c2 u0 com.pkg/com.pkg.Main}", "mFocusedApp=ActivityRecord{..."
+_FOCUS = re.compile(r"(mCurrentFocus|mFocusedApp)=.*?\s([\w.]+)/([\w.$]+)")
+# "TASK com.pkg id=12 userId=0" (Android 12+: "TASK 10140:com.pkg id=12 ...")
+_TASK = re.compile(r"^\s*TASK (?:\d+:)?([\w.]+) id=(\d+)")
+# "ACTIVITY com.pkg/.MainActivity 8a2f8e5 pid=4321"
+_ACTIVITY = re.compile(r"^\s*ACTIVITY ([\w.]+)/([\w.$]+) \w+ pid=(\d+|\(not running\))")
+_MEMINFO_HEADER = re.compile(r"\*\* MEMINFO in pid (\d+) \[([\w.:]+)\] \*\*")
+# "Java Heap:    12345" and "TOTAL PSS:   150000   TOTAL RSS:   230000"
+_SUMMARY_VALUE = re.compile(r"([A-Za-z][A-Za-z ]*?):\s+([\d,]+)")
+_GFXINFO_HEADER = re.compile(r"\*\* Graphics info for pid (\d+) \[([\w.:]+)\] \*\*")
+# Frame time percentiles reported by gfxinfo
+PERCENTILES = (50, 90, 95, 99)
+_PLUGGED = (
+    ("AC powered", "ac"),
+    ("USB powered", "usb"),
+    ("Wireless powered", "wireless"),
+)
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    value = value.replace(",", "")
+    if value.lstrip("-").isdigit():
+        return int(value)
+    return None
+
+
+@dataclass
+class BatteryInfo:
+    """`dumpsys battery`."""
+
+    level: Optional[int] = None
+    scale: Optional[int] = None
+    status: Optional[int] = None  # BatteryManager.BATTERY_STATUS_*
+    health: Optional[int] = None  # BatteryManager.BATTERY_HEALTH_*
+    plugged: str = "none"  # "ac", "usb", "wireless" or "none"
+    temperature: Optional[float] = None  # degrees Celsius
+    voltage: Optional[int] = None  # mV
+    present: bool = False
+    values: Dict[str, str] = field(default_factory=dict)  # every "key: value"
+
+    @property
+    def percent(self) -> Optional[float]:
+        if self.level is None or not self.scale:
+            return self.level
+        return self.level * 100 / self.scale
+
+
+@dataclass
+class WindowFocus:
+    """Focused window and focused app from `dumpsys window`."""
+
+    window_package: Optional[str] = None
+    window_activity: Optional[str] = None
+    app_package: Optional[str] = None
+    app_activity: Optional[str] = None
+
+    @property
+    def package(self) -> Optional[str]:
+        """Package in front: the focused window, else the focused app."""
+        return self.window_package or self.app_package
+
+
+@dataclass
+class TopActivity:
+    """Resumed activity from `dumpsys activity top`."""
+
+    package: Optional[str] = None
+    activity: Optional[str] = None
+    pid: Optional[int] = None
+    task_id: Optional[int] = None
+
+
+@dataclass
+class PackageInfo:
+    """Installed package details from `dumpsys package <package>`."""
+
+    package: str = ""
+    found: bool = False
+    version_name: Optional[str] = None
+    version_code: Optional[int] = None
+    min_sdk: Optional[int] = None
+    target_sdk: Optional[int] = None
+    first_install_time: Optional[str] = None
+    last_update_time: Optional[str] = None
+
+
+@dataclass
+class MemInfo:
+    """Process memory from `dumpsys meminfo <package>` (values in KB)."""
+
+    package: str = ""
+    pid: Optional[int] = None
+    total_pss: Optional[int] = None
+    total_rss: Optional[int] = None
+    summary: Dict[str, int] = field(default_factory=dict)  # App Summary rows
+
+
+@dataclass
+class GfxInfo:
+    """Frame statistics of a process from `dumpsys gfxinfo <package>`."""
+
+    package: str = ""
+    pid: Optional[int] = None
+    total_frames: int = 0
+    janky_frames: int = 0
+    percentiles: Dict[int, int] = field(default_factory=dict)  # ms, see PERCENTILES
+    counters: Dict[str, int] = field(default_factory=dict)  # "Slow UI thread", ...
+    histogram: Dict[int, int] = field(default_factory=dict)  # frame ms -> frames
+
+    @property
+    def janky_percent(self) -> Optional[float]:
+        if not self.total_frames:
+            return None
+        return 100 * self.janky_frames / self.total_frames
+
+    def since(self, earlier: "GfxInfo") -> "GfxInfo":
+        """
+        Frames rendered after `earlier` was taken.
+
+        Counters only ever grow within one process, so the difference of two
+        snapshots covers the frames in between; percentiles are recomputed
+        from the histogram difference. A restarted process (other pid or
+        fewer frames) starts from zero, so `self` is returned as is.
+        """
+        if earlier.pid != self.pid or earlier.total_frames > self.total_frames:
+            return self
+        histogram = {
+            ms: count - earlier.histogram.get(ms, 0)
+            for ms, count in self.histogram.items()
+        }
+        histogram = {ms: count for ms, count in histogram.items() if count > 0}
+        return GfxInfo(
+            package=self.package,
+            pid=self.pid,
+            total_frames=self.total_frames - earlier.total_frames,
+            janky_frames=self.janky_frames - earlier.janky_frames,
+            percentiles=histogram_percentiles(histogram),
+            counters={
+                key: value - earlier.counters.get(key, 0)
+                for key, value in self.counters.items()
+            },
+            histogram=histogram,
+        )
+
+
+def histogram_percentiles(histogram: Dict[int, int]) -> Dict[int, int]:
+    """PERCENTILES of a frame-time histogram, the way gfxinfo computes them."""
+    total = sum(histogram.values())
+    percentiles = {}
+    if not total:
+        return percentiles
+    buckets = sorted(histogram.items())
+    for percentile in PERCENTILES:
+        target = total * percentile / 100
+        seen = 0
+        for ms, count in buckets:
+            seen += count
+            if seen >= target:
+                percentiles[percentile] = ms
+                break
+    return percentiles
+
+
+def parse_battery(lines: Iterable[str]) -> BatteryInfo:
+    info = BatteryInfo()
+    values = info.values
+    for line in lines:
+        key, sep, value = line.partition(":")
+        if sep:
+            values[key.strip()] = value.strip()
+    info.level = _int(values.get("level"))
+    info.scale = _int(values.get("scale"))
+    info.status = _int(values.get("status"))
+    info.health = _int(values.get("health"))
+    info.voltage = _int(values.get("voltage"))
+    temperature = _int(values.get("temperature"))
+    info.temperature = temperature / 10 if temperature is not None else None
+    info.present = values.get("present") == "true"
+    for key, name in _PLUGGED:
+        if values.get(key) == "true":
+            info.plugged = name
+            break
+    return info
+
+
+def parse_window(lines: Iterable[str]) -> WindowFocus:
+    focus = WindowFocus()
+    for line in lines:
+        if "mCurrentFocus" not in line and "mFocusedApp" not in line:
+            continue
+        match = _FOCUS.search(line)
+        if match is None:
+            continue
+        name, package, activity = match.groups()
+        if name == "mCurrentFocus" and focus.window_package is None:
+            focus.window_package, focus.window_activity = package, activity
+        elif name == "mFocusedApp" and focus.app_package is None:
+            focus.app_package, focus.app_activity = package, activity
+        if focus.window_package and focus.app_package:
+            break
+    return focus
+
+
+def parse_activity_top(lines: Iterable[str]) -> TopActivity:
+    # Tasks are listed bottom to top; the last ACTIVITY is the resumed one
+    top = TopActivity()
+    task_id = None
+    for line in lines:
+        if "TASK " in line:
+            match = _TASK.match(line)
+            if match:
+                task_id = int(match.group(2))
+            continue
+        if "ACTIVITY " in line:
+            match = _ACTIVITY.match(line)
+            if match:
+                package, activity, pid = match.groups()
+                top = TopActivity(package, activity, _int(pid), task_id)
+    return top
+
+
+def parse_package(lines: Iterable[str], package: str = DEFAULT_PACKAGE) -> PackageInfo:
+    info = PackageInfo(package)
+    header = f"Package [{package}]"
+    for line in lines:
+        if not info.found:
+            info.found = header in line and line.lstrip().startswith(header)
+            continue
+        stripped = line.strip()
+        if stripped.startswith("Package ["):
+            break  # next package (e.g. the hidden system copy)
+        if stripped.startswith("versionCode="):
+            for item in stripped.split():
+                key, _, value = item.partition("=")
+                if key == "versionCode":
+                    info.version_code = _int(value)
+                elif key == "minSdk":
+                    info.min_sdk = _int(value)
+                elif key == "targetSdk":
+                    info.target_sdk = _int(value)
+        elif stripped.startswith("versionName="):
+            info.version_name = stripped.partition("=")[2]
+        elif stripped.startswith("firstInstallTime="):
+            info.first_install_time = stripped.partition("=")[2]
+        elif stripped.startswith("lastUpdateTime="):
+            info.last_update_time = stripped.partition("=")[2]
+            break  # the remaining fields are user state and permissions
+    return info
+
+
+def parse_meminfo(lines: Iterable[str], package: str = DEFAULT_PACKAGE) -> MemInfo:
+    info = MemInfo(package)
+    in_summary = False
+    pss_end = None  # column where the Pss(KB) values of App Summary end
+    for line in lines:
+        if info.pid is None:
+            match = "MEMINFO" in line and _MEMINFO_HEADER.search(line)
+            if match:
+                info.pid = int(match.group(1))
+                info.package = match.group(2)
+            continue
+        stripped = line.strip()
+        if stripped == "App Summary":
+            in_summary = True
+            continue
+        if in_summary:
+            if pss_end is None and "Pss(KB)" in line:
+                pss_end = line.index("Pss(KB)") + len("Pss(KB)")
+                continue
+            matches = list(_SUMMARY_VALUE.finditer(line))
+            for match in matches:
+                key, value = match.group(1).strip(), _int(match.group(2))
+                if key in ("TOTAL", "TOTAL PSS"):
+                    info.total_pss = value
+                elif key == "TOTAL RSS":
+                    info.total_rss = value
+                elif key.startswith("TOTAL"):
+                    continue
+                elif pss_end is None or match.end(2) <= pss_end + 1:
+                    info.summary[key] = value  # rows with only an Rss value skipped
+            if matches and matches[0].group(1).strip().startswith("TOTAL"):
+                break  # Objects, SQL and Assets sections follow
+        elif stripped.startswith("TOTAL ") and info.total_pss is None:
+            # Table row: "TOTAL   150000   120000 ..." (PSS total first)
+            info.total_pss = _int(stripped.split()[1])
+    return info
+
+
+def parse_gfxinfo(lines: Iterable[str], package: str = DEFAULT_PACKAGE) -> GfxInfo:
+    info = GfxInfo(package)
+    for line in lines:
+        if info.pid is None:
+            match = "Graphics info" in line and _GFXINFO_HEADER.search(line)
+            if match:
+                info.pid = int(match.group(1))
+                info.package = match.group(2)
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        key = key.strip()
+        if key == "Total frames rendered":
+            info.total_frames = _int(value.strip()) or 0
+        elif key == "Janky frames":
+            info.janky_frames = _int(value.split()[0]) or 0
+        elif key.endswith("th percentile") and not key.startswith("GPU"):
+            info.percentiles[int(key.split("th")[0])] = _int(
+                value.strip().removesuffix("ms")
+            )
+        elif key.startswith("Number "):
+            info.counters[key[7:]] = _int(value.strip()) or 0
+        elif key == "HISTOGRAM":
+            for bucket in value.split():
+                if not bucket.endswith("=0"):  # most of the ~150 buckets
+                    ms, _, count = bucket.partition("ms=")
+                    info.histogram[int(ms)] = int(count)
+            break  # GPU histogram and per-window profile data follow
+    return info
+
+
+PARSERS: Dict[str, Callable] = {
+    BATTERY: parse_battery,
+    WINDOW: parse_window,
+    ACTIVITY_TOP: parse_activity_top,
+    PACKAGE: parse_package,
+    MEMINFO: parse_meminfo,
+    GFXINFO: parse_gfxinfo,
+}
+
+
+def parse_section(section: str, output: str, arg: Optional[str] = None):
+    """Parse the shell output of one section."""
+    lines = output.splitlines()
+    if section in _PACKAGE_SECTIONS:
+        return PARSERS[section](lines, arg or DEFAULT_PACKAGE)
+    return PARSERS[section](lines)
+
+
+class DumpsysCache:
+    """
+    Parsed dumpsys sections per device, each reused for its section's TTL.
+
+    Callers that just changed the device state (e.g. launched an app)
+    invalidate the affected sections; everything else reads through.
+    """
+
+    def __init__(self, device_service, ttls: Optional[Dict[str, float]] = None):
+        """Initialize the cache.
+
+        Args:
+            device_service: DeviceService used to reach the devices
+            ttls: Seconds per section (default: SECTION_TTLS)
+        """
+        self.device_service = device_service
+        self.ttls = dict(SECTION_TTLS, **(ttls or {}))
+        self.entries: Dict[Tuple[str, str, Optional[str]], Tuple[float, object]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(
+        self,
+        serial: str,
+        section: str,
+        arg: Optional[str] = None,
+        max_age: Optional[float] = None,
+    ):
+        """
+        Parsed section of one device, from cache when fresh enough.
+
+        Args:
+            serial: Device serial number
+            section: BATTERY, WINDOW, ACTIVITY_TOP, PACKAGE, MEMINFO or GFXINFO
+            arg: Package name for PACKAGE, MEMINFO and GFXINFO
+                (default: DEFAULT_PACKAGE)
+            max_age: Override the section TTL (0 forces a fresh read)
+
+        Returns:
+            The section's dataclass, or None if the device is not connected
+
+        Raises:
+            Exception: Errors of the shell command propagate
+        """
+        if section not in SECTION_COMMANDS:
+            raise ValueError(f"Unknown dumpsys section: {section}")
+        arg = (arg or DEFAULT_PACKAGE) if section in _PACKAGE_SECTIONS else None
+        key = (serial, section, arg)
+        ttl = self.ttls[section] if max_age is None else max_age
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        device = self.device_service.get_device(serial)
+        if device is None:
+            return None
+        with self.device_service.timed(serial):
+            output = device.shell(SECTION_COMMANDS[section].format(arg=arg))
+        result = parse_section(section, output, arg)
+        with self.lock:
+            self.entries[key] = (time.monotonic(), result)
+        return result
+
+    def invalidate(self, serial: str, *sections: str):
+        """Drop cached sections of a device (all sections if none given)."""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == serial]:
+                if not sections or key[1] in sections:
+                    del self.entries[key]
+
+    def forget(self, serial: str):
+        self.invalidate(serial)
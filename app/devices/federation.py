@@ -0,0 +1,407 @@
+# Module for one DeviceService over the devices of several ADB servers
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.config import ADB_HOST, ADB_PORT
+from app.config.settings import (
+    ADB_RECONNECT_BACKOFF,
+    ADB_RECONNECT_BACKOFF_MAX,
+    ADB_SERVERS,
+)
+from app.devices.device_service import DeviceService
+
+logger = logging.getLogger(__name__)
+
+# Hosts where a server that is down can be started with `adb start-server`
+LOCAL_HOSTS = ("127.0.0.1", "localhost")
+# Seconds a server gets to accept the track-devices connection
+CONNECT_TIMEOUT = 5.0
+# Seconds a device listing waits for the servers; slower ones are skipped
+# for that listing instead of holding up the devices of the others
+LIST_TIMEOUT = 10.0
+
+
+def parse_adb_servers(text: str = ADB_SERVERS) -> List[Tuple[str, int]]:
+    """
+    (host, port) of each server in a comma separated "host:port" list; a
+    bare host uses ADB_PORT. An empty list means the single default server.
+    """
+    servers = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, separator, port = item.partition(":")
+        if not host or (separator and not port.isdigit()):
+            raise ValueError(f"Invalid ADB server address: {item}")
+        servers.append((host, int(port) if separator else ADB_PORT))
+    return servers or [(ADB_HOST, ADB_PORT)]
+
+
+def create_live_device_service() -> DeviceService:
+    """
+    DeviceService for the configured ADB servers: federated when ADB_SERVERS
+    lists other servers than the default one, plain otherwise.
+    """
+    servers = parse_adb_servers()
+    if servers != [(ADB_HOST, ADB_PORT)]:
+        return FederatedDeviceService(servers)
+    return DeviceService()
+
+
+class TrackDevicesStream:
+    """Device lists pushed by an ADB server over `host:track-devices` (ppadb)."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.file = connection.socket.makefile("rb")
+
+    def read(self) -> Optional[Dict[str, str]]:
+        """Next full device list (serial -> state), None once the server closes it."""
+        header = self.file.read(4)
+        if len(header) < 4:
+            return None
+        payload = self.file.read(int(header, 16)).decode("utf-8", errors="replace")
+        devices = {}
+        for line in payload.splitlines():
+            serial, _, state = line.partition("\t")
+            if serial:
+                devices[serial] = state.strip()
+        return devices
+
+    def close(self):
+        import socket
+
+        try:
+            # Unblocks a read() waiting in the tracker thread
+            self.connection.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.file.close()
+        self.connection.close()
+
+
+class AdbServer:
+    """One ADB server of a federation: its client, devices and tracker."""
+
+    def __init__(self, host: str, port: int, client):
+        self.host = host
+        self.port = port
+        self.address = f"{host}:{port}"
+        self.client = client  # ppadb Client of this server only
+        self.lock = threading.Lock()
+        self.serials: Set[str] = set()  # devices online on this server
+        self.devices: Dict[str, object] = {}  # serial -> ADB device handle
+        self.ui_client = None  # adbutils client for uiautomator2, on first use
+        self.available = True  # until a call or the tracker finds it down
+        self.tracking = False  # track-devices stream open
+        self.lost = 0  # times the server went away
+        self.stream = None
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def local(self) -> bool:
+        return self.host in LOCAL_HOSTS
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                "available": self.available,
+                "tracking": self.tracking,
+                "devices": len(self.serials),
+                "lost": self.lost,
+            }
+
+
+class FederatedAdbClient:
+    """ppadb Client surface that routes each call to the owning server."""
+
+    def __init__(self, federation: "FederatedDeviceService"):
+        self.federation = federation
+
+    def version(self) -> int:
+        """Version of the first server that answers."""
+        error = None
+        for server in self.federation.available_servers():
+            try:
+                return server.client.version()
+            except Exception as e:
+                self.federation._server_down(server, e)
+                error = e
+        raise ConnectionError(f"No ADB server reachable: {error}")
+
+    def devices(self) -> list:
+        return self.federation.list_devices()
+
+    def device(self, serial: str):
+        return self.federation.route(serial)
+
+
+class FederatedDeviceService(DeviceService):
+    """
+    DeviceService over the devices of several ADB servers (e.g. one per USB
+    host), behind the same get_devices/get_ui_device/execute_action API.
+
+    Every server has its own ppadb client, cached device handles and
+    uiautomator2 transport, plus a thread reading its `host:track-devices`
+    stream. Calls for a device go to the server that reported it last.
+    When a server goes away (its stream closes or a call fails), only its
+    devices are dropped; the tracker reconnects with backoff and the
+    devices come back with the next list it pushes.
+    """
+
+    def __init__(self, servers: Optional[List[Tuple[str, int]]] = None):
+        """Initialize the service and start tracking every server.
+
+        Args:
+            servers: (host, port) of each ADB server (default: ADB_SERVERS)
+        """
+        self.servers: Dict[str, AdbServer] = {}
+        self.owners: Dict[str, AdbServer] = {}  # serial -> server reporting it
+        self.routes_lock = threading.Lock()
+        self._addresses = servers or parse_adb_servers()
+        self._stop = threading.Event()
+        super().__init__(*self._addresses[0])
+        for server in self.servers.values():
+            server.thread = threading.Thread(
+                target=self._track,
+                args=(server,),
+                name=f"adb-track-{server.address}",
+                daemon=True,
+            )
+            server.thread.start()
+
+    def _create_adb_client(self, host: str, port: int):
+        for server_host, server_port in self._addresses:
+            server = AdbServer(
+                server_host,
+                server_port,
+                self._create_server_client(server_host, server_port),
+            )
+            self.servers[server.address] = server
+        return FederatedAdbClient(self)
+
+    def _create_server_client(self, host: str, port: int):
+        """Create the ADB client of one server.
+
+        Subclasses override this to swap the transport (e.g. simulation).
+        """
+        return super()._create_adb_client(host, port)
+
+    def _open_track_stream(self, server: AdbServer):
+        """Open the `host:track-devices` stream of a server.
+
+        The stream has read() (returning the next device list, None at the
+        end) and close().
+        Subclasses override this to swap the transport (e.g. simulation).
+        """
+        connection = server.client.create_connection(timeout=CONNECT_TIMEOUT)
+        connection.send("host:track-devices")
+        connection.socket.settimeout(None)  # lists arrive only on changes
+        return TrackDevicesStream(connection)
+
+    def _connect_ui(self, serial: str):
+        server = self.owner(serial)
+        if server is None:
+            raise ConnectionError(f"Device {serial} not found on any ADB server")
+        return self._connect_server_ui(server, serial)
+
+    def _connect_server_ui(self, server: AdbServer, serial: str):
+        """Create a uiautomator2 connection through the device's own server.
+
+        Subclasses override this to swap the transport (e.g. simulation).
+        """
+        import adbutils
+        import uiautomator2 as u2
+
+        with server.lock:
+            if server.ui_client is None:
+                server.ui_client = adbutils.AdbClient(
+                    host=server.host, port=server.port
+                )
+            client = server.ui_client
+        return u2.connect(client.device(serial))
+
+    def _track(self, server: AdbServer):
+        backoff = ADB_RECONNECT_BACKOFF
+        while not self._stop.is_set():
+            try:
+                stream = self._open_track_stream(server)
+            except Exception as e:
+                self._server_down(server, e)
+            else:
+                with server.lock:
+                    server.stream = stream
+                    server.tracking = True
+                backoff = ADB_RECONNECT_BACKOFF
+                try:
+                    while True:
+                        devices = stream.read()
+                        if devices is None:
+                            raise ConnectionError("track-devices closed by server")
+                        online = [s for s, st in devices.items() if st == "device"]
+                        self._update(server, dict.fromkeys(online))
+                except Exception as e:
+                    if not self._stop.is_set():
+                        self._server_down(server, e)
+                finally:
+                    with server.lock:
+                        server.stream = None
+                        server.tracking = False
+                    stream.close()
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, ADB_RECONNECT_BACKOFF_MAX)
+
+    def _update(self, server: AdbServer, devices: Dict[str, object]):
+        """Take a server's current devices (serial -> handle or None)."""
+        with server.lock:
+            returned = not server.available
+            server.available = True
+            added = devices.keys() - server.serials
+            removed = server.serials - devices.keys()
+            server.serials = set(devices)
+            for serial in removed:
+                server.devices.pop(serial, None)
+            for serial, handle in devices.items():
+                if handle is not None:
+                    server.devices[serial] = handle
+        with self.routes_lock:
+            for serial in added:
+                self.owners[serial] = server
+            # A device that moved to another server already belongs to it
+            removed = [s for s in removed if self.owners.get(s) is server]
+            for serial in removed:
+                del self.owners[serial]
+        if returned:
+            logger.info(f"ADB server {server.address} tersambung kembali")
+        for serial in added:
+            self.reconnected(serial)
+        for serial in removed:
+            self.release(serial)
+        if returned or added or removed:
+            self._devices_changed()
+
+    def _server_down(self, server: AdbServer, error: Exception):
+        """Drop the devices of a server that went away; the others keep running."""
+        with server.lock:
+            was_available = server.available
+            server.available = False
+            server.serials = set()
+            server.devices.clear()
+            server.ui_client = None
+            if was_available:
+                server.lost += 1
+        with self.routes_lock:
+            lost = [s for s, owner in self.owners.items() if owner is server]
+            for serial in lost:
+                del self.owners[serial]
+        if not was_available:
+            logger.debug(f"ADB server {server.address} masih terputus: {error}")
+            return
+        logger.error(
+            f"ADB server {server.address} terputus ({error}), "
+            f"{len(lost)} device dilepas"
+        )
+        for serial in lost:
+            self.release(serial)
+        self._devices_changed()
+
+    def available_servers(self) -> List[AdbServer]:
+        return [server for server in self.servers.values() if server.available]
+
+    def _list_server(self, server: AdbServer) -> list:
+        try:
+            devices = server.client.devices()
+        except Exception as e:
+            self._server_down(server, e)
+            return []
+        self._update(server, {device.serial: device for device in devices})
+        return devices
+
+    def list_devices(self) -> list:
+        """ADB device handles of every available server, listed concurrently."""
+        servers = self.available_servers()
+        if not servers:
+            return []
+        executor = ThreadPoolExecutor(
+            max_workers=len(servers), thread_name_prefix="adb-list"
+        )
+        futures = {executor.submit(self._list_server, s): s for s in servers}
+        done, pending = wait(futures, timeout=LIST_TIMEOUT)
+        executor.shutdown(wait=False)
+        for future in pending:
+            logger.warning(f"ADB server {futures[future].address} lambat, dilewati")
+        # In configuration order, so the device list stays stable
+        return [
+            device
+            for future, server in futures.items()
+            if future in done
+            for device in future.result()
+        ]
+
+    def owner(self, serial: str) -> Optional[AdbServer]:
+        """The server a device is on, listing the servers if it is not known yet."""
+        with self.routes_lock:
+            server = self.owners.get(serial)
+        if server is None:
+            self.list_devices()
+            with self.routes_lock:
+                server = self.owners.get(serial)
+        return server
+
+    def route(self, serial: str):
+        """ADB device handle from the server that owns the device, or None."""
+        server = self.owner(serial)
+        if server is None:
+            return None
+        with server.lock:
+            device = server.devices.get(serial)
+        if device is not None:
+            return device
+        try:
+            device = server.client.device(serial)
+        except Exception as e:
+            self._server_down(server, e)
+            return None
+        if device is not None:
+            with server.lock:
+                if serial in server.serials:
+                    server.devices[serial] = device
+        return device
+
+    def server_status(self) -> Dict[str, dict]:
+        """Per server address: availability, tracker state and device count."""
+        return {address: server.status() for address, server in self.servers.items()}
+
+    def ensure_adb_running(self) -> bool:
+        """
+        Memastikan minimal satu ADB server berjalan. Server lokal yang terputus
+        dicoba dijalankan; server remote disambung ulang oleh tracker-nya.
+
+        Returns:
+            bool: True jika ada server yang berjalan, False jika tidak ada
+        """
+        for server in self.servers.values():
+            if not server.available and server.local:
+                if self._start_adb_server(server.port):
+                    with server.lock:
+                        server.available = True
+        if self.available_servers():
+            return True
+        logger.error("Tidak ada ADB server yang berjalan")
+        return False
+
+    def close(self):
+        """Stop the trackers, then release connections like DeviceService."""
+        self._stop.set()
+        for server in self.servers.values():
+            with server.lock:
+                stream = server.stream
+            if stream is not None:
+                stream.close()
+        for server in self.servers.values():
+            if server.thread is not None:
+                server.thread.join(timeout=CONNECT_TIMEOUT)
+        super().close()
@@ -0,0 +1,333 @@
+# Module for per-device health tracking, quarantine and recovery
+import logging
+import statistics
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+
+from app.config.settings import (
+    DEFAULT_PACKAGE,
+    HEALTH_FAILURE_THRESHOLD,
+    HEALTH_LATENCY_THRESHOLD,
+    HEALTH_RECOVERY_BACKOFF,
+    HEALTH_RECOVERY_BACKOFF_MAX,
+)
+from app.devices.command import COLD
+
+logger = logging.getLogger(__name__)
+
+HEALTHY = "healthy"
+QUARANTINED = "quarantined"
+PROBATION = "probation"  # recovered, the next run decides
+
+# Error classes that mean the device connection itself is broken
+IMMEDIATE_QUARANTINE = {
+    "ConnectionError",
+    "ConnectionRefusedError",
+    "ConnectionResetError",
+    "ConnectError",
+    "GatewayError",
+    "UiAutomationNotConnectedError",
+}
+
+# Substrings of action error logs mapped to an error class
+_LOG_ERROR_CLASSES = (
+    ("tidak terbuka", "app_not_open"),
+    ("tidak ditemukan", "element_missing"),
+    ("tidak muncul", "element_missing"),
+    ("timeout", "timeout"),
+    ("tidak enabled", "element_disabled"),
+    ("otp", "otp_rejected"),
+)
+
+# RPC latency samples kept per device
+LATENCY_WINDOW = 20
+
+
+@dataclass
+class DeviceHealth:
+    """Health counters of one device."""
+
+    serial: str
+    state: str = HEALTHY
+    consecutive_failures: int = 0
+    successes: int = 0
+    failures: int = 0
+    error_classes: Counter = field(default_factory=Counter)
+    latencies: Deque[float] = field(
+        default_factory=lambda: deque(maxlen=LATENCY_WINDOW)
+    )
+    reason: Optional[str] = None
+    quarantined_at: Optional[float] = None
+    recoveries: int = 0
+    recovery_attempts: int = 0
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Median of the recent RPC latencies (seconds)."""
+        return statistics.median(self.latencies) if self.latencies else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "serial": self.serial,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "error_classes": dict(self.error_classes),
+            "latency": self.latency,
+            "reason": self.reason,
+            "quarantined_at": self.quarantined_at,
+            "recoveries": self.recoveries,
+            "recovery_attempts": self.recovery_attempts,
+        }
+
+
+def classify_log_error(message: str) -> str:
+    """Map an action error log message to a coarse error class."""
+    lowered = message.lower()
+    for needle, error_class in _LOG_ERROR_CLASSES:
+        if needle in lowered:
+            return error_class
+    return "error"
+
+
+class _ErrorLogHandler(logging.Handler):
+    """Feeds ERROR records of device loggers into every live tracker."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.trackers: "weakref.WeakSet[HealthTracker]" = weakref.WeakSet()
+
+    def emit(self, record):
+        serial = getattr(record, "device_id", None)
+        if serial is None:
+            return
+        if record.exc_info and record.exc_info[0] is not None:
+            error_class = record.exc_info[0].__name__
+        else:
+            error_class = classify_log_error(record.getMessage())
+        for tracker in list(self.trackers):
+            tracker.record_error(serial, error_class)
+
+
+_error_handler = _ErrorLogHandler()
+logging.getLogger("device").addHandler(_error_handler)
+
+
+class HealthTracker:
+    """
+    Circuit breaker over the devices of one DeviceService.
+
+    A device is quarantined after HEALTH_FAILURE_THRESHOLD consecutive
+    failed runs, one failure with a connection-level error, or a median
+    RPC latency above HEALTH_LATENCY_THRESHOLD. A background thread then
+    force-stops the app, reconnects uiautomator2, relaunches the app and
+    probes the device, backing off between attempts. A device that passes
+    the probe is on probation: its next run closes the breaker or sends it
+    straight back to quarantine.
+    """
+
+    def __init__(
+        self,
+        device_service,
+        failure_threshold: int = HEALTH_FAILURE_THRESHOLD,
+        latency_threshold: float = HEALTH_LATENCY_THRESHOLD,
+        backoff: float = HEALTH_RECOVERY_BACKOFF,
+        backoff_max: float = HEALTH_RECOVERY_BACKOFF_MAX,
+    ):
+        """Initialize the tracker.
+
+        Args:
+            device_service: DeviceService used for recovery and probes
+            failure_threshold: Consecutive failures before quarantine
+            latency_threshold: Median RPC latency (seconds) before quarantine
+            backoff: Seconds before the first recovery attempt
+            backoff_max: Upper bound for the doubling backoff
+        """
+        self.device_service = device_service
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.devices: Dict[str, DeviceHealth] = {}
+        self.lock = threading.Lock()
+        self._recovering: Dict[str, threading.Event] = {}
+        _error_handler.trackers.add(self)
+
+    def _get(self, serial: str) -> DeviceHealth:
+        # Caller holds self.lock
+        health = self.devices.get(serial)
+        if health is None:
+            health = self.devices[serial] = DeviceHealth(serial)
+        return health
+
+    def get(self, serial: str) -> DeviceHealth:
+        with self.lock:
+            return self._get(serial)
+
+    def is_available(self, serial: str) -> bool:
+        """True if the device may receive work."""
+        with self.lock:
+            health = self.devices.get(serial)
+            return health is None or health.state != QUARANTINED
+
+    def record_error(self, serial: str, error_class: str):
+        """Count an error class seen in the device's action logs."""
+        with self.lock:
+            self._get(serial).error_classes[error_class] += 1
+
+    def record_latency(self, serial: str, seconds: float):
+        """Record the latency of one RPC to the device."""
+        with self.lock:
+            health = self._get(serial)
+            health.latencies.append(seconds)
+            slow = (
+                len(health.latencies) >= health.latencies.maxlen // 2
+                and health.state == HEALTHY
+                and health.latency > self.latency_threshold
+            )
+        if slow:
+            self.quarantine(serial, f"median RPC latency {health.latency:.1f}s")
+
+    @contextmanager
+    def timed(self, serial: str):
+        """Record the duration of the enclosed RPC as device latency."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_latency(serial, time.monotonic() - start)
+
+    def record_success(self, serial: str):
+        """Record a successful run; closes the breaker after probation."""
+        with self.lock:
+            health = self._get(serial)
+            health.successes += 1
+            health.consecutive_failures = 0
+            if health.state == PROBATION:
+                health.state = HEALTHY
+                health.reason = None
+                logger.info(f"Device {serial} kembali sehat")
+
+    def record_failure(self, serial: str, error_class: Optional[str] = None):
+        """Record a failed run and quarantine the device if it is sick."""
+        with self.lock:
+            health = self._get(serial)
+            health.failures += 1
+            health.consecutive_failures += 1
+            if error_class:
+                health.error_classes[error_class] += 1
+            if health.state == QUARANTINED:
+                return
+            if health.state == PROBATION:
+                reason = "failed on probation"
+            elif error_class in IMMEDIATE_QUARANTINE:
+                reason = f"connection error ({error_class})"
+            elif health.consecutive_failures >= self.failure_threshold:
+                reason = f"{health.consecutive_failures} consecutive failures"
+            else:
+                return
+        self.quarantine(serial, reason)
+
+    def quarantine(self, serial: str, reason: str):
+        """Take the device out of rotation and start background recovery."""
+        with self.lock:
+            health = self._get(serial)
+            if health.state == QUARANTINED:
+                return
+            health.state = QUARANTINED
+            health.reason = reason
+            health.quarantined_at = time.time()
+            stop = threading.Event()
+            self._recovering[serial] = stop
+        logger.warning(f"Device {serial} dikarantina: {reason}")
+        threading.Thread(
+            target=self._recovery_loop,
+            args=(serial, stop),
+            name=f"recover-{serial}",
+            daemon=True,
+        ).start()
+
+    def _recovery_loop(self, serial: str, stop: threading.Event):
+        delay = self.backoff
+        while not stop.wait(delay):
+            with self.lock:
+                self._get(serial).recovery_attempts += 1
+            if self.recover(serial):
+                with self.lock:
+                    health = self._get(serial)
+                    health.state = PROBATION
+                    health.consecutive_failures = 0
+                    health.latencies.clear()
+                    health.recoveries += 1
+                    self._recovering.pop(serial, None)
+                logger.info(f"Device {serial} lolos probe, masuk masa percobaan")
+                return
+            delay = min(delay * 2, self.backoff_max)
+            logger.warning(f"Recovery {serial} gagal, dicoba lagi dalam {delay:.0f}s")
+
+    def recover(self, serial: str) -> bool:
+        """
+        Run the recovery routine and the probe once.
+
+        Drops the uiautomator2 connection, cold-starts the app (force-stop
+        plus `am start -W`, which returns once the first frame is drawn) and
+        checks that the app is in front and a shell RPC answers within the
+        latency limit.
+
+        Returns:
+            bool: True if the probe passed
+        """
+        device_service = self.device_service
+        try:
+            device_service.release(serial)
+            if not device_service.launch_app(serial, DEFAULT_PACKAGE, COLD).ok:
+                return False
+            return self.probe(serial)
+        except Exception as e:
+            logger.warning(f"Recovery {serial} error: {e}")
+            return False
+
+    def probe(self, serial: str) -> bool:
+        """Check that the device answers quickly and shows the app."""
+        device = self.device_service.get_device(serial)
+        if device is None:
+            return False
+        start = time.monotonic()
+        device.shell("getprop ro.build.version.sdk")
+        latency = time.monotonic() - start
+        if latency > self.latency_threshold:
+            logger.warning(f"Probe {serial}: shell lambat ({latency:.1f}s)")
+            return False
+
+        ui_device = self.device_service.get_ui_device(serial)
+        package = ui_device.app_current().get("package")
+        if package != DEFAULT_PACKAGE:
+            logger.warning(f"Probe {serial}: aplikasi di depan adalah {package}")
+            return False
+        return True
+
+    def forget(self, serial: str):
+        """Drop all state of a disconnected device and stop its recovery."""
+        with self.lock:
+            self.devices.pop(serial, None)
+            stop = self._recovering.pop(serial, None)
+        if stop is not None:
+            stop.set()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self.lock:
+            return {serial: h.to_dict() for serial, h in self.devices.items()}
+
+    def close(self):
+        """Stop all recovery threads."""
+        with self.lock:
+            stops = list(self._recovering.values())
+            self._recovering.clear()
+        for stop in stops:
+            stop.set()
@@ -0,0 +1,415 @@
+# Module for per-device logcat event streams: screen transitions, crashes, app logs
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Deque, Dict, List, Optional
+
+from app.automation.deadline import (
+    CHECK_INTERVAL,
+    check_deadline,
+    current_deadline,
+    interruptible_sleep,
+)
+from app.config.settings import DEFAULT_PACKAGE
+from app.logging import get_device_logger
+
+logger = logging.getLogger(__name__)
+
+# Event kinds
+DISPLAYED = "displayed"  # an activity of the app drew its first frame
+CRASH = "crash"  # the app process died with an uncaught exception
+ANR = "anr"  # the app stopped responding
+APP = "app"  # any other line logged by the app process
+
+# Follow the log from now on; -T 1 replays the newest entry, which is skipped
+LOGCAT_COMMAND = "logcat -v threadtime -T 1 -b main,system,crash"
+# Events kept per device for late subscribers and wait()
+EVENT_HISTORY = 200
+# Seconds before re-opening a logcat stream that ended
+RECONNECT_DELAY = 1.0
+
+# 10-19 06:01:01.986  1234  1250 I ActivityTaskManager: Displayed ...
+_LINE = re.compile(
+    r"^(\d\d-\d\d \d\d:\d\d:\d\d\.\d+)\s+(\d+)\s+(\d+)\s+([VDIWEFA])\s+(.*?)\s*: (.*)$"
+)
+_START_PROC = re.compile(r"Start proc (\d+):([\w.]+)/")
+_DISPLAYED = re.compile(
+    r"Displayed ([\w.]+)/(\S+?)(?: for user \d+)?: \+(?:(\d+)s)?(\d+)ms"
+)
+_ANR = re.compile(r"ANR in ([\w.]+)")
+_CRASH_PROCESS = re.compile(r"Process: ([\w.]+)(?::\S+)?, PID: (\d+)")
+_SYSTEM_TAGS = ("ActivityManager", "ActivityTaskManager")
+
+
+@dataclass
+class LogcatEvent:
+    """One typed event parsed from a device's logcat."""
+
+    kind: str
+    package: str
+    time: str  # device timestamp as printed by logcat
+    tag: str = ""
+    message: str = ""
+    activity: Optional[str] = None
+    pid: Optional[int] = None
+    ms: Optional[int] = None  # launch time of DISPLAYED events
+    received_at: float = field(default_factory=time.monotonic)
+    seq: int = 0
+
+
+class LogcatParser:
+    """
+    Turn threadtime logcat lines into LogcatEvents for one package.
+
+    Lines are fed one at a time; the parser keeps just enough state (the
+    app's PID and a pending FATAL EXCEPTION header) to type each line as it
+    arrives, so a crash is reported on the line that names the process.
+    """
+
+    def __init__(self, package: str, pid: Optional[int] = None):
+        """Initialize the parser.
+
+        Args:
+            package: Application package whose events are reported
+            pid: Current process ID of the app, if it is running
+        """
+        self.package = package
+        self.pid = pid
+        self._fatal_thread: Optional[str] = None
+        self._skip_replayed = True
+
+    def feed(self, line: str) -> Optional[LogcatEvent]:
+        """Parse one line; returns its event, or None if it is not one."""
+        match = _LINE.match(line.rstrip("\r\n"))
+        if match is None:
+            return None  # "--------- beginning of main" and wrapped lines
+        if self._skip_replayed:
+            self._skip_replayed = False
+            return None
+        stamp, pid, _, _, tag, message = match.groups()
+        pid = int(pid)
+
+        if tag in _SYSTEM_TAGS:
+            started = _START_PROC.search(message)
+            if started and started.group(2) == self.package:
+                self.pid = int(started.group(1))
+                return None
+            displayed = _DISPLAYED.search(message)
+            if displayed and displayed.group(1) == self.package:
+                seconds, millis = displayed.group(3), int(displayed.group(4))
+                return LogcatEvent(
+                    DISPLAYED,
+                    self.package,
+                    stamp,
+                    tag,
+                    message,
+                    activity=displayed.group(2),
+                    pid=self.pid,
+                    ms=int(seconds or 0) * 1000 + millis,
+                )
+            anr = _ANR.search(message)
+            if anr and anr.group(1) == self.package:
+                return LogcatEvent(ANR, self.package, stamp, tag, message, pid=self.pid)
+            return None
+
+        if tag == "AndroidRuntime":
+            if message.startswith("FATAL EXCEPTION"):
+                self._fatal_thread = message.partition(":")[2].strip()
+                return None
+            crashed = _CRASH_PROCESS.match(message)
+            if crashed and self._fatal_thread is not None:
+                thread, self._fatal_thread = self._fatal_thread, None
+                if crashed.group(1) == self.package:
+                    self.pid = None
+                    return LogcatEvent(
+                        CRASH,
+                        self.package,
+                        stamp,
+                        tag,
+                        f"FATAL EXCEPTION in {thread}",
+                        pid=int(crashed.group(2)),
+                    )
+            return None
+
+        if self.pid is not None and pid == self.pid:
+            return LogcatEvent(APP, self.package, stamp, tag, message, pid=pid)
+        return None
+
+
+class SocketLineStream:
+    """Line reader over an open `adb shell` socket connection (ppadb)."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.file = connection.socket.makefile("r", encoding="utf-8", errors="replace")
+
+    def readline(self) -> str:
+        return self.file.readline()
+
+    def close(self):
+        import socket
+
+        try:
+            # Unblocks a readline() waiting in the reader thread
+            self.connection.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.file.close()
+        self.connection.close()
+
+
+_active: Dict[str, "LogcatStream"] = {}
+_active_lock = threading.Lock()
+
+
+def get_event_stream(serial: str) -> Optional["LogcatStream"]:
+    """The running event stream of a device, if any."""
+    with _active_lock:
+        return _active.get(serial)
+
+
+class LogcatStream:
+    """
+    A persistent logcat reader for one device.
+
+    A background thread keeps `logcat` open through the DeviceService shell
+    stream and publishes the app's events as they are logged. Flows wait on
+    the stream instead of sleeping between UI polls, so they look again as
+    soon as a screen is drawn, and scopes registered with watch() are
+    aborted the moment the app crashes or stops responding.
+    """
+
+    def __init__(
+        self,
+        device_service,
+        serial: str,
+        package: str = DEFAULT_PACKAGE,
+        history: int = EVENT_HISTORY,
+    ):
+        """Initialize the stream.
+
+        Args:
+            device_service: DeviceService providing the shell stream
+            serial: Device serial number
+            package: Application package whose events are published
+            history: Number of recent events kept
+        """
+        self.device_service = device_service
+        self.serial = serial
+        self.package = package
+        self.events: Deque[LogcatEvent] = deque(maxlen=history)
+        self.seq = 0
+        self.cond = threading.Condition()
+        self._callbacks: List[Callable[[LogcatEvent], None]] = []
+        self._watchers: List = []
+        self._stream = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stop.is_set()
+
+    def start(self):
+        """Start the reader thread and make the stream visible to actions."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name=f"logcat-{self.serial}", daemon=True
+        )
+        with _active_lock:
+            _active[self.serial] = self
+        self._thread.start()
+
+    def stop(self):
+        """Stop reading; waiters wake up and see no further events."""
+        self._stop.set()
+        with _active_lock:
+            if _active.get(self.serial) is self:
+                del _active[self.serial]
+        stream = self._stream
+        if stream is not None:
+            stream.close()
+        with self.cond:
+            self.cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def subscribe(self, callback: Callable[[LogcatEvent], None]):
+        """Call `callback(event)` for every event from now on."""
+        with self.cond:
+            self._callbacks.append(callback)
+
+    def unsubscribe(self, callback: Callable[[LogcatEvent], None]):
+        with self.cond:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def watch(self, deadline):
+        """Abort `deadline` if the app crashes or stops responding."""
+        with self.cond:
+            self._watchers.append(deadline)
+
+    def unwatch(self, deadline):
+        with self.cond:
+            if deadline in self._watchers:
+                self._watchers.remove(deadline)
+
+    def mark(self) -> int:
+        """Sequence number of the newest event, for wait(since=...)."""
+        with self.cond:
+            return self.seq
+
+    def last(self, kind: Optional[str] = None) -> Optional[LogcatEvent]:
+        """Newest event, optionally of one kind."""
+        with self.cond:
+            for event in reversed(self.events):
+                if kind is None or event.kind == kind:
+                    return event
+        return None
+
+    def wait(self, since: int, timeout: float) -> Optional[LogcatEvent]:
+        """
+        Wait for an event newer than `since`.
+
+        Returns:
+            LogcatEvent: The first such event, or None on timeout or stop
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > since or self._stop.is_set(), timeout)
+            for event in self.events:
+                if event.seq > since:
+                    return event
+        return None
+
+    def publish(self, event: LogcatEvent):
+        """Number an event, wake waiters and run callbacks and watchers."""
+        with self.cond:
+            self.seq += 1
+            event.seq = self.seq
+            self.events.append(event)
+            callbacks = list(self._callbacks)
+            watchers = list(self._watchers) if event.kind in (CRASH, ANR) else []
+            for deadline in watchers:
+                deadline.abort(f"{event.package} {event.kind}: {event.message}")
+            self.cond.notify_all()
+        if watchers or event.kind in (CRASH, ANR):
+            get_device_logger(self.serial).error(
+                f"Aplikasi {event.package} {event.kind}: {event.message}"
+            )
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.exception(f"Logcat subscriber for {self.serial} failed: {e}")
+
+    def _query_pid(self) -> Optional[int]:
+        device = self.device_service.get_device(self.serial)
+        if device is None:
+            return None
+        try:
+            output = device.shell(f"pidof {self.package}").split()
+        except Exception:
+            return None
+        return int(output[0]) if output and output[0].isdigit() else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._stream = self.device_service._open_shell_stream(
+                    self.serial, LOGCAT_COMMAND
+                )
+                parser = LogcatParser(self.package, self._query_pid())
+                for line in iter(self._stream.readline, ""):
+                    event = parser.feed(line)
+                    if event is not None:
+                        self.publish(event)
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning(f"Logcat {self.serial} terputus: {e}")
+            finally:
+                stream, self._stream = self._stream, None
+                if stream is not None:
+                    stream.close()
+            self._stop.wait(RECONNECT_DELAY)
+
+
+def wait_for_ui_event(
+    serial: str, seconds: float, since: Optional[int] = None
+) -> Optional[LogcatEvent]:
+    """
+    Sleep up to `seconds`, waking early when the device logs an app event.
+
+    Falls back to interruptible_sleep when the device has no event stream.
+    Like interruptible_sleep, raises Cancelled when the current scope ends.
+
+    Args:
+        serial: Device serial number
+        seconds: Longest wait
+        since: Sequence number already seen (default: only newer events)
+
+    Returns:
+        LogcatEvent: The event that ended the wait, or None on timeout
+    """
+    stream = get_event_stream(serial)
+    if stream is None:
+        interruptible_sleep(seconds)
+        return None
+    deadline = current_deadline()
+    since = stream.mark() if since is None else since
+    end = time.monotonic() + seconds
+    while True:
+        check_deadline()
+        left = end - time.monotonic()
+        if deadline is not None:
+            left = min(left, deadline.remaining())
+        if left <= 0 or not stream.running:
+            break
+        event = stream.wait(since, min(left, CHECK_INTERVAL))
+        if event is not None:
+            check_deadline()
+            return event
+    if not stream.running and time.monotonic() < end:
+        interruptible_sleep(end - time.monotonic())
+    return None
+
+
+@contextmanager
+def watch_app(device_service, serial: str):
+    """
+    Abort the current deadline scope if the app crashes on `serial`.
+
+    No-op outside a scope or when the device has no event stream.
+    """
+    deadline = current_deadline()
+    stream = device_service.event_stream(serial) if deadline is not None else None
+    if stream is None:
+        yield None
+        return
+    stream.watch(deadline)
+    try:
+        yield stream
+    finally:
+        stream.unwatch(deadline)
+
+
+def abort_on_crash(func):
+    """
+    Decorator for flows called as `func(device_service, serial, ...)`.
+
+    Place it under @flow_budget: a crash or ANR logged while the flow runs
+    aborts the flow's scope, so it fails within CHECK_INTERVAL instead of
+    waiting out its timeouts.
+    """
+
+    @wraps(func)
+    def wrapper(device_service, serial, *args, **kwargs):
+        with watch_app(device_service, serial):
+            return func(device_service, serial, *args, **kwargs)
+
+    return wrapper
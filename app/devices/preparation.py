@@ -0,0 +1,209 @@
+# Module for preparing devices for automation and restoring them afterwards
+import logging
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from app.devices.command import (
+    ANIMATION_SETTINGS,
+    STAY_ON_ALL,
+    STAY_ON_SETTING,
+    get_global_settings,
+    put_global_settings,
+    trim_background_apps,
+    wake_and_unlock,
+)
+from app.profiling import add_flow_observer
+
+logger = logging.getLogger(__name__)
+
+# Settings applied while a device is prepared
+PREPARED_SETTINGS = {
+    **{name: "0" for name in ANIMATION_SETTINGS},
+    STAY_ON_SETTING: STAY_ON_ALL,
+}
+# Flow duration samples kept per (flow, prepared) pair
+FLOW_SAMPLES = 200
+
+
+@dataclass
+class PreparedDevice:
+    """Original settings of a prepared device, restored on teardown."""
+
+    serial: str
+    original: Dict[str, str]
+    prepared_at: float = field(default_factory=time.time)
+    awake: bool = False
+    trimmed: bool = False
+
+
+class DevicePreparation:
+    """
+    Prepare-device stage of one DeviceService.
+
+    Preparing a device turns the window, transition and animator animation
+    scales off, keeps the screen on while plugged in, wakes and unlocks the
+    screen and kills cached background apps. The original setting values
+    are kept and written back by restore(). Flow durations are recorded
+    separately for prepared and unprepared devices so report() can show
+    the latency the stage saves per flow.
+    """
+
+    def __init__(self, device_service):
+        """Initialize the stage.
+
+        Args:
+            device_service: DeviceService used to reach the devices
+        """
+        self.device_service = device_service
+        self.prepared: Dict[str, PreparedDevice] = {}
+        self.durations: Dict[tuple, List[float]] = {}
+        self.lock = threading.Lock()
+        add_flow_observer(self)
+
+    def is_prepared(self, serial: str) -> bool:
+        with self.lock:
+            return serial in self.prepared
+
+    def prepare(self, serial: str, trim: bool = True) -> bool:
+        """
+        Prepare one device; preparing it again only re-wakes it.
+
+        Args:
+            serial: Device serial number
+            trim: Also kill cached background apps
+
+        Returns:
+            bool: True if the settings were applied and the screen is on
+        """
+        device = self.device_service.get_device(serial)
+        if device is None:
+            return False
+        with self.lock:
+            state = self.prepared.get(serial)
+        if state is None:
+            try:
+                original = get_global_settings(device, PREPARED_SETTINGS)
+            except Exception as e:
+                logger.error(f"Gagal membaca settings {serial}: {e}")
+                return False
+            if not put_global_settings(device, PREPARED_SETTINGS):
+                logger.error(f"Gagal menerapkan settings di {serial}")
+                return False
+            state = PreparedDevice(serial, original)
+            with self.lock:
+                self.prepared[serial] = state
+
+        state.awake = wake_and_unlock(device)
+        if not state.awake:
+            logger.warning(f"Layar {serial} tidak menyala setelah wake")
+        if trim:
+            state.trimmed = trim_background_apps(device)
+        logger.info(f"Device {serial} siap (animasi mati, layar tetap menyala)")
+        return state.awake
+
+    def prepare_all(
+        self, serials: Iterable[str], max_workers: Optional[int] = None
+    ) -> Dict[str, bool]:
+        """
+        Prepare devices concurrently.
+
+        Args:
+            serials: Device serial numbers
+            max_workers: Parallel preparations (default: one per device)
+
+        Returns:
+            dict: Serial -> result of prepare()
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        serials = list(serials)
+        if not serials:
+            return {}
+        with ThreadPoolExecutor(
+            max_workers or len(serials), thread_name_prefix="prepare"
+        ) as executor:
+            return dict(zip(serials, executor.map(self.prepare, serials)))
+
+    def restore(self, serial: str) -> bool:
+        """
+        Write back the settings a device had before prepare().
+
+        Args:
+            serial: Device serial number
+
+        Returns:
+            bool: True if restored (or nothing to restore)
+        """
+        with self.lock:
+            state = self.prepared.pop(serial, None)
+        if state is None:
+            return True
+        device = self.device_service.get_device(serial)
+        if device is None or not put_global_settings(device, state.original):
+            logger.error(f"Gagal mengembalikan settings {serial}")
+            return False
+        logger.info(f"Settings {serial} dikembalikan")
+        return True
+
+    def restore_all(self) -> Dict[str, bool]:
+        """Restore every prepared device concurrently."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with self.lock:
+            serials = list(self.prepared)
+        if not serials:
+            return {}
+        self.log_report()
+        with ThreadPoolExecutor(len(serials), thread_name_prefix="restore") as executor:
+            return dict(zip(serials, executor.map(self.restore, serials)))
+
+    def forget(self, serial: str):
+        """Drop the state of a disconnected device (nothing to restore)."""
+        with self.lock:
+            self.prepared.pop(serial, None)
+
+    def record_flow(self, serial: str, flow: str, seconds: float, ok: bool):
+        """Flow observer: keep durations of successful flows of our devices."""
+        if not ok:
+            return
+        with self.lock:
+            samples = self.durations.setdefault((flow, serial in self.prepared), [])
+            samples.append(seconds)
+            del samples[:-FLOW_SAMPLES]
+
+    def report(self) -> Dict[str, Dict]:
+        """
+        Median flow duration on unprepared vs prepared devices.
+
+        Returns:
+            dict: Flow -> {"baseline", "prepared", "saved", "samples"};
+                "saved" is None until both sides have samples
+        """
+        with self.lock:
+            durations = {key: list(samples) for key, samples in self.durations.items()}
+        report = {}
+        for flow in sorted({flow for flow, _ in durations}):
+            baseline = durations.get((flow, False), [])
+            prepared = durations.get((flow, True), [])
+            medians = [
+                statistics.median(samples) if samples else None
+                for samples in (baseline, prepared)
+            ]
+            report[flow] = {
+                "baseline": medians[0],
+                "prepared": medians[1],
+                "saved": (medians[0] - medians[1] if None not in medians else None),
+                "samples": (len(baseline), len(prepared)),
+            }
+        return report
+
+    def log_report(self):
+        for flow, row in self.report().items():
+            if row["saved"] is not None:
+                logger.info(
+                    f"{flow}: {row['baseline']:.2f}s -> {row['prepared']:.2f}s "
+                    f"(hemat {row['saved']:.2f}s per flow)"
+                )
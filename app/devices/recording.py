@@ -0,0 +1,407 @@
+# Module for recording uiautomator2/ADB traffic and replaying it without a device
+import base64
+import builtins
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Union
+
+from app.config import ADB_HOST, ADB_PORT
+from app.devices.device_service import DeviceService
+from app.devices.federation import create_live_device_service
+
+logger = logging.getLogger(__name__)
+
+# 2: truth tests, len(), iter() and bytes() are keyed; 3: timeouts are not
+RECORDING_VERSION = 3
+
+# Latency modes for replay: scale factor applied to the recorded durations
+LATENCY_MODES = {"faithful": 1.0, "zero": 0.0}
+
+# Keyword arguments whose value differs between runs (clipped to the flow
+# deadline, learned per device model); keyed by name only
+_UNKEYED_KWARGS = frozenset({"timeout"})
+
+# Marker stored in place of results that are live objects (UiObject, ppadb Device)
+_OBJECT = {"__obj__": True}
+
+
+class ReplayMissError(KeyError):
+    """Raised when a replayed flow makes a call that was never recorded."""
+
+
+class ReplayedError(RuntimeError):
+    """Stand-in for a non-builtin exception raised during recording."""
+
+
+def _format_call(path: str, args: tuple, kwargs: dict) -> str:
+    """Build the lookup key for a call, stable across runs."""
+    parts = [repr(arg) for arg in args]
+    parts += [
+        f"{key}=..." if key in _UNKEYED_KWARGS else f"{key}={value!r}"
+        for key, value in sorted(kwargs.items())
+    ]
+    return f"{path}({', '.join(parts)})"
+
+
+def _is_plain(value) -> bool:
+    """Check whether a value can be stored as-is in the recording."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain(item) for item in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(key, str) and _is_plain(item) for key, item in value.items()
+        )
+    return False
+
+
+class Recorder:
+    """Append-only writer for a gzip'd JSON-lines recording."""
+
+    def __init__(self, path: str):
+        """Open the recording file.
+
+        Args:
+            path: Output file path (gzip-compressed JSON lines)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.call_count = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        header = {"version": RECORDING_VERSION, "created": datetime.now().isoformat()}
+        self._file.write(json.dumps(header) + "\n")
+
+    def record(
+        self, key: str, elapsed: float, result=None, error=None, is_object=False
+    ):
+        """Write one request/response entry."""
+        entry: Dict[str, Any] = {"k": key, "t": round(elapsed, 6)}
+        if error is not None:
+            entry["e"] = [type(error).__name__, str(error)]
+        elif is_object:
+            entry["o"] = 1
+        else:
+            entry["r"] = result
+
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.lock:
+            if not self._file.closed:
+                self._file.write(line)
+                self.call_count += 1
+
+    def capture(self, key: str, value, elapsed: float):
+        """Record a result and return the value the caller should receive."""
+        if _is_plain(value):
+            self.record(key, elapsed, result=value)
+            return value
+
+        if isinstance(value, (list, tuple)):
+            encoded, live = self._encode_sequence(key, value)
+            self.record(key, elapsed, result=encoded)
+            return live
+
+        self.record(key, elapsed, is_object=True)
+        return RecordingProxy(value, key, self)
+
+    def _encode_sequence(self, key: str, value):
+        encoded = []
+        live = []
+        for i, item in enumerate(value):
+            if _is_plain(item):
+                encoded.append(item)
+                live.append(item)
+            else:
+                encoded.append(_OBJECT)
+                live.append(RecordingProxy(item, f"{key}[{i}]", self))
+        return encoded, type(value)(live)
+
+    def close(self):
+        """Flush and close the recording file."""
+        with self.lock:
+            if not self._file.closed:
+                self._file.close()
+                logger.info(f"Recording saved to {self.path} ({self.call_count} calls)")
+
+
+class RecordingProxy:
+    """Transparent wrapper that records every attribute read and call."""
+
+    __slots__ = ("_target", "_path", "_recorder")
+
+    def __init__(self, target, path: str, recorder: Recorder):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_path", path)
+        object.__setattr__(self, "_recorder", recorder)
+
+    def __getattr__(self, name: str):
+        path = f"{self._path}.{name}"
+        start = time.perf_counter()
+        try:
+            value = getattr(self._target, name)
+        except Exception as e:
+            self._recorder.record(path, time.perf_counter() - start, error=e)
+            raise
+
+        # Bound methods are recorded when called, not when looked up
+        if callable(value):
+            return RecordingProxy(value, path, self._recorder)
+        return self._recorder.capture(path, value, time.perf_counter() - start)
+
+    def __call__(self, *args, **kwargs):
+        key = _format_call(self._path, args, kwargs)
+        start = time.perf_counter()
+        try:
+            value = self._target(*args, **kwargs)
+        except Exception as e:
+            self._recorder.record(key, time.perf_counter() - start, error=e)
+            raise
+        return self._recorder.capture(key, value, time.perf_counter() - start)
+
+    def _convert(self, name: str, convert):
+        # Conversions are keyed like calls, e.g. `u2:X.exists.__bool__()`
+        key = f"{self._path}.{name}()"
+        start = time.perf_counter()
+        try:
+            value = convert(self._target)
+        except Exception as e:
+            self._recorder.record(key, time.perf_counter() - start, error=e)
+            raise
+        return key, value, time.perf_counter() - start
+
+    def __bool__(self):
+        # uiautomator2's `UiObject.exists` is a callable whose truth is the check
+        key, value, elapsed = self._convert("__bool__", bool)
+        self._recorder.record(key, elapsed, result=value)
+        return value
+
+    def __len__(self):
+        key, value, elapsed = self._convert("__len__", len)
+        self._recorder.record(key, elapsed, result=value)
+        return value
+
+    def __iter__(self):
+        key, value, elapsed = self._convert("__iter__", list)
+        return iter(self._recorder.capture(key, value, elapsed))
+
+    def __bytes__(self):
+        key, value, elapsed = self._convert("__bytes__", bytes)
+        encoded = base64.b64encode(value).decode("ascii")
+        self._recorder.record(key, elapsed, result=encoded)
+        return value
+
+    def __repr__(self):
+        return f"<RecordingProxy {self._path}>"
+
+
+class Replay:
+    """In-memory store of recorded responses, served back in recorded order."""
+
+    def __init__(self, path: str, latency: Union[str, float] = "faithful"):
+        """Load a recording.
+
+        Args:
+            path: Recording file created by Recorder
+            latency: "faithful", "zero" or a scale factor for recorded durations
+        """
+        self.path = path
+        self.latency_scale = (
+            LATENCY_MODES[latency] if isinstance(latency, str) else float(latency)
+        )
+        self.lock = threading.Lock()
+        self.call_count = 0
+        self._entries: Dict[str, Deque[dict]] = {}
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != RECORDING_VERSION:
+                raise ValueError(f"Unsupported recording version: {header}")
+            for line in f:
+                entry = json.loads(line)
+                self._entries.setdefault(entry["k"], deque()).append(entry)
+
+        logger.info(f"Loaded recording {path} ({len(self._entries)} unique calls)")
+
+    def has(self, key: str) -> bool:
+        """Check whether a key was recorded."""
+        return key in self._entries
+
+    def play(self, key: str):
+        """Return the next recorded response for a key.
+
+        The last response for a key is repeated once the queue is exhausted,
+        so polling loops that run longer than in the recording keep working.
+        """
+        with self.lock:
+            queue = self._entries.get(key)
+            if not queue:
+                raise ReplayMissError(key)
+            entry = queue[0] if len(queue) == 1 else queue.popleft()
+            self.call_count += 1
+
+        if self.latency_scale > 0:
+            time.sleep(entry["t"] * self.latency_scale)
+
+        if "e" in entry:
+            error_type, message = entry["e"]
+            error_class = getattr(builtins, error_type, None)
+            if isinstance(error_class, type) and issubclass(error_class, Exception):
+                raise error_class(message)
+            raise ReplayedError(f"{error_type}: {message}")
+
+        if "o" in entry:
+            return ReplayNode(self, key)
+        return self._decode(key, entry["r"])
+
+    def _decode(self, key: str, value):
+        if isinstance(value, list):
+            return [
+                ReplayNode(self, f"{key}[{i}]") if item == _OBJECT else item
+                for i, item in enumerate(value)
+            ]
+        return value
+
+
+class ReplayNode:
+    """Stand-in for a recorded object (device, UiObject) during replay."""
+
+    __slots__ = ("_replay", "_path")
+
+    def __init__(self, replay: Replay, path: str):
+        object.__setattr__(self, "_replay", replay)
+        object.__setattr__(self, "_path", path)
+
+    def __getattr__(self, name: str):
+        path = f"{self._path}.{name}"
+        if self._replay.has(path):
+            return self._replay.play(path)
+        # Not recorded as an attribute, so it's a method: resolve on call
+        return ReplayNode(self._replay, path)
+
+    def __call__(self, *args, **kwargs):
+        return self._replay.play(_format_call(self._path, args, kwargs))
+
+    def __bool__(self):
+        return self._replay.play(f"{self._path}.__bool__()")
+
+    def __len__(self):
+        key = f"{self._path}.__len__()"
+        if not self._replay.has(key):
+            # list() asks for a length hint first and only accepts TypeError
+            raise TypeError(f"{self._path} has no recorded length")
+        return self._replay.play(key)
+
+    def __iter__(self):
+        return iter(self._replay.play(f"{self._path}.__iter__()"))
+
+    def __bytes__(self):
+        return base64.b64decode(self._replay.play(f"{self._path}.__bytes__()"))
+
+    def __repr__(self):
+        return f"<ReplayNode {self._path}>"
+
+
+class RecordingDeviceService(DeviceService):
+    """DeviceService that records all ADB and uiautomator2 traffic to a file."""
+
+    def __init__(self, path: str, host: str = ADB_HOST, port: int = ADB_PORT):
+        """Initialize the recording service.
+
+        Args:
+            path: Output recording file
+            host: ADB server host
+            port: ADB server port
+        """
+        self.recorder = Recorder(path)
+        super().__init__(host, port)
+        # Logcat and artifact captures run on their own schedule and cannot
+        # be replayed in order
+        self.logcat_enabled = False
+        self.artifacts = None
+
+    def _create_adb_client(self, host: str, port: int):
+        client = super()._create_adb_client(host, port)
+        return RecordingProxy(client, "adb", self.recorder)
+
+    def _connect_ui(self, serial: str):
+        ui_device = super()._connect_ui(serial)
+        return RecordingProxy(ui_device, f"u2:{serial}", self.recorder)
+
+    def _open_shell_stream(self, serial: str, command: str):
+        raise RuntimeError(f"Shell streams cannot be recorded: {command}")
+
+    def _exec_out(self, serial: str, command: str) -> bytes:
+        key = _format_call(f"exec:{serial}", (command,), {})
+        start = time.perf_counter()
+        try:
+            output = super()._exec_out(serial, command)
+        except Exception as e:
+            self.recorder.record(key, time.perf_counter() - start, error=e)
+            raise
+        encoded = base64.b64encode(output).decode("ascii")
+        self.recorder.record(key, time.perf_counter() - start, result=encoded)
+        return output
+
+    def close(self):
+        """Release connections and finalize the recording."""
+        super().close()
+        self.recorder.close()
+
+
+class ReplayDeviceService(DeviceService):
+    """DeviceService that serves responses from a recording, no device needed."""
+
+    def __init__(self, path: str, latency: Union[str, float] = "faithful"):
+        """Initialize the replay service.
+
+        Args:
+            path: Recording file created by RecordingDeviceService
+            latency: "faithful", "zero" or a scale factor for recorded durations
+        """
+        self.replay = Replay(path, latency)
+        super().__init__()
+        self.logcat_enabled = False  # recordings hold no logcat stream
+        self.artifacts = None
+
+    def _create_adb_client(self, host: str, port: int):
+        return ReplayNode(self.replay, "adb")
+
+    def _connect_ui(self, serial: str):
+        return ReplayNode(self.replay, f"u2:{serial}")
+
+    def _open_shell_stream(self, serial: str, command: str):
+        raise RuntimeError(f"Shell streams cannot be replayed: {command}")
+
+    def _exec_out(self, serial: str, command: str) -> bytes:
+        key = _format_call(f"exec:{serial}", (command,), {})
+        return base64.b64decode(self.replay.play(key))
+
+
+def create_device_service(
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    latency: Union[str, float] = "faithful",
+) -> DeviceService:
+    """Create a live, recording or replaying DeviceService.
+
+    Args:
+        record: Record traffic to this file (optional)
+        replay: Replay traffic from this file instead of a device (optional)
+        latency: Replay latency mode ("faithful", "zero" or a scale factor)
+
+    Returns:
+        DeviceService instance; without record or replay, the live one from
+        create_live_device_service
+    """
+    if record and replay:
+        raise ValueError("Cannot record and replay at the same time")
+    if replay:
+        return ReplayDeviceService(replay, latency)
+    if record:
+        return RecordingDeviceService(record)
+    return create_live_device_service()
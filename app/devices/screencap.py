@@ -0,0 +1,67 @@
+# Module for reading raw screencap frames (no PNG encode/decode) into arrays
+import struct
+from typing import NamedTuple
+
+# `screencap` without -p writes width, height and pixel format as uint32
+# (Android 9+ adds the colour space), followed by the pixels
+_HEADER = struct.Struct("<III")
+_HEADER_SIZES = (16, 12)
+_BYTES_PER_PIXEL = {1: 4, 2: 4, 3: 3}  # RGBA_8888, RGBX_8888, RGB_888
+# ITU-R BT.601 luma weights for the grayscale conversion
+_GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+class RawFrame(NamedTuple):
+    """One screen frame as returned by `screencap`, pixels not copied."""
+
+    width: int
+    height: int
+    pixel_format: int
+    data: bytes
+    offset: int  # start of the pixels in `data`
+
+    @property
+    def resolution(self):
+        return self.width, self.height
+
+
+def parse_screencap(data: bytes) -> RawFrame:
+    """
+    Parse the output of `screencap` (raw, not -p).
+
+    Raises:
+        ValueError: If the output is not a raw frame in a known format
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError(f"Output screencap terlalu pendek ({len(data)} byte)")
+    width, height, pixel_format = _HEADER.unpack_from(data)
+    bpp = _BYTES_PER_PIXEL.get(pixel_format)
+    if bpp is None:
+        raise ValueError(f"Format pixel screencap tidak didukung: {pixel_format}")
+    for offset in _HEADER_SIZES:
+        if len(data) - offset == width * height * bpp:
+            return RawFrame(width, height, pixel_format, data, offset)
+    raise ValueError(
+        f"Ukuran screencap {len(data)} byte tidak cocok dengan {width}x{height}"
+    )
+
+
+def to_gray(frame: RawFrame, step: int = 1):
+    """
+    Grayscale float32 array of a frame, keeping every `step`-th pixel.
+
+    Downscaling by striding only touches the kept pixels, so a 1/4 frame
+    costs about 1/16 of a full conversion. Requires NumPy.
+    """
+    import numpy as np
+
+    channels = _BYTES_PER_PIXEL[frame.pixel_format]
+    pixels = np.frombuffer(
+        frame.data,
+        dtype=np.uint8,
+        count=frame.width * frame.height * channels,
+        offset=frame.offset,
+    ).reshape(frame.height, frame.width, channels)
+    kept = pixels[::step, ::step]
+    red, green, blue = (np.float32(weight) for weight in _GRAY_WEIGHTS)
+    return kept[..., 0] * red + kept[..., 1] * green + kept[..., 2] * blue
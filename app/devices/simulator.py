@@ -0,0 +1,1377 @@
+# Module for an in-process simulated MYIM3 device farm used for load testing
+import logging
+import queue
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+
+from app.config import ADB_PORT
+from app.config.settings import DEFAULT_PACKAGE
+from app.devices.device_service import DeviceService
+from app.devices.federation import AdbServer, FederatedDeviceService
+
+logger = logging.getLogger(__name__)
+
+_ID = f"{DEFAULT_PACKAGE}:id/"
+_EDIT_TEXT = "android.widget.EditText"
+_TEXT_VIEW = "android.widget.TextView"
+_LAYOUT = "android.widget.FrameLayout"
+_BUTTON = "android.widget.Button"
+
+# Number of rows the simulated screen is divided into for element bounds
+_ROWS = 20
+
+# Launcher activity of the simulated app and of the home screen
+_ACTIVITY = f"{DEFAULT_PACKAGE}/{DEFAULT_PACKAGE}.MainActivity"
+_HOME_ACTIVITY = "com.android.launcher3/com.android.launcher3.Launcher"
+# Activity drawing each app screen, as logged in "Displayed" lines
+_SCREEN_ACTIVITIES = {
+    "main": ".MainActivity",
+    "home": ".MainActivity",
+    "login": ".ui.login.LoginActivity",
+    "otp": ".ui.login.OtpActivity",
+    "verifying": ".ui.login.OtpActivity",
+}
+_SYSTEM_PID = 1234
+
+# Thermal model: each RPC heats the SoC, which cools with this half-life (s)
+_HEAT_PER_RPC = 0.01
+_HEAT_HALF_LIFE = 60.0
+_AMBIENT = 30.0  # degrees Celsius
+_THROTTLE_AT = 40.0  # SoC temperature where the CPU starts slowing down
+_CORES = 8
+_MAX_FREQ_KHZ = 2400000
+
+# Frame-time histogram buckets (ms) as printed by `dumpsys gfxinfo`
+_GFX_BUCKETS = (
+    list(range(5, 33))
+    + list(range(34, 49, 2))
+    + list(range(53, 134, 4))
+    + list(range(150, 5000, 50))
+)
+_FRAME_BUDGET_MS = 16  # frames slower than this count as janky
+# PSS of the app right after start, and what each screen change adds (KB)
+_BASE_PSS = 114380
+_PSS_PER_SCREEN = 160
+
+# iphonesubinfo transaction code answering getLine1NumberForSubscriber (SDK 33)
+_LINE1_CODE = 15
+
+
+def _parcel(text: str) -> str:
+    """Format a string the way `service call` prints a Parcel reply."""
+    if not text:
+        return "Result: Parcel(00000000 ffffffff   '........')\n"
+    # Status word, length word, then UTF-16 code units (two per 32-bit word)
+    chars = [ord(c) for c in text] + [0] * (len(text) % 2)
+    words = [0, len(text)]
+    words += [chars[i] | chars[i + 1] << 16 for i in range(0, len(chars), 2)]
+    ascii_units = "." * 8 + "".join(c + "." for c in text)
+    lines = ["Result: Parcel("]
+    for offset in range(0, len(words), 4):
+        chunk = " ".join(f"{word:08x}" for word in words[offset : offset + 4])
+        column = ascii_units[offset * 4 : offset * 4 + 16]
+        lines.append(f"  0x{offset * 4:08x}: {chunk:<35} '{column:<16}'")
+    return "\n".join(lines) + ")\n"
+
+
+def _screen_colour(name: str) -> bytes:
+    """RGBA pixel a screen (or popup) is filled with, derived from its name."""
+    digest = zlib.crc32(name.encode())
+    return bytes((digest & 0xFF, digest >> 8 & 0xFF, digest >> 16 & 0xFF, 0xFF))
+
+
+@lru_cache(maxsize=16)
+def _button_rows(width: int, height: int, cross: bool) -> Tuple[bytes, ...]:
+    """RGBA rows of a white button with a dark border and optional cross."""
+    white, dark = b"\xff\xff\xff\xff", b"\x30\x30\x30\xff"
+    border = max(2, min(width, height) // 12)
+    rows = []
+    for y in range(height):
+        row = bytearray()
+        for x in range(width):
+            edge = min(x, y, width - 1 - x, height - 1 - y) < border
+            diagonal = abs(x * height - y * width) < border * width
+            anti = abs((width - 1 - x) * height - y * width) < border * width
+            margin = border * 3 <= min(x, y, width - 1 - x, height - 1 - y)
+            row += dark if edge or (cross and margin and (diagonal or anti)) else white
+        rows.append(bytes(row))
+    return tuple(rows)
+
+
+class SimulatedUiObjectNotFoundError(Exception):
+    """Raised like uiautomator2's UiObjectNotFoundError for missing elements."""
+
+
+@dataclass
+class LatencyModel:
+    """Latency model for simulated RPCs (seconds)."""
+
+    ui_rpc: float = 0.05  # uiautomator2 JSON-RPC round trip
+    shell: float = 0.03  # adb shell round trip
+    transition: float = 0.1  # layout/render after a navigation click
+    animation: float = 0.2  # window/transition animation at scale 1.0
+    cold_start: float = 1.2  # process start until the first frame
+    warm_start: float = 0.5  # activity re-creation in a running process
+    jitter: float = 0.25  # +/- fraction applied to every delay
+    scale: float = 1.0  # global multiplier (0 disables all delays)
+
+    def delay(self, base: float, rng: random.Random) -> float:
+        """Compute a jittered delay for a base latency."""
+        if self.scale <= 0 or base <= 0:
+            return 0.0
+        factor = 1 + rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, base * self.scale * factor)
+
+
+@dataclass
+class _Node:
+    """One element of the simulated view hierarchy."""
+
+    resource_id: str
+    class_name: str = _TEXT_VIEW
+    text: str = ""
+    enabled: bool = True
+    clickable: bool = False
+    bounds: Tuple[int, int, int, int] = (0, 0, 0, 0)
+    popup: bool = False
+    id_hidden: bool = False  # e.g. web content: no resource-id in the hierarchy
+
+    @property
+    def visible_id(self) -> str:
+        return "" if self.id_hidden else self.resource_id
+
+    def matches(self, selector: Dict[str, str]) -> bool:
+        for key, value in selector.items():
+            if key == "resourceId" and self.visible_id != value:
+                return False
+            if key == "text" and self.text != value:
+                return False
+            if key == "textContains" and value not in self.text:
+                return False
+            if key == "className" and self.class_name != value:
+                return False
+            if key not in ("resourceId", "text", "textContains", "className"):
+                return False
+        return True
+
+    def to_info(self) -> Dict:
+        left, top, right, bottom = self.bounds
+        bounds = {"left": left, "top": top, "right": right, "bottom": bottom}
+        return {
+            "resourceName": self.visible_id,
+            "className": self.class_name,
+            "packageName": DEFAULT_PACKAGE,
+            "text": self.text,
+            "enabled": self.enabled,
+            "clickable": self.clickable,
+            "bounds": bounds,
+            "visibleBounds": bounds,
+        }
+
+
+@dataclass
+class SimulatedDeviceConfig:
+    """Behaviour knobs for a simulated device."""
+
+    width: int = 1080
+    height: int = 2400
+    popup_rate: float = 0.3  # chance of a promo/tutorial popup on app launch
+    # Chance the promo's close button has a resource ID; without one it is
+    # also drawn away from the top-right corner
+    promo_close_id_rate: float = 1.0
+    invalid_otp_rate: float = 0.0  # chance a correct OTP is still rejected
+    otp_countdown: int = 60  # seconds before resend is allowed
+    sms_delay: Tuple[float, float] = (2.0, 8.0)  # OTP SMS delivery range
+    verify_seconds: int = 3  # "Verifying your number" timer
+    tutorial_steps: int = 3
+    crash_rate: float = 0.0  # chance the app crashes on a screen change
+    latency: LatencyModel = field(default_factory=LatencyModel)
+
+
+class SimulatedDevice:
+    """State machine modelling com.pure.indosat.care on one phone."""
+
+    def __init__(
+        self,
+        serial: str,
+        phone_number: str,
+        config: Optional[SimulatedDeviceConfig] = None,
+        seed: Optional[int] = None,
+    ):
+        """Initialize the simulated device.
+
+        Args:
+            serial: Device serial number
+            phone_number: MSISDN of the simulated SIM
+            config: Behaviour configuration
+            seed: Seed for popups, OTP codes and latency jitter
+        """
+        self.serial = serial
+        self.phone_number = phone_number
+        self.config = config or SimulatedDeviceConfig()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.rpc_count = 0
+        self.reachable = True  # False while its ADB server is down
+
+        self.properties = {
+            "ro.product.manufacturer": "Simulated",
+            "ro.product.model": "MYIM3-Sim",
+            "ro.build.version.release": "13",
+            "ro.build.version.sdk": "33",
+            "ro.product.device": "sim",
+        }
+        self.battery_level = 100
+        self.app_version = "120.3.1"
+        self.settings: Dict[str, str] = {
+            "window_animation_scale": "1.0",
+            "transition_animation_scale": "1.0",
+            "animator_duration_scale": "1.0",
+            "stay_on_while_plugged_in": "0",
+        }
+        self.killed_background = 0
+
+        # App state
+        self.app_running = False
+        self.logged_in = False
+        self.screen = "launcher"
+        self.last_app_screen = "main"
+        self.ready_at = 0.0  # screen elements hidden until this time (transition)
+        self.popup: Optional[str] = None
+        self.promo_close_hidden = False
+        self.frozen = False  # app shows nothing until force-stopped
+        self.tutorial_step = 0
+        self.mobile_text = ""
+        self.otp_text = ""
+        self.message = ""
+        self.otp_code = ""
+        self.otp_sent_at = 0.0
+        self.sms_delivered_at = 0.0
+        self.verifying_until = 0.0
+        # Called with (serial, code) when an OTP SMS arrives (push delivery)
+        self.sms_listener: Optional[Callable[[str, str], None]] = None
+        # Open logcat readers; lines are only produced while one is attached
+        self.log_streams: List["queue.Queue[Optional[str]]"] = []
+        self.pid = 0
+        self.launch_count = 0
+        self.crash_count = 0
+        self.heat = 0.0  # degrees above ambient
+        self.heat_at = time.monotonic()
+        # Rendering stats of the app process (reset when it restarts); frame
+        # times have their own random stream so flows stay reproducible
+        self.frame_rng = random.Random(seed)
+        self.frames: Dict[int, int] = {}  # histogram bucket ms -> frames
+        self.slow_ui_frames = 0
+        self.pss = _BASE_PSS
+
+    def rpc(self, base: float):
+        """Account for one RPC and sleep for its simulated latency."""
+        if not self.reachable:
+            raise ConnectionResetError(f"Simulated device {self.serial} unreachable")
+        with self.lock:
+            self.rpc_count += 1
+            delay = self.config.latency.delay(base, self.rng)
+            heat = self._heat()
+            # RPCs slow down as the CPU throttles
+            delay *= 1.0 + max(0.0, _AMBIENT + min(heat, 25.0) - _THROTTLE_AT) / 10
+            self.heat = heat + _HEAT_PER_RPC
+        if delay:
+            time.sleep(delay)
+
+    def _heat(self) -> float:
+        # Caller holds self.lock; decays the accumulated heat up to now
+        now = time.monotonic()
+        heat = self.heat * 0.5 ** ((now - self.heat_at) / _HEAT_HALF_LIFE)
+        self.heat_at = now
+        return heat
+
+    def temperature(self) -> float:
+        """SoC temperature in degrees Celsius."""
+        with self.lock:
+            self.heat = self._heat()
+            return _AMBIENT + min(self.heat, 25.0)
+
+    def cpu_freq(self) -> int:
+        """Current frequency of each core in kHz."""
+        over = max(0.0, self.temperature() - _THROTTLE_AT)
+        return int(_MAX_FREQ_KHZ / (1.0 + over / 10))
+
+    def _render(self, frames: int, slow_rate: float):
+        # Caller holds self.lock; a hot SoC stretches every frame
+        stretch = 1.0 + max(0.0, min(self._heat(), 25.0) + _AMBIENT - _THROTTLE_AT) / 10
+        for _ in range(frames):
+            if self.frame_rng.random() < slow_rate:
+                ms = self.frame_rng.uniform(18, 60)
+                self.slow_ui_frames += 1
+            else:
+                ms = max(2.0, self.frame_rng.gauss(7, 1.5))
+            ms *= stretch
+            bucket = next((b for b in _GFX_BUCKETS if b >= ms), _GFX_BUCKETS[-1])
+            self.frames[bucket] = self.frames.get(bucket, 0) + 1
+
+    def gfxinfo(self) -> str:
+        """Output of `dumpsys gfxinfo` for the app."""
+        with self.lock:
+            if not self.app_running:
+                return f"No process found for: {DEFAULT_PACKAGE}\n"
+            frames = dict(self.frames)
+            pid, slow_ui = self.pid, self.slow_ui_frames
+        total = sum(frames.values())
+        janky = sum(n for ms, n in frames.items() if ms > _FRAME_BUDGET_MS)
+        lines = [
+            "Applications Graphics Acceleration Info:",
+            f"** Graphics info for pid {pid} [{DEFAULT_PACKAGE}] **",
+            f"Total frames rendered: {total}",
+            f"Janky frames: {janky} ({100 * janky / max(total, 1):.2f}%)",
+        ]
+        for percentile in (50, 90, 95, 99):
+            seen, value = 0, 0
+            for ms in _GFX_BUCKETS:
+                seen += frames.get(ms, 0)
+                if total and seen >= total * percentile / 100:
+                    value = ms
+                    break
+            lines.append(f"{percentile}th percentile: {value}ms")
+        lines += [
+            f"Number Missed Vsync: {janky // 2}",
+            "Number High input latency: 0",
+            f"Number Slow UI thread: {slow_ui}",
+            "Number Slow bitmap uploads: 0",
+            f"Number Slow issue draw commands: {janky - slow_ui}",
+            "HISTOGRAM: "
+            + " ".join(f"{ms}ms={frames.get(ms, 0)}" for ms in _GFX_BUCKETS),
+        ]
+        return "\n".join(lines) + "\n"
+
+    def _advance(self, now: float):
+        if self.screen == "verifying" and now >= self.verifying_until:
+            self.logged_in = True
+            self._goto("home", now)
+
+    def _goto(self, screen: str, now: float):
+        if (
+            screen != "launcher"
+            and self.config.crash_rate
+            and self.rng.random() < self.config.crash_rate
+        ):
+            self._crash()
+            return
+        self.screen = screen
+        if screen != "launcher":
+            self.last_app_screen = screen
+            self.pss += _PSS_PER_SCREEN
+            self._render(24, 0.08)
+        latency = self.config.latency
+        self.ready_at = now + latency.delay(
+            latency.transition + latency.animation * self.animation_scale(), self.rng
+        )
+        if screen in _SCREEN_ACTIVITIES and self.log_streams:
+            self._log(
+                "ActivityTaskManager",
+                f"Displayed {DEFAULT_PACKAGE}/{_SCREEN_ACTIVITIES[screen]}: "
+                f"+{int((self.ready_at - now) * 1000)}ms",
+                at=self.ready_at,
+            )
+            self._log("MYIM3", f"screen={screen}", at=self.ready_at, pid=self.pid)
+
+    def _log(
+        self,
+        tag: str,
+        message: str,
+        at: Optional[float] = None,
+        pid: int = _SYSTEM_PID,
+        level: str = "I",
+    ):
+        # Caller holds self.lock; `at` is a time.monotonic() value
+        if not self.log_streams:
+            return
+        delay = 0.0 if at is None else max(0.0, at - time.monotonic())
+        wall = time.time() + delay
+        stamp = time.strftime("%m-%d %H:%M:%S", time.localtime(wall))
+        line = (
+            f"{stamp}.{int(wall * 1000) % 1000:03d} {pid:5d} {pid:5d} "
+            f"{level} {tag}: {message}\n"
+        )
+        streams = list(self.log_streams)
+        if delay:
+            timer = threading.Timer(delay, self._emit, (streams, line))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._emit(streams, line)
+
+    @staticmethod
+    def _emit(streams: List["queue.Queue[Optional[str]]"], line: str):
+        for stream in streams:
+            stream.put(line)
+
+    def open_log_stream(self) -> "SimulatedLogStream":
+        """Attach a logcat reader (`logcat -T 1`)."""
+        with self.lock:
+            stream = SimulatedLogStream(self)
+            self.log_streams.append(stream.lines)
+            # -T 1 starts with the newest entry already in the buffer
+            self._log("ActivityManager", "logcat attached")
+        return stream
+
+    def _crash(self):
+        # Caller holds self.lock
+        self.crash_count += 1
+        self._log("AndroidRuntime", "FATAL EXCEPTION: main", pid=self.pid, level="E")
+        self._log(
+            "AndroidRuntime",
+            f"Process: {DEFAULT_PACKAGE}, PID: {self.pid}",
+            pid=self.pid,
+            level="E",
+        )
+        self._log(
+            "AndroidRuntime",
+            "java.lang.IllegalStateException: simulated crash",
+            pid=self.pid,
+            level="E",
+        )
+        self.app_running = False
+        self.popup = None
+        self.screen = "launcher"
+        self.last_app_screen = "main"
+
+    def crash(self):
+        """Crash the app now, as an uncaught exception would."""
+        with self.lock:
+            if self.app_running:
+                self._crash()
+
+    def animation_scale(self) -> float:
+        """Transition animation scale currently set on the device."""
+        try:
+            return float(self.settings.get("transition_animation_scale", "1.0"))
+        except ValueError:
+            return 1.0
+
+    def countdown_remaining(self, now: float) -> int:
+        """Seconds left before the OTP resend button becomes available."""
+        elapsed = now - self.otp_sent_at
+        return max(0, int(self.config.otp_countdown - elapsed + 0.999))
+
+    def read_sms(self) -> Optional[str]:
+        """Return the current OTP code once its SMS has been delivered."""
+        with self.lock:
+            if self.otp_code and time.monotonic() >= self.sms_delivered_at:
+                return self.otp_code
+        return None
+
+    def _send_otp(self, now: float):
+        self.otp_code = f"{self.rng.randrange(10**6):06d}"
+        self.otp_sent_at = now
+        low, high = self.config.sms_delay
+        self.sms_delivered_at = now + self.rng.uniform(low, high)
+        if self.sms_listener is not None:
+            timer = threading.Timer(
+                self.sms_delivered_at - now,
+                self.sms_listener,
+                (self.serial, self.otp_code),
+            )
+            timer.daemon = True
+            timer.start()
+
+    def _row(self, row: int, span: int = 1, left=0.05, right=0.95):
+        w, h = self.config.width, self.config.height
+        return (
+            int(w * left),
+            int(h * row / _ROWS),
+            int(w * right),
+            int(h * (row + span) / _ROWS),
+        )
+
+    def nodes(self, now: float) -> List[_Node]:
+        """Build the visible hierarchy for the current state."""
+        self._advance(now)
+        if self.screen == "launcher" or self.frozen or now < self.ready_at:
+            return []
+
+        full = (0, 0, self.config.width, self.config.height)
+        nodes = [_Node(_ID + "action_bar_root", _LAYOUT, bounds=full)]
+
+        if self.screen in ("main", "home"):
+            nodes.append(
+                _Node(
+                    _ID + "navigation_account",
+                    clickable=True,
+                    text="Account",
+                    bounds=self._row(19, left=0.75, right=1.0),
+                )
+            )
+            if self.screen == "home":
+                nodes += [
+                    _Node(_ID + "home", _LAYOUT, bounds=self._row(1, 17)),
+                    _Node(_ID + "dashBoardView", _LAYOUT, bounds=self._row(2, 10)),
+                ]
+        elif self.screen == "login":
+            nodes += [
+                _Node(_ID + "clLogin", _LAYOUT, bounds=self._row(2, 16)),
+                _Node(
+                    _ID + "tilMobileNumber",
+                    _LAYOUT,
+                    clickable=True,
+                    bounds=self._row(4),
+                ),
+                _Node(
+                    _ID + "etMobileNumber",
+                    _EDIT_TEXT,
+                    text=self.mobile_text,
+                    clickable=True,
+                    bounds=self._row(4),
+                ),
+                _Node(
+                    _ID + "btnContinue",
+                    _BUTTON,
+                    text="Continue",
+                    clickable=True,
+                    enabled=len(re.sub(r"\D", "", self.mobile_text)) >= 10,
+                    bounds=self._row(16),
+                ),
+            ]
+        elif self.screen == "otp":
+            remaining = self.countdown_remaining(now)
+            nodes += [
+                _Node(
+                    _ID + "tvLoginVerification",
+                    text="Login Verification",
+                    bounds=self._row(2),
+                ),
+                _Node(
+                    _ID + "tvOtpSentContent",
+                    text="OTP Code was sent to",
+                    bounds=self._row(3),
+                ),
+                _Node(_ID + "tvMSISDN", text=self.phone_number, bounds=self._row(4)),
+                _Node(_ID + "tvInputCode", text="Input code", bounds=self._row(5)),
+                _Node(
+                    _ID + "etOtpView",
+                    _EDIT_TEXT,
+                    text=self.otp_text,
+                    clickable=True,
+                    bounds=self._row(7),
+                ),
+                _Node(
+                    _ID + "tvCountdown",
+                    text=f"{remaining // 60:02d}:{remaining % 60:02d}",
+                    bounds=self._row(9, left=0.4, right=0.6),
+                ),
+                _Node(
+                    _ID + "tvResendOTP",
+                    text="Resend OTP",
+                    clickable=True,
+                    enabled=remaining == 0,
+                    bounds=self._row(10, left=0.3, right=0.7),
+                ),
+                _Node(
+                    _ID + "btnVerify",
+                    _BUTTON,
+                    text="Verify",
+                    clickable=True,
+                    enabled=len(self.otp_text) == 6,
+                    bounds=self._row(16),
+                ),
+            ]
+            if self.message:
+                nodes.append(
+                    _Node(_ID + "tvMessage", text=self.message, bounds=self._row(12))
+                )
+        elif self.screen == "verifying":
+            remaining = max(0, int(self.verifying_until - now + 0.999))
+            nodes += [
+                _Node(
+                    _ID + "tvVerifyingYourNumber",
+                    text="Verifying your number",
+                    bounds=self._row(6),
+                ),
+                _Node(_ID + "tvPleaseWait", text="Please wait", bounds=self._row(7)),
+                _Node(_ID + "tvTimer", text=str(remaining), bounds=self._row(8)),
+            ]
+
+        nodes += self._popup_nodes()
+        return nodes
+
+    def _popup_nodes(self) -> List[_Node]:
+        w, h = self.config.width, self.config.height
+        if self.popup == "promo":
+            close_bounds = (w - 100, 50, w, 150)
+            if self.promo_close_hidden:
+                close_bounds = (w - 260, 220, w - 160, 320)
+            return [
+                _Node(
+                    _ID + "inapp_html_full_relative_layout",
+                    _LAYOUT,
+                    bounds=(0, 0, w, h),
+                    popup=True,
+                ),
+                _Node(
+                    "button-2",
+                    _BUTTON,
+                    text="X",
+                    clickable=True,
+                    bounds=close_bounds,
+                    popup=True,
+                    id_hidden=self.promo_close_hidden,
+                ),
+            ]
+        if self.popup == "tutorial":
+            return [
+                _Node(_ID + "skip_layout", _LAYOUT, bounds=(0, 0, w, h), popup=True),
+                _Node(
+                    _ID + "tvSkip",
+                    text="SKIP",
+                    clickable=True,
+                    bounds=self._row(18, left=0.05, right=0.3),
+                    popup=True,
+                ),
+                _Node(
+                    _ID + "tvNext",
+                    text="Next",
+                    clickable=True,
+                    bounds=self._row(18, left=0.7, right=0.95),
+                    popup=True,
+                ),
+            ]
+        return []
+
+    def find(self, selector: Dict[str, str]) -> Optional[_Node]:
+        """Find the first node matching a uiautomator2-style selector."""
+        with self.lock:
+            for node in self.nodes(time.monotonic()):
+                if node.matches(selector):
+                    return node
+        return None
+
+    def screenshot(self) -> bytes:
+        """Binary PPM of the screen at 1/20 scale, one colour per screen."""
+        with self.lock:
+            name = self.popup or self.screen
+        width, height = self.config.width // 20, self.config.height // 20
+        pixel = _screen_colour(name)[:3]
+        return f"P6 {width} {height} 255\n".encode() + pixel * (width * height)
+
+    def screencap(self) -> bytes:
+        """
+        Full-resolution raw frame as `screencap` writes it (RGBA_8888).
+
+        One colour per screen; clickable popup elements are drawn as white
+        boxes, with a cross for close buttons.
+        """
+        with self.lock:
+            name = self.popup or self.screen
+            nodes = self.nodes(time.monotonic()) if self.popup else []
+        width, height = self.config.width, self.config.height
+        rows = [_screen_colour(name) * width] * height
+        for node in nodes:
+            if not (node.popup and node.clickable):
+                continue
+            left, top, right, bottom = node.bounds
+            box = _button_rows(right - left, bottom - top, node.text == "X")
+            for y, pixels in enumerate(box, start=top):
+                row = rows[y]
+                rows[y] = row[: left * 4] + pixels + row[right * 4 :]
+        header = struct.pack("<IIII", width, height, 1, 0)
+        return header + b"".join(rows)
+
+    def dump_hierarchy(self) -> str:
+        """Render the hierarchy in uiautomator's XML dump format."""
+        with self.lock:
+            nodes = self.nodes(time.monotonic())
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<hierarchy rotation="0">']
+        for index, node in enumerate(nodes):
+            left, top, right, bottom = node.bounds
+            lines.append(
+                f'<node index="{index}" text={quoteattr(node.text)} '
+                f'resource-id={quoteattr(node.visible_id)} class="{node.class_name}" '
+                f'package="{DEFAULT_PACKAGE}" content-desc="" '
+                f'clickable="{str(node.clickable).lower()}" '
+                f'enabled="{str(node.enabled).lower()}" '
+                f'bounds="[{left},{top}][{right},{bottom}]" />'
+            )
+        lines.append("</hierarchy>")
+        return "\n".join(lines)
+
+    def click_node(self, resource_id: str):
+        """Handle a click on the element with the given resource ID."""
+        with self.lock:
+            now = time.monotonic()
+            node = next(
+                (n for n in self.nodes(now) if n.resource_id == resource_id), None
+            )
+            if node is None:
+                raise SimulatedUiObjectNotFoundError(resource_id)
+            # Popups swallow clicks aimed at the screen underneath
+            if self.popup and not node.popup:
+                return
+            if not node.enabled:
+                return
+            self._on_click(resource_id, now)
+
+    def click_point(self, x: int, y: int):
+        """Handle a tap at screen coordinates."""
+        with self.lock:
+            now = time.monotonic()
+            target = None
+            for node in self.nodes(now):
+                left, top, right, bottom = node.bounds
+                if node.clickable and left <= x < right and top <= y < bottom:
+                    target = node  # later nodes are drawn on top
+            if target is None or (self.popup and not target.popup):
+                return
+            if target.enabled:
+                self._on_click(target.resource_id, now)
+
+    def _on_click(self, resource_id: str, now: float):
+        name = resource_id.replace(_ID, "")
+        if self.app_running:
+            self._render(6, 0.02)  # ripple
+        if name == "button-2":
+            self.popup = None
+        elif name == "tvSkip":
+            self.popup = None
+        elif name == "tvNext":
+            self.tutorial_step += 1
+            if self.tutorial_step >= self.config.tutorial_steps:
+                self.popup = None
+        elif name == "navigation_account" and not self.logged_in:
+            self.mobile_text = ""
+            self._goto("login", now)
+        elif name == "btnContinue":
+            self.otp_text = ""
+            self.message = ""
+            self._send_otp(now)
+            self._goto("otp", now)
+        elif name == "btnVerify":
+            self._verify_otp(now)
+        elif name == "tvResendOTP":
+            self._send_otp(now)
+            self.message = "OTP successfully sent"
+
+    def _verify_otp(self, now: float):
+        if self.countdown_remaining(now) == 0:
+            self.message = "OTP has expired"
+        elif (
+            self.otp_text != self.otp_code
+            or self.rng.random() < self.config.invalid_otp_rate
+        ):
+            self.message = "Invalid OTP code"
+        else:
+            self.message = ""
+            self.verifying_until = now + self.config.verify_seconds
+            self._goto("verifying", now)
+            self._log("MYIM3", "verification complete", self.verifying_until, self.pid)
+
+    def set_text(self, resource_id: str, class_name: str, text: str):
+        """Replace the text of an input field."""
+        with self.lock:
+            if self.app_running:
+                self._render(len(text), 0.02)  # one frame per character
+            if self.screen == "login":
+                self.mobile_text = text
+            elif self.screen == "otp":
+                self.otp_text = text[:6]
+                self.message = ""
+
+    def press_key(self, keycode: int):
+        """Handle an Android key event."""
+        with self.lock:
+            now = time.monotonic()
+            if keycode == 3:  # HOME
+                self.screen = "launcher"
+            elif keycode == 4:  # BACK
+                if self.popup:
+                    self.popup = None
+                elif self.screen == "otp":
+                    self._goto("login", now)
+                elif self.screen == "login":
+                    self._goto("main", now)
+                elif self.screen != "launcher":
+                    self.screen = "launcher"
+
+    def launch_app(self):
+        """Bring the app to the foreground, cold-starting it if needed."""
+        with self.lock:
+            now = time.monotonic()
+            if self.app_running:
+                self._goto(self.last_app_screen, now)
+                return
+            self.app_running = True
+            self.launch_count += 1
+            self.pid = 3000 + self.launch_count
+            self.frames = {}
+            self.slow_ui_frames = 0
+            self.pss = _BASE_PSS
+            self._render(40, 0.25)  # first frames inflate layouts
+            self._log(
+                "ActivityManager",
+                f"Start proc {self.pid}:{DEFAULT_PACKAGE}/u0a245 for "
+                f"activity {{{_ACTIVITY}}}",
+            )
+            self._goto("home" if self.logged_in else "main", now)
+            if self.rng.random() < self.config.popup_rate:
+                self.popup = self.rng.choice(["promo", "tutorial"])
+                self.tutorial_step = 0
+                rate = self.config.promo_close_id_rate
+                # Only draw when configured so default runs stay reproducible
+                self.promo_close_hidden = (
+                    self.popup == "promo" and rate < 1.0 and self.rng.random() >= rate
+                )
+
+    def start_activity(self, force_stop: bool, clear_task: bool) -> str:
+        """Emulate `am start -W`: launch, wait for the first frame, report."""
+        if force_stop:
+            self.stop_app()
+        latency = self.config.latency
+        with self.lock:
+            if not self.app_running:
+                state, extra = "COLD", latency.cold_start
+            elif clear_task:
+                state, extra = "WARM", latency.warm_start
+                self.last_app_screen = "home" if self.logged_in else "main"
+            else:
+                state, extra = "HOT", 0.0
+        self.launch_app()
+        with self.lock:
+            self.ready_at += latency.delay(extra, self.rng)
+            wait = max(0.0, self.ready_at - time.monotonic())
+        if wait:
+            time.sleep(wait)  # -W returns once the first frame is drawn
+        total = int(wait * 1000)
+        return (
+            f"Starting: Intent {{ cmp={_ACTIVITY} }}\n"
+            "Status: ok\n"
+            f"LaunchState: {state}\n"
+            f"Activity: {_ACTIVITY}\n"
+            f"TotalTime: {total}\n"
+            f"WaitTime: {total + 5}\n"
+            "Complete\n"
+        )
+
+    def focused_activity(self) -> str:
+        """Component of the window that currently has focus."""
+        with self.lock:
+            in_app = self.app_running and self.screen != "launcher"
+        return _ACTIVITY if in_app else _HOME_ACTIVITY
+
+    def stop_app(self):
+        """Force-stop the app."""
+        with self.lock:
+            self.app_running = False
+            self.frozen = False
+            self.popup = None
+            self.screen = "launcher"
+            self.last_app_screen = "main"
+
+    def clear_app_data(self):
+        """Equivalent of `pm clear`: stops the app and logs out."""
+        self.stop_app()
+        with self.lock:
+            self.logged_in = False
+
+    def shell(self, command: str) -> str:
+        """Emulate the subset of `adb shell` commands used by the app."""
+        if ";" in command:
+            return "".join(self.shell(part) for part in command.split(";"))
+        command = command.strip()
+        match = re.match(r"settings (get|put|delete) global (\S+)(?: (\S+))?$", command)
+        if match:
+            action, name, value = match.groups()
+            with self.lock:
+                if action == "get":
+                    return self.settings.get(name, "null") + "\n"
+                if action == "put":
+                    self.settings[name] = value or ""
+                else:
+                    self.settings.pop(name, None)
+            return ""
+        if command.startswith("echo "):
+            return command[5:] + "\n"
+        match = re.match(r"cat (\S+) 2>/dev/null$", command)
+        if match:
+            path = match.group(1)
+            if path.endswith("/cpufreq/scaling_cur_freq"):
+                return f"{self.cpu_freq()}\n" * _CORES
+            if path.endswith("/cpufreq/cpuinfo_max_freq"):
+                return f"{_MAX_FREQ_KHZ}\n" * _CORES
+            if path == "/sys/class/thermal/thermal_zone*/temp":
+                soc = int(self.temperature() * 1000)
+                return f"{soc}\n{soc - 4000}\n-273000\n"
+            return ""
+        if command in ("input keyevent KEYCODE_WAKEUP", "wm dismiss-keyguard"):
+            return ""
+        if command.startswith("cmd package resolve-activity"):
+            if command.endswith(f" {DEFAULT_PACKAGE}"):
+                return f"priority=0 preferredOrder=0 match=0x108000\n{_ACTIVITY}\n"
+            return "No activity found\n"
+        if command.startswith("dumpsys window"):
+            focus = self.focused_activity()
+            return f"  mCurrentFocus=Window{{5e1f0a2 u0 {focus}}}\n"
+        match = re.match(r"am start -W (-S |-f 0x10008000 )?-n (\S+)$", command)
+        if match:
+            if match.group(2) != _ACTIVITY:
+                return (
+                    "Error type 3\nError: Activity class "
+                    f"{{{match.group(2)}}} does not exist.\n"
+                )
+            option = match.group(1) or ""
+            return self.start_activity("-S" in option, "-f" in option)
+        if command == f"pidof {DEFAULT_PACKAGE}":
+            with self.lock:
+                return f"{self.pid}\n" if self.app_running else ""
+        if command.startswith("dumpsys activity top"):
+            with self.lock:
+                running = self.app_running and self.screen != "launcher"
+                pid = self.pid
+            if not running:
+                return "  TASK com.android.launcher3 id=1 userId=0\n"
+            activity = _SCREEN_ACTIVITIES.get(self.last_app_screen, ".MainActivity")
+            return (
+                "  TASK com.android.launcher3 id=1 userId=0\n"
+                f"  TASK {DEFAULT_PACKAGE} id=12 userId=0\n"
+                f"    ACTIVITY {DEFAULT_PACKAGE}/{activity} 8a2f8e5 pid={pid}\n"
+            )
+        if command == f"dumpsys package {DEFAULT_PACKAGE}":
+            return (
+                "Packages:\n"
+                f"  Package [{DEFAULT_PACKAGE}] (4b1c2d3):\n"
+                "    userId=10245\n"
+                f"    pkg=Package{{9e8d7c6 {DEFAULT_PACKAGE}}}\n"
+                "    versionCode=2024120 minSdk=23 targetSdk=34\n"
+                f"    versionName={self.app_version}\n"
+                "    firstInstallTime=2024-05-02 10:11:12\n"
+                "    lastUpdateTime=2024-11-20 08:09:10\n"
+            )
+        if command == f"dumpsys meminfo {DEFAULT_PACKAGE}":
+            with self.lock:
+                if not self.app_running:
+                    return f"No process found for: {DEFAULT_PACKAGE}\n"
+                pid, total_pss = self.pid, self.pss
+            java_heap = 24512 + total_pss - _BASE_PSS
+            return (
+                f"Applications Memory Usage (in Kilobytes):\n"
+                f"** MEMINFO in pid {pid} [{DEFAULT_PACKAGE}] **\n"
+                " App Summary\n"
+                "                       Pss(KB)                        Rss(KB)\n"
+                "                        ------                         ------\n"
+                f"           Java Heap:{java_heap:>9}                          36200\n"
+                "         Native Heap:    31840                          33012\n"
+                "                Code:    18220                          60344\n"
+                "               Stack:     1204                           1212\n"
+                "            Graphics:    20480                          20480\n"
+                "       Private Other:     6120\n"
+                "              System:    12004\n"
+                "             Unknown:                                    4120\n"
+                f"           TOTAL PSS:{total_pss:>9}            TOTAL RSS:   155368"
+                "       TOTAL SWAP PSS:       12\n"
+            )
+        if command == f"dumpsys gfxinfo {DEFAULT_PACKAGE}":
+            return self.gfxinfo()
+        if command.startswith("dumpsys power"):
+            return "  mWakefulness=Awake\n"
+        if command == "am kill-all":
+            with self.lock:
+                self.killed_background += 1
+            return ""
+        if command.startswith("getprop "):
+            return self.properties.get(command.split(None, 1)[1], "") + "\n"
+        if command == "dumpsys battery":
+            battery_temp = int(280 + (self.temperature() - _AMBIENT) * 4)
+            return (
+                "Current Battery Service state:\n"
+                "  AC powered: false\n"
+                "  USB powered: true\n"
+                "  status: 2\n"
+                "  health: 2\n"
+                "  present: true\n"
+                f"  level: {self.battery_level}\n"
+                "  scale: 100\n"
+                "  voltage: 4200\n"
+                f"  temperature: {battery_temp}\n"
+            )
+        match = re.match(r"service call iphonesubinfo (\d+) i32 (\d+)", command)
+        if match:
+            code, sub_id = int(match.group(1)), int(match.group(2))
+            if code == _LINE1_CODE and sub_id == 1:
+                return _parcel("+62" + self.phone_number[1:])
+            return _parcel("")
+        match = re.match(r"input keyevent (\d+)$", command)
+        if match:
+            self.press_key(int(match.group(1)))
+            return ""
+        if command.startswith("monkey ") and DEFAULT_PACKAGE in command:
+            self.launch_app()
+            return "Events injected: 1\n"
+        if command == f"am force-stop {DEFAULT_PACKAGE}":
+            self.stop_app()
+            return ""
+        if command == f"pm clear {DEFAULT_PACKAGE}":
+            self.clear_app_data()
+            return "Success\n"
+        return f"/system/bin/sh: {command.split()[0]}: not found\n"
+
+
+class SimulatedLogStream:
+    """Output of a `logcat` shell stream on a SimulatedDevice."""
+
+    def __init__(self, device: SimulatedDevice):
+        self.device = device
+        self.lines: "queue.Queue[Optional[str]]" = queue.Queue()
+
+    def readline(self) -> str:
+        return self.lines.get() or ""
+
+    def close(self):
+        with self.device.lock:
+            if self.lines in self.device.log_streams:
+                self.device.log_streams.remove(self.lines)
+        self.lines.put(None)
+
+
+class SimulatedUiObject:
+    """uiautomator2 UiObject surface backed by a SimulatedDevice."""
+
+    def __init__(self, device: SimulatedDevice, selector: Dict[str, str]):
+        self.device = device
+        self.selector = selector
+
+    def _node(self) -> _Node:
+        node = self.device.find(self.selector)
+        if node is None:
+            raise SimulatedUiObjectNotFoundError(str(self.selector))
+        return node
+
+    @property
+    def exists(self) -> bool:
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        return self.device.find(self.selector) is not None
+
+    @property
+    def info(self) -> Dict:
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        return self._node().to_info()
+
+    def wait(self, exists: bool = True, timeout: Optional[float] = None) -> bool:
+        # One JSON-RPC; uiautomator polls on the device until it returns
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        deadline = time.monotonic() + (timeout if timeout is not None else 20.0)
+        while True:
+            if (self.device.find(self.selector) is not None) == exists:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+
+    def wait_gone(self, timeout: Optional[float] = None) -> bool:
+        return self.wait(exists=False, timeout=timeout)
+
+    def click(self):
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        self.device.click_node(self._node().resource_id)
+
+    def click_exists(self, timeout: float = 0) -> bool:
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        node = self.device.find(self.selector)
+        if node is None:
+            return False
+        self.device.click_node(node.resource_id)
+        return True
+
+    def get_text(self) -> str:
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        return self._node().text
+
+    def set_text(self, text: str):
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        node = self._node()
+        self.device.set_text(node.resource_id, node.class_name, text)
+
+    def send_keys(self, text: str):
+        self.set_text(text)
+
+    def clear_text(self):
+        self.set_text("")
+
+
+class SimulatedUiDevice:
+    """uiautomator2 Device surface backed by a SimulatedDevice."""
+
+    def __init__(self, device: SimulatedDevice):
+        self.device = device
+        self.serial = device.serial
+
+    def __call__(self, **selector) -> SimulatedUiObject:
+        return SimulatedUiObject(self.device, selector)
+
+    def click(self, x, y):
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        self.device.click_point(int(x), int(y))
+
+    def swipe(self, *args, **kwargs):
+        self.device.rpc(self.device.config.latency.ui_rpc)
+
+    def window_size(self) -> Tuple[int, int]:
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        return self.device.config.width, self.device.config.height
+
+    def press(self, key: str):
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        self.device.press_key({"home": 3, "back": 4, "menu": 82}[key])
+
+    def app_start(self, package_name: str):
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        if package_name == DEFAULT_PACKAGE:
+            self.device.launch_app()
+
+    def app_stop(self, package_name: str):
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        if package_name == DEFAULT_PACKAGE:
+            self.device.stop_app()
+
+    def app_info(self, package_name: str) -> Dict[str, str]:
+        self.device.rpc(self.device.config.latency.shell)
+        if package_name != DEFAULT_PACKAGE:
+            raise SimulatedUiObjectNotFoundError(package_name)
+        return {"versionName": self.device.app_version, "versionCode": 2024120}
+
+    def app_current(self) -> Dict[str, str]:
+        self.device.rpc(self.device.config.latency.ui_rpc)
+        if self.device.screen == "launcher":
+            return {"package": "com.android.launcher3", "activity": ".Launcher"}
+        return {"package": DEFAULT_PACKAGE, "activity": ".MainActivity"}
+
+    def dump_hierarchy(self) -> str:
+        self.device.rpc(self.device.config.latency.ui_rpc * 4)
+        return self.device.dump_hierarchy()
+
+    def screenshot(self, format: str = "pillow"):
+        self.device.rpc(self.device.config.latency.ui_rpc * 2)
+        return self.device.screenshot()
+
+
+class SimulatedAdbDevice:
+    """ppadb Device surface backed by a SimulatedDevice."""
+
+    def __init__(self, device: SimulatedDevice):
+        self.device = device
+        self.serial = device.serial
+
+    def shell(self, command: str) -> str:
+        self.device.rpc(self.device.config.latency.shell)
+        return self.device.shell(command)
+
+    def install(self, *args, **kwargs) -> bool:
+        self.device.rpc(self.device.config.latency.shell)
+        return True
+
+    def uninstall(self, *args, **kwargs) -> bool:
+        self.device.rpc(self.device.config.latency.shell)
+        return True
+
+
+class SimulatedFarm:
+    """A set of simulated devices sharing one configuration."""
+
+    def __init__(
+        self,
+        count: int,
+        config: Optional[SimulatedDeviceConfig] = None,
+        seed: int = 0,
+    ):
+        """Create the farm.
+
+        Args:
+            count: Number of simulated devices
+            config: Behaviour configuration shared by all devices
+            seed: Base seed; each device derives its own from it
+        """
+        self.config = config or SimulatedDeviceConfig()
+        self.devices: Dict[str, SimulatedDevice] = {}
+        for i in range(count):
+            serial = f"SIM{i:04d}"
+            phone_number = f"0856{i:08d}"
+            self.devices[serial] = SimulatedDevice(
+                serial, phone_number, self.config, seed=seed * 100003 + i
+            )
+
+    @property
+    def rpc_count(self) -> int:
+        return sum(device.rpc_count for device in self.devices.values())
+
+    def on_sms(self, callback: Callable[[str, str], None]):
+        """Push every OTP SMS to `callback(serial, code)` when it arrives."""
+        for device in self.devices.values():
+            device.sms_listener = callback
+
+
+class SimulatedAdbClient:
+    """ppadb Client surface backed by a SimulatedFarm, or part of it."""
+
+    def __init__(self, farm: SimulatedFarm, serials: Optional[List[str]] = None):
+        self.farm = farm
+        self.serials = serials  # devices attached to this server (None: all)
+        self.online = True
+
+    def _attached(self) -> List[str]:
+        return list(self.farm.devices) if self.serials is None else self.serials
+
+    def _check(self):
+        if not self.online:
+            raise ConnectionRefusedError("Simulated ADB server is down")
+
+    def stop(self):
+        """Take the server away: its calls and its devices' RPCs fail."""
+        self.online = False
+        for serial in self._attached():
+            self.farm.devices[serial].reachable = False
+
+    def start(self):
+        """Bring the server and its devices back."""
+        for serial in self._attached():
+            self.farm.devices[serial].reachable = True
+        self.online = True
+
+    def version(self) -> int:
+        self._check()
+        return 41
+
+    def devices(self) -> List[SimulatedAdbDevice]:
+        self._check()
+        return [SimulatedAdbDevice(self.farm.devices[s]) for s in self._attached()]
+
+    def device(self, serial: str) -> Optional[SimulatedAdbDevice]:
+        self._check()
+        device = self.farm.devices.get(serial)
+        if device is None or serial not in self._attached():
+            return None
+        return SimulatedAdbDevice(device)
+
+
+class SimulatedTrackStream:
+    """`host:track-devices` of a SimulatedAdbClient, polled for changes."""
+
+    def __init__(self, client: SimulatedAdbClient):
+        client._check()
+        self.client = client
+        self.closed = threading.Event()
+        self.last: Optional[Dict[str, str]] = None
+
+    def read(self) -> Optional[Dict[str, str]]:
+        while not self.closed.is_set():
+            if not self.client.online:
+                raise ConnectionResetError("Simulated ADB server went away")
+            devices = dict.fromkeys(self.client._attached(), "device")
+            if devices != self.last:
+                self.last = devices
+                return devices
+            self.closed.wait(0.05)
+        return None
+
+    def close(self):
+        self.closed.set()
+
+
+class SimulatedDeviceService(DeviceService):
+    """DeviceService backed by a SimulatedFarm instead of real phones."""
+
+    def __init__(
+        self, farm: SimulatedFarm, logcat: bool = False, artifacts: bool = False
+    ):
+        """Initialize the simulated service.
+
+        Args:
+            farm: Simulated devices to expose
+            logcat: Start logcat event streams (off: flows only poll)
+            artifacts: Capture recent screens in the background during flows
+        """
+        self.farm = farm
+        super().__init__()
+        self.logcat_enabled = logcat
+        if not artifacts:
+            self.artifacts = None
+
+    def _create_adb_client(self, host: str, port: int):
+        return SimulatedAdbClient(self.farm)
+
+    def _connect_ui(self, serial: str):
+        device = self.farm.devices.get(serial)
+        if device is None:
+            raise ConnectionError(f"Simulated device {serial} not found")
+        return SimulatedUiDevice(device)
+
+    def _open_shell_stream(self, serial: str, command: str):
+        device = self.farm.devices.get(serial)
+        if device is None:
+            raise ConnectionError(f"Simulated device {serial} not found")
+        if not command.startswith("logcat "):
+            raise ValueError(f"Unsupported shell stream: {command}")
+        return device.open_log_stream()
+
+    def _exec_out(self, serial: str, command: str) -> bytes:
+        device = self.farm.devices.get(serial)
+        if device is None:
+            raise ConnectionError(f"Simulated device {serial} not found")
+        if command != "screencap":
+            raise ValueError(f"Unsupported exec command: {command}")
+        # ~10 MB over USB: a few shell round trips, no PNG encoding
+        device.rpc(device.config.latency.shell * 4)
+        return device.screencap()
+
+
+def create_simulated_service(
+    count: int, config: Optional[SimulatedDeviceConfig] = None, seed: int = 0
+) -> SimulatedDeviceService:
+    """Build a service over a fresh farm; picklable as a worker factory."""
+    return SimulatedDeviceService(SimulatedFarm(count, config, seed))
+
+
+class SimulatedFederatedService(FederatedDeviceService):
+    """FederatedDeviceService over a SimulatedFarm split across ADB servers."""
+
+    def __init__(
+        self,
+        farm: SimulatedFarm,
+        servers: int = 2,
+        logcat: bool = False,
+        artifacts: bool = False,
+    ):
+        """Initialize the simulated federation.
+
+        Args:
+            farm: Simulated devices, dealt round-robin to the servers
+            servers: Number of simulated ADB servers (sim-0, sim-1, ...)
+            logcat: Start logcat event streams (off: flows only poll)
+            artifacts: Capture recent screens in the background during flows
+        """
+        self.farm = farm
+        serials = list(farm.devices)
+        self.clients = {
+            f"sim-{i}:{ADB_PORT}": SimulatedAdbClient(farm, serials[i::servers])
+            for i in range(servers)
+        }
+        super().__init__([(f"sim-{i}", ADB_PORT) for i in range(servers)])
+        self.logcat_enabled = logcat
+        if not artifacts:
+            self.artifacts = None
+
+    def _create_server_client(self, host: str, port: int):
+        return self.clients[f"{host}:{port}"]
+
+    def _open_track_stream(self, server: AdbServer):
+        return SimulatedTrackStream(server.client)
+
+    def _connect_server_ui(self, server: AdbServer, serial: str):
+        return SimulatedUiDevice(self.farm.devices[serial])
+
+    # Same farm-backed transport as SimulatedDeviceService
+    _open_shell_stream = SimulatedDeviceService._open_shell_stream
+    _exec_out = SimulatedDeviceService._exec_out
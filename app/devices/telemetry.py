@@ -0,0 +1,414 @@
+# Module for sampling device telemetry during runs and relating it to flow latency
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.config.settings import DEFAULT_PACKAGE
+from app.devices.dumpsys import BATTERY, MEMINFO, SECTION_COMMANDS, parse_section
+from app.profiling import add_flow_observer
+
+logger = logging.getLogger(__name__)
+
+# Series sampled per device
+BATTERY_LEVEL = "battery_level"  # %
+BATTERY_TEMP = "battery_temp"  # degrees Celsius
+BATTERY_VOLTAGE = "battery_voltage"  # mV
+CPU_FREQ = "cpu_freq_mhz"  # mean current frequency over all cores
+CPU_FREQ_PCT = "cpu_freq_pct"  # current / maximum frequency (throttling)
+THERMAL_MAX = "thermal_max"  # hottest thermal zone, degrees Celsius
+PSS = "pss_kb"  # app process PSS
+SERIES = (
+    BATTERY_LEVEL,
+    BATTERY_TEMP,
+    BATTERY_VOLTAGE,
+    CPU_FREQ,
+    CPU_FREQ_PCT,
+    THERMAL_MAX,
+    PSS,
+)
+
+# Samples kept in memory per series (an hour at the default interval)
+RING_SIZE = 720
+# Read the app's PSS every Nth sample; dumpsys meminfo is the costly part
+PSS_EVERY = 6
+# Seconds of samples averaged into one SQLite row per series
+FLUSH_INTERVAL = 60.0
+# Flows kept in memory for the latency report
+FLOW_HISTORY = 1000
+
+_SEPARATOR = "---"
+_CPU_DIR = "/sys/devices/system/cpu/cpu*/cpufreq"
+# Battery, CPU frequencies and thermal zones in one shell round trip
+SAMPLE_COMMAND = "; ".join(
+    [
+        SECTION_COMMANDS[BATTERY],
+        f"echo {_SEPARATOR}",
+        f"cat {_CPU_DIR}/scaling_cur_freq 2>/dev/null",
+        f"echo {_SEPARATOR}",
+        "cat /sys/class/thermal/thermal_zone*/temp 2>/dev/null",
+    ]
+)
+MAX_FREQ_COMMAND = f"cat {_CPU_DIR}/cpuinfo_max_freq 2>/dev/null"
+
+
+def _numbers(text: str) -> List[int]:
+    return [int(word) for word in text.split() if word.lstrip("-").isdigit()]
+
+
+def parse_sample(output: str, max_freq_khz: int = 0) -> Dict[str, float]:
+    """
+    Parse the output of SAMPLE_COMMAND.
+
+    Args:
+        output: Shell output (battery, CPU and thermal parts)
+        max_freq_khz: Sum of the cores' maximum frequencies, 0 if unknown
+
+    Returns:
+        dict: Series name -> value, for the values that could be read
+    """
+    parts = output.split(f"{_SEPARATOR}\n")
+    values: Dict[str, float] = {}
+    battery = parse_section(BATTERY, parts[0])
+    if battery.level is not None:
+        values[BATTERY_LEVEL] = battery.percent
+    if battery.temperature is not None:
+        values[BATTERY_TEMP] = battery.temperature
+    if battery.voltage is not None:
+        values[BATTERY_VOLTAGE] = battery.voltage
+
+    freqs = _numbers(parts[1]) if len(parts) > 1 else []
+    if freqs:
+        values[CPU_FREQ] = sum(freqs) / len(freqs) / 1000
+        if max_freq_khz:
+            values[CPU_FREQ_PCT] = 100 * sum(freqs) / max_freq_khz
+
+    # Zones report millidegrees; a few report degrees, and unused ones <= 0
+    zones = _numbers(parts[2]) if len(parts) > 2 else []
+    temps = [t / 1000 if t > 1000 else t for t in zones]
+    temps = [t for t in temps if 0 < t < 150]
+    if temps:
+        values[THERMAL_MAX] = max(temps)
+    return values
+
+
+class TelemetryStore:
+    """SQLite file with downsampled series and the conditions of each flow."""
+
+    def __init__(self, path: str):
+        """Initialize the store; the file is created on first write.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        # Caller holds self.lock; sqlite3 is only loaded when telemetry is kept
+        if self._connection is None:
+            import sqlite3
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(
+                "CREATE TABLE IF NOT EXISTS telemetry ("
+                " serial TEXT, series TEXT, start REAL, seconds REAL,"
+                " count INTEGER, min REAL, avg REAL, max REAL);"
+                "CREATE INDEX IF NOT EXISTS telemetry_serial"
+                " ON telemetry (serial, series, start);"
+                "CREATE TABLE IF NOT EXISTS flows ("
+                " serial TEXT, flow TEXT, ended REAL, seconds REAL, ok INTEGER, "
+                + ", ".join(f"{name} REAL" for name in SERIES)
+                + ");"
+            )
+        return self._connection
+
+    def add_buckets(self, rows: Iterable[Tuple]):
+        """Insert (serial, series, start, seconds, count, min, avg, max) rows."""
+        rows = list(rows)
+        if not rows:
+            return
+        with self.lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT INTO telemetry VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            connection.commit()
+
+    def add_flow(self, row: Dict):
+        """Insert one flow with the mean of each series while it ran."""
+        columns = ["serial", "flow", "ended", "seconds", "ok", *SERIES]
+        with self.lock:
+            connection = self._connect()
+            connection.execute(
+                f"INSERT INTO flows ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                [row.get(column) for column in columns],
+            )
+            connection.commit()
+
+    def flows(self) -> List[Dict]:
+        """Every stored flow, oldest first."""
+        if not os.path.exists(self.path):
+            return []
+        with self.lock:
+            cursor = self._connect().execute("SELECT * FROM flows ORDER BY ended")
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def correlate(flows: Iterable[Dict]) -> Dict[str, Dict[str, Dict]]:
+    """
+    Relate flow latency to the device conditions it ran under.
+
+    Args:
+        flows: Flow rows ({"flow", "seconds", "ok", <series>: value, ...})
+
+    Returns:
+        dict: Flow -> series -> {"samples", "r", "slope"}; r is the Pearson
+            correlation of the series with the flow duration and slope the
+            extra seconds per unit of the series (None when undefined)
+    """
+    by_flow: Dict[str, List[Dict]] = {}
+    for row in flows:
+        if row.get("ok"):
+            by_flow.setdefault(row["flow"], []).append(row)
+    report = {}
+    for flow, rows in sorted(by_flow.items()):
+        report[flow] = {}
+        for name in SERIES:
+            pairs = [(r[name], r["seconds"]) for r in rows if r.get(name) is not None]
+            r = slope = None
+            if len(pairs) >= 3:
+                xs, ys = zip(*pairs)
+                try:
+                    r = statistics.correlation(xs, ys)
+                    slope = statistics.linear_regression(xs, ys).slope
+                except statistics.StatisticsError:
+                    pass  # constant series
+            report[flow][name] = {"samples": len(pairs), "r": r, "slope": slope}
+    return report
+
+
+class TelemetrySampler:
+    """
+    Background telemetry of one DeviceService.
+
+    One thread per started device reads battery, CPU frequency and thermal
+    zones in a single shell call every `interval` seconds, and the app's
+    PSS every PSS_EVERY samples. Each series is kept in a fixed-size ring
+    buffer; every FLUSH_INTERVAL the new samples are reduced to one
+    min/avg/max row per series in SQLite. Finished flows are stored with
+    the mean of each series over their duration, so correlate() can show
+    which conditions slow them down.
+    """
+
+    def __init__(
+        self,
+        device_service,
+        interval: float = 5.0,
+        db_path: Optional[str] = None,
+        package: str = DEFAULT_PACKAGE,
+    ):
+        """Initialize the sampler.
+
+        Args:
+            device_service: DeviceService used to reach the devices
+            interval: Seconds between samples of one device
+            db_path: SQLite file for downsampled series (None: memory only)
+            package: Application whose PSS is sampled
+        """
+        self.device_service = device_service
+        self.interval = interval
+        self.package = package
+        self.store = TelemetryStore(db_path) if db_path else None
+        self.series: Dict[str, Dict[str, Deque[Tuple[float, float]]]] = {}
+        self.flows: Deque[Dict] = deque(maxlen=FLOW_HISTORY)
+        self.lock = threading.Lock()
+        self._stops: Dict[str, threading.Event] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        add_flow_observer(self)
+
+    def start(self, serial: str):
+        """Start sampling a device (no-op if it is already sampled)."""
+        with self.lock:
+            if serial in self._threads:
+                return
+            self.series[serial] = {name: deque(maxlen=RING_SIZE) for name in SERIES}
+            stop = self._stops[serial] = threading.Event()
+            thread = self._threads[serial] = threading.Thread(
+                target=self._run,
+                args=(serial, stop),
+                name=f"telemetry-{serial}",
+                daemon=True,
+            )
+        thread.start()
+
+    def stop(self, serial: str):
+        """Stop sampling a device and flush its pending samples."""
+        with self.lock:
+            stop = self._stops.pop(serial, None)
+            thread = self._threads.pop(serial, None)
+        if stop is not None:
+            stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.interval + 5)
+
+    def close(self):
+        """Stop every device, flush and close the database."""
+        with self.lock:
+            serials = list(self._threads)
+        for serial in serials:
+            self.stop(serial)
+        if self.store is not None:
+            self.store.close()
+
+    def forget(self, serial: str):
+        """Stop sampling a disconnected device and drop its buffers."""
+        self.stop(serial)
+        with self.lock:
+            self.series.pop(serial, None)
+
+    def sample(self, serial: str, max_freq_khz: int = 0, pss: bool = False):
+        """
+        Take one sample of a device now.
+
+        Returns:
+            dict: Series name -> value (empty if the device is unreachable)
+        """
+        device = self.device_service.get_device(serial)
+        if device is None:
+            return {}
+        values = parse_sample(device.shell(SAMPLE_COMMAND), max_freq_khz)
+        if pss:
+            command = SECTION_COMMANDS[MEMINFO].format(arg=self.package)
+            meminfo = parse_section(MEMINFO, device.shell(command), self.package)
+            if meminfo.total_pss is not None:
+                values[PSS] = meminfo.total_pss
+        now = time.time()
+        with self.lock:
+            buffers = self.series.get(serial)
+            if buffers is not None:
+                for name, value in values.items():
+                    buffers[name].append((now, value))
+        return values
+
+    def _max_freq(self, serial: str) -> int:
+        device = self.device_service.get_device(serial)
+        if device is None:
+            return 0
+        return sum(_numbers(device.shell(MAX_FREQ_COMMAND)))
+
+    def _run(self, serial: str, stop: threading.Event):
+        max_freq = 0
+        count = 0
+        flushed_at = time.time()
+        while not stop.is_set():
+            # Quarantined devices are left alone until they recover
+            if self.device_service.health.is_available(serial):
+                try:
+                    max_freq = max_freq or self._max_freq(serial)
+                    self.sample(serial, max_freq, pss=count % PSS_EVERY == 0)
+                    count += 1
+                except Exception as e:
+                    logger.debug(f"Telemetry {serial} gagal: {e}")
+            if time.time() - flushed_at >= FLUSH_INTERVAL:
+                self._flush(serial, flushed_at)
+                flushed_at = time.time()
+            stop.wait(self.interval)
+        self._flush(serial, flushed_at)
+
+    def _flush(self, serial: str, since: float):
+        # Downsample [since, now) into one row per series
+        if self.store is None:
+            return
+        now = time.time()
+        rows = []
+        for name, samples in self.window(serial, since, now).items():
+            if samples:
+                rows.append(
+                    (
+                        serial,
+                        name,
+                        since,
+                        now - since,
+                        len(samples),
+                        min(samples),
+                        statistics.fmean(samples),
+                        max(samples),
+                    )
+                )
+        try:
+            self.store.add_buckets(rows)
+        except Exception as e:
+            logger.error(f"Gagal menyimpan telemetry {serial}: {e}")
+
+    def window(self, serial: str, start: float, end: float) -> Dict[str, List[float]]:
+        """Sampled values per series with start <= time < end."""
+        with self.lock:
+            buffers = self.series.get(serial, {})
+            return {
+                name: [value for t, value in samples if start <= t < end]
+                for name, samples in buffers.items()
+            }
+
+    def latest(self, serial: str) -> Dict[str, float]:
+        """Newest value of each series of a device."""
+        with self.lock:
+            buffers = self.series.get(serial, {})
+            return {
+                name: samples[-1][1] for name, samples in buffers.items() if samples
+            }
+
+    def record_flow(self, serial: str, flow: str, seconds: float, ok: bool):
+        """Flow observer: keep the conditions a flow of a sampled device ran under."""
+        with self.lock:
+            if serial not in self.series:
+                return
+        end = time.time()
+        # Flows shorter than the interval take the sample just before them
+        window = self.window(serial, end - seconds - self.interval, end)
+        row = {
+            "serial": serial,
+            "flow": flow,
+            "ended": end,
+            "seconds": seconds,
+            "ok": ok,
+        }
+        for name, samples in window.items():
+            row[name] = statistics.fmean(samples) if samples else None
+        with self.lock:
+            self.flows.append(row)
+        if self.store is not None:
+            try:
+                self.store.add_flow(row)
+            except Exception as e:
+                logger.error(f"Gagal menyimpan flow {serial}: {e}")
+
+    def report(self) -> Dict[str, Dict[str, Dict]]:
+        """correlate() over the flows of this run."""
+        with self.lock:
+            flows = list(self.flows)
+        return correlate(flows)
+
+    def log_report(self):
+        for flow, series in self.report().items():
+            for name, row in series.items():
+                if row["r"] is not None and abs(row["r"]) >= 0.3:
+                    logger.info(
+                        f"{flow}: durasi berkorelasi dengan {name} "
+                        f"(r={row['r']:.2f}, {row['slope']:+.3f}s per unit)"
+                    )
@@ -0,0 +1,200 @@
+# Module for the long-running daemon exposing login/OTP jobs over local HTTP
+import json
+import logging
+import re
+import threading
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from app.config.settings import (
+    DAEMON_HOST,
+    DAEMON_PORT,
+    DAEMON_REFRESH_INTERVAL,
+    PREPARE_DEVICES,
+)
+from app.fleet.jobs import JobError, JobManager
+from app.fleet.registry import DeviceRegistry
+from app.profiling import get_profile_mode, write_fleet_report
+
+logger = logging.getLogger(__name__)
+
+_JOB_PATH = re.compile(r"^/jobs/(\w+)(/events)?$")
+_CANCEL_PATH = re.compile(r"^/jobs/(\w+)/cancel$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON API: /health, /devices, /jobs, /jobs/<id>[/events|/cancel]."""
+
+    daemon: "Daemon"
+    protocol_version = "HTTP/1.0"  # events stream until the connection closes
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path == "/health":
+            return self._send_json(200, self.daemon.health())
+        if path == "/devices":
+            health = self.daemon.device_service.health.snapshot()
+            devices = [
+                dict(asdict(device), health=health.get(device.serial))
+                for device in self.daemon.registry.list()
+            ]
+            return self._send_json(200, devices)
+        if path == "/jobs":
+            jobs = [job.to_dict() for job in self.daemon.jobs.list()]
+            return self._send_json(200, jobs)
+
+        match = _JOB_PATH.match(path)
+        job = self.daemon.jobs.get(match.group(1)) if match else None
+        if job is None:
+            return self._send_json(404, {"error": "Not found"})
+        if not match.group(2):
+            return self._send_json(200, job.to_dict())
+
+        since = re.search(r"since=(\d+)", query)
+        self._stream_events(job, int(since.group(1)) if since else 0)
+
+    def _stream_events(self, job, since: int):
+        # One JSON object per line; the stream ends when the job is finished
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for event in job.iter_events(since):
+                line = b"\n" if event is None else json.dumps(event).encode() + b"\n"
+                self.wfile.write(line)
+                self.wfile.flush()
+            self.wfile.write(json.dumps({"job": job.to_dict()}).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug(f"Event stream of job {job.id} closed by client")
+
+    def do_POST(self):
+        cancel = _CANCEL_PATH.match(self.path)
+        if cancel:
+            job = self.daemon.jobs.cancel(cancel.group(1))
+            if job is None:
+                return self._send_json(404, {"error": "Not found"})
+            return self._send_json(202, job.to_dict())
+        if self.path != "/jobs":
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            budget = request.get("budget")
+            job = self.daemon.jobs.submit(
+                request.get("kind", ""),
+                request.get("serial") or None,
+                request.get("params", {}),
+                float(budget) if budget is not None else None,
+            )
+        except (ValueError, TypeError, JobError) as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, job.to_dict())
+
+
+class Daemon:
+    """Keeps DeviceService, uiautomator2 connections and devices warm."""
+
+    def __init__(
+        self,
+        device_service,
+        host: str = DAEMON_HOST,
+        port: int = DAEMON_PORT,
+        refresh_interval: float = DAEMON_REFRESH_INTERVAL,
+    ):
+        """Initialize the daemon.
+
+        Args:
+            device_service: DeviceService shared by every job
+            host: Address to listen on (keep it local)
+            port: Port to listen on
+            refresh_interval: Seconds between device list refreshes
+        """
+        self.device_service = device_service
+        self.refresh_interval = refresh_interval
+        self.registry = DeviceRegistry(device_service)
+        self.jobs = JobManager(
+            device_service, is_known_device=self.registry.is_connected
+        )
+        self.registry.on_added(self._on_device_added)
+        self.registry.on_removed(self.jobs.forget_device)
+        # Servers that push device changes get them picked up right away
+        device_service.on_devices_changed(self.registry.request_refresh)
+
+        handler = type("Handler", (_Handler,), {"daemon": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def _on_device_added(self, device):
+        # Devices present at start are prepared and sampled together in start()
+        if PREPARE_DEVICES and self._thread is not None:
+            self.device_service.preparation.prepare(device.serial)
+        if self._thread is not None:
+            self.device_service.start_telemetry([device.serial])
+        self.jobs.add_device(device.serial, device.sim_numbers)
+
+    def health(self) -> dict:
+        jobs = self.jobs.list()
+        health = self.device_service.health.snapshot().values()
+        result = {
+            "devices": len(self.registry.list()),
+            "quarantined": sum(1 for h in health if h["state"] == "quarantined"),
+            "connections": len(self.device_service.device_cache),
+            "jobs": len(jobs),
+            "running": sum(1 for job in jobs if job.status == "running"),
+            "scheduler": self.jobs.scheduler.snapshot(),
+        }
+        servers = getattr(self.device_service, "server_status", None)
+        if servers is not None:
+            result["adb_servers"] = servers()
+        return result
+
+    def start(self):
+        """Start serving in a background thread."""
+        self.registry.refresh()
+        serials = [device.serial for device in self.registry.list()]
+        if PREPARE_DEVICES:
+            self.device_service.prepare_devices(serials)
+        self.device_service.start_telemetry(serials)
+        self.registry.start(self.refresh_interval)
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="daemon-http", daemon=True
+        )
+        self._thread.start()
+        host, port = self.address
+        logger.info(f"Daemon mendengarkan di http://{host}:{port}")
+
+    def serve_forever(self):
+        """Run until interrupted (Ctrl+C)."""
+        self.start()
+        try:
+            self._thread.join()
+        except KeyboardInterrupt:
+            logger.info("Daemon dihentikan")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.registry.stop()
+        self.jobs.shutdown(wait=False)
+        self.device_service.close()
+        if get_profile_mode():
+            write_fleet_report()
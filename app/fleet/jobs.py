@@ -0,0 +1,405 @@
+# Module for login/OTP jobs executed against warm device connections
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from app.automation.deadline import Cancelled, JobCancelled, deadline_scope
+from app.automation.flows.login_flow import login_flow
+from app.automation.flows.otp_flow import otp_flow
+from app.config.settings import (
+    DAEMON_JOB_BUDGET,
+    DAEMON_JOB_HISTORY,
+    DEFAULT_PACKAGE,
+)
+from app.devices.app_perf import StepRecord, collect_steps
+from app.devices.command import normalize_msisdn
+from app.fleet.scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Routing of a job kind
+SIM = "sim"  # runs on the device whose SIM owns params["phone_number"]
+DEVICE = "device"  # needs an explicit serial
+ANY = "any"  # any available device
+
+
+class JobError(ValueError):
+    """Raised for job requests that cannot be accepted."""
+
+
+class Job:
+    """One login or OTP run on one device, with its progress events."""
+
+    def __init__(
+        self,
+        job_id: str,
+        kind: str,
+        serial: Optional[str],
+        params: Dict,
+        budget: float,
+    ):
+        self.id = job_id
+        self.kind = kind
+        self.serial = serial  # None until an unpinned job starts
+        self.pinned = serial is not None
+        self.params = params
+        self.budget = budget
+        self.cancel_event = threading.Event()
+        self.status = QUEUED
+        self.result: Optional[bool] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict] = []
+        self.steps: List[StepRecord] = []  # with EXA_APP_PERF=1
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def emit(self, message: str, level: str = "INFO"):
+        """Append a progress event and wake up event streams."""
+        with self.changed:
+            self.events.append(
+                {
+                    "seq": len(self.events),
+                    "time": time.time(),
+                    "level": level,
+                    "message": message,
+                }
+            )
+            self.changed.notify_all()
+
+    def cancel(self):
+        """Request cancellation; a running job stops at its next check."""
+        if not self.finished:
+            self.cancel_event.set()
+            self.emit("cancel requested", "WARNING")
+
+    def _set_status(self, status: str):
+        with self.changed:
+            self.status = status
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif status in FINISHED_STATES:
+                self.finished_at = time.time()
+            self.changed.notify_all()
+        self.emit(f"status: {status}")
+
+    def iter_events(self, since: int = 0, timeout: float = 1.0) -> Iterator[Dict]:
+        """
+        Yield events from `since` on, blocking until the job finishes.
+
+        Yields None every `timeout` seconds without news so callers can
+        notice closed connections.
+        """
+        position = since
+        while True:
+            with self.changed:
+                if position >= len(self.events) and not self.finished:
+                    self.changed.wait(timeout)
+                pending = self.events[position:]
+                done = self.finished
+            for event in pending:
+                yield event
+            position += len(pending)
+            if done and position >= len(self.events):
+                return
+            if not pending:
+                yield None
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "serial": self.serial,
+            "pinned": self.pinned,
+            "status": self.status,
+            "budget": self.budget,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "events": len(self.events),
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+
+class _JobLogHandler(logging.Handler):
+    """Forwards log records emitted while a job runs to that job's events."""
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.local = threading.local()
+
+    def emit(self, record):
+        job = getattr(self.local, "job", None)
+        if job is not None:
+            job.emit(record.getMessage(), record.levelname)
+
+
+def ensure_app_open(device_service, serial: str) -> bool:
+    """Open the app unless it is already in front (warm connections)."""
+    result = device_service.launch_app(serial, DEFAULT_PACKAGE)
+    if result.ok and not result.skipped:
+        logger.info(
+            f"{DEFAULT_PACKAGE} dibuka di {serial} ({result.launch_state}, "
+            f"{result.total_time} ms)"
+        )
+    return result.ok
+
+
+def _run_login(device_service, job: Job) -> bool:
+    if not ensure_app_open(device_service, job.serial):
+        return False
+    return login_flow(device_service, job.serial, job.params["phone_number"])
+
+
+def _run_otp(device_service, job: Job) -> bool:
+    return otp_flow(
+        device_service,
+        job.serial,
+        job.params["otp_code"],
+        job.params.get("max_resend", 1),
+    )
+
+
+def _run_open_app(device_service, job: Job) -> bool:
+    return ensure_app_open(device_service, job.serial)
+
+
+# Job kind -> (required params, runner, routing)
+JOB_KINDS: Dict[str, tuple] = {
+    "login": (("phone_number",), _run_login, SIM),
+    "otp": (("otp_code",), _run_otp, DEVICE),
+    "open_app": ((), _run_open_app, ANY),
+}
+
+
+class JobManager:
+    """Routes jobs to devices through a Scheduler, one job per device at a time."""
+
+    def __init__(
+        self,
+        device_service,
+        history: int = DAEMON_JOB_HISTORY,
+        is_known_device: Optional[Callable[[str], bool]] = None,
+    ):
+        """Initialize the job manager.
+
+        Args:
+            device_service: Shared (warm) DeviceService
+            history: Number of finished jobs kept for inspection
+            is_known_device: Optional check used to reject unknown serials.
+                Without it, devices are added to the scheduler on first use.
+        """
+        self.device_service = device_service
+        self.history = history
+        self.is_known_device = is_known_device
+        self.scheduler = Scheduler(self._run, device_service.health.is_available)
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.lock = threading.Lock()
+        # Devices added by a request, whose SIM numbers are read on their runner
+        self._unresolved: Set[str] = set()
+        self._ids = itertools.count(1)
+        self._log_handler = _JobLogHandler()
+        logging.getLogger().addHandler(self._log_handler)
+
+    def add_device(self, serial: str, sim_numbers: Iterable[str] = ()):
+        """Make a device available to the scheduler (idempotent)."""
+        with self.lock:
+            self._unresolved.discard(serial)
+        self.scheduler.add_device(serial, sim_numbers)
+
+    def _route(self, routing: str, serial: Optional[str], params: Dict):
+        # Resolve the device a job is pinned to; None means any device
+        if serial:
+            if self.is_known_device and not self.is_known_device(serial):
+                raise JobError(f"Device {serial} is not connected")
+            if not self.scheduler.has_device(serial):
+                # Runs on the request thread: no device RPCs here
+                with self.lock:
+                    self._unresolved.add(serial)
+                self.scheduler.add_device(serial)
+            return serial
+        if routing == DEVICE:
+            raise JobError("Missing serial")
+        if routing == SIM:
+            number = normalize_msisdn(params["phone_number"])
+            if not number:
+                raise JobError(f"Invalid phone number: {params['phone_number']}")
+            owner = self.scheduler.owner_of(number)
+            if owner is None:
+                raise JobError(f"No device has a SIM with number {number}")
+            return owner
+        return None
+
+    def submit(
+        self,
+        kind: str,
+        serial: Optional[str],
+        params: Dict,
+        budget: Optional[float] = None,
+    ) -> Job:
+        """
+        Queue a job.
+
+        A job with a serial, or a login whose phone number belongs to a
+        device's SIM, is pinned to that device. Other jobs run on whichever
+        available device gets to them first.
+
+        Args:
+            kind: Job kind ("login", "otp" or "open_app")
+            serial: Device serial number, or None to let the scheduler route
+            params: Job parameters (phone_number / otp_code)
+            budget: Seconds the job may run (default: DAEMON_JOB_BUDGET)
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            JobError: Unknown kind, missing parameters, or no device to run on
+        """
+        if kind not in JOB_KINDS:
+            raise JobError(f"Unknown job kind: {kind}")
+        required, _, routing = JOB_KINDS[kind]
+        missing = [name for name in required if not params.get(name)]
+        if missing:
+            raise JobError(f"Missing parameter(s): {', '.join(missing)}")
+        if budget is None:
+            budget = DAEMON_JOB_BUDGET
+        if budget <= 0:
+            raise JobError("Budget must be positive")
+        serial = self._route(routing, serial, params)
+        if serial and not self.device_service.health.is_available(serial):
+            raise JobError(f"Device {serial} is quarantined")
+
+        job = Job(f"{next(self._ids):06d}", kind, serial, dict(params), budget)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._trim()
+        job.emit(f"status: {QUEUED}")
+        try:
+            self.scheduler.enqueue(job)
+        except ValueError as e:
+            with self.lock:
+                del self.jobs[job.id]
+            raise JobError(str(e)) from e
+        return job
+
+    def _run(self, job: Job):
+        # Called by the scheduler on the device's runner thread
+        _, runner, _ = JOB_KINDS[job.kind]
+        health = self.device_service.health
+        status = FAILED
+        if job.cancel_event.is_set():
+            job._set_status(CANCELLED)
+            return
+        if not health.is_available(job.serial):
+            job.error = f"Device {job.serial} is quarantined"
+            job._set_status(FAILED)
+            return
+        self._resolve_sim_numbers(job.serial)
+        job._set_status(RUNNING)
+        self._log_handler.local.job = job
+        try:
+            # The budget counts from the start of the run, not from queueing
+            with (
+                deadline_scope(
+                    job.budget, f"job {job.id}", cancel_event=job.cancel_event
+                ),
+                collect_steps() as job.steps,
+            ):
+                job.result = bool(runner(self.device_service, job))
+            status = SUCCEEDED if job.result else FAILED
+            if job.result:
+                health.record_success(job.serial)
+            else:
+                health.record_failure(job.serial)
+        except Cancelled as e:
+            logger.warning(f"Job {job.id} ({job.kind}) on {job.serial}: {e}")
+            job.result = False
+            job.error = str(e)
+            status = CANCELLED if isinstance(e, JobCancelled) else FAILED
+            if status == FAILED:
+                health.record_failure(job.serial, type(e).__name__)
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) on {job.serial}: {e}")
+            job.result = False
+            job.error = str(e)
+            health.record_failure(job.serial, type(e).__name__)
+        finally:
+            self._log_handler.local.job = None
+        job._set_status(status)
+
+    def _resolve_sim_numbers(self, serial: str):
+        # Called on the runner thread of a device that a request added
+        with self.lock:
+            if serial not in self._unresolved:
+                return
+            self._unresolved.discard(serial)
+        try:
+            numbers = self.device_service.get_sim_numbers(serial)
+        except Exception as e:
+            logger.warning(f"SIM numbers of {serial} could not be read: {e}")
+            return
+        if self.scheduler.has_device(serial):
+            self.scheduler.add_device(serial, numbers)
+
+    def _trim(self):
+        # Caller holds self.lock; drop the oldest finished jobs beyond history
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; returns None if unknown."""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def forget_device(self, serial: str):
+        """
+        Stop routing to a disconnected device.
+
+        Its unpinned jobs move to other devices; pinned ones fail.
+        """
+        with self.lock:
+            self._unresolved.discard(serial)
+        for job in self.scheduler.remove_device(serial):
+            job.error = f"Device {serial} disconnected"
+            job._set_status(FAILED)
+
+    def shutdown(self, wait: bool = True):
+        """Stop the device runners and detach the log handler.
+
+        Jobs that never started are cancelled. With `wait`, running jobs
+        are waited for; otherwise they finish on their own (daemon) threads.
+        """
+        for job in self.scheduler.stop():
+            job._set_status(CANCELLED)
+        if wait:
+            self.scheduler.join()
+        logging.getLogger().removeHandler(self._log_handler)
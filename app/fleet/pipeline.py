@@ -0,0 +1,355 @@
+# Module for batch login + OTP: log in everywhere, then verify in code-arrival order
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.automation.actions.otp import (
+    check_otp_message,
+    click_verify,
+    get_countdown_time,
+    input_otp_code,
+    parse_countdown_seconds,
+    try_resend_otp,
+    verify_home_page,
+    verify_otp_page,
+)
+from app.automation.deadline import Cancelled, deadline_scope
+from app.automation.flows.login_flow import login_flow
+from app.automation.ui.selectors import selector_registry
+from app.config.settings import OTP_FLOW_BUDGET
+from app.devices.app_perf import StepRecord, capture_scope, collect_steps
+from app.devices.logcat import watch_app
+from app.fleet.jobs import ensure_app_open
+from app.logging import get_device_logger
+
+logger = logging.getLogger(__name__)
+
+# Device phases
+LOGIN = "login"
+WAITING = "waiting"  # on the OTP page, waiting for a code or a resend window
+BUSY = "busy"  # entering a code or resending
+DONE = "done"
+
+# Dispatcher actions
+_RESEND = "resend"
+_EXPIRE = "expire"
+
+
+@dataclass
+class DeviceRun:
+    """Progress and outcome of one device in a pipeline batch."""
+
+    serial: str
+    phone_number: str
+    phase: str = LOGIN
+    ok: bool = False
+    error: Optional[str] = None
+    resends: int = 0
+    codes_tried: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    otp_page_at: Optional[float] = None
+    code_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    steps: List[StepRecord] = field(default_factory=list)  # with EXA_APP_PERF=1
+
+    def to_dict(self) -> Dict:
+        end = self.finished_at or time.monotonic()
+        return {
+            "serial": self.serial,
+            "ok": self.ok,
+            "error": self.error,
+            "resends": self.resends,
+            "codes_tried": self.codes_tried,
+            "login": (self.otp_page_at or end) - self.started_at,
+            "code_wait": (
+                self.code_at - self.otp_page_at
+                if self.code_at and self.otp_page_at
+                else None
+            ),
+            "total": end - self.started_at,
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+
+class OtpPipeline:
+    """
+    Two-phase login + OTP over many devices.
+
+    Phase one fires login_flow on every device at once. Each device that
+    reaches the OTP page then waits without holding a thread: OTP codes
+    pushed through deliver() are entered in the order they arrive, and the
+    tvCountdown value read once on the OTP page schedules the resend for
+    the moment _is_countdown_finished would pass. A single dispatcher
+    sleeps until the next code or resend window, so the batch takes about
+    as long as its slowest SMS instead of a fixed sleep per device.
+    """
+
+    def __init__(
+        self,
+        device_service,
+        max_resend: int = 1,
+        max_workers: Optional[int] = None,
+        otp_budget: float = OTP_FLOW_BUDGET,
+    ):
+        """Initialize the pipeline.
+
+        Args:
+            device_service: DeviceService driving the devices
+            max_resend: Resends allowed per device before giving up
+            max_workers: Threads for device steps (default: one per device)
+            otp_budget: Seconds allowed for one code entry or resend step
+        """
+        self.device_service = device_service
+        self.max_resend = max_resend
+        self.max_workers = max_workers
+        self.otp_budget = otp_budget
+        self.runs: Dict[str, DeviceRun] = {}
+        self.cond = threading.Condition()
+        self._codes: Dict[str, List[str]] = {}
+        self._timers: List[Tuple[float, int, str, str]] = []
+        self._seq = itertools.count()
+        self._windows: Dict[str, int] = {}  # serial -> its current timer
+        self._finished: List[DeviceRun] = []
+        self._stop = threading.Event()
+
+    def deliver(self, serial: str, otp_code: str):
+        """Hand over an OTP code received for a device (thread-safe)."""
+        with self.cond:
+            self._codes.setdefault(serial, []).append(otp_code)
+            self.cond.notify_all()
+
+    def stop(self):
+        """Abort the batch; running steps stop at their next check."""
+        self._stop.set()
+        with self.cond:
+            self.cond.notify_all()
+
+    def run(
+        self, phone_numbers: Dict[str, str], timeout: Optional[float] = None
+    ) -> Dict[str, DeviceRun]:
+        """
+        Log in and verify OTP on every device.
+
+        Args:
+            phone_numbers: Serial -> phone number to log in with
+            timeout: Seconds for the whole batch (default: no limit)
+
+        Returns:
+            dict: Serial -> DeviceRun, in the order devices finished
+        """
+        ends_at = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            for serial, phone_number in phone_numbers.items():
+                self.runs[serial] = DeviceRun(serial, phone_number)
+
+        workers = self.max_workers or max(1, len(phone_numbers))
+        with ThreadPoolExecutor(workers, thread_name_prefix="pipeline") as executor:
+            for serial in phone_numbers:
+                executor.submit(self._login, serial)
+
+            with self.cond:
+                while len(self._finished) < len(self.runs):
+                    if ends_at is not None and time.monotonic() >= ends_at:
+                        self._stop.set()
+                    if self._stop.is_set():
+                        # Running steps notice the stop event and finish
+                        self._abort_waiting()
+                        self.cond.wait()
+                        continue
+                    self._dispatch(executor)
+                    self.cond.wait(self._next_wakeup(ends_at))
+        return {run.serial: run for run in self._finished}
+
+    # Dispatcher (caller holds self.cond)
+
+    def _dispatch(self, executor):
+        for serial, codes in self._codes.items():
+            run = self.runs.get(serial)
+            if codes and run is not None and run.phase == WAITING:
+                run.phase = BUSY
+                run.code_at = run.code_at or time.monotonic()
+                executor.submit(self._enter_code, serial, codes.pop(0))
+
+        now = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            _, seq, serial, action = heapq.heappop(self._timers)
+            run = self.runs[serial]
+            if run.phase != WAITING or self._windows.get(serial) != seq:
+                continue  # a code arrived first; the window is moot
+            run.phase = BUSY
+            if action == _EXPIRE:
+                self._finish(run, False, "OTP tidak diterima sebelum countdown habis")
+            else:
+                executor.submit(self._resend, serial)
+
+    def _next_wakeup(self, ends_at: Optional[float]) -> Optional[float]:
+        wakeups = [when for when, _, _, _ in self._timers[:1]]
+        if ends_at is not None:
+            wakeups.append(ends_at)
+        if not wakeups:
+            return None  # woken by deliver() or a finished step
+        return max(0.0, min(wakeups) - time.monotonic())
+
+    def _abort_waiting(self):
+        for run in self.runs.values():
+            if run.phase == WAITING:
+                self._finish(run, False, "Batch dihentikan")
+
+    def _finish(self, run: DeviceRun, ok: bool, error: Optional[str] = None):
+        if run.phase == DONE:
+            return
+        run.phase = DONE
+        run.ok = ok
+        run.error = error
+        run.finished_at = time.monotonic()
+        self._finished.append(run)
+        self.cond.notify_all()
+        if not ok and self.device_service.artifacts is not None:
+            self.device_service.artifacts.dump(run.serial, "pipeline", error)
+
+    def _wait_for_window(self, serial: str, seconds: Optional[int], read_at: float):
+        # Caller holds self.cond; park the device until a code or the window end
+        run = self.runs[serial]
+        if seconds is None:
+            self._finish(run, False, "Countdown OTP tidak terbaca")
+            return
+        action = _RESEND if run.resends < self.max_resend else _EXPIRE
+        seq = self._windows[serial] = next(self._seq)
+        heapq.heappush(self._timers, (read_at + seconds, seq, serial, action))
+        run.phase = WAITING
+        self.cond.notify_all()
+
+    # Device steps (executor threads)
+
+    def _read_countdown(self, serial: str) -> Tuple[Optional[int], float]:
+        ui_device = self.device_service.get_ui_device(serial)
+        countdown = selector_registry.for_serial(serial)["countdown"]
+        text = get_countdown_time(ui_device, countdown, serial)
+        # Read after the RPC returns: the window cannot end earlier than this
+        return parse_countdown_seconds(text), time.monotonic()
+
+    def _capturing(self, serial: str):
+        # Recent screens for the artifacts written when the device fails
+        artifacts = self.device_service.artifacts
+        return artifacts.capturing(serial) if artifacts else nullcontext()
+
+    def _step(self, serial: str, budget: Optional[float], func, *args):
+        # Run one device step under its own budget; report errors as failures
+        try:
+            with (
+                deadline_scope(budget, f"pipeline {serial}", cancel_event=self._stop),
+                watch_app(self.device_service, serial),
+                self._capturing(serial),
+                collect_steps() as steps,
+            ):
+                try:
+                    return func(*args)
+                finally:
+                    self.runs[serial].steps.extend(steps)
+        except Cancelled as e:
+            get_device_logger(serial).warning(f"Pipeline dihentikan: {e}")
+            with self.cond:
+                self._finish(self.runs[serial], False, str(e))
+        except Exception as e:
+            get_device_logger(serial).exception(f"Pipeline error: {e}")
+            with self.cond:
+                self._finish(self.runs[serial], False, str(e))
+        return None
+
+    def _login(self, serial: str):
+        # login_flow carries its own budget
+        self._step(serial, None, self._do_login, serial)
+
+    def _do_login(self, serial: str):
+        run = self.runs[serial]
+        ok = ensure_app_open(self.device_service, serial) and login_flow(
+            self.device_service, serial, run.phone_number
+        )
+        if not ok:
+            with self.cond:
+                self._finish(run, False, "Login gagal")
+            return
+        seconds, read_at = self._read_countdown(serial)
+        with self.cond:
+            run.otp_page_at = read_at
+            self._wait_for_window(serial, seconds, read_at)
+
+    def _enter_code(self, serial: str, otp_code: str):
+        self._step(serial, self.otp_budget, self._do_enter_code, serial, otp_code)
+
+    def _do_enter_code(self, serial: str, otp_code: str):
+        run = self.runs[serial]
+        ui_device = self.device_service.get_ui_device(serial)
+        run.codes_tried += 1
+        with capture_scope(self.device_service, serial, "submit_otp_code"):
+            ok, message_type = submit_otp_code(ui_device, serial, otp_code)
+        if ok:
+            with self.cond:
+                self._finish(run, True)
+            return
+        if message_type not in ("invalid", "expired"):
+            with self.cond:
+                self._finish(run, False, f"Verifikasi OTP gagal ({message_type})")
+            return
+        # Rejected code: wait for another code or the next resend window
+        seconds, read_at = self._read_countdown(serial)
+        with self.cond:
+            self._wait_for_window(serial, seconds, read_at)
+
+    def _resend(self, serial: str):
+        self._step(serial, self.otp_budget, self._do_resend, serial)
+
+    def _do_resend(self, serial: str):
+        run = self.runs[serial]
+        ui_device = self.device_service.get_ui_device(serial)
+        with capture_scope(self.device_service, serial, "resend_otp"):
+            selectors = selector_registry.for_serial(serial)
+            resent = try_resend_otp(ui_device, selectors, serial)
+        seconds, read_at = self._read_countdown(serial)
+        with self.cond:
+            if resent:
+                run.resends += 1
+                # Codes of the previous request are no longer valid
+                self._codes.pop(serial, None)
+            elif not seconds:
+                self._finish(run, False, "Resend OTP gagal")
+                return
+            self._wait_for_window(serial, seconds, read_at)
+
+
+def submit_otp_code(ui_device, serial: str, otp_code: str) -> Tuple[bool, str]:
+    """
+    Input satu kode OTP dan verifikasi, tanpa resend.
+
+    Sama dengan langkah 4-7 otp_flow, tetapi mengembalikan tipe pesan
+    agar pemanggil dapat memutuskan kapan resend.
+
+    Args:
+        ui_device: Objek UI Automator device
+        serial: Serial number device
+        otp_code: Kode OTP
+
+    Returns:
+        tuple: (berhasil, tipe pesan)
+    """
+    # Versi aplikasi sudah dibaca login_flow untuk device ini
+    selectors = selector_registry.for_serial(serial)
+    if not verify_otp_page(ui_device, selectors, serial):
+        return False, "not_otp_page"
+    if not input_otp_code(ui_device, selectors["otp_input"], otp_code, serial):
+        return False, "input_failed"
+    if not click_verify(ui_device, selectors, serial):
+        is_success, message_type = check_otp_message(ui_device, selectors, serial)
+        return False, message_type if not is_success else "verify_failed"
+    is_success, message_type = check_otp_message(ui_device, selectors, serial)
+    if not is_success:
+        return False, message_type
+    if verify_home_page(ui_device, selectors, serial):
+        return True, "success"
+    return False, "home_not_found"
@@ -0,0 +1,107 @@
+# Module for tracking connected devices and cleaning up after disconnects
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+from app.devices.device_model import Device
+from app.logging import release_device_logger
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceRegistry:
+    """Keeps the list of connected devices current for a long-running process."""
+
+    def __init__(self, device_service):
+        """Initialize the registry.
+
+        Args:
+            device_service: Shared DeviceService used to list devices
+        """
+        self.device_service = device_service
+        self.devices: Dict[str, Device] = {}
+        self.last_seen: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self._on_added: List[Callable[[Device], None]] = []
+        self._on_removed: List[Callable[[str], None]] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # refresh before the interval is over
+        self._thread = None
+
+    def on_added(self, callback: Callable[[Device], None]):
+        """Register a callback run with each newly connected Device."""
+        self._on_added.append(callback)
+
+    def on_removed(self, callback: Callable[[str], None]):
+        """Register a callback run with the serial of each removed device."""
+        self._on_removed.append(callback)
+
+    def refresh(self):
+        """Re-list devices, registering new ones and releasing removed ones."""
+        devices = self.device_service.get_devices()
+        current = {device.serial: device for device in devices}
+        now = time.time()
+        with self.lock:
+            added = current.keys() - self.devices.keys()
+            removed = self.devices.keys() - current.keys()
+            self.devices = current
+            for serial in current:
+                self.last_seen[serial] = now
+            for serial in removed:
+                self.last_seen.pop(serial, None)
+
+        for serial in sorted(added):
+            logger.info(f"Device {serial} tersambung")
+            for callback in self._on_added:
+                try:
+                    callback(current[serial])
+                except Exception as e:
+                    logger.exception(f"Setup for {serial} failed: {e}")
+        for serial in sorted(removed):
+            logger.info(f"Device {serial} terputus, membersihkan resource")
+            self._release(serial)
+
+    def _release(self, serial: str):
+        self.device_service.forget(serial)
+        for callback in self._on_removed:
+            try:
+                callback(serial)
+            except Exception as e:
+                logger.exception(f"Cleanup for {serial} failed: {e}")
+        release_device_logger(serial)
+
+    def is_connected(self, serial: str) -> bool:
+        with self.lock:
+            return serial in self.devices
+
+    def list(self) -> List[Device]:
+        with self.lock:
+            return list(self.devices.values())
+
+    def request_refresh(self):
+        """Make the background thread refresh now (e.g. an ADB server changed)."""
+        self._wake.set()
+
+    def start(self, interval: float):
+        """Refresh in a background thread every `interval` seconds."""
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.exception(f"Device refresh failed: {e}")
+                self._wake.wait(interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(
+            target=loop, name="device-registry", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
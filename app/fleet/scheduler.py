@@ -0,0 +1,205 @@
+# Module for routing jobs to devices: SIM affinity, least-loaded placement, stealing
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds an idle device waits before re-checking its health and the queues
+IDLE_WAIT = 1.0
+
+
+class Scheduler:
+    """
+    One queue and one runner thread per device.
+
+    Pinned jobs (an explicit serial, or a phone number owned by a device's
+    SIM) only ever run on their device. Unpinned jobs are placed on the
+    least-loaded available device, and an idle device steals unpinned jobs
+    from the back of the busiest queue, so a slow phone never holds up
+    work another phone could do. A device that is not available (e.g.
+    quarantined) only drains its pinned jobs and lets others steal the rest.
+    """
+
+    def __init__(
+        self,
+        run: Callable,
+        is_available: Callable[[str], bool] = lambda serial: True,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            run: Called with each job on its device's runner thread
+            is_available: Whether a device may take unpinned work
+        """
+        self.run = run
+        self.is_available = is_available
+        self.queues: Dict[str, Deque] = {}
+        self.running: Dict[str, object] = {}
+        self.owners: Dict[str, str] = {}  # normalized MSISDN -> serial
+        self.stolen = 0
+        self.cond = threading.Condition()
+        self._threads: List[threading.Thread] = []  # device runners
+        self._stopped = False
+
+    def add_device(self, serial: str, sim_numbers: Iterable[str] = ()):
+        """Start scheduling onto a device and index its SIM numbers."""
+        with self.cond:
+            for number in sim_numbers:
+                previous = self.owners.get(number)
+                if previous and previous != serial:
+                    logger.warning(f"Nomor {number} ada di {previous} dan {serial}")
+                self.owners[number] = serial
+            if serial in self.queues:
+                return
+            self.queues[serial] = deque()
+            thread = threading.Thread(
+                target=self._device_loop,
+                args=(serial,),
+                name=f"jobs-{serial}",
+                daemon=True,
+            )
+            # A removed device's runner stays listed until its job is over
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._threads.append(thread)
+        thread.start()
+
+    def has_device(self, serial: str) -> bool:
+        with self.cond:
+            return serial in self.queues
+
+    def remove_device(self, serial: str) -> List:
+        """
+        Stop scheduling onto a device.
+
+        Unpinned jobs waiting there are moved to other devices.
+
+        Returns:
+            list: Pinned jobs that can no longer run
+        """
+        with self.cond:
+            queue = self.queues.pop(serial, deque())
+            for number in [n for n, owner in self.owners.items() if owner == serial]:
+                del self.owners[number]
+            orphans = [job for job in queue if job.pinned]
+            movable = [job for job in queue if not job.pinned]
+            self.cond.notify_all()
+        for job in movable:
+            self.enqueue(job)
+        return orphans
+
+    def owner_of(self, number: str) -> Optional[str]:
+        """Serial of the device whose SIM owns `number`, if known."""
+        with self.cond:
+            return self.owners.get(number)
+
+    def load(self, serial: str) -> int:
+        # Caller holds self.cond
+        return len(self.queues[serial]) + (1 if serial in self.running else 0)
+
+    def enqueue(self, job):
+        """
+        Queue a job: pinned jobs go to job.serial, others to the least loaded
+        available device.
+
+        Raises:
+            ValueError: No device can take the job
+        """
+        with self.cond:
+            if job.pinned:
+                if job.serial not in self.queues:
+                    raise ValueError(f"Device {job.serial} is not scheduled")
+                target = job.serial
+            else:
+                candidates = [s for s in self.queues if self.is_available(s)]
+                if not candidates:
+                    candidates = list(self.queues)
+                if not candidates:
+                    raise ValueError("No device available")
+                target = min(candidates, key=self.load)
+            self.queues[target].append(job)
+            self.cond.notify_all()
+
+    def _take(self, serial: str):
+        # Caller holds self.cond; own queue first, then steal
+        queue = self.queues[serial]
+        if not self.is_available(serial):
+            for job in queue:
+                if job.pinned:
+                    queue.remove(job)
+                    return job
+            return None
+        if queue:
+            return queue.popleft()
+
+        victims = sorted(
+            (s for s in self.queues if s != serial), key=self.load, reverse=True
+        )
+        for victim in victims:
+            for job in reversed(self.queues[victim]):
+                if not job.pinned:
+                    self.queues[victim].remove(job)
+                    self.stolen += 1
+                    logger.debug(f"{serial} mengambil job {job.id} dari {victim}")
+                    return job
+        return None
+
+    def _device_loop(self, serial: str):
+        while True:
+            with self.cond:
+                job = None
+                while not self._stopped and serial in self.queues:
+                    job = self._take(serial)
+                    if job is not None:
+                        break
+                    self.cond.wait(IDLE_WAIT)
+                if job is None:
+                    return
+                job.serial = serial
+                self.running[serial] = job
+            try:
+                self.run(job)
+            except Exception as e:
+                logger.exception(f"Job {job.id} on {serial} crashed: {e}")
+            finally:
+                with self.cond:
+                    self.running.pop(serial, None)
+                    # Wake idle devices: this one may now be a stealing victim
+                    self.cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        with self.cond:
+            return {
+                "devices": {
+                    serial: {
+                        "queued": len(queue),
+                        "running": getattr(self.running.get(serial), "id", None),
+                    }
+                    for serial, queue in self.queues.items()
+                },
+                "owners": dict(self.owners),
+                "stolen": self.stolen,
+            }
+
+    def stop(self) -> List:
+        """Stop all runner threads; returns the jobs that never started."""
+        with self.cond:
+            self._stopped = True
+            pending = [job for queue in self.queues.values() for job in queue]
+            for queue in self.queues.values():
+                queue.clear()
+            self.cond.notify_all()
+        return pending
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for the runner threads to exit, i.e. their running jobs to end."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            threads = [t for t in self._threads if t is not threading.current_thread()]
+        for thread in threads:
+            if deadline is None:
+                thread.join()
+            else:
+                thread.join(max(0.0, deadline - time.monotonic()))
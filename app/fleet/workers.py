@@ -0,0 +1,362 @@
+# Module for running devices in supervised worker processes
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Seconds between heartbeats sent by each worker
+HEARTBEAT_INTERVAL = 1.0
+
+
+class WorkerRestarted(RuntimeError):
+    """Set on a task whose worker was killed because it hung or died."""
+
+
+@dataclass
+class WorkerStats:
+    """Counters for one worker slot, kept across restarts."""
+
+    serials: List[str]
+    pid: Optional[int] = None
+    restarts: int = 0
+    completed: int = 0
+    failed: int = 0
+    timeouts: int = 0
+    cpu_time: float = 0.0  # CPU seconds of previous incarnations
+    current_cpu_time: float = 0.0
+    max_rss_kib: int = 0
+    busy_time: float = 0.0
+
+
+@dataclass
+class _Task:
+    id: int
+    serial: str
+    func: Callable
+    args: tuple
+    kwargs: dict
+    future: Future = field(default_factory=Future)
+    started_at: Optional[float] = None
+
+
+def _cpu_and_rss():
+    try:
+        import resource
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+    except ImportError:  # Windows
+        return time.process_time(), 0
+
+
+def _worker_main(service_factory, serials, tasks, conn, log_level):
+    """Entry point of a worker process."""
+    logging.basicConfig(
+        level=log_level,
+        format=f"%(asctime)s - [worker {os.getpid()}] - %(name)s - "
+        "%(levelname)s - %(message)s",
+    )
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    def heartbeat():
+        while True:
+            cpu_time, max_rss = _cpu_and_rss()
+            send(("heartbeat", time.time(), cpu_time, max_rss))
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    threading.Thread(target=heartbeat, name="heartbeat", daemon=True).start()
+
+    device_service = service_factory()
+    device_locks = {serial: threading.Lock() for serial in serials}
+
+    def run(task_id, serial, func, args, kwargs):
+        with device_locks.setdefault(serial, threading.Lock()):
+            send(("started", task_id))
+            start = time.perf_counter()
+            try:
+                value = func(device_service, serial, *args, **kwargs)
+                message = ("done", task_id, value, None)
+            except Exception as e:
+                logging.getLogger(__name__).exception(f"Task {task_id}: {e}")
+                message = ("done", task_id, None, f"{type(e).__name__}: {e}")
+            send(message + (time.perf_counter() - start,))
+
+    # One thread per device so a group of devices still runs in parallel
+    with ThreadPoolExecutor(max_workers=max(1, len(serials))) as executor:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            executor.submit(run, *task)
+    send(("exit",))
+
+
+class _Worker:
+    """Parent-side handle of one worker process slot."""
+
+    def __init__(self, index: int, serials: Sequence[str]):
+        self.index = index
+        self.serials = list(serials)
+        self.stats = WorkerStats(serials=self.serials)
+        self.process = None
+        self.conn = None
+        self.tasks = None
+        self.last_heartbeat = 0.0
+        self.pending: Dict[int, _Task] = {}  # sent, not finished
+
+    def spawn(self, context, service_factory, log_level):
+        self.tasks = context.Queue()
+        receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_worker_main,
+            args=(service_factory, self.serials, self.tasks, sender, log_level),
+            name=f"device-worker-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        sender.close()
+        self.conn = receiver
+        self.last_heartbeat = time.time()
+        self.stats.pid = self.process.pid
+
+    def send(self, task: _Task):
+        self.tasks.put((task.id, task.serial, task.func, task.args, task.kwargs))
+
+    def kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+        if self.process is not None:
+            self.process.join(timeout=5)
+        if self.conn is not None:
+            self.conn.close()
+        if self.tasks is not None:
+            self.tasks.cancel_join_thread()
+            self.tasks.close()
+        self.stats.cpu_time += self.stats.current_cpu_time
+        self.stats.current_cpu_time = 0.0
+
+
+class Supervisor:
+    """
+    Runs device tasks in worker processes and restarts hung or dead workers.
+
+    Every worker owns a fixed group of serials and runs one thread per
+    device. A worker is restarted when its heartbeat stops, when it exits
+    unexpectedly, or when one of its tasks exceeds `task_timeout`; the
+    interrupted task fails with WorkerRestarted and queued tasks of the
+    group are resent to the new process.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable,
+        groups: Sequence[Sequence[str]],
+        heartbeat_timeout: float = 10.0,
+        task_timeout: float = 600.0,
+        log_level: int = logging.WARNING,
+    ):
+        """Initialize the supervisor.
+
+        Args:
+            service_factory: Picklable callable returning a DeviceService,
+                called once in every worker process
+            groups: Serials handled by each worker
+            heartbeat_timeout: Seconds without heartbeat before a restart
+            task_timeout: Maximum seconds a single task may run
+            log_level: Logging level inside the workers
+        """
+        self.service_factory = service_factory
+        self.heartbeat_timeout = heartbeat_timeout
+        self.task_timeout = task_timeout
+        self.log_level = log_level
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = [_Worker(i, group) for i, group in enumerate(groups)]
+        self.routes = {
+            serial: worker for worker in self.workers for serial in worker.serials
+        }
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._stop = threading.Event()
+        self._stopping = False
+        self._monitor: Optional[threading.Thread] = None
+        self.started_at = 0.0
+
+    @staticmethod
+    def split(serials: Sequence[str], processes: int) -> List[List[str]]:
+        """Distribute serials round-robin over at most `processes` groups."""
+        processes = max(1, min(processes, len(serials)))
+        return [list(serials[i::processes]) for i in range(processes)]
+
+    def start(self):
+        """Spawn all workers and the monitor thread."""
+        self.started_at = time.time()
+        for worker in self.workers:
+            worker.spawn(self.context, self.service_factory, self.log_level)
+        self._monitor = threading.Thread(
+            target=self._run_monitor, name="supervisor", daemon=True
+        )
+        self._monitor.start()
+
+    def submit(self, serial: str, func: Callable, *args, **kwargs) -> Future:
+        """
+        Run `func(device_service, serial, *args, **kwargs)` in the owning worker.
+
+        `func` and its arguments must be picklable (module-level functions).
+
+        Returns:
+            Future: Resolves to the function's return value
+        """
+        worker = self.routes.get(serial)
+        if worker is None:
+            raise ValueError(f"No worker handles device {serial}")
+        task = _Task(next(self._ids), serial, func, args, kwargs)
+        with self.lock:
+            worker.pending[task.id] = task
+            worker.send(task)
+        return task.future
+
+    def _run_monitor(self):
+        while not self._stop.is_set():
+            with self.lock:
+                connections = {worker.conn: worker for worker in self.workers}
+            for conn in wait(list(connections), timeout=0.5):
+                worker = connections[conn]
+                try:
+                    while conn.poll():
+                        self._handle(worker, conn.recv())
+                except (EOFError, OSError):
+                    pass  # the dead-process check below restarts it
+            self._check_workers()
+
+    def _handle(self, worker: _Worker, message):
+        kind = message[0]
+        if kind == "heartbeat":
+            _, worker.last_heartbeat, cpu_time, max_rss = message
+            worker.stats.current_cpu_time = cpu_time
+            worker.stats.max_rss_kib = max(worker.stats.max_rss_kib, max_rss)
+        elif kind == "started":
+            task = worker.pending.get(message[1])
+            if task is not None:
+                task.started_at = time.time()
+        elif kind == "done":
+            _, task_id, value, error, duration = message
+            with self.lock:
+                task = worker.pending.pop(task_id, None)
+            if task is None:
+                return
+            worker.stats.busy_time += duration
+            if error is None:
+                worker.stats.completed += 1
+                task.future.set_result(value)
+            else:
+                worker.stats.failed += 1
+                task.future.set_exception(RuntimeError(error))
+
+    def _check_workers(self):
+        now = time.time()
+        for worker in self.workers:
+            reason = None
+            if self._stopping:
+                break
+            if not worker.process.is_alive():
+                reason = f"exited with code {worker.process.exitcode}"
+            elif now - worker.last_heartbeat > self.heartbeat_timeout:
+                reason = f"no heartbeat for {now - worker.last_heartbeat:.0f}s"
+            else:
+                for task in list(worker.pending.values()):
+                    if task.started_at and now - task.started_at > self.task_timeout:
+                        reason = f"task on {task.serial} exceeded {self.task_timeout}s"
+                        worker.stats.timeouts += 1
+                        break
+            if reason:
+                self._restart(worker, reason)
+
+    def _restart(self, worker: _Worker, reason: str):
+        logger.warning(
+            f"Restarting worker {worker.index} (pid {worker.stats.pid}): {reason}"
+        )
+        with self.lock:
+            worker.kill()
+            worker.stats.restarts += 1
+            interrupted = [t for t in worker.pending.values() if t.started_at]
+            for task in interrupted:
+                del worker.pending[task.id]
+                worker.stats.failed += 1
+                task.future.set_exception(
+                    WorkerRestarted(f"Worker for {task.serial} restarted: {reason}")
+                )
+            worker.spawn(self.context, self.service_factory, self.log_level)
+            for task in worker.pending.values():
+                worker.send(task)
+
+    def metrics(self) -> Dict:
+        """Merged metrics of all workers."""
+        workers = []
+        totals = {
+            "completed": 0,
+            "failed": 0,
+            "restarts": 0,
+            "timeouts": 0,
+            "cpu_time": 0.0,
+        }
+        for worker in self.workers:
+            stats = worker.stats
+            cpu_time = stats.cpu_time + stats.current_cpu_time
+            workers.append(
+                {
+                    "index": worker.index,
+                    "pid": stats.pid,
+                    "devices": len(stats.serials),
+                    "completed": stats.completed,
+                    "failed": stats.failed,
+                    "restarts": stats.restarts,
+                    "timeouts": stats.timeouts,
+                    "cpu_time": round(cpu_time, 3),
+                    "busy_time": round(stats.busy_time, 3),
+                    "max_rss_kib": stats.max_rss_kib,
+                }
+            )
+            for key in ("completed", "failed", "restarts", "timeouts"):
+                totals[key] += getattr(stats, key)
+            totals["cpu_time"] += cpu_time
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        totals["cpu_time"] = round(totals["cpu_time"], 3)
+        totals["elapsed"] = round(elapsed, 3)
+        totals["throughput"] = round(totals["completed"] / elapsed, 3)
+        return {"workers": workers, "totals": totals}
+
+    def stop(self, timeout: float = 10.0):
+        """Ask workers to finish queued tasks and exit, then stop monitoring."""
+        self._stopping = True
+        for worker in self.workers:
+            worker.tasks.put(None)
+        deadline = time.time() + timeout
+        for worker in self.workers:
+            worker.process.join(max(0.0, deadline - time.time()))
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join()
+        for worker in self.workers:
+            worker.kill()
+            for task in worker.pending.values():
+                task.future.cancel()
+            worker.pending.clear()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -4,16 +4,14 @@ import os
 from functools import wraps
 from logging.handlers import RotatingFileHandler
 
+from app.automation.deadline import check_deadline
+
 # Constants
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 DEVICE_LOG_FORMAT = (
     "%(asctime)s - %(name)s - %(levelname)s - [%(device_id)s] - %(message)s"
 )
 DEFAULT_LOG_LEVEL = logging.INFO
-LOG_DIR = "logs"
-
-# Ensure logs directory exists
-os.makedirs(LOG_DIR, exist_ok=True)
 
 
 def initialize_logging(log_to_file=True, log_level=DEFAULT_LOG_LEVEL):
@@ -28,8 +26,11 @@ def initialize_logging(log_to_file=True, log_level=DEFAULT_LOG_LEVEL):
     handlers: list[logging.Handler] = [logging.StreamHandler()]
 
     if log_to_file:
+        from app.config.paths import LOGS_DIR
+
+        os.makedirs(LOGS_DIR, exist_ok=True)
         log_filename = os.path.join(
-            LOG_DIR, f"automation_{datetime.datetime.now().strftime('%Y%m%d')}.log"
+            LOGS_DIR, f"automation_{datetime.datetime.now().strftime('%Y%m%d')}.log"
         )
         file_handler = RotatingFileHandler(
             log_filename,
@@ -49,6 +50,18 @@ def get_logger(name):
     return logging.getLogger(name)
 
 
+class DeviceFilter(logging.Filter):
+    """Inject the device ID into every record of a device logger."""
+
+    def __init__(self, device_id):
+        super().__init__()
+        self.device_id = device_id
+
+    def filter(self, record):
+        record.device_id = self.device_id
+        return True
+
+
 def get_device_logger(device_id):
     """
     Get a logger for a specific device with device ID context
@@ -61,28 +74,31 @@ def get_device_logger(device_id):
     """
     logger = logging.getLogger(f"device.{device_id}")
 
-    # Create a filter to inject device_id into log records
-    class DeviceFilter(logging.Filter):
-        def filter(self, record):
-            record.device_id = device_id
-            return True
-
-    # Check if filter already exists
-    has_filter = False
-    for handler in logger.handlers:
-        for filter_obj in handler.filters:
-            if isinstance(filter_obj, DeviceFilter):
-                has_filter = True
-                break
-
-    if not has_filter:
-        # Add filter to logger
-        device_filter = DeviceFilter()
-        logger.addFilter(device_filter)
+    # Add the filter only once per logger
+    if not any(isinstance(f, DeviceFilter) for f in logger.filters):
+        logger.addFilter(DeviceFilter(device_id))
 
     return logger
 
 
+def release_device_logger(device_id):
+    """
+    Drop the logger of a device that is gone for good
+
+    Loggers are never freed by the logging module, so long-running
+    processes call this when a device disconnects.
+
+    Args:
+        device_id: The device serial number
+    """
+    name = f"device.{device_id}"
+    with logging._lock:
+        logger = logging.Logger.manager.loggerDict.pop(name, None)
+    if isinstance(logger, logging.Logger):
+        logger.filters.clear()
+        logger.handlers.clear()
+
+
 def log_action(func=None, *, level=logging.INFO):
     """
     Decorator to log function execution with timing
@@ -102,6 +118,8 @@ def log_action(func=None, *, level=logging.INFO):
         def wrapper(*args, **kwargs):
             import time
 
+            from app.devices.app_perf import capture_step
+
             # Try to get device from args
             device_id = "unknown"
             if args and hasattr(args[0], "serial_number"):
@@ -110,11 +128,16 @@ def log_action(func=None, *, level=logging.INFO):
             else:
                 logger = logging.getLogger(f.__module__)
 
+            # Stop before starting any action once the flow must end
+            check_deadline()
+
             start_time = time.time()
             logger.log(level, f"Starting {f.__name__}")
 
             try:
-                result = f(*args, **kwargs)
+                # App gfxinfo/meminfo around the step when the flow captures them
+                with capture_step(f.__name__):
+                    result = f(*args, **kwargs)
                 elapsed = time.time() - start_time
                 logger.log(level, f"Completed {f.__name__} in {elapsed:.2f}s")
                 return result
@@ -0,0 +1,320 @@
+# Module for opt-in profiling of flow execution per device and per flow
+import io
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Optional
+
+from app.config import PROFILE_MODE, PROFILE_SAMPLE_INTERVAL, PROFILES_DIR
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sample")
+FLEET_REPORT = "fleet-report.txt"
+# Name of this run's subdirectory of PROFILES_DIR; set on first use and
+# inherited by spawned worker processes, so they write into the same run
+PROFILE_RUN_ENV = "EXA_PROFILE_RUN"
+
+_mode = PROFILE_MODE
+
+# Objects with record_flow(serial, flow, seconds, ok), notified after each flow
+_flow_observers: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def set_profile_mode(mode: str):
+    """Enable ("cprofile" or "sample") or disable ("") flow profiling."""
+    global _mode
+    if mode and mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    _mode = mode
+
+
+def get_profile_mode() -> str:
+    """Return the active profiling mode ("" when disabled)."""
+    return _mode
+
+
+def add_flow_observer(observer):
+    """Notify `observer.record_flow(serial, flow, seconds, ok)` after each flow.
+
+    Observers are held weakly and dropped when garbage collected.
+    """
+    _flow_observers.add(observer)
+
+
+def remove_flow_observer(observer):
+    _flow_observers.discard(observer)
+
+
+class _Sampler:
+    """Single background thread sampling the stacks of all profiled threads."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.sessions: Dict[int, Counter] = {}
+        self.thread: Optional[threading.Thread] = None
+        self._labels: Dict[object, str] = {}
+        self._wake = threading.Event()
+
+    def start_session(self, thread_id: int) -> Counter:
+        counts: Counter = Counter()
+        with self.lock:
+            self.sessions[thread_id] = counts
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="flow-sampler", daemon=True
+                )
+                self.thread.start()
+        return counts
+
+    def stop_session(self, thread_id: int):
+        with self.lock:
+            self.sessions.pop(thread_id, None)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame) -> str:
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.sessions:
+                    self.thread = None
+                    return
+                active = list(self.sessions.items())
+
+            frames = sys._current_frames()
+            for thread_id, counts in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counts[self._collapse(frame)] += 1
+            del frames
+
+            self._wake.wait(self.interval)
+
+
+_sampler = _Sampler(PROFILE_SAMPLE_INTERVAL)
+
+
+def run_directory() -> str:
+    """Profile directory of the current run (profiles/<start time>-<pid>)."""
+    run = os.environ.get(PROFILE_RUN_ENV)
+    if not run:
+        run = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        os.environ[PROFILE_RUN_ENV] = run
+    return os.path.join(PROFILES_DIR, run)
+
+
+def latest_run_directory(directory: str = PROFILES_DIR) -> Optional[str]:
+    """Most recently written run directory under `directory`, if any."""
+    try:
+        runs = [entry for entry in os.scandir(directory) if entry.is_dir()]
+    except FileNotFoundError:
+        return None
+    if not runs:
+        return None
+    return max(runs, key=lambda entry: entry.stat().st_mtime).path
+
+
+def _output_path(serial: str, flow: str, extension: str) -> str:
+    safe_serial = re.sub(r"[^\w.-]", "_", serial)
+    directory = os.path.join(run_directory(), safe_serial)
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(directory, f"{flow}-{timestamp}{extension}")
+
+
+def _write_folded(path: str, counts: Counter):
+    with open(path, "w") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_scope(serial: str, flow: str):
+    """
+    Profile the enclosed block and write one profile file for it.
+
+    Args:
+        serial: Device serial number
+        flow: Flow name, used in the output file name
+    """
+    mode = _mode
+    if not mode:
+        yield
+        return
+
+    if mode == "sample":
+        thread_id = threading.get_ident()
+        counts = _sampler.start_session(thread_id)
+        try:
+            yield
+        finally:
+            _sampler.stop_session(thread_id)
+            _write_folded(_output_path(serial, flow, ".folded"), counts)
+        return
+
+    # Since Python 3.12 cProfile is process-wide, so only one flow per process
+    # can be profiled deterministically at a time; concurrent flows run
+    # unprofiled. Use "sample" mode (or process workers) to cover every device.
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        logger.debug(f"Profiling {flow} on {serial} skipped: {e}")
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(_output_path(serial, flow, ".prof"))
+
+
+def profile_flow(func):
+    """
+    Decorator to profile a flow when profiling is enabled.
+
+    The flow must take the device serial as its second positional argument
+    or as the `serial` keyword, like `login_flow(device_service, serial, ...)`.
+    Flow durations are also reported to the flow observers. When profiling
+    is off and nobody observes, the overhead is a single flag check.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _mode and not _flow_observers:
+            return func(*args, **kwargs)
+        serial = str(kwargs.get("serial", args[1] if len(args) > 1 else "unknown"))
+        start = time.monotonic()
+        result = False
+        try:
+            if _mode:
+                with profile_scope(serial, func.__name__):
+                    result = func(*args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+            return result
+        finally:
+            seconds = time.monotonic() - start
+            for observer in list(_flow_observers):
+                try:
+                    observer.record_flow(serial, func.__name__, seconds, bool(result))
+                except Exception as e:
+                    logger.debug(f"Flow observer failed: {e}")
+
+    return wrapper
+
+
+def _collect(directory: str):
+    prof_files, folded_files = [], []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name in ("fleet.prof", "fleet.folded"):
+                continue  # output of an earlier report
+            if name.endswith(".prof"):
+                prof_files.append(os.path.join(root, name))
+            elif name.endswith(".folded"):
+                folded_files.append(os.path.join(root, name))
+    return prof_files, folded_files
+
+
+def write_fleet_report(directory: Optional[str] = None, top: int = 40) -> Optional[str]:
+    """
+    Merge the per-device profiles of one run into one fleet-wide report.
+
+    Writes fleet.prof (merged cProfile stats), fleet.folded (merged samples,
+    flamegraph input) and a readable fleet-report.txt into the run directory.
+    Call it where flows ran (test scripts, farm, daemon shutdown).
+
+    Args:
+        directory: Run directory (default: the current run's)
+        top: Number of entries to list per section
+
+    Returns:
+        str: Path of the text report, or None if no profiles were found
+    """
+    if directory is None:
+        directory = run_directory()
+    prof_files, folded_files = _collect(directory)
+    if not prof_files and not folded_files:
+        logger.warning(f"No profiles found in {directory}")
+        return None
+
+    flows = Counter(
+        os.path.basename(path).split("-", 1)[0] for path in prof_files + folded_files
+    )
+    devices = {os.path.basename(os.path.dirname(path)) for path in prof_files}
+    devices |= {os.path.basename(os.path.dirname(path)) for path in folded_files}
+
+    report = io.StringIO()
+    report.write(f"Fleet profile: {len(devices)} device(s)\n")
+    for flow, count in sorted(flows.items()):
+        report.write(f"  {flow}: {count} run(s)\n")
+
+    if prof_files:
+        import pstats
+
+        stats = pstats.Stats(prof_files[0], stream=report)
+        for path in prof_files[1:]:
+            stats.add(path)
+        stats.dump_stats(os.path.join(directory, "fleet.prof"))
+        report.write("\n== Deterministic (cProfile), by cumulative time ==\n")
+        stats.sort_stats("cumulative").print_stats(top)
+        report.write("\n== Deterministic (cProfile), by own time ==\n")
+        stats.sort_stats("tottime").print_stats(top)
+
+    if folded_files:
+        merged: Counter = Counter()
+        for path in folded_files:
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    merged[stack] += int(count)
+        _write_folded(os.path.join(directory, "fleet.folded"), merged)
+
+        own: Counter = Counter()
+        for stack, count in merged.items():
+            own[stack.rsplit(";", 1)[-1]] += count
+        total = sum(merged.values())
+        report.write(f"\n== Sampled, by own samples ({total} samples) ==\n")
+        for frame, count in own.most_common(top):
+            report.write(f"{count / total:7.2%} {count:8d}  {frame}\n")
+
+    path = os.path.join(directory, FLEET_REPORT)
+    with open(path, "w") as f:
+        f.write(report.getvalue())
+    logger.info(f"Fleet profile report written to {path}")
+    return path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    directory = sys.argv[1] if len(sys.argv) > 1 else latest_run_directory()
+    report_path = write_fleet_report(directory) if directory else None
+    if report_path:
+        print(report_path)
+    else:
+        sys.exit(1)
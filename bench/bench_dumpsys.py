@@ -0,0 +1,151 @@
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT_DIR)
+
+from app.devices.dumpsys import (
+    ACTIVITY_TOP,
+    BATTERY,
+    GFXINFO,
+    MEMINFO,
+    PACKAGE,
+    WINDOW,
+    parse_section,
+)
+from app.devices.simulator import (
+    LatencyModel,
+    SimulatedDeviceConfig,
+    SimulatedDeviceService,
+    SimulatedFarm,
+)
+from bench.common import (
+    BENCH_DIR,
+    check_regressions,
+    load_baselines,
+    print_table,
+    save_baselines,
+)
+
+logger = logging.getLogger("bench_dumpsys")
+
+SECTION = "dumpsys"
+DUMPS_DIR = os.path.join(BENCH_DIR, "dumps")
+SECTIONS = (BATTERY, WINDOW, ACTIVITY_TOP, PACKAGE, MEMINFO, GFXINFO)
+# Reads of one section within its TTL for the cache benchmark
+CACHE_READS = 100
+
+THRESHOLDS = {"parse_us": 1.0, "alloc_peak_kib": 0.25, "rpc_count": 0.0}
+SLACK = {"parse_us": 20.0, "alloc_peak_kib": 1.0}
+
+
+def load_dump(section: str) -> str:
+    """Recorded output of one section (unfiltered `dumpsys` from a device)."""
+    with open(os.path.join(DUMPS_DIR, f"{section}.txt")) as f:
+        return f.read()
+
+
+def parse_naive(output: str) -> dict:
+    """The ad-hoc approach: split every line into a key/value dict."""
+    values = {}
+    for line in output.splitlines():
+        line = line.strip()
+        if ":" in line:
+            key, value = line.split(":", 1)
+            values[key.strip()] = value.strip()
+    return values
+
+
+def best_time(func, repeat: int) -> float:
+    """Best wall time of `func` in microseconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return min(runs) * 1e6
+
+
+def peak_kib(func) -> float:
+    """Peak memory allocated while running `func`, in KiB."""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def bench_parser(section: str, repeat: int) -> dict:
+    output = load_dump(section)
+    parse_us = best_time(lambda: parse_section(section, output), repeat)
+    naive_us = best_time(lambda: parse_naive(output), repeat)
+    return {
+        "parse_us": round(parse_us, 3),
+        "naive_us": round(naive_us, 3),
+        "alloc_peak_kib": round(peak_kib(lambda: parse_section(section, output)), 3),
+        "naive_kib": round(peak_kib(lambda: parse_naive(output)), 3),
+    }
+
+
+def bench_cache() -> dict:
+    """Shell commands issued for CACHE_READS reads of one section."""
+    config = SimulatedDeviceConfig(latency=LatencyModel(scale=0.0))
+    farm = SimulatedFarm(1, config)
+    device_service = SimulatedDeviceService(farm)
+    serial = next(iter(farm.devices))
+    before = farm.rpc_count
+    for _ in range(CACHE_READS):
+        device_service.dumpsys(serial, BATTERY)
+    return {"rpc_count": farm.rpc_count - before}
+
+
+def run_benchmarks(repeat: int) -> dict:
+    results = {
+        f"parse_{section}": bench_parser(section, repeat) for section in SECTIONS
+    }
+    results["cache_battery"] = bench_cache()
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark parser dumpsys terhadap dump yang direkam"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=50, help="Jumlah ulangan (diambil yang terbaik)"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Simpan hasil sebagai baseline baru",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+
+    results = run_benchmarks(args.repeat)
+    print_table(results)
+
+    if args.update_baseline:
+        save_baselines(SECTION, results)
+        return
+
+    regressions = check_regressions(results, load_baselines(SECTION), THRESHOLDS, SLACK)
+    for regression in regressions:
+        logger.error(f"REGRESI: {regression}")
+    if regressions:
+        sys.exit(1)
+    logger.info("Tidak ada regresi")
+
+
+if __name__ == "__main__":
+    main()
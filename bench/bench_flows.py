@@ -0,0 +1,214 @@
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.automation.actions.login import navigate_to_account
+from app.automation.flows.login_flow import login_flow
+from app.automation.flows.otp_flow import otp_flow
+from app.automation.popup.pop_utils import handle_popup
+from app.automation.timing import timing_profiles
+from app.automation.ui.bounds import bounds_cache
+from app.automation.ui.input_utils import input_text
+from app.automation.ui.selectors import selector_registry
+from app.devices.simulator import (
+    LatencyModel,
+    SimulatedDeviceConfig,
+    SimulatedDeviceService,
+    SimulatedFarm,
+)
+from bench.common import (
+    VirtualClock,
+    check_regressions,
+    load_baselines,
+    print_table,
+    save_baselines,
+)
+
+logger = logging.getLogger("bench_flows")
+
+SECTION = "flows"
+SEED = 7
+SERIAL = "SIM0000"
+
+# Allowed relative increase per metric before a run counts as a regression
+THRESHOLDS = {
+    "wall_ms": 1.0,  # host CPU time, noisy across machines
+    "sleep_s": 0.02,
+    "rpc_count": 0.02,
+    "alloc_peak_kib": 0.25,
+}
+
+# Absolute increase that never counts as a regression (timer noise)
+SLACK = {"wall_ms": 0.5}
+
+# Learned timings would make a run depend on the runs (and files) before it
+timing_profiles.path = ""
+
+
+def _new_device(popup=None):
+    """Create a deterministic zero-latency device with the app in front."""
+    # Every run starts cold, independent of the benchmarks run before it
+    bounds_cache.clear()
+    selector_registry.forget(SERIAL)
+    timing_profiles.clear()
+    config = SimulatedDeviceConfig(popup_rate=0.0, latency=LatencyModel(scale=0.0))
+    farm = SimulatedFarm(1, config, seed=SEED)
+    device_service = SimulatedDeviceService(farm)
+    sim = farm.devices[SERIAL]
+    sim.launch_app()
+    sim.popup = popup
+    return device_service, sim
+
+
+def setup_login_flow():
+    device_service, sim = _new_device()
+    return lambda: login_flow(device_service, SERIAL, sim.phone_number), sim
+
+
+def setup_otp_flow():
+    device_service, sim = _new_device()
+    if not login_flow(device_service, SERIAL, sim.phone_number):
+        raise RuntimeError("Setup login gagal")
+    return lambda: otp_flow(device_service, SERIAL, sim.otp_code), sim
+
+
+def setup_handle_popup(popup_type):
+    def setup():
+        device_service, sim = _new_device(popup=popup_type)
+        ui_device = device_service.get_ui_device(SERIAL)
+        return lambda: handle_popup(ui_device, SERIAL), sim
+
+    return setup
+
+
+def setup_input_text():
+    device_service, sim = _new_device()
+    ui_device = device_service.get_ui_device(SERIAL)
+    selectors = selector_registry.for_device(device_service, SERIAL)
+    if not navigate_to_account(ui_device, selectors, SERIAL):
+        raise RuntimeError("Setup navigasi ke login gagal")
+    return (
+        lambda: input_text(
+            ui_device,
+            selectors["mobile_field"],
+            sim.phone_number,
+            SERIAL,
+            selectors["continue_button"],
+        ),
+        sim,
+    )
+
+
+BENCHMARKS = {
+    "login_flow": setup_login_flow,
+    "otp_flow": setup_otp_flow,
+    "handle_popup_promo": setup_handle_popup("promo"),
+    "handle_popup_tutorial": setup_handle_popup("tutorial"),
+    "input_text": setup_input_text,
+}
+
+
+def run_once(setup, trace_memory: bool = False) -> dict:
+    """
+    Run one benchmark iteration under a fresh virtual clock.
+
+    Args:
+        setup: Function returning (callable to measure, simulated device)
+        trace_memory: Measure peak allocations with tracemalloc
+
+    Returns:
+        dict: Metrics of this iteration
+    """
+    clock = VirtualClock()
+    with clock.patch():
+        run, sim = setup()
+        rpc_before = sim.rpc_count
+        slept_before = clock.slept
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = run()
+        wall = time.perf_counter() - start
+        peak = 0
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    if not result:
+        raise RuntimeError("Flow gagal saat benchmark")
+    return {
+        "wall_ms": wall * 1000,
+        "sleep_s": clock.slept - slept_before,
+        "rpc_count": sim.rpc_count - rpc_before,
+        "alloc_peak_kib": peak / 1024,
+    }
+
+
+def run_benchmarks(names, repeat: int) -> dict:
+    """Run the selected benchmarks and collect their metrics."""
+    results = {}
+    for name in names:
+        setup = BENCHMARKS[name]
+        runs = [run_once(setup) for _ in range(repeat)]
+        metrics = {
+            "wall_ms": min(run["wall_ms"] for run in runs),
+            "sleep_s": runs[0]["sleep_s"],
+            "rpc_count": runs[0]["rpc_count"],
+            "alloc_peak_kib": run_once(setup, trace_memory=True)["alloc_peak_kib"],
+        }
+        results[name] = {key: round(value, 3) for key, value in metrics.items()}
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark flow terhadap device simulasi yang deterministik"
+    )
+    parser.add_argument(
+        "names", nargs="*", help="Benchmark yang dijalankan (default: semua)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Jumlah ulangan untuk wall time"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Simpan hasil sebagai baseline baru",
+    )
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Benchmark tidak dikenal: {', '.join(unknown)}")
+    return args
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+
+    results = run_benchmarks(args.names or list(BENCHMARKS), args.repeat)
+    print_table(results)
+
+    if args.update_baseline:
+        baselines = load_baselines(SECTION)
+        baselines.update(results)
+        save_baselines(SECTION, baselines)
+        return
+
+    regressions = check_regressions(results, load_baselines(SECTION), THRESHOLDS, SLACK)
+    for regression in regressions:
+        logger.error(f"REGRESI: {regression}")
+    if regressions:
+        sys.exit(1)
+    logger.info("Tidak ada regresi")
+
+
+if __name__ == "__main__":
+    main()
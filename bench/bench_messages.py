@@ -0,0 +1,128 @@
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT_DIR)
+
+from app.automation.actions.otp.utils import OTP_MESSAGES, find_otp_message
+from app.automation.ui.bounds import Snapshot
+from bench.common import (
+    BENCH_DIR,
+    check_regressions,
+    load_baselines,
+    print_table,
+    save_baselines,
+)
+
+logger = logging.getLogger("bench_messages")
+
+SECTION = "messages"
+DUMPS_DIR = os.path.join(BENCH_DIR, "dumps")
+# Recorded screen -> message type the classifier must find (None: no message)
+SCREENS = {
+    "hierarchy_otp_dialog": "invalid",  # OTP page with the error in a dialog
+    "hierarchy_home": None,  # large screen without a message: full scan
+}
+
+THRESHOLDS = {"classify_us": 1.0, "alloc_peak_kib": 0.25}
+SLACK = {"classify_us": 20.0, "alloc_peak_kib": 1.0}
+
+
+def load_screen(name: str) -> str:
+    """Recorded `dump_hierarchy` of one screen."""
+    with open(os.path.join(DUMPS_DIR, f"{name}.xml")) as f:
+        return f.read()
+
+
+def classify_naive(hierarchy: str):
+    """The per-call approach: parse every node, lowercase every pattern."""
+    for element in Snapshot(hierarchy).elements:
+        text = element.attributes.get("text", "")
+        for message_type, patterns in OTP_MESSAGES.items():
+            for pattern in patterns:
+                if pattern.lower() in text.lower():
+                    return message_type
+    return None
+
+
+def best_time(func, repeat: int) -> float:
+    """Best wall time of `func` in microseconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return min(runs) * 1e6
+
+
+def peak_kib(func) -> float:
+    """Peak memory allocated while running `func`, in KiB."""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def bench_screen(name: str, expected, repeat: int) -> dict:
+    hierarchy = load_screen(name)
+    message = find_otp_message(hierarchy)
+    found = message.type if message is not None else None
+    if found != expected:
+        raise RuntimeError(f"{name}: pesan {found}, seharusnya {expected}")
+    return {
+        "classify_us": round(best_time(lambda: find_otp_message(hierarchy), repeat), 3),
+        "naive_us": round(best_time(lambda: classify_naive(hierarchy), repeat), 3),
+        "alloc_peak_kib": round(peak_kib(lambda: find_otp_message(hierarchy)), 3),
+        "naive_kib": round(peak_kib(lambda: classify_naive(hierarchy)), 3),
+    }
+
+
+def run_benchmarks(repeat: int) -> dict:
+    return {
+        name: bench_screen(name, expected, repeat) for name, expected in SCREENS.items()
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark klasifikasi pesan OTP terhadap layar yang direkam"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=200, help="Jumlah ulangan (diambil yang terbaik)"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Simpan hasil sebagai baseline baru",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+
+    results = run_benchmarks(args.repeat)
+    print_table(results)
+
+    if args.update_baseline:
+        save_baselines(SECTION, results)
+        return
+
+    regressions = check_regressions(results, load_baselines(SECTION), THRESHOLDS, SLACK)
+    for regression in regressions:
+        logger.error(f"REGRESI: {regression}")
+    if regressions:
+        sys.exit(1)
+    logger.info("Tidak ada regresi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT_DIR)
+
+from bench.common import (
+    check_regressions,
+    load_baselines,
+    print_table,
+    save_baselines,
+)
+
+logger = logging.getLogger("bench_startup")
+
+SECTION = "startup"
+
+# Modules that must stay out of the lightweight import graph
+HEAVY_MODULES = (
+    "uiautomator2",
+    "ppadb",
+    "adbutils",
+    "numpy",
+    "sqlalchemy",
+    "sqlmodel",
+)
+
+# Module imported by each benchmark, measured in a fresh interpreter
+IMPORTS = {
+    "import_cli": "app.cli",
+    "import_device_service": "app.devices.device_service",
+    "import_flows": "app.automation.flows.otp_flow",
+}
+
+THRESHOLDS = {"import_ms": 0.5, "process_ms": 0.5, "heavy_modules": 0.0}
+SLACK = {"import_ms": 5.0, "process_ms": 20.0}
+
+_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"import_ms": elapsed * 1000, "heavy": heavy}}))
+"""
+
+
+def measure_import(module: str) -> dict:
+    """Import a module in a fresh interpreter and report time and heavy deps."""
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_process(argv: list) -> float:
+    """Run a command in a fresh interpreter and return its wall time (ms)."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable] + argv, cwd=ROOT_DIR, capture_output=True, check=True
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def run_benchmarks(repeat: int) -> dict:
+    """Run all startup benchmarks, keeping the best of `repeat` runs."""
+    results = {}
+    for name, module in IMPORTS.items():
+        runs = [measure_import(module) for _ in range(repeat)]
+        heavy = sorted(set().union(*(run["heavy"] for run in runs)))
+        if heavy:
+            logger.warning(f"{module} memuat modul berat: {', '.join(heavy)}")
+        results[name] = {
+            "import_ms": round(min(run["import_ms"] for run in runs), 3),
+            "heavy_modules": len(heavy),
+        }
+
+    process_ms = min(measure_process(["main.py", "--help"]) for _ in range(repeat))
+    results["cli_help"] = {"process_ms": round(process_ms, 3)}
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark waktu startup CLI")
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Jumlah ulangan (diambil yang terbaik)"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Simpan hasil sebagai baseline baru",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+
+    results = run_benchmarks(args.repeat)
+    print_table(results)
+
+    if args.update_baseline:
+        save_baselines(SECTION, results)
+        return
+
+    regressions = check_regressions(results, load_baselines(SECTION), THRESHOLDS, SLACK)
+    for regression in regressions:
+        logger.error(f"REGRESI: {regression}")
+    if regressions:
+        sys.exit(1)
+    logger.info("Tidak ada regresi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import logging
+import os
+import statistics
+import sys
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.automation.flows.login_flow import login_flow
+from app.automation.flows.otp_flow import otp_flow
+from app.automation.timing import timing_profiles
+from app.automation.ui.bounds import bounds_cache
+from app.automation.ui.selectors import selector_registry
+from app.config.settings import DEFAULT_PACKAGE
+from app.devices.simulator import (
+    LatencyModel,
+    SimulatedDeviceConfig,
+    SimulatedDeviceService,
+    SimulatedFarm,
+)
+from bench.common import (
+    VirtualClock,
+    check_regressions,
+    load_baselines,
+    print_table,
+    save_baselines,
+)
+
+logger = logging.getLogger("bench_timing")
+
+SECTION = "timing"
+SERIAL = "SIM0000"
+# Device model -> latency scale of the simulated phone
+MODELS = {"fast": 0.3, "slow": 6.0}
+# Login + OTP runs per model; the last MEASURED ones are reported, after the
+# profile had MIN_SAMPLES runs to learn from
+RUNS = 30
+MEASURED = 10
+
+THRESHOLDS = {"flow_s": 0.05, "rpc_count": 0.05, "failures": 0.0}
+SLACK = {"failures": 0.0}
+
+
+def run_model(model: str, scale: float, adaptive: bool) -> dict:
+    """
+    Run login + OTP on fresh devices of one model under a virtual clock.
+
+    Every run starts from a new device (same model), so only the timing
+    profile carries over between runs.
+    """
+    timing_profiles.clear()
+    timing_profiles.enabled = adaptive
+    durations, rpcs, failures = [], [], 0
+    for seed in range(RUNS):
+        clock = VirtualClock()
+        with clock.patch():
+            config = SimulatedDeviceConfig(
+                popup_rate=0.0, latency=LatencyModel(scale=scale)
+            )
+            farm = SimulatedFarm(1, config, seed=seed)
+            device_service = SimulatedDeviceService(farm)
+            sim = farm.devices[SERIAL]
+            sim.properties["ro.product.model"] = model
+            bounds_cache.clear()
+            selector_registry.forget(SERIAL)
+            timing_profiles.forget(SERIAL)
+            device_service.launch_app(SERIAL, DEFAULT_PACKAGE)
+
+            start, rpc_before = clock.now, sim.rpc_count
+            ok = login_flow(device_service, SERIAL, sim.phone_number) and otp_flow(
+                device_service, SERIAL, sim.otp_code
+            )
+            durations.append(clock.now - start)
+            rpcs.append(sim.rpc_count - rpc_before)
+            failures += not ok
+    return {
+        "flow_s": statistics.mean(durations[-MEASURED:]),
+        "rpc_count": statistics.mean(rpcs[-MEASURED:]),
+        "failures": failures,
+    }
+
+
+def run_benchmarks() -> dict:
+    results = {}
+    for model, scale in MODELS.items():
+        adaptive = run_model(model, scale, adaptive=True)
+        constant = run_model(model, scale, adaptive=False)
+        adaptive["constant_s"] = constant["flow_s"]
+        results[model] = {key: round(value, 3) for key, value in adaptive.items()}
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark profil waktu per model device terhadap timeout tetap"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Simpan hasil sebagai baseline baru",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+    # Only what this run learns; never the profiles file of real devices
+    timing_profiles.path = ""
+
+    results = run_benchmarks()
+    print_table(results)
+
+    if args.update_baseline:
+        save_baselines(SECTION, results)
+        return
+
+    regressions = check_regressions(results, load_baselines(SECTION), THRESHOLDS, SLACK)
+    for regression in regressions:
+        logger.error(f"REGRESI: {regression}")
+    if regressions:
+        sys.exit(1)
+    logger.info("Tidak ada regresi")
+
+
+if __name__ == "__main__":
+    main()
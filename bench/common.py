@@ -0,0 +1,116 @@
+# Shared helpers for the benchmark scripts: virtual clock and baseline checks
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger("bench")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_PATH = os.path.join(BENCH_DIR, "baselines.json")
+
+
+class VirtualClock:
+    """Replaces time.sleep/time.time/time.monotonic so sleeps cost nothing.
+
+    Flows keep their exact control flow (timeouts, countdowns, polling) but
+    every sleep just advances the clock and is added to `slept`.
+    """
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+        self.slept = 0.0
+        self.sleep_calls = 0
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
+            self.slept += seconds
+        self.sleep_calls += 1
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    @contextmanager
+    def patch(self):
+        """Install the virtual clock on the time module for the duration."""
+        saved = time.sleep, time.time, time.monotonic
+        time.sleep, time.time, time.monotonic = self.sleep, self.time, self.monotonic
+        try:
+            yield self
+        finally:
+            time.sleep, time.time, time.monotonic = saved
+
+
+def load_baselines(section: str) -> Dict[str, Dict[str, float]]:
+    """Load stored baselines for one benchmark section."""
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH) as f:
+        return json.load(f).get(section, {})
+
+
+def save_baselines(section: str, results: Dict[str, Dict[str, float]]):
+    """Store results as the new baselines for one benchmark section."""
+    data = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as f:
+            data = json.load(f)
+    data[section] = results
+    with open(BASELINES_PATH, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    logger.info(f"Baseline '{section}' disimpan ke {BASELINES_PATH}")
+
+
+def check_regressions(
+    results: Dict[str, Dict[str, float]],
+    baselines: Dict[str, Dict[str, float]],
+    thresholds: Dict[str, float],
+    slack: Optional[Dict[str, float]] = None,
+) -> list:
+    """
+    Compare results against stored baselines.
+
+    Args:
+        results: Metrics per benchmark
+        baselines: Baseline metrics per benchmark
+        thresholds: Allowed relative increase per metric (0.1 = 10%)
+        slack: Absolute increase per metric that is always tolerated (optional)
+
+    Returns:
+        list: Regression messages, empty if none
+    """
+    slack = slack or {}
+    regressions = []
+    for name, metrics in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            logger.warning(f"Tidak ada baseline untuk {name}")
+            continue
+        for metric, value in metrics.items():
+            if metric not in baseline or metric not in thresholds:
+                continue
+            limit = baseline[metric] * (1 + thresholds[metric])
+            if value > limit and value - baseline[metric] > slack.get(metric, 1e-9):
+                regressions.append(
+                    f"{name}.{metric}: {value:.4g} > {limit:.4g} "
+                    f"(baseline {baseline[metric]:.4g}, +{thresholds[metric]:.0%})"
+                )
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]]):
+    """Print results as an aligned table."""
+    metrics = sorted({metric for values in results.values() for metric in values})
+    print(f"{'benchmark':<22}" + "".join(f"{metric:>14}" for metric in metrics))
+    for name, values in results.items():
+        row = "".join(
+            f"{values.get(metric, float('nan')):>14.4g}" for metric in metrics
+        )
+        print(f"{name:<22}{row}")
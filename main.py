@@ -1,4 +1,6 @@
-from app.app import main
+import sys
+
+from app.cli import main
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
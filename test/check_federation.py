@@ -0,0 +1,171 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.automation.flows.login_flow import login_flow
+from app.automation.flows.otp_flow import otp_flow
+from app.automation.timing import timing_profiles
+from app.config.settings import DEFAULT_PACKAGE
+from app.devices.simulator import (
+    LatencyModel,
+    SimulatedDeviceConfig,
+    SimulatedFarm,
+    SimulatedFederatedService,
+)
+
+logger = logging.getLogger("check_federation")
+
+
+def run_device(device_service: SimulatedFederatedService, serial: str) -> bool:
+    """Jalankan login + OTP flow pada satu device simulasi."""
+    sim = device_service.farm.devices[serial]
+    try:
+        device_service.launch_app(serial, DEFAULT_PACKAGE)
+        return login_flow(device_service, serial, sim.phone_number) and otp_flow(
+            device_service, serial, sim.otp_code
+        )
+    except Exception as e:
+        logger.info(f"{serial}: {e}")
+        return False
+
+
+def wait_for(condition, timeout: float) -> bool:
+    """Tunggu sampai `condition()` bernilai True, maksimal `timeout` detik."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def check(args) -> list:
+    """
+    Jalankan flow di semua device, matikan satu ADB server di tengah jalan,
+    lalu nyalakan lagi.
+
+    Returns:
+        list: Pesan untuk setiap pengecekan yang gagal
+    """
+    config = SimulatedDeviceConfig(
+        popup_rate=0.0, latency=LatencyModel(scale=args.latency_scale)
+    )
+    farm = SimulatedFarm(args.devices, config, seed=args.seed)
+    device_service = SimulatedFederatedService(farm, args.servers)
+    changes = []
+    device_service.on_devices_changed(lambda: changes.append(time.monotonic()))
+    errors = []
+
+    serials = [device.serial for device in device_service.get_devices()]
+    if sorted(serials) != sorted(farm.devices):
+        errors.append(f"get_devices: {len(serials)} dari {args.devices} device")
+
+    dropped_address, dropped = next(iter(device_service.clients.items()))
+    lost = set(dropped.serials)
+    # Info yang sudah dibaca harus dibaca ulang saat device tersambung kembali
+    for serial in lost:
+        device_service.device_info[serial].model = "usang"
+    timer = threading.Timer(args.drop_after, dropped.stop)
+    timer.start()
+    with ThreadPoolExecutor(max_workers=len(serials)) as executor:
+        results = dict(
+            zip(serials, executor.map(lambda s: run_device(device_service, s), serials))
+        )
+    timer.join()
+
+    kept = [serial for serial in serials if serial not in lost]
+    failed = [serial for serial in kept if not results[serial]]
+    logger.info(
+        f"Server {dropped_address} dimatikan setelah {args.drop_after}s; "
+        f"device di server lain: {len(kept) - len(failed)}/{len(kept)} sukses"
+    )
+    if failed:
+        errors.append(f"Flow gagal di server yang tetap hidup: {failed}")
+
+    status = device_service.server_status()
+    if status[dropped_address]["available"]:
+        errors.append(f"{dropped_address} masih dianggap tersambung")
+    remaining = {device.serial for device in device_service.get_devices()}
+    if remaining != set(kept):
+        errors.append(f"Device setelah server mati: {sorted(remaining)}")
+    if any(device_service.get_device(serial) for serial in lost):
+        errors.append("Device dari server yang mati masih bisa dipakai")
+    if lost & set(device_service.device_cache):
+        errors.append("Koneksi uiautomator2 server yang mati tidak dilepas")
+
+    dropped.start()
+    if not wait_for(
+        lambda: device_service.server_status()[dropped_address]["available"],
+        args.rejoin_timeout,
+    ):
+        errors.append(f"{dropped_address} tidak tersambung kembali")
+    devices = device_service.get_devices()
+    rejoined = {device.serial for device in devices}
+    if rejoined != set(farm.devices):
+        errors.append(f"Device setelah server kembali: {len(rejoined)}")
+    stale = [device.serial for device in devices if device.model == "usang"]
+    if stale:
+        errors.append(f"Info device tidak dibaca ulang: {stale}")
+    if not changes:
+        errors.append("Perubahan device tidak dilaporkan")
+    logger.info(f"Status server: {device_service.server_status()}")
+    device_service.close()
+    return errors
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Cek DeviceService gabungan beberapa ADB server simulasi"
+    )
+    parser.add_argument("--devices", type=int, default=8, help="Jumlah device")
+    parser.add_argument("--servers", type=int, default=2, help="Jumlah ADB server")
+    parser.add_argument(
+        "--drop-after",
+        type=float,
+        default=1.0,
+        help="Detik sebelum server pertama dimatikan",
+    )
+    parser.add_argument(
+        "--rejoin-timeout",
+        type=float,
+        default=15.0,
+        help="Batas waktu (detik) server tersambung kembali",
+    )
+    parser.add_argument(
+        "--latency-scale", type=float, default=0.3, help="Pengali latency RPC"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed random")
+    parser.add_argument(
+        "--log-level", default="WARNING", help="Level log flow (default: WARNING)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=args.log_level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
+    logger.setLevel(logging.INFO)
+    # Device simulasi belajar profil waktu di memori saja, bukan di file device asli
+    timing_profiles.path = ""
+
+    errors = check(args)
+    for error in errors:
+        logger.error(error)
+    if errors:
+        sys.exit(1)
+    logger.info("Semua pengecekan lolos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import logging
+import os
+import struct
+import sys
+import tempfile
+from typing import Optional
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.automation.actions.login.navigation import navigate_to_account
+from app.automation.timing import timing_profiles
+from app.devices.recording import (
+    Recorder,
+    RecordingDeviceService,
+    RecordingProxy,
+    Replay,
+    ReplayDeviceService,
+    ReplayNode,
+)
+
+logger = logging.getLogger("check_recording")
+
+
+class FakeExists:
+    """Seperti `Exists` uiautomator2: callable, nilai kebenarannya hasil cek."""
+
+    def __init__(self, ui_object: "FakeUiObject"):
+        self.ui_object = ui_object
+
+    def __bool__(self):
+        return self.ui_object.present
+
+    def __call__(self, timeout: float = 0):
+        return self.ui_object.present
+
+
+class FakeUiObject:
+    def __init__(self, present: bool):
+        self.present = present
+
+    @property
+    def exists(self) -> FakeExists:
+        return FakeExists(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.present
+
+    def wait_gone(self, timeout: Optional[float] = None) -> bool:
+        return not self.present
+
+    def click(self):
+        pass
+
+
+class FakeChildren:
+    """Objek yang hanya bisa dihitung dan diiterasi."""
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return iter(self.texts)
+
+
+class FakeDevice:
+    def __init__(self, present):
+        self.present = set(present)
+
+    def __call__(self, resourceId: str) -> FakeUiObject:
+        return FakeUiObject(resourceId in self.present)
+
+    def children(self) -> FakeChildren:
+        return FakeChildren(["Masuk", "Daftar"])
+
+    def screenshot(self) -> bytes:
+        return b"\x89PNG\x00\xff"
+
+
+# Frame screencap mentah 2x2 RGBA_8888 dengan header 16 byte (Android 9+)
+RAW_FRAME = struct.pack("<IIII", 2, 2, 1, 0) + bytes(range(16))
+
+
+class FakeConnection:
+    def send(self, command: str):
+        self.command = command
+
+    def read_all(self) -> bytes:
+        return RAW_FRAME
+
+    def close(self):
+        pass
+
+
+class FakeAdbDevice:
+    def __init__(self, serial: str):
+        self.serial = serial
+
+    def create_connection(self, timeout=None) -> FakeConnection:
+        return FakeConnection()
+
+
+class FakeAdbClient:
+    def device(self, serial: str) -> FakeAdbDevice:
+        return FakeAdbDevice(serial)
+
+
+class FakeModelService:
+    """Cukup untuk timing_profiles.for_device: getprop ro.product.model."""
+
+    def get_device(self, serial: str):
+        return self
+
+    def shell(self, command: str) -> str:
+        return "FakeModel"
+
+
+class FakeRecordingService(RecordingDeviceService):
+    """RecordingDeviceService di atas client ADB palsu."""
+
+    def _create_adb_client(self, host: str, port: int):
+        return RecordingProxy(FakeAdbClient(), "adb", self.recorder)
+
+
+def scenario(device, timeout: float) -> list:
+    """
+    Langkah ala flow; hasilnya harus sama saat rekam dan replay.
+
+    `timeout` meniru sisa batas waktu flow, yang berbeda di setiap run.
+    """
+    results = []
+    for resource_id in ("login_button", "popup_close"):
+        ui_object = device(resourceId=resource_id)
+        results.append(bool(ui_object.exists))
+        results.append("ada" if ui_object.exists else "tidak ada")
+        results.append(not ui_object.exists)
+        results.append(ui_object.exists(timeout=1))
+        results.append(ui_object.wait_gone(timeout=timeout))
+    children = device.children()
+    results.append(len(children))
+    results.append(list(children))
+    results.append(bytes(device.screenshot()))
+    return results
+
+
+def check() -> list:
+    """
+    Rekam skenario pada device palsu, lalu replay dari file rekaman.
+
+    Returns:
+        list: Pesan untuk setiap pengecekan yang gagal
+    """
+    errors = []
+    device = FakeDevice(["login_button"])
+    live = scenario(device, 5.0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rekaman.jsonl.gz")
+        recorder = Recorder(path)
+        recorded = scenario(RecordingProxy(device, "u2:FAKE", recorder), 4.87)
+        recorder.close()
+        replayed = scenario(ReplayNode(Replay(path, "zero"), "u2:FAKE"), 4.61)
+
+    if recorded != live:
+        errors.append(f"Hasil saat rekam berbeda: {recorded} != {live}")
+    if replayed != live:
+        errors.append(f"Hasil replay berbeda: {replayed} != {live}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "screencap.jsonl.gz")
+        service = FakeRecordingService(path)
+        recorded_frame = service.screencap("FAKE")
+        service.close()
+        service = ReplayDeviceService(path, "zero")
+        replayed_frame = service.screencap("FAKE")
+        try:
+            service._open_shell_stream("FAKE", "logcat")
+            errors.append("Shell stream saat replay tidak ditolak")
+        except RuntimeError:
+            pass
+        service.close()
+    if recorded_frame is None or recorded_frame.data != RAW_FRAME:
+        errors.append(f"Screencap saat rekam salah: {recorded_frame}")
+    if replayed_frame != recorded_frame:
+        errors.append(f"Screencap replay berbeda: {replayed_frame}")
+
+    # Timeout yang dipelajari berubah antara rekam dan replay
+    resource_ids = {"account_tab": "account_tab", "login_container": "login_container"}
+    device = FakeDevice(resource_ids.values())
+    profile = timing_profiles.for_device(FakeModelService(), "FAKE")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "navigasi.jsonl.gz")
+        recorder = Recorder(path)
+        recording = RecordingProxy(device, "u2:FAKE", recorder)
+        recorded_timeout = profile.timeout("login_container", 5)
+        navigated = navigate_to_account(recording, resource_ids, "FAKE")
+        recorder.close()
+        for _ in range(10):
+            profile.record("login_container", 1.0)
+        replay = ReplayNode(Replay(path, "zero"), "u2:FAKE")
+        try:
+            replayed_nav = navigate_to_account(replay, resource_ids, "FAKE")
+        except KeyError as e:
+            replayed_nav = f"miss {e}"
+    if profile.timeout("login_container", 5) == recorded_timeout:
+        errors.append("Timeout login_container tidak berubah setelah belajar")
+    if not navigated or replayed_nav is not True:
+        errors.append(f"Navigasi: rekam {navigated}, replay {replayed_nav}")
+    return errors
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Cek rekam dan replay objek uiautomator2 palsu"
+    )
+    parser.add_argument(
+        "--log-level", default="WARNING", help="Level log (default: WARNING)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=args.log_level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
+    logger.setLevel(logging.INFO)
+    # Profil waktu device palsu hanya di memori, bukan di file device asli
+    timing_profiles.path = ""
+
+    errors = check()
+    for error in errors:
+        logger.error(error)
+    if errors:
+        sys.exit(1)
+    logger.info("Semua pengecekan lolos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from typing import Iterator, List
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.automation.ui.selectors import FALLBACK, MISSING, selector_registry
+from app.devices.simulator import LatencyModel, SimulatedDevice, SimulatedDeviceConfig
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger("check_selectors")
+
+# (layar, popup, pesan) yang direkam dari device simulasi dengan --simulate
+SIMULATED_STATES = [
+    ("main", None, ""),
+    ("main", "promo", ""),
+    ("main", "tutorial", ""),
+    ("login", None, ""),
+    ("otp", None, ""),
+    ("otp", None, "Invalid OTP code"),
+    ("verifying", None, ""),
+    ("home", None, ""),
+]
+
+
+def read_hierarchies(path: str) -> Iterator[str]:
+    """
+    Baca dump hierarchy dari file atau direktori.
+
+    - `*.xml`: hasil `dump_hierarchy` apa adanya
+    - `*.xml.z`: hierarchy dari artefak kegagalan (artifacts/objects)
+    - `*.gz`/`*.jsonl`: rekaman `--record`, semua hasil `dump_hierarchy()`
+    - direktori: semua file di atas di dalamnya
+    """
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for filename in sorted(files):
+                yield from read_hierarchies(os.path.join(root, filename))
+        return
+    if path.endswith(".xml"):
+        with open(path, encoding="utf-8") as f:
+            yield f.read()
+    elif path.endswith(".xml.z"):
+        with open(path, "rb") as f:
+            yield zlib.decompress(f.read()).decode("utf-8")
+    elif path.endswith((".gz", ".jsonl")):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if "dump_hierarchy(" in entry.get("k", "") and isinstance(
+                    entry.get("r"), str
+                ):
+                    yield entry["r"]
+
+
+def simulated_hierarchies(version: str) -> List[str]:
+    """Rekam hierarchy setiap layar aplikasi dari device simulasi."""
+    device = SimulatedDevice(
+        "SIMCHECK",
+        "081234567890",
+        SimulatedDeviceConfig(popup_rate=0.0, latency=LatencyModel(scale=0.0)),
+        seed=0,
+    )
+    device.app_version = version or device.app_version
+    device.launch_app()
+    dumps = []
+    for screen, popup, message in SIMULATED_STATES:
+        device.screen = screen
+        device.popup = popup
+        device.message = message
+        device.ready_at = 0.0
+        device.verifying_until = time.monotonic() + 60
+        dumps.append(device.dump_hierarchy())
+    return dumps
+
+
+def check_selectors(version: str, hierarchies: List[str]) -> bool:
+    """
+    Cocokkan selector satu versi aplikasi dengan dump hierarchy.
+
+    Args:
+        version: versionName aplikasi
+        hierarchies: Dump hierarchy yang direkam dari versi tersebut
+
+    Returns:
+        bool: True jika tidak ada selector wajib yang hilang
+    """
+    selectors = selector_registry.get(version)
+    status = selectors.check(hierarchies)
+    logger.info(
+        f"Selector versi {selectors.version}: {len(selectors)} selector, "
+        f"{len(hierarchies)} hierarchy"
+    )
+    print(f"{'selector':<28}{'layar':<16}status")
+    for name, selector in sorted(selectors.items(), key=lambda x: x[1].screen):
+        print(f"{name:<28}{selector.screen:<16}{status[name]}")
+
+    missing = [name for name, result in status.items() if result == MISSING]
+    fallback = [name for name, result in status.items() if result == FALLBACK]
+    if fallback:
+        logger.warning(f"Hanya ditemukan lewat fallback: {', '.join(fallback)}")
+    if missing:
+        logger.error(f"Selector tidak ditemukan di layarnya: {', '.join(missing)}")
+        return False
+    logger.info("✅ Semua selector yang layarnya terekam ditemukan")
+    return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Validasi selector per versi aplikasi terhadap hierarchy terekam"
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="File .xml, .xml.z (artefak), rekaman .gz/.jsonl, atau direktori",
+    )
+    parser.add_argument(
+        "--version", default="", help="versionName aplikasi (default: terbaru)"
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="Rekam hierarchy setiap layar dari device simulasi",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    hierarchies = []
+    for path in args.paths:
+        hierarchies.extend(read_hierarchies(path))
+    if args.simulate:
+        hierarchies.extend(simulated_hierarchies(args.version))
+    if not hierarchies:
+        logger.error("Tidak ada hierarchy: beri path atau --simulate")
+        sys.exit(2)
+    sys.exit(0 if check_selectors(args.version, hierarchies) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Tambahkan root directory ke path agar bisa mengimport dari app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.automation.flows.login_flow import login_flow
+from app.automation.flows.otp_flow import otp_flow
+from app.automation.timing import timing_profiles
+from app.config.settings import DEFAULT_PACKAGE
+from app.devices.app_perf import collect_steps
+from app.devices.simulator import (
+    LatencyModel,
+    SimulatedDeviceConfig,
+    SimulatedDeviceService,
+    SimulatedFarm,
+    create_simulated_service,
+)
+from app.fleet.pipeline import OtpPipeline
+from app.fleet.workers import Supervisor
+from app.profiling import set_profile_mode, write_fleet_report
+
+logger = logging.getLogger("load_farm")
+
+
+def run_device(device_service: SimulatedDeviceService, serial: str) -> dict:
+    """
+    Jalankan login + OTP flow pada satu device simulasi.
+
+    Args:
+        device_service: Service untuk device simulasi
+        serial: Serial number device
+
+    Returns:
+        dict: Hasil dan durasi tiap tahap
+    """
+    sim = device_service.farm.devices[serial]
+    start = time.perf_counter()
+
+    device_service.launch_app(serial, DEFAULT_PACKAGE)
+
+    with collect_steps() as steps:
+        login_ok = login_flow(device_service, serial, sim.phone_number)
+    login_time = time.perf_counter() - start
+    if not login_ok:
+        return {
+            "serial": serial,
+            "ok": False,
+            "login": login_time,
+            "total": login_time,
+            "rpc": sim.rpc_count,
+            "steps": [step.to_dict() for step in steps],
+        }
+
+    # Tunggu SMS OTP sampai
+    otp_code = sim.read_sms()
+    while otp_code is None:
+        time.sleep(0.2)
+        otp_code = sim.read_sms()
+
+    with collect_steps() as otp_steps:
+        otp_ok = otp_flow(device_service, serial, otp_code)
+    return {
+        "serial": serial,
+        "ok": otp_ok,
+        "login": login_time,
+        "total": time.perf_counter() - start,
+        "rpc": sim.rpc_count,
+        "steps": [step.to_dict() for step in steps + otp_steps],
+    }
+
+
+def report_steps(results: list):
+    """Log durasi host per langkah di samping kerja aplikasi (frame, PSS)."""
+    by_step = {}
+    for result in results:
+        for step in result.get("steps", []):
+            by_step.setdefault((step["flow"], step["step"]), []).append(step)
+    for (flow, name), steps in sorted(by_step.items()):
+        frames = sum(step["frames"] for step in steps)
+        janky = sum(step["janky_frames"] for step in steps)
+        p90 = max((step["percentiles"].get(90, 0) for step in steps), default=0)
+        deltas = [step["pss_delta"] for step in steps if step["pss_delta"] is not None]
+        logger.info(
+            f"{flow}.{name}: {len(steps)}x, host "
+            f"{statistics.mean(step['seconds'] for step in steps):.2f}s, "
+            f"app {frames / len(steps):.0f} frame ({janky} janky, p90 maks {p90}ms), "
+            f"PSS {statistics.mean(deltas or [0]) / 1024:+.2f}MB, capture "
+            f"{statistics.mean(step['capture_seconds'] for step in steps):.3f}s"
+        )
+
+
+def run_farm(args) -> list:
+    """
+    Jalankan semua device simulasi secara paralel.
+
+    Args:
+        args: Argumen command line
+
+    Returns:
+        list: Hasil per device
+    """
+    config = SimulatedDeviceConfig(
+        popup_rate=args.popup_rate,
+        promo_close_id_rate=args.promo_close_id_rate,
+        invalid_otp_rate=args.invalid_otp_rate,
+        crash_rate=args.crash_rate,
+        latency=LatencyModel(scale=args.latency_scale),
+    )
+    farm = SimulatedFarm(args.devices, config, seed=args.seed)
+    device_service = SimulatedDeviceService(
+        farm, logcat=args.logcat, artifacts=args.artifacts
+    )
+    device_service.app_perf_enabled = args.app_perf
+    serials = [device.serial for device in device_service.get_devices()]
+    # Prepare only part of the farm so the report compares both sides
+    prepared = serials[: int(len(serials) * args.prepare_ratio)]
+    if prepared and not args.processes:
+        device_service.prepare_devices(prepared)
+    telemetry = None
+    if args.telemetry and not args.processes:
+        telemetry = device_service.start_telemetry(serials, args.telemetry, "")
+
+    start = time.perf_counter()
+    if args.pipeline:
+        # Login everywhere first, then enter codes as their SMS arrive
+        pipeline = OtpPipeline(device_service)
+        farm.on_sms(pipeline.deliver)
+        runs = pipeline.run({s: farm.devices[s].phone_number for s in serials})
+        results = [
+            dict(run.to_dict(), rpc=farm.devices[serial].rpc_count)
+            for serial, run in runs.items()
+        ]
+        resends = sum(result["resends"] for result in results)
+        logger.info(f"Pipeline: {resends} resend")
+    elif args.processes:
+        # Every worker builds the same farm and drives only its own serials
+        factory = partial(create_simulated_service, args.devices, config, args.seed)
+        groups = Supervisor.split(serials, args.processes)
+        with Supervisor(factory, groups, log_level=args.log_level) as supervisor:
+            futures = [supervisor.submit(s, run_device) for s in serials]
+            results = [future.result() for future in futures]
+            metrics = supervisor.metrics()["totals"]
+        logger.info(
+            f"Worker: {len(groups)} proses, restart: {metrics['restarts']}, "
+            f"CPU: {metrics['cpu_time']:.1f}s"
+        )
+    else:
+        with ThreadPoolExecutor(max_workers=args.workers or len(serials)) as executor:
+            results = list(
+                executor.map(lambda s: run_device(device_service, s), serials)
+            )
+    elapsed = time.perf_counter() - start
+
+    totals = sorted(result["total"] for result in results)
+    success = sum(1 for result in results if result["ok"])
+    failed = len(results) - success
+    logger.info(f"Device: {len(results)}, sukses: {success}, gagal: {failed}")
+    throughput = len(results) / elapsed
+    logger.info(f"Waktu total: {elapsed:.1f}s ({throughput:.2f} device/detik)")
+    if totals:
+        p95 = totals[min(len(totals) - 1, int(len(totals) * 0.95))]
+        logger.info(
+            f"Durasi per device: p50={statistics.median(totals):.1f}s p95={p95:.1f}s"
+        )
+    logger.info(f"Total RPC: {sum(result['rpc'] for result in results)}")
+    if prepared and not args.processes:
+        for flow, row in device_service.preparation.report().items():
+            if row["saved"] is not None:
+                logger.info(
+                    f"Persiapan device, {flow}: {row['baseline']:.2f}s -> "
+                    f"{row['prepared']:.2f}s (hemat {row['saved']:.2f}s)"
+                )
+    if args.app_perf:
+        report_steps(results)
+    if telemetry:
+        for flow, series in telemetry.report().items():
+            for name, row in series.items():
+                if row["r"] is not None:
+                    logger.info(
+                        f"Telemetry, {flow} vs {name}: r={row['r']:+.2f} "
+                        f"({row['samples']} flow)"
+                    )
+    crashes = sum(device.crash_count for device in farm.devices.values())
+    if crashes:
+        logger.info(f"Crash aplikasi: {crashes}")
+    device_service.close()
+    if device_service.artifacts is not None and device_service.artifacts.written:
+        written = device_service.artifacts.written
+        logger.info(f"Artefak kegagalan: {len(written)} (terakhir: {written[-1]})")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Load test login + OTP flow dengan device farm simulasi"
+    )
+    parser.add_argument(
+        "--devices", type=int, default=50, help="Jumlah device simulasi"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Jumlah thread (default: satu per device)",
+    )
+    parser.add_argument(
+        "--latency-scale", type=float, default=1.0, help="Pengali latency RPC"
+    )
+    parser.add_argument(
+        "--popup-rate", type=float, default=0.3, help="Peluang popup saat app dibuka"
+    )
+    parser.add_argument(
+        "--promo-close-id-rate",
+        type=float,
+        default=1.0,
+        help="Peluang tombol close popup promo punya resource ID",
+    )
+    parser.add_argument(
+        "--invalid-otp-rate",
+        type=float,
+        default=0.0,
+        help="Peluang OTP benar tetap ditolak",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        help="Jalankan device di N proses worker (default: thread saja)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Login semua device dulu, lalu input OTP sesuai urutan SMS datang",
+    )
+    parser.add_argument(
+        "--prepare-ratio",
+        type=float,
+        default=0.0,
+        help="Bagian device yang disiapkan (animasi mati) untuk perbandingan",
+    )
+    parser.add_argument(
+        "--logcat",
+        action="store_true",
+        help="Baca logcat per device (bangun saat layar berganti, gagal saat crash)",
+    )
+    parser.add_argument(
+        "--crash-rate",
+        type=float,
+        default=0.0,
+        help="Peluang aplikasi crash setiap kali layar berganti",
+    )
+    parser.add_argument(
+        "--artifacts",
+        action="store_true",
+        help="Simpan layar terakhir per device dan tulis saat flow gagal",
+    )
+    parser.add_argument(
+        "--app-perf",
+        action="store_true",
+        help="Rekam gfxinfo/meminfo aplikasi di sekitar setiap langkah flow",
+    )
+    parser.add_argument(
+        "--telemetry",
+        type=float,
+        default=0.0,
+        help="Interval (detik) telemetry per device; korelasi dengan durasi flow",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed random")
+    parser.add_argument(
+        "--profile",
+        choices=["cprofile", "sample"],
+        help="Profiling per device dan per flow, plus laporan gabungan",
+    )
+    parser.add_argument(
+        "--log-level", default="WARNING", help="Level log flow (default: WARNING)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=args.log_level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
+    logger.setLevel(logging.INFO)
+    if args.profile:
+        set_profile_mode(args.profile)
+    # Device simulasi belajar profil waktu di memori saja, bukan di file device asli
+    timing_profiles.path = ""
+
+    run_farm(args)
+
+    if args.profile:
+        logger.info(f"Laporan profiling: {write_fleet_report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import argparse
 import logging
 import os
 import sys
-import time
+from typing import Optional
 
 # Tambahkan root directory ke path agar bisa mengimport dari app
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -10,6 +10,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from app.automation.flows.login_flow import login_flow
 from app.config import init_app
 from app.devices.device_service import DeviceService
+from app.devices.recording import create_device_service
+from app.profiling import get_profile_mode, write_fleet_report
 
 # Konfigurasi logging
 logging.basicConfig(
@@ -20,13 +22,16 @@ logging.basicConfig(
 logger = logging.getLogger("test_login")
 
 
-def test_login_flow(serial: str, phone_number: str):
+def test_login_flow(
+    serial: str, phone_number: str, device_service: Optional[DeviceService] = None
+):
     """
     Tes login flow dengan device dan nomor telepon tertentu
 
     Args:
         serial: Serial number device untuk test
         phone_number: Nomor telepon untuk login
+        device_service: Service yang dipakai (opsional, default: device live)
     """
     logger.info(
         f"Memulai pengujian login dengan device {serial} dan nomor {phone_number}"
@@ -35,8 +40,9 @@ def test_login_flow(serial: str, phone_number: str):
     # Initialize app
     init_app()
 
-    # Buat device service
-    device_service = DeviceService()
+    # Buat device service (live, rekam, atau replay)
+    if device_service is None:
+        device_service = DeviceService()
 
     # Verifikasi device tersedia
     devices = device_service.get_devices()
@@ -52,13 +58,13 @@ def test_login_flow(serial: str, phone_number: str):
         logger.error(f"Device dengan serial {serial} tidak ditemukan")
         return False
 
-    # Persiapan: press home dan buka aplikasi
-    logger.info("Menekan tombol HOME dan membuka aplikasi")
-    device_service.press_key(serial, 3)  # KEYCODE_HOME = 3
-    time.sleep(1)
-
-    device_service.open_app(serial, "com.pure.indosat.care")
-    time.sleep(3)  # Beri waktu aplikasi untuk terbuka
+    # Persiapan: buka aplikasi (dilewati jika sudah di depan); am start -W
+    # baru selesai setelah frame pertama tampil, jadi tidak perlu sleep
+    logger.info("Membuka aplikasi")
+    launch = device_service.launch_app(serial, "com.pure.indosat.care")
+    if not launch.ok:
+        logger.error(f"Aplikasi gagal dibuka: {launch.error}")
+        return False
 
     # Coba login
     result = login_flow(device_service, serial, phone_number)
@@ -75,6 +81,18 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Test login flow untuk aplikasi myIM3")
     parser.add_argument("serial", help="Serial number device untuk test")
     parser.add_argument("phone", help="Nomor telepon untuk login")
+    parser.add_argument(
+        "--record", help="Rekam semua request ADB/uiautomator2 ke file ini"
+    )
+    parser.add_argument(
+        "--replay", help="Jalankan ulang dari file rekaman tanpa device"
+    )
+    parser.add_argument(
+        "--replay-latency",
+        default="faithful",
+        choices=["faithful", "zero"],
+        help="Latency saat replay (default: faithful)",
+    )
     parser.add_argument(
         "--package",
         default="com.pure.indosat.care",
@@ -85,7 +103,15 @@ def parse_args():
 
 def main():
     args = parse_args()
-    test_login_flow(args.serial, args.phone)
+    device_service = create_device_service(
+        record=args.record, replay=args.replay, latency=args.replay_latency
+    )
+    try:
+        test_login_flow(args.serial, args.phone, device_service)
+    finally:
+        device_service.close()
+    if get_profile_mode():
+        logger.info(f"Laporan profiling: {write_fleet_report()}")
 
 
 if __name__ == "__main__":
@@ -2,15 +2,18 @@ import argparse
 import logging
 import os
 import sys
-import time
+from typing import Optional
 
 # Tambahkan root directory ke path agar bisa mengimport dari app
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app.automation.flows.login_flow import login_flow
 from app.automation.flows.otp_flow import otp_flow
+from app.automation.ui.selectors import selector_registry
 from app.config import init_app
 from app.devices.device_service import DeviceService
+from app.devices.recording import create_device_service
+from app.profiling import get_profile_mode, write_fleet_report
 
 # Konfigurasi logging
 logging.basicConfig(
@@ -37,7 +40,11 @@ def get_otp_from_user() -> str:
 
 
 def test_otp_flow(
-    serial: str, phone_number: str, otp_code: str = "", manual_input: bool = True
+    serial: str,
+    phone_number: str,
+    otp_code: str = "",
+    manual_input: bool = True,
+    device_service: Optional[DeviceService] = None,
 ):
     """
     Tes login dan OTP flow dengan device dan nomor telepon tertentu
@@ -47,6 +54,7 @@ def test_otp_flow(
         phone_number: Nomor telepon untuk login
         otp_code: Kode OTP (opsional, jika tidak diisi akan minta input)
         manual_input: True untuk meminta OTP dari user, False untuk menggunakan otp_code
+        device_service: Service yang dipakai (opsional, default: device live)
 
     Returns:
         bool: True jika flow berhasil, False jika gagal
@@ -58,8 +66,9 @@ def test_otp_flow(
     # Initialize app
     init_app()
 
-    # Buat device service
-    device_service = DeviceService()
+    # Buat device service (live, rekam, atau replay)
+    if device_service is None:
+        device_service = DeviceService()
 
     # Verifikasi device tersedia
     devices = device_service.get_devices()
@@ -75,13 +84,13 @@ def test_otp_flow(
         logger.error(f"Device dengan serial {serial} tidak ditemukan")
         return False
 
-    # Persiapan: press home dan buka aplikasi
-    logger.info("Menekan tombol HOME dan membuka aplikasi")
-    device_service.press_key(serial, 3)  # KEYCODE_HOME = 3
-    time.sleep(1)
-
-    device_service.open_app(serial, "com.pure.indosat.care")
-    time.sleep(3)  # Beri waktu aplikasi untuk terbuka
+    # Persiapan: buka aplikasi (dilewati jika sudah di depan); am start -W
+    # baru selesai setelah frame pertama tampil, jadi tidak perlu sleep
+    logger.info("Membuka aplikasi")
+    launch = device_service.launch_app(serial, "com.pure.indosat.care")
+    if not launch.ok:
+        logger.error(f"Aplikasi gagal dibuka: {launch.error}")
+        return False
 
     # Coba login
     logger.info(f"Memulai proses login dengan nomor {phone_number}")
@@ -95,9 +104,8 @@ def test_otp_flow(
 
     # Verifikasi apakah kita berada di halaman OTP
     ui_device = device_service.get_ui_device(serial)
-    otp_page_check = ui_device(
-        resourceId="com.pure.indosat.care:id/tvLoginVerification"
-    ).exists
+    selectors = selector_registry.for_device(device_service, serial)
+    otp_page_check = ui_device(resourceId=selectors["otp_title"]).exists
 
     if not otp_page_check:
         logger.warning(
@@ -131,6 +139,18 @@ def parse_args():
     parser.add_argument(
         "--otp", help="Kode OTP (opsional, jika tidak diisi akan minta input)"
     )
+    parser.add_argument(
+        "--record", help="Rekam semua request ADB/uiautomator2 ke file ini"
+    )
+    parser.add_argument(
+        "--replay", help="Jalankan ulang dari file rekaman tanpa device"
+    )
+    parser.add_argument(
+        "--replay-latency",
+        default="faithful",
+        choices=["faithful", "zero"],
+        help="Latency saat replay (default: faithful)",
+    )
     parser.add_argument(
         "--package",
         default="com.pure.indosat.care",
@@ -146,9 +166,21 @@ def parse_args():
 
 def main():
     args = parse_args()
-    test_otp_flow(
-        args.serial, args.phone, otp_code=args.otp, manual_input=not args.auto
+    device_service = create_device_service(
+        record=args.record, replay=args.replay, latency=args.replay_latency
     )
+    try:
+        test_otp_flow(
+            args.serial,
+            args.phone,
+            otp_code=args.otp,
+            manual_input=not args.auto,
+            device_service=device_service,
+        )
+    finally:
+        device_service.close()
+    if get_profile_mode():
+        logger.info(f"Laporan profiling: {write_fleet_report()}")
 
 
 if __name__ == "__main__":